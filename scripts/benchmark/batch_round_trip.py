@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Run process_problems_batch through a submit -> poll -> download -> resume round trip.
+
+The script serves scripts/benchmark/batch_stub.py on a local port, points the OpenAI
+(or TogetherAI) client at it and generates responses for a few synthetic OEQ problems in
+a temporary output directory:
+1. Submit with --batch-no-wait: the job is checkpointed and nothing is ingested
+2. Check again with --batch-no-wait: the checkpointed job is resumed, not resubmitted
+3. Wait for the job: one request fails and one is missing from the output; the other
+   results are ingested and the checkpoint moves the job to its history
+4. Run again: only the failed and missing requests are submitted as a new job, and every
+   problem ends with a successful response
+
+Each step checks response.jsonl, batch_state.json and the uploads seen by the stub, and
+the script exits with an error on the first mismatch.
+
+Usage:
+    python scripts/benchmark/batch_round_trip.py
+    python scripts/benchmark/batch_round_trip.py --base together
+    python scripts/benchmark/batch_round_trip.py --problems 20 --keep-output /tmp/batch_round_trip
+"""
+
+import os
+import sys
+import json
+import shutil
+import logging
+import argparse
+import tempfile
+
+# Model of each base used for the round trip
+BASE_MODELS = {"openai": "gpt4o-mini", "together": "llama"}
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch_stub import BatchStub, start_stub_server
+
+def read_lines(path):
+    """Read a JSONL file, or return an empty list if it does not exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def read_state(output_dir):
+    """Read the batch checkpoint of the output directory."""
+    with open(os.path.join(output_dir, "batch_state.json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def check(condition, message):
+    """Print the outcome of one check and exit on failure."""
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Round trip of batch mode against a local stub of the batch API")
+    parser.add_argument("--base", type=str, default="openai", choices=list(BASE_MODELS), help="Base whose batch implementation is tested")
+    parser.add_argument("--problems", type=int, default=6, help="Number of synthetic problems")
+    parser.add_argument("--polls", type=int, default=2, help="Number of status checks a job stays in_progress (at least 1)")
+    parser.add_argument("--keep-output", type=str, default=None, help="Directory to write the outputs to instead of a temporary one")
+    parser.add_argument("--verbose", action="store_true", help="Show the generation logs")
+    args = parser.parse_args()
+    if args.polls < 1 or args.problems < 3:
+        parser.error("the round trip needs --polls >= 1 and --problems >= 3")
+
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+
+    problems = [{'id': f"problem_{idx}", 'question': f"What is {idx} + {idx}?"} for idx in range(args.problems)]
+    fail_id, drop_id = problems[1]['id'], problems[-1]['id']
+
+    stub = BatchStub(polls=args.polls, fail_ids=[fail_id], drop_ids=[drop_id])
+    server = start_stub_server(stub)
+
+    # The endpoint and keys are read when the model modules are imported and the clients created
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["TOGETHER_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["TOGETHER_API_KEY"] = "stub-key"
+
+    from src.generate.generate import process_problems_batch
+
+    output_dir = args.keep_output or tempfile.mkdtemp(prefix="batch_round_trip_")
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "response.jsonl")
+    metadata_path = os.path.join(output_dir, "metadata.json")
+
+    def run(no_wait):
+        return process_problems_batch(problems, BASE_MODELS[args.base], output_path, args.base, question_type="OEQ", dataset_name="stub",
+                                      max_tokens=64, metadata_path=metadata_path, poll_interval=0.05, no_wait=no_wait)
+
+    try:
+        print(f"Stub at {base_url} ({args.base}), output in {output_dir}")
+
+        print("1. Submit without waiting")
+        run(no_wait=True)
+        state = read_state(output_dir)
+        first_batch_id = state['active']['batch_id'] if state['active'] else None
+        check(first_batch_id is not None and state['active']['status'] == "in_progress", "the submitted job is checkpointed as in_progress")
+        check(len(state['active']['custom_ids']) == args.problems, f"the job covers all {args.problems} problems")
+        check(read_lines(output_path) == [], "no responses are ingested yet")
+
+        print("2. Check the running job again")
+        run(no_wait=True)
+        state = read_state(output_dir)
+        check(state['active'] is not None and state['active']['batch_id'] == first_batch_id, "the checkpointed job is resumed")
+        check(stub.uploads == 1 and len(stub.batches) == 1, "nothing is uploaded or submitted again")
+
+        print("3. Wait for the job and download its results")
+        responses, metadata = run(no_wait=False)
+        state = read_state(output_dir)
+        lines = read_lines(output_path)
+        errors = [line['id'] for line in lines if 'error' in line]
+        check(state['active'] is None and [job['batch_id'] for job in state['history']] == [first_batch_id], "the job moves to the checkpoint history")
+        check(len(responses) == args.problems - 1, f"{args.problems - 1} results are ingested")
+        check(errors == [fail_id], f"the failed request {fail_id} is recorded as an error")
+        check(drop_id not in [line['id'] for line in lines], f"the missing request {drop_id} has no response")
+        check(metadata['statistics']['missing_questions'] == 1, "the metadata counts one missing question")
+
+        print("4. Resubmit the failed and missing requests")
+        responses, metadata = run(no_wait=False)
+        state = read_state(output_dir)
+        lines = read_lines(output_path)
+        second_batch = [batch for batch_id, batch in stub.batches.items() if batch_id != first_batch_id]
+        check(stub.uploads == 2 and len(second_batch) == 1, "exactly one new job is submitted")
+        check(sorted(second_batch[0]['custom_ids']) == sorted([fail_id, drop_id]), "the new job covers only the failed and missing requests")
+        check(len(state['history']) == 2 and state['active'] is None, "both jobs are in the checkpoint history")
+        check([line['id'] for line in lines] == [problem['id'] for problem in problems], "response.jsonl lists every problem in dataset order")
+        check(all('error' not in line for line in lines), "every problem has a successful response")
+        check(metadata['statistics']['completion_percentage'] == 100, "the metadata reports 100% completion")
+
+        print("5. Run once more")
+        responses, _ = run(no_wait=False)
+        check(responses == [] and stub.uploads == 2, "nothing is left to submit")
+
+        print("Round trip passed")
+    finally:
+        server.shutdown()
+        if not args.keep_output:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
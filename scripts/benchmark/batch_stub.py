@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Local stub of the OpenAI-compatible batch endpoints used by --batch-mode.
+
+The stub implements just enough of the API for src/models/batch_api.py:
+1. POST /v1/files: multipart upload of a batch request file
+2. POST /v1/batches: create a job from an uploaded file
+3. GET /v1/batches/{id}: the job stays in_progress for --polls retrievals, then completes
+4. GET /v1/files/{id}/content: the output or error file of a completed job
+
+Every request line is answered with a fixed chat completion. Requests whose custom_id is
+listed in fail_ids are answered with an error line instead, and those listed in drop_ids
+appear in neither file. Both lists only apply to the first job that contains the id, so a
+resubmission of the same requests succeeds.
+
+Point the models at it with OPENAI_BASE_URL / TOGETHER_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python scripts/benchmark/batch_stub.py --port 8765
+    python scripts/benchmark/batch_stub.py --port 8765 --polls 3 --fail-ids problem_1 --drop-ids problem_2
+"""
+
+import json
+import time
+import uuid
+import email
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Content of every successful chat completion
+STUB_ANSWER = "The answer is \\boxed{A}"
+
+class BatchStub:
+    """In-memory state of the stubbed files and batch jobs."""
+
+    def __init__(self, polls=2, fail_ids=(), drop_ids=()):
+        """
+        Initialize the stub.
+
+        Args:
+            polls (int): Number of retrievals a job stays in_progress before it completes
+            fail_ids (iterable): custom_ids answered with an error line in their first job
+            drop_ids (iterable): custom_ids left out of both files of their first job
+        """
+        self.polls = polls
+        self.fail_ids = set(fail_ids)
+        self.drop_ids = set(drop_ids)
+        self.files = {}
+        self.batches = {}
+        self.retrievals = {}
+        self.uploads = 0
+        self._lock = threading.Lock()
+
+    def add_file(self, content, filename, purpose):
+        """Store an uploaded or generated file and return its file object."""
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+
+    def upload(self, content, filename, purpose):
+        """Handle POST /v1/files."""
+        with self._lock:
+            self.uploads += 1
+            return self.add_file(content, filename, purpose)
+
+    def create_batch(self, params):
+        """Handle POST /v1/batches."""
+        with self._lock:
+            input_file_id = params["input_file_id"]
+            if input_file_id not in self.files:
+                return None
+            requests = [json.loads(line) for line in self.files[input_file_id].decode("utf-8").splitlines() if line.strip()]
+            batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": params["endpoint"],
+                "input_file_id": input_file_id,
+                "completion_window": params["completion_window"],
+                "metadata": params.get("metadata"),
+                "status": "validating",
+                "created_at": int(time.time()),
+                "output_file_id": None,
+                "error_file_id": None,
+                "errors": None,
+                "request_counts": {"total": len(requests), "completed": 0, "failed": 0},
+                "custom_ids": [request["custom_id"] for request in requests],
+                "requests": requests
+            }
+            self.retrievals[batch_id] = 0
+            return self.public_batch(batch_id)
+
+    def public_batch(self, batch_id):
+        """The batch object as returned by the API, without the stub's own fields."""
+        batch = self.batches[batch_id]
+        return {key: value for key, value in batch.items() if key not in ("custom_ids", "requests")}
+
+    def retrieve_batch(self, batch_id):
+        """Handle GET /v1/batches/{id}, completing the job after the configured number of polls."""
+        with self._lock:
+            if batch_id not in self.batches:
+                return None
+            batch = self.batches[batch_id]
+            self.retrievals[batch_id] += 1
+            if batch["status"] != "completed":
+                if self.retrievals[batch_id] > self.polls:
+                    self._complete(batch)
+                else:
+                    batch["status"] = "in_progress"
+            return self.public_batch(batch_id)
+
+    def _complete(self, batch):
+        """Answer every request of a job and write its output and error files."""
+        output_lines = []
+        error_lines = []
+        for request in batch["requests"]:
+            custom_id = request["custom_id"]
+            if custom_id in self.drop_ids:
+                self.drop_ids.discard(custom_id)
+                continue
+            if custom_id in self.fail_ids:
+                self.fail_ids.discard(custom_id)
+                error_lines.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": custom_id,
+                    "response": {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": {"type": "server_error", "message": "Stub failure"}}},
+                    "error": None
+                })
+                continue
+            output_lines.append({
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": custom_id,
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": self._completion(request["body"])},
+                "error": None
+            })
+
+        if output_lines:
+            batch["output_file_id"] = self.add_file(self._jsonl(output_lines), "batch_output.jsonl", "batch_output")["id"]
+        if error_lines:
+            batch["error_file_id"] = self.add_file(self._jsonl(error_lines), "batch_errors.jsonl", "batch_output")["id"]
+        batch["request_counts"] = {"total": len(batch["requests"]), "completed": len(output_lines), "failed": len(error_lines)}
+        batch["status"] = "completed"
+
+    @staticmethod
+    def _completion(body):
+        """A chat completion answering one request body."""
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body.get("messages", []))
+        completion_tokens = len(STUB_ANSWER.split())
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": STUB_ANSWER}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    @staticmethod
+    def _jsonl(lines):
+        return "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+
+def make_handler(stub):
+    """Create the request handler class serving one BatchStub."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            # Keep the stub quiet; the callers log every request themselves
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _not_found(self):
+            self._send_json(404, {"error": {"type": "not_found", "message": f"No route for {self.command} {self.path}"}})
+
+        def _read_body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        def do_POST(self):
+            body = self._read_body()
+            if self.path == "/v1/files":
+                # Parse the multipart form with the email parser (the cgi module is deprecated)
+                message = email.message_from_bytes(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + body)
+                fields = {}
+                for part in message.get_payload():
+                    name = part.get_param("name", header="content-disposition")
+                    fields[name] = (part.get_filename(), part.get_payload(decode=True))
+                filename, content = fields["file"]
+                purpose = fields.get("purpose", (None, b"batch"))[1].decode("utf-8")
+                self._send_json(200, stub.upload(content, filename or "upload.jsonl", purpose))
+            elif self.path == "/v1/batches":
+                batch = stub.create_batch(json.loads(body))
+                if batch is None:
+                    self._send_json(400, {"error": {"type": "invalid_request_error", "message": "Unknown input_file_id"}})
+                else:
+                    self._send_json(200, batch)
+            else:
+                self._not_found()
+
+        def do_GET(self):
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 3 and parts[:2] == ["v1", "batches"]:
+                batch = stub.retrieve_batch(parts[2])
+                if batch is None:
+                    self._not_found()
+                else:
+                    self._send_json(200, batch)
+            elif len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content" and parts[2] in stub.files:
+                data = stub.files[parts[2]]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._not_found()
+
+    return Handler
+
+def start_stub_server(stub, host="127.0.0.1", port=0):
+    """
+    Serve a BatchStub on a background thread.
+
+    Args:
+        stub (BatchStub): The stub to serve
+        host (str): Host to bind
+        port (int): Port to bind; 0 picks a free port
+
+    Returns:
+        ThreadingHTTPServer: The running server; its base URL is http://host:server.server_port/v1
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, name="batch-stub", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI-compatible batch API")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Host to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+    parser.add_argument("--polls", type=int, default=2, help="Number of status checks a job stays in_progress before it completes")
+    parser.add_argument("--fail-ids", nargs="*", default=[], help="custom_ids answered with an error line in their first job")
+    parser.add_argument("--drop-ids", nargs="*", default=[], help="custom_ids left out of the output of their first job")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(BatchStub(args.polls, args.fail_ids, args.drop_ids)))
+    print(f"Serving the batch API stub at http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
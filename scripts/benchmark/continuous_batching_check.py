@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Check ContinuousBatchingEngine against model.generate on a CPU with a tiny causal LM.
+
+The script builds a small randomly initialized Llama model (no download needed) and
+decodes a set of prompts greedily twice: once with model.generate, one unpadded prompt at
+a time, and once with the engine. Both must produce the same tokens for every prompt.
+Several token ids that the model emits at different steps are used as EOS tokens, so the
+rows of a batch finish at different steps.
+
+The engine is run in four cases, each of which also checks that the path it targets was
+taken:
+1. padded batch: prompts of very different lengths in one left-padded batch, so every
+   row's position ids have to skip its padding
+2. joins: fewer slots than prompts, so prompts are prefilled while others are decoding
+   (their caches are merged into the running batch) and finished rows are dropped (the
+   cache is trimmed to the remaining rows and its all-padding columns)
+3. shared prefix: prompts that start with the same tokens reuse one prefilled prefix cache,
+   laid out as [prefix | padding | suffix]
+4. OOM restart: a decode step raises an out-of-memory error once, and the running sequences
+   are restarted with a smaller batch
+
+The script exits with an error on the first mismatch.
+
+Usage:
+    python scripts/benchmark/continuous_batching_check.py
+    python scripts/benchmark/continuous_batching_check.py --prompts 12 --max-new-tokens 24 --seed 1
+"""
+
+import os
+import sys
+import types
+import random
+import argparse
+
+import torch
+from transformers import LlamaConfig, LlamaForCausalLM
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.continuous_batching import ContinuousBatchingEngine
+from src.models.prefix_cache import SharedPrefix
+
+# Token id used for padding; never part of a prompt
+PAD_TOKEN_ID = 0
+
+def build_model(vocab_size, seed):
+    """Build a tiny randomly initialized Llama model in float64, so that greedy decoding has no near ties."""
+    torch.manual_seed(seed)
+    config = LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=512,
+        initializer_range=0.2,
+        pad_token_id=PAD_TOKEN_ID,
+        bos_token_id=None,
+        eos_token_id=None
+    )
+    model = LlamaForCausalLM(config).to(torch.float64).eval()
+    model.generation_config.do_sample = False
+    return model
+
+def reference(model, prompts, max_new_tokens, eos_token_ids):
+    """Greedy model.generate on each prompt alone, without padding; the EOS token is dropped like the engine does."""
+    outputs = []
+    for prompt in prompts:
+        input_ids = torch.tensor([prompt], dtype=torch.long)
+        with torch.inference_mode():
+            generated = model.generate(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=max_new_tokens,
+                                       do_sample=False, eos_token_id=eos_token_ids or None, pad_token_id=PAD_TOKEN_ID)
+        tokens = generated[0, len(prompt):].tolist()
+        for position, token in enumerate(tokens):
+            if token in eos_token_ids:
+                tokens = tokens[:position]
+                break
+        outputs.append(tokens)
+    return outputs
+
+def pick_eos_tokens(model, prompt_sets, max_new_tokens):
+    """
+    Pick EOS token ids that make the prompts of each set finish at different steps.
+
+    Each candidate is a token some prompt emits in its unstopped greedy continuation. It is
+    kept if it adds a new finishing step while at least a third of the prompts of every set
+    still run to max_new_tokens.
+
+    Args:
+        model: The tiny model
+        prompt_sets (list): Lists of prompts
+        max_new_tokens (int): Maximum number of generated tokens per prompt
+
+    Returns:
+        list: EOS token ids
+    """
+    continuation_sets = [reference(model, prompts, max_new_tokens, []) for prompts in prompt_sets]
+
+    def finishing_steps(eos_token_ids):
+        return [[len(tokens) for tokens in reference_lengths(continuations, eos_token_ids)] for continuations in continuation_sets]
+
+    eos_token_ids = []
+    for continuations in continuation_sets:
+        for continuation in continuations:
+            for token in continuation[1:]:
+                current, candidate = finishing_steps(eos_token_ids), finishing_steps(eos_token_ids + [token])
+                adds_step = any(len(set(new)) > len(set(old)) for old, new in zip(current, candidate))
+                keeps_long = all(3 * steps.count(max_new_tokens) >= len(steps) for steps in candidate)
+                if adds_step and keeps_long:
+                    eos_token_ids.append(token)
+                    break
+    return eos_token_ids
+
+def reference_lengths(continuations, eos_token_ids):
+    """Cut unstopped continuations at their first EOS token."""
+    cut = []
+    for tokens in continuations:
+        end = next((position for position, token in enumerate(tokens) if token in eos_token_ids), len(tokens))
+        cut.append(tokens[:end])
+    return cut
+
+def trace_forward(model, fail_at=None):
+    """
+    Record the batch size and attention mask width of every forward pass of the model.
+
+    Args:
+        model: The model whose forward is wrapped
+        fail_at (int, optional): Index of a decode step (one token per row) that raises an
+            out-of-memory error the first time it is reached
+
+    Returns:
+        list: The trace, appended to as (rows, new tokens per row, mask columns) tuples
+    """
+    trace = []
+    forward = model.forward
+    state = {'decode_steps': 0, 'failed': False}
+
+    def traced(self, *args, **kwargs):
+        input_ids = kwargs['input_ids']
+        if input_ids.shape[1] == 1 and kwargs.get('attention_mask') is not None and kwargs['attention_mask'].shape[1] > 1:
+            if fail_at is not None and state['decode_steps'] == fail_at and not state['failed']:
+                state['failed'] = True
+                raise torch.cuda.OutOfMemoryError("Simulated out of memory")
+            state['decode_steps'] += 1
+        trace.append((input_ids.shape[0], input_ids.shape[1], kwargs['attention_mask'].shape[1] if kwargs.get('attention_mask') is not None else None))
+        return forward(*args, **kwargs)
+
+    model.forward = types.MethodType(traced, model)
+    return trace
+
+def run_engine(model, prompts, max_batch_size, max_new_tokens, shared_prefix=None, fail_at=None):
+    """Generate with a fresh engine; returns (outputs in prompt order, finish reasons, engine stats, forward trace)."""
+    tokenizer = types.SimpleNamespace(pad_token_id=PAD_TOKEN_ID, eos_token_id=None)
+    engine = ContinuousBatchingEngine(model, tokenizer, max_batch_size=max_batch_size, max_new_tokens=max_new_tokens, device="cpu")
+    trace = trace_forward(model, fail_at)
+    outputs = [None] * len(prompts)
+    reasons = [None] * len(prompts)
+    try:
+        for index, result in engine.generate(prompts, shared_prefix=shared_prefix):
+            outputs[index] = result['token_ids']
+            reasons[index] = result['finish_reason']
+    finally:
+        # Remove the instance attribute so the class forward is used again
+        del model.forward
+    return outputs, reasons, engine.get_stats(), trace
+
+def decode_steps(trace):
+    """The (rows, mask columns) of the decode steps in a forward trace."""
+    return [(rows, columns) for rows, new_tokens, columns in trace if new_tokens == 1 and columns and columns > 1]
+
+def merged_prefills(trace):
+    """Count the prefills whose cache was merged into a running batch: the next decode step has more rows than the prefill."""
+    return sum(1 for (rows, new_tokens, _), (next_rows, next_new_tokens, _) in zip(trace, trace[1:])
+               if new_tokens > 1 and next_new_tokens == 1 and next_rows > rows)
+
+def check(condition, message):
+    """Print the outcome of one check and exit on failure."""
+    print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+def compare(outputs, expected):
+    """Check that the engine produced the reference tokens for every prompt."""
+    mismatches = [index for index, (tokens, reference_tokens) in enumerate(zip(outputs, expected)) if tokens != reference_tokens]
+    check(not mismatches, f"every prompt matches model.generate" + (f" (mismatches: {mismatches})" if mismatches else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the continuous-batching engine against model.generate with a tiny CPU model")
+    parser.add_argument("--prompts", type=int, default=8, help="Number of prompts per case")
+    parser.add_argument("--max-new-tokens", type=int, default=16, help="Maximum number of generated tokens per prompt")
+    parser.add_argument("--vocab-size", type=int, default=256, help="Vocabulary size of the tiny model")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the model weights and prompts")
+    args = parser.parse_args()
+    if args.prompts < 4:
+        parser.error("the check needs --prompts >= 4")
+
+    model = build_model(args.vocab_size, args.seed)
+    rng = random.Random(args.seed)
+
+    def random_prompt(length):
+        return [rng.randrange(1, args.vocab_size) for _ in range(length)]
+
+    # Prompts of very different lengths, and prompts sharing a 12-token prefix
+    prompts = [random_prompt(rng.randint(3, 30)) for _ in range(args.prompts)]
+    prefix = random_prompt(12)
+    prefixed_prompts = [prefix + random_prompt(rng.randint(1, 10)) for _ in range(args.prompts)]
+
+    eos_token_ids = pick_eos_tokens(model, [prompts, prefixed_prompts], args.max_new_tokens)
+    model.generation_config.eos_token_id = eos_token_ids
+    expected = reference(model, prompts, args.max_new_tokens, eos_token_ids)
+    expected_prefixed = reference(model, prefixed_prompts, args.max_new_tokens, eos_token_ids)
+    lengths = sorted({len(tokens) for tokens in expected})
+    print(f"Tiny Llama ({sum(p.numel() for p in model.parameters())} parameters), EOS tokens {eos_token_ids}, "
+          f"completion lengths {lengths}")
+    check(len(lengths) >= 2, "rows finish at different steps")
+
+    print("1. One left-padded batch of prompts of different lengths")
+    outputs, reasons, stats, trace = run_engine(model, prompts, len(prompts), args.max_new_tokens)
+    compare(outputs, expected)
+    check(stats['prefills'] == 1 and len({len(prompt) for prompt in prompts}) > 1, "all prompts were prefilled together with left padding")
+    check({"stop", "length"} <= set(reasons), "some rows stopped at an EOS token and others ran to max tokens")
+
+    print("2. Prompts joining a running batch")
+    max_batch_size = max(2, len(prompts) // 3)
+    outputs, reasons, stats, trace = run_engine(model, prompts, max_batch_size, args.max_new_tokens)
+    steps = decode_steps(trace)
+    compare(outputs, expected)
+    check(stats['prefills'] > 1, f"prompts were admitted in {stats['prefills']} prefills into {max_batch_size} slots")
+    check(merged_prefills(trace) > 0, f"{merged_prefills(trace)} prefilled caches were merged into the running batch")
+    check(any(rows < previous_rows for (previous_rows, _), (rows, _) in zip(steps, steps[1:])), "finished rows were dropped from the cache")
+    check(any(columns < previous_columns + 1 for (_, previous_columns), (_, columns) in zip(steps, steps[1:])), "all-padding cache columns were trimmed")
+
+    print("3. Shared prompt prefix")
+    shared_prefix = SharedPrefix(model, prefix, "cpu")
+    outputs, reasons, stats, trace = run_engine(model, prefixed_prompts, max_batch_size, args.max_new_tokens, shared_prefix=shared_prefix)
+    compare(outputs, expected_prefixed)
+    check(stats['prefix_reused_tokens'] == len(prefix) * len(prefixed_prompts), f"every prefill reused the {len(prefix)}-token prefix")
+
+    print("4. Out-of-memory restart")
+    outputs, reasons, stats, trace = run_engine(model, prompts, max_batch_size, args.max_new_tokens, fail_at=3)
+    compare(outputs, expected)
+    check(stats['oom_restarts'] == 1, f"the running sequences were restarted once (max batch size {max_batch_size} -> {max(1, max_batch_size // 2)})")
+
+    print("Continuous batching matches model.generate")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Measure the expected-answer lookups of an evaluation run with and without the id index.
+
+Evaluation used to find the dataset item of each response by scanning the dataset, which
+is O(responses x dataset). Dataset indexes the items by id once, so each lookup is a
+dictionary access. This script replicates a dataset (with unique ids) up to each of the
+--sizes, looks up one response per item in shuffled order both ways, and checks that
+both find the same items.
+
+Usage:
+    python scripts/benchmark/dataset_index.py
+    python scripts/benchmark/dataset_index.py --dataset data/jsonl/oeq.jsonl --sizes 1000 10000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+
+def replicate(items, size):
+    """Repeat items up to size, giving every copy a unique id."""
+    replicated = []
+    for copy in range(size // len(items) + 1):
+        for item in items:
+            replicated.append({**item, 'id': f"{item.get('id')}_copy{copy}"})
+    return replicated[:size]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure expected-answer lookups with and without the id index")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/main_11-30.jsonl", help="Dataset to replicate, relative to the project root")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="Dataset sizes to measure")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the response order")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    items = read_jsonl(os.path.join(project_root, args.dataset), "problems")
+
+    results = {}
+    print(f"{'items':>8s} {'scan (s)':>10s} {'index build (s)':>16s} {'index lookups (s)':>18s} {'speedup':>9s}")
+    for size in args.sizes:
+        expected_answers = replicate(items, size)
+        problem_ids = [item['id'] for item in expected_answers]
+        random.Random(args.seed).shuffle(problem_ids)
+
+        # The lookup evaluate_responses used to do for every response
+        start = time.time()
+        scanned = [next((item for item in expected_answers if item.get('id') == problem_id), None) for problem_id in problem_ids]
+        scan_time = time.time() - start
+
+        start = time.time()
+        dataset = Dataset(expected_answers)
+        build_time = time.time() - start
+        start = time.time()
+        indexed = [dataset.get(problem_id) for problem_id in problem_ids]
+        lookup_time = time.time() - start
+
+        if any(a is not b for a, b in zip(scanned, indexed)):
+            print(f"Lookups differ for {size} items")
+            sys.exit(1)
+
+        indexed_time = build_time + lookup_time
+        speedup = scan_time / indexed_time if indexed_time else float('inf')
+        results[size] = {
+            'scan_time': round(scan_time, 4),
+            'index_build_time': round(build_time, 4),
+            'index_lookup_time': round(lookup_time, 4),
+            'speedup': round(speedup, 1)
+        }
+        print(f"{size:8d} {scan_time:10.3f} {build_time:16.4f} {lookup_time:18.4f} {speedup:8.0f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'dataset': args.dataset, 'sizes': results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measure the rule-based OEQ evaluation with one process and with a pool of worker processes.
+
+For each response file, this script runs evaluate_responses without the LLM judge, first
+serially and then with each of --workers processes. It checks that evaluation.jsonl and
+results.json are byte-identical to the serial run's.
+
+Usage:
+    python scripts/benchmark/evaluate_workers.py
+    python scripts/benchmark/evaluate_workers.py --pattern "output/OEQ/oeq/deepseek-v3-8000/response.jsonl" --workers 2 4 8
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import filecmp
+import logging
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluate import evaluate_responses
+
+def run(responses, dataset, workers, output_dir, tolerance):
+    """Evaluate responses with a number of workers and return (elapsed seconds, evaluation path, results path)."""
+    evaluation_path = os.path.join(output_dir, f"evaluation_{workers}.jsonl")
+    results_path = os.path.join(output_dir, f"results_{workers}.json")
+    start = time.time()
+    evaluate_responses(responses, dataset, question_type="OEQ", evaluation_path=evaluation_path, results_path=results_path,
+                       tolerance=tolerance, workers=workers)
+    return time.time() - start, evaluation_path, results_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure OEQ evaluation with a pool of worker processes")
+    parser.add_argument("--pattern", type=str, default="output/OEQ/oeq/*/response.jsonl", help="Glob of OEQ response files, relative to the project root")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/oeq.jsonl", help="OEQ dataset with the expected answers, relative to the project root")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8], help="Worker counts to compare with the serial run")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Tolerance for numerical comparisons")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Keep the per-response logging out of the timings
+    logging.disable(logging.CRITICAL)
+
+    dataset = Dataset.from_jsonl(os.path.join(project_root, args.dataset), "problems")
+
+    results = {}
+    all_identical = True
+    print(f"{'responses':60s} {'count':>6s} {'workers':>8s} {'time (s)':>9s} {'speedup':>8s} {'identical':>10s}")
+    for path in sorted(glob.glob(os.path.join(project_root, args.pattern))):
+        responses = read_jsonl(path, "responses")
+        if not responses:
+            continue
+        name = os.path.relpath(path, project_root)
+        results[name] = {}
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            serial_time, serial_evaluation, serial_results = run(responses, dataset, 1, output_dir, args.tolerance)
+            results[name]['1'] = {'time': round(serial_time, 4)}
+            print(f"{name:60s} {len(responses):6d} {1:8d} {serial_time:9.3f} {1.0:7.2f}x {'-':>10s}")
+
+            for workers in args.workers:
+                elapsed, evaluation_path, results_path = run(responses, dataset, workers, output_dir, args.tolerance)
+                identical = filecmp.cmp(serial_evaluation, evaluation_path, shallow=False) and filecmp.cmp(serial_results, results_path, shallow=False)
+                all_identical = all_identical and identical
+                speedup = serial_time / elapsed if elapsed else float('inf')
+                results[name][str(workers)] = {'time': round(elapsed, 4), 'speedup': round(speedup, 2), 'identical': identical}
+                print(f"{'':60s} {'':6s} {workers:8d} {elapsed:9.3f} {speedup:7.2f}x {str(identical):>10s}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'cpus': os.cpu_count(), 'files': results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if not all_identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
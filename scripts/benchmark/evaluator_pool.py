@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measure the per-response overhead removed by reusing evaluators across an evaluation run.
+
+For existing OEQ responses, this script:
+1. Evaluates every response with evaluate_response and no pool, so the evaluators are
+   built again for each response (the behaviour before EvaluatorPool)
+2. Evaluates them again with one EvaluatorPool shared by all responses
+3. Checks that both passes give identical results
+4. Times building an LLMEvaluator, and with it an OpenAI client, which the LLM pass used
+   to do once per subquestion
+
+No requests are sent to the LLM; a placeholder OPENAI_API_KEY is set if none is configured.
+
+Usage:
+    python scripts/benchmark/evaluator_pool.py
+    python scripts/benchmark/evaluator_pool.py --pattern "output/OEQ/oeq/deepseek-v3-8000/response.jsonl" --limit 200
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluate import evaluate_response
+from src.evaluate.evaluators import EvaluatorPool, LLMEvaluator
+from src.evaluate.utils import extract_expected_answers, deduplicate_expected_answers
+
+def load_cases(project_root, pattern, dataset_path, limit):
+    """
+    Pair existing responses with the expected answers of their problems.
+
+    Args:
+        project_root (str): Project root directory
+        pattern (str): Glob of response files, relative to the project root
+        dataset_path (str): Dataset file, relative to the project root
+        limit (int): Maximum number of responses, or None for all
+
+    Returns:
+        list: (expected subquestion answers, response text) tuples
+    """
+    dataset = Dataset.from_jsonl(os.path.join(project_root, dataset_path), "problems")
+    cases = []
+    for path in sorted(glob.glob(os.path.join(project_root, pattern))):
+        for response in read_jsonl(path, "responses"):
+            answer = dataset.answer(response.get('id'))
+            if 'error' in response or answer is None:
+                continue
+            expected = deduplicate_expected_answers(extract_expected_answers(answer))
+            cases.append((expected, response.get('response', '')))
+    return cases[:limit]
+
+def run_pass(cases, tolerance, pool):
+    """Evaluate every case and return (results, elapsed seconds)."""
+    start = time.time()
+    results = [evaluate_response(expected, response, question_type="OEQ", tolerance=tolerance, pool=pool) for expected, response in cases]
+    return results, time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead removed by reusing evaluators across responses")
+    parser.add_argument("--pattern", type=str, default="output/OEQ/oeq/*/response.jsonl", help="Glob of OEQ response files, relative to the project root")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/oeq.jsonl", help="OEQ dataset with the expected answers, relative to the project root")
+    parser.add_argument("--limit", type=int, default=500, help="Maximum number of responses to evaluate")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Tolerance for numerical comparisons")
+    parser.add_argument("--llm-clients", type=int, default=50, help="Number of LLMEvaluator constructions to time")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Keep the evaluators' per-response logging out of the timings
+    logging.disable(logging.CRITICAL)
+
+    cases = load_cases(project_root, args.pattern, args.dataset, args.limit)
+    if not cases:
+        print(f"No responses matched {args.pattern}")
+        return
+    print(f"Evaluating {len(cases)} responses")
+
+    # Warm up imports and lazily compiled state before timing either pass
+    run_pass(cases[:5], args.tolerance, None)
+
+    fresh_results, fresh_time = run_pass(cases, args.tolerance, None)
+    pool = EvaluatorPool(tolerance=args.tolerance)
+    pooled_results, pooled_time = run_pass(cases, args.tolerance, pool)
+
+    identical = json.dumps(fresh_results, sort_keys=True, default=str) == json.dumps(pooled_results, sort_keys=True, default=str)
+
+    # Cost of one LLM evaluator with its OpenAI client, previously paid per subquestion
+    os.environ.setdefault("OPENAI_API_KEY", "placeholder")
+    start = time.time()
+    for _ in range(args.llm_clients):
+        LLMEvaluator(tolerance=args.tolerance)
+    llm_client_time = (time.time() - start) / args.llm_clients
+
+    results = {
+        'responses': len(cases),
+        'fresh_evaluators_time': round(fresh_time, 4),
+        'pooled_evaluators_time': round(pooled_time, 4),
+        'saved_per_response_ms': round((fresh_time - pooled_time) / len(cases) * 1000, 4),
+        'llm_evaluator_construction_ms': round(llm_client_time * 1000, 4),
+        'identical_results': identical
+    }
+
+    print(f"{'evaluators':12s} {'time (s)':>9s} {'per response (ms)':>18s}")
+    print(f"{'fresh':12s} {fresh_time:9.3f} {fresh_time / len(cases) * 1000:18.3f}")
+    print(f"{'pooled':12s} {pooled_time:9.3f} {pooled_time / len(cases) * 1000:18.3f}")
+    print(f"Saved per response: {results['saved_per_response_ms']:.3f} ms")
+    print(f"LLMEvaluator construction: {results['llm_evaluator_construction_ms']:.3f} ms each")
+    print(f"Identical results: {identical}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if not identical:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Compare the symbolic and numeric comparison modes of ExpressionEvaluator.
+
+For existing OEQ responses, this script evaluates every subquestion with the
+ExpressionEvaluator alone (the QuantityEvaluator is left out so that every answer reaches
+it), once in each mode. It reports the time spent comparing parsed expressions, as
+recorded in the evaluator's 'comparison' details, the strategies used in the numeric
+mode, and the subquestions on which the two modes disagree.
+
+Usage:
+    python scripts/benchmark/expression_modes.py
+    python scripts/benchmark/expression_modes.py --limit 200 --points 64
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluate import evaluate_response
+from src.evaluate.evaluators import EvaluatorPool, ExpressionEvaluator
+from src.evaluate.utils import extract_expected_answers, deduplicate_expected_answers
+
+def load_cases(project_root, pattern, dataset_path, limit):
+    """Pair existing responses with the expected subquestion answers of their problems."""
+    dataset = Dataset.from_jsonl(os.path.join(project_root, dataset_path), "problems")
+    cases = []
+    for path in sorted(glob.glob(os.path.join(project_root, pattern))):
+        for response in read_jsonl(path, "responses"):
+            answer = dataset.answer(response.get('id'))
+            if 'error' in response or answer is None:
+                continue
+            expected = deduplicate_expected_answers(extract_expected_answers(answer))
+            cases.append((response.get('id'), expected, response.get('response', '')))
+    return cases[:limit]
+
+def run(cases, tolerance, mode, points):
+    """
+    Evaluate every case with the ExpressionEvaluator alone in one comparison mode.
+
+    Returns:
+        tuple: (verdicts, comparisons, elapsed seconds), where verdicts maps (problem id,
+               subquestion id) to the verdict and comparisons to the recorded comparison details
+    """
+    pool = EvaluatorPool(tolerance=tolerance, disable_quantity=True)
+    pool.expression = ExpressionEvaluator(tolerance=tolerance, comparison_mode=mode, sample_points=points)
+    verdicts, comparisons = {}, {}
+    start = time.time()
+    for problem_id, expected, response in cases:
+        evaluation = evaluate_response(expected, response, question_type="OEQ", tolerance=tolerance, pool=pool)
+        for subq_id, subq_result in evaluation['subquestion_results'].items():
+            for result in subq_result['evaluator_results']:
+                details = result['details']
+                if details.get('evaluator') != 'ExpressionEvaluator':
+                    continue
+                verdicts[(problem_id, subq_id)] = result['is_correct']
+                if details.get('comparison'):
+                    comparisons[(problem_id, subq_id)] = details['comparison']
+    return verdicts, comparisons, time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the symbolic and numeric comparison modes of ExpressionEvaluator")
+    parser.add_argument("--pattern", type=str, default="output/OEQ/oeq/*/response.jsonl", help="Glob of OEQ response files, relative to the project root")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/oeq.jsonl", help="OEQ dataset with the expected answers, relative to the project root")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of responses to evaluate")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Tolerance for numerical comparisons")
+    parser.add_argument("--points", type=int, default=32, help="Number of random points of the numeric mode")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Keep the evaluators' per-response logging out of the timings
+    logging.disable(logging.CRITICAL)
+
+    cases = load_cases(project_root, args.pattern, args.dataset, args.limit)
+    if not cases:
+        print(f"No responses matched {args.pattern}")
+        return
+
+    symbolic_verdicts, symbolic_comparisons, symbolic_time = run(cases, args.tolerance, "symbolic", args.points)
+    numeric_verdicts, numeric_comparisons, numeric_time = run(cases, args.tolerance, "numeric", args.points)
+
+    symbolic_seconds = sum(comparison['seconds'] for comparison in symbolic_comparisons.values())
+    numeric_seconds = sum(comparison['seconds'] for comparison in numeric_comparisons.values())
+    strategies = Counter(comparison['strategy'] for comparison in numeric_comparisons.values())
+    changed = [key for key in symbolic_verdicts if key in numeric_verdicts and symbolic_verdicts[key] != numeric_verdicts[key]]
+
+    print(f"{len(cases)} responses, {len(symbolic_verdicts)} subquestions reached the ExpressionEvaluator")
+    print(f"{'mode':10s} {'comparisons':>12s} {'compare (s)':>12s} {'total (s)':>10s}")
+    print(f"{'symbolic':10s} {len(symbolic_comparisons):12d} {symbolic_seconds:12.3f} {symbolic_time:10.2f}")
+    print(f"{'numeric':10s} {len(numeric_comparisons):12d} {numeric_seconds:12.3f} {numeric_time:10.2f}")
+    if numeric_seconds:
+        print(f"Comparison speedup: {symbolic_seconds / numeric_seconds:.1f}x")
+    print(f"Numeric mode strategies: {dict(strategies)}")
+    print(f"{len(changed)} verdicts differ:")
+    for problem_id, subq_id in changed:
+        print(f"  {problem_id} ({subq_id}): symbolic {symbolic_verdicts[(problem_id, subq_id)]}, numeric {numeric_verdicts[(problem_id, subq_id)]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'responses': len(cases),
+                'subquestions': len(symbolic_verdicts),
+                'symbolic': {'comparisons': len(symbolic_comparisons), 'compare_time': round(symbolic_seconds, 4), 'total_time': round(symbolic_time, 4)},
+                'numeric': {'comparisons': len(numeric_comparisons), 'compare_time': round(numeric_seconds, 4), 'total_time': round(numeric_time, 4),
+                            'strategies': dict(strategies)},
+                'changed_verdicts': [{'id': problem_id, 'subquestion': subq_id, 'symbolic': symbolic_verdicts[(problem_id, subq_id)],
+                                      'numeric': numeric_verdicts[(problem_id, subq_id)]} for problem_id, subq_id in changed]
+            }, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
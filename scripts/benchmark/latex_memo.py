@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Measure the LaTeX memos of the QuantityEvaluator and ExpressionEvaluator.
+
+For existing OEQ responses, this script evaluates every response with one EvaluatorPool
+whose evaluators have their LaTeX cleaning and parsing memos disabled, and again with one
+whose memos are enabled. It reports the time of both runs, the hits and misses of each
+memo, and checks that both runs reach the same verdicts. Responses of several models to
+the same problems share their expected answers, so the hit rate grows with the number of
+response files.
+
+Usage:
+    python scripts/benchmark/latex_memo.py
+    python scripts/benchmark/latex_memo.py --limit 400 --memo-size 1024
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluate import evaluate_response
+from src.evaluate.evaluators import EvaluatorPool, QuantityEvaluator, ExpressionEvaluator
+from src.evaluate.evaluators.memo import DEFAULT_MEMO_SIZE
+from src.evaluate.utils import extract_expected_answers, deduplicate_expected_answers
+
+def load_cases(project_root, pattern, dataset_path, limit):
+    """Pair existing responses with the expected subquestion answers of their problems."""
+    dataset = Dataset.from_jsonl(os.path.join(project_root, dataset_path), "problems")
+    cases = []
+    for path in sorted(glob.glob(os.path.join(project_root, pattern))):
+        for response in read_jsonl(path, "responses"):
+            answer = dataset.answer(response.get('id'))
+            if 'error' in response or answer is None:
+                continue
+            expected = deduplicate_expected_answers(extract_expected_answers(answer))
+            cases.append((response.get('id'), expected, response.get('response', '')))
+    return cases[:limit]
+
+def run(cases, tolerance, memo_size):
+    """
+    Evaluate every case with one pool of rule-based evaluators.
+
+    Returns:
+        tuple: (verdicts, memo stats, elapsed seconds), where verdicts maps (case index,
+               subquestion id) to the verdict
+    """
+    pool = EvaluatorPool(tolerance=tolerance)
+    pool.quantity = QuantityEvaluator(tolerance=tolerance, memo_size=memo_size)
+    pool.expression = ExpressionEvaluator(tolerance=tolerance, simplify_timeout=pool.expression.simplify_timeout, memo_size=memo_size)
+    verdicts = {}
+    start = time.time()
+    for idx, (problem_id, expected, response) in enumerate(cases):
+        evaluation = evaluate_response(expected, response, question_type="OEQ", tolerance=tolerance, pool=pool)
+        for subq_id, subq_result in evaluation['subquestion_results'].items():
+            verdicts[(idx, subq_id)] = subq_result['is_correct']
+    return verdicts, pool.memo_stats(), time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the LaTeX memos of the rule-based evaluators")
+    parser.add_argument("--pattern", type=str, default="output/OEQ/oeq/*/response.jsonl", help="Glob of OEQ response files, relative to the project root")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/oeq.jsonl", help="OEQ dataset with the expected answers, relative to the project root")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of responses to evaluate")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Tolerance for numerical comparisons")
+    parser.add_argument("--memo-size", type=int, default=DEFAULT_MEMO_SIZE, help="Number of entries of each memo")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Keep the evaluators' per-response logging out of the timings
+    logging.disable(logging.CRITICAL)
+
+    cases = load_cases(project_root, args.pattern, args.dataset, args.limit)
+    if not cases:
+        print(f"No responses matched {args.pattern}")
+        return
+
+    # Warm up sympy and pint so that neither run pays for their first-use setup
+    run(cases[:5], args.tolerance, 0)
+
+    plain_verdicts, _, plain_time = run(cases, args.tolerance, 0)
+    memo_verdicts, memo_stats, memo_time = run(cases, args.tolerance, args.memo_size)
+    changed = [key for key in plain_verdicts if plain_verdicts[key] != memo_verdicts.get(key)]
+
+    print(f"{len(cases)} responses, {len(plain_verdicts)} subquestions")
+    print(f"Without memos: {plain_time:.2f} s")
+    print(f"With memos:    {memo_time:.2f} s ({plain_time / memo_time:.2f}x)")
+    print(f"{'memo':40s} {'hits':>8s} {'misses':>8s} {'hit rate':>9s} {'size':>6s}")
+    for name, stats in memo_stats.items():
+        calls = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / calls if calls else 0.0
+        print(f"{name:40s} {stats['hits']:8d} {stats['misses']:8d} {hit_rate:9.1%} {stats['size']:6d}")
+    print(f"{len(changed)} verdicts differ")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'responses': len(cases),
+                'subquestions': len(plain_verdicts),
+                'memo_size': args.memo_size,
+                'plain_time': round(plain_time, 4),
+                'memo_time': round(memo_time, 4),
+                'memo_stats': memo_stats,
+                'changed_verdicts': len(changed)
+            }, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Measure the decode tokens saved by stopping MCQ generation after the final answer.
+
+For every existing MCQ response of a local model, this script:
+1. Replays the response token by token through FinalAnswerDetector, the detector the
+   local models use to stop a sequence once it has emitted a completed final answer
+2. Records where the sequence would have been stopped and how many generated tokens
+   come after that point
+3. Checks whether MCQEvaluator.extract_mcq_answer still extracts the same answer from
+   the stopped response
+
+Without --tokenizer, responses are replayed character by character and the saved share of
+characters is applied to each response's recorded completion_tokens.
+
+Usage:
+    python scripts/benchmark/mcq_early_stop.py
+    python scripts/benchmark/mcq_early_stop.py --pattern "output/MCQ/*/huggingface-Qwen2.5-7B-Instruct-*/response.jsonl" --tokenizer Qwen/Qwen2.5-7B-Instruct
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import read_jsonl
+from src.type.MCQ import FINAL_ANSWER_PATTERNS
+from src.models.stopping import FinalAnswerDetector
+from src.evaluate.evaluators import MCQEvaluator
+
+class CharacterTokenizer:
+    """Stand-in tokenizer with one token per character, used when no tokenizer is given."""
+
+    def encode(self, text):
+        return [ord(character) for character in text]
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return "".join(chr(token_id) for token_id in token_ids)
+
+def replay(detector, token_ids):
+    """
+    Feed a response to the detector one token at a time.
+
+    Args:
+        detector (FinalAnswerDetector): Final answer detector
+        token_ids (list): Tokens of the response
+
+    Returns:
+        int: Number of tokens the sequence would have generated before being stopped
+    """
+    state = detector.new_state()
+    for position in range(len(token_ids)):
+        if detector.check(state, token_ids[max(0, position + 1 - detector.window):position + 1]):
+            return position + 1
+    return len(token_ids)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the decode tokens saved by stopping MCQ generation after the final answer")
+    parser.add_argument("--pattern", type=str, default="output/MCQ/*/huggingface-*/response.jsonl", help="Glob of the response files, relative to the project root")
+    parser.add_argument("--tokenizer", type=str, default=None, help="Hugging Face tokenizer to replay responses with (default: one token per character)")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of responses per file")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        encode = lambda text: tokenizer.encode(text, add_special_tokens=False)
+        detector = FinalAnswerDetector(tokenizer, FINAL_ANSWER_PATTERNS)
+    else:
+        # Characters are roughly a quarter of a token, so the window and grace period are scaled up
+        tokenizer = CharacterTokenizer()
+        encode = tokenizer.encode
+        detector = FinalAnswerDetector(tokenizer, FINAL_ANSWER_PATTERNS, window=200, grace_tokens=32)
+
+    evaluator = MCQEvaluator()
+
+    results = {}
+    total_tokens = total_saved = 0
+    print(f"{'responses':60s} {'count':>6s} {'stopped':>8s} {'saved tokens':>13s} {'share':>7s} {'changed':>8s}")
+    for path in sorted(glob.glob(os.path.join(project_root, args.pattern))):
+        rows = read_jsonl(path, "responses")
+        rows = [row for row in rows if row.get('response') and 'error' not in row][:args.limit]
+        if not rows:
+            continue
+
+        stopped = changed = tokens = saved = 0
+        for row in rows:
+            response = row['response']
+            token_ids = encode(response)
+            kept = replay(detector, token_ids)
+            if kept == len(token_ids):
+                tokens += (row.get('usage') or {}).get('completion_tokens') or len(token_ids)
+                continue
+
+            stopped += 1
+            kept_text = tokenizer.decode(token_ids[:kept], skip_special_tokens=True)
+            if args.tokenizer:
+                row_tokens, row_saved = len(token_ids), len(token_ids) - kept
+            else:
+                row_tokens = (row.get('usage') or {}).get('completion_tokens') or len(token_ids)
+                row_saved = round(row_tokens * (1 - kept / len(token_ids)))
+            tokens += row_tokens
+            saved += row_saved
+            changed += evaluator.extract_mcq_answer(response) != evaluator.extract_mcq_answer(kept_text)
+
+        name = os.path.relpath(os.path.dirname(path), os.path.join(project_root, "output"))
+        results[name] = {
+            'responses': len(rows),
+            'stopped': stopped,
+            'completion_tokens': tokens,
+            'saved_tokens': saved,
+            'saved_share': round(saved / tokens, 4) if tokens else 0.0,
+            'answer_changed': changed
+        }
+        total_tokens += tokens
+        total_saved += saved
+        print(f"{name:60s} {len(rows):6d} {stopped:8d} {saved:13d} {results[name]['saved_share']:7.1%} {changed:8d}")
+
+    share = total_saved / total_tokens if total_tokens else 0.0
+    print(f"\nTotal: {total_saved} of {total_tokens} decode tokens saved ({share:.1%})")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'total_saved_tokens': total_saved, 'total_completion_tokens': total_tokens, 'saved_share': share, 'files': results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
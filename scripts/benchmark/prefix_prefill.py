@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Measure the prefill time saved by reusing the KV cache of the shared prompt prefix.
+
+Every local prompt of a question type starts with the same chat template header and
+SYSTEM_MESSAGE. For each dataset, this script:
+1. Tokenizes the prompts the way HuggingFaceBaseModel does and packs them into batches
+   of --batch-size in dataset order
+2. Times the prefill forward pass of every batch on the full left-padded prompts
+3. Times it again with the shared prefix's cached keys and values, running only the
+   suffixes (SharedPrefix, the path used by both local engines)
+
+The one-off prefill of the prefix itself is timed separately and included in the total.
+
+Usage:
+    python scripts/benchmark/prefix_prefill.py --model Qwen/Qwen2.5-7B-Instruct
+    python scripts/benchmark/prefix_prefill.py --model Qwen/Qwen2.5-7B-Instruct --datasets MCQ:data/jsonl/main_1-10.jsonl --batch-size 16 --limit 64
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import torch
+from transformers import DynamicCache
+from src.dataset import read_jsonl
+from src.models.huggingface_base import HuggingFaceBaseModel
+
+DEFAULT_DATASETS = [
+    "MCQ:data/jsonl/main_1-10.jsonl",
+    "MCQ:data/jsonl/extra_1-10.jsonl",
+    "MCQ:data/jsonl/main_11-30.jsonl",
+    "OEQ:data/jsonl/oeq.jsonl"
+]
+
+def synchronize(device):
+    """Wait for queued GPU work so wall-clock timings cover it."""
+    if torch.device(device).type == "cuda":
+        torch.cuda.synchronize(device)
+
+def prefill_full(model, prompts, pad_token_id, device):
+    """Prefill left-padded prompts from scratch and return the elapsed seconds."""
+    length = max(len(prompt) for prompt in prompts)
+    input_ids = torch.full((len(prompts), length), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(prompts), length), dtype=torch.long)
+    for row, prompt in enumerate(prompts):
+        input_ids[row, length - len(prompt):] = torch.tensor(prompt, dtype=torch.long)
+        attention_mask[row, length - len(prompt):] = 1
+    input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+
+    synchronize(device)
+    start = time.time()
+    with torch.inference_mode():
+        model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids, past_key_values=DynamicCache(), use_cache=True)
+    synchronize(device)
+    return time.time() - start
+
+def prefill_with_prefix(model, shared_prefix, prompts, pad_token_id, device):
+    """Prefill only the suffixes of prompts on top of the prefix cache and return the elapsed seconds."""
+    input_ids, attention_mask = shared_prefix.build_batch(prompts, pad_token_id, device)
+    position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+    prefix_length = len(shared_prefix)
+
+    synchronize(device)
+    start = time.time()
+    # Copying the prefix cache for the batch is part of the cost of reusing it
+    cache = shared_prefix.cache_for_batch(len(prompts))
+    with torch.inference_mode():
+        model(
+            input_ids=input_ids[:, prefix_length:],
+            attention_mask=attention_mask,
+            position_ids=position_ids[:, prefix_length:],
+            past_key_values=cache,
+            use_cache=True
+        )
+    synchronize(device)
+    return time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the prefill time saved by reusing the shared prompt prefix")
+    parser.add_argument("--model", type=str, required=True, help="Hugging Face model name or path")
+    parser.add_argument("--datasets", type=str, nargs="+", default=DEFAULT_DATASETS, help="Datasets as TYPE:path, relative to the project root")
+    parser.add_argument("--batch-size", type=int, default=8, help="Number of prompts per prefill batch")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of questions per dataset")
+    parser.add_argument("--gpu", type=str, default="0", help="GPU device IDs to use")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    model = HuggingFaceBaseModel(args.model, parallel_size=args.batch_size, max_tokens=1, gpu=args.gpu)
+    device = model.accelerator.device
+    pad_token_id = model.tokenizer.pad_token_id if model.tokenizer.pad_token_id is not None else model.tokenizer.eos_token_id
+
+    results = {}
+    print(f"{'dataset':28s} {'prompts':>8s} {'prefix':>7s} {'full (s)':>9s} {'reused (s)':>11s} {'saved':>7s}")
+    for spec in args.datasets:
+        question_type, path = spec.split(":", 1)
+        problems = read_jsonl(os.path.join(project_root, path), "problems")[:args.limit]
+        if not problems:
+            continue
+
+        # Prefill the prefix once, as the model does on first use
+        synchronize(device)
+        start = time.time()
+        shared_prefix = model._get_shared_prefix(question_type)
+        synchronize(device)
+        prefix_time = time.time() - start
+        if shared_prefix is None:
+            print(f"{path:28s} no shared prefix of at least 8 tokens; skipped")
+            continue
+
+        _, input_ids = model._tokenize_prompts(problems, question_type)
+        batches = [input_ids[i:i + args.batch_size] for i in range(0, len(input_ids), args.batch_size)]
+        batches = [batch for batch in batches if shared_prefix.matches(batch)]
+
+        # Warm up kernels and allocator on the first batch
+        prefill_full(model.model, batches[0], pad_token_id, device)
+        prefill_with_prefix(model.model, shared_prefix, batches[0], pad_token_id, device)
+
+        full_time = sum(prefill_full(model.model, batch, pad_token_id, device) for batch in batches)
+        reused_time = prefix_time + sum(prefill_with_prefix(model.model, shared_prefix, batch, pad_token_id, device) for batch in batches)
+        saved = 1 - reused_time / full_time if full_time else 0.0
+
+        results[path] = {
+            'question_type': question_type,
+            'prompts': sum(len(batch) for batch in batches),
+            'prefix_tokens': len(shared_prefix),
+            'prompt_tokens': sum(len(prompt) for batch in batches for prompt in batch),
+            'full_prefill_time': round(full_time, 4),
+            'reused_prefill_time': round(reused_time, 4),
+            'prefix_prefill_time': round(prefix_time, 4),
+            'saved_share': round(saved, 4)
+        }
+        print(f"{path:28s} {results[path]['prompts']:8d} {len(shared_prefix):7d} {full_time:9.3f} {reused_time:11.3f} {saved:7.1%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'batch_size': args.batch_size, 'datasets': results}, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Measure the symbolic comparisons of ExpressionEvaluator under the simplify deadline.
+
+For existing OEQ responses, this script evaluates every subquestion with the
+ExpressionEvaluator alone (the QuantityEvaluator is left out so that every answer reaches
+it) and collects the 'comparison' details it records: the simplification strategy used
+and the time spent. It reports how many comparisons used each strategy and the slowest
+ones, and the comparisons left undecided because the deadline fired before equivalence
+was proven. With --compare-unbounded, it also runs every comparison without a deadline and
+reports the verdicts that the deadline changed and the time it saved.
+
+Usage:
+    python scripts/benchmark/simplify_deadline.py
+    python scripts/benchmark/simplify_deadline.py --timeout 1 --limit 200 --compare-unbounded
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluate import evaluate_response
+from src.evaluate.evaluators import EvaluatorPool
+from src.evaluate.evaluators.expression_evaluator import DEFAULT_SIMPLIFY_TIMEOUT
+from src.evaluate.utils import extract_expected_answers, deduplicate_expected_answers
+
+def load_cases(project_root, pattern, dataset_path, limit):
+    """Pair existing responses with the expected subquestion answers of their problems."""
+    dataset = Dataset.from_jsonl(os.path.join(project_root, dataset_path), "problems")
+    cases = []
+    for path in sorted(glob.glob(os.path.join(project_root, pattern))):
+        for response in read_jsonl(path, "responses"):
+            answer = dataset.answer(response.get('id'))
+            if 'error' in response or answer is None:
+                continue
+            expected = deduplicate_expected_answers(extract_expected_answers(answer))
+            cases.append((response.get('id'), expected, response.get('response', '')))
+    return cases[:limit]
+
+def run(cases, tolerance, timeout):
+    """
+    Evaluate every case with the ExpressionEvaluator alone.
+
+    Returns:
+        tuple: (comparisons, elapsed seconds), where comparisons maps (problem id, subquestion id)
+               to the verdict and the recorded comparison details
+    """
+    pool = EvaluatorPool(tolerance=tolerance, disable_quantity=True, simplify_timeout=timeout)
+    comparisons = {}
+    start = time.time()
+    for problem_id, expected, response in cases:
+        evaluation = evaluate_response(expected, response, question_type="OEQ", tolerance=tolerance, pool=pool)
+        for subq_id, subq_result in evaluation['subquestion_results'].items():
+            for result in subq_result['evaluator_results']:
+                details = result['details']
+                if details.get('evaluator') == 'ExpressionEvaluator' and details.get('comparison'):
+                    comparisons[(problem_id, subq_id)] = {'is_correct': result['is_correct'], **details['comparison']}
+    return comparisons, time.time() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure symbolic comparisons under the simplify deadline")
+    parser.add_argument("--pattern", type=str, default="output/OEQ/oeq/*/response.jsonl", help="Glob of OEQ response files, relative to the project root")
+    parser.add_argument("--dataset", type=str, default="data/jsonl/oeq.jsonl", help="OEQ dataset with the expected answers, relative to the project root")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of responses to evaluate")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Tolerance for numerical comparisons")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_SIMPLIFY_TIMEOUT, help="Deadline in seconds of each sympy.simplify call")
+    parser.add_argument("--compare-unbounded", action="store_true", help="Also run without a deadline and compare the verdicts")
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest comparisons to list")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # Keep the evaluators' per-response logging out of the timings
+    logging.disable(logging.CRITICAL)
+
+    cases = load_cases(project_root, args.pattern, args.dataset, args.limit)
+    if not cases:
+        print(f"No responses matched {args.pattern}")
+        return
+
+    bounded, bounded_time = run(cases, args.tolerance, args.timeout)
+    strategies = Counter(comparison['strategy'] for comparison in bounded.values())
+    slowest = sorted(bounded.items(), key=lambda item: item[1]['seconds'], reverse=True)[:args.top]
+
+    undecided = sum(1 for comparison in bounded.values() if comparison['is_correct'] is None)
+    print(f"{len(cases)} responses, {len(bounded)} symbolic comparisons, deadline {args.timeout} s: {bounded_time:.2f} s, {undecided} undecided after a timeout")
+    for strategy in ['simplify', 'expand', 'none']:
+        print(f"  {strategy:10s} {strategies.get(strategy, 0):6d}")
+    print("Slowest comparisons:")
+    for (problem_id, subq_id), comparison in slowest:
+        print(f"  {problem_id} ({subq_id}): {comparison['seconds']:.3f} s, {comparison['strategy']}")
+
+    results = {
+        'responses': len(cases),
+        'comparisons': len(bounded),
+        'timeout': args.timeout,
+        'time': round(bounded_time, 4),
+        'strategies': dict(strategies),
+        'undecided': undecided,
+        'slowest': [{'id': problem_id, 'subquestion': subq_id, **comparison} for (problem_id, subq_id), comparison in slowest]
+    }
+
+    if args.compare_unbounded:
+        unbounded, unbounded_time = run(cases, args.tolerance, None)
+        changed = [key for key in bounded if key in unbounded and bounded[key]['is_correct'] != unbounded[key]['is_correct']]
+        print(f"Without a deadline: {unbounded_time:.2f} s; {len(changed)} verdicts differ")
+        for problem_id, subq_id in changed:
+            print(f"  {problem_id} ({subq_id}): {unbounded[(problem_id, subq_id)]['is_correct']} -> {bounded[(problem_id, subq_id)]['is_correct']}")
+        results['unbounded_time'] = round(unbounded_time, 4)
+        results['changed_verdicts'] = [{'id': problem_id, 'subquestion': subq_id} for problem_id, subq_id in changed]
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark the startup cost of resolving a model through the model registry.
+
+For every (base, model) pair, this script:
+1. Starts a fresh Python interpreter in the project root
+2. Imports src.generate.generate (which imports the registry) and resolves the model with get_model
+3. Records the wall time, peak memory and whether any GPU stack module
+   (torch, transformers, accelerate) was imported
+
+API bases must never import the GPU stack. The script exits with status 1 if one does,
+or if the median startup time of a pair exceeds --max-seconds, so it can guard against
+regressions of the lazy registry.
+
+Usage:
+    python scripts/benchmark/startup_time.py
+    python scripts/benchmark/startup_time.py --pairs openai:gpt4o together:llama --repeat 5 --max-seconds 3
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from statistics import median
+
+# Modules that only local (huggingface) models may import
+GPU_STACK_MODULES = ["torch", "transformers", "accelerate"]
+
+# Bases that run on GPUs and are allowed to import the GPU stack
+LOCAL_BASES = ["huggingface"]
+
+DEFAULT_PAIRS = [
+    "openai:gpt4o",
+    "together:llama",
+    "deepseek:v3",
+    "google:gemini-2.0-flash-exp",
+]
+
+# Code run in the child interpreter; prints one JSON line with its measurements
+CHILD_CODE = """
+import sys, time, json, resource
+start = time.perf_counter()
+import src.generate.generate
+from src.models import get_model
+model_class = get_model({model!r}, {base!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "model_class": model_class.__name__,
+    "gpu_stack": [name for name in {gpu_stack!r} if name in sys.modules],
+    "modules": len(sys.modules),
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+}}))
+"""
+
+def measure(base, model, project_root):
+    """
+    Measure one cold start in a fresh interpreter.
+
+    Args:
+        base (str): Name of the model base
+        model (str): Name of the model
+        project_root (str): Directory the child interpreter runs in
+
+    Returns:
+        dict: The child's measurements, or a dict with an 'error' field if it failed
+    """
+    code = CHILD_CODE.format(base=base, model=model, gpu_stack=GPU_STACK_MODULES)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=project_root, capture_output=True, text=True)
+    if proc.returncode != 0:
+        error_lines = proc.stderr.strip().splitlines()
+        return {"error": error_lines[-1] if error_lines else f"exit status {proc.returncode}"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of model resolution for each base")
+    parser.add_argument("--pairs", nargs="+", default=DEFAULT_PAIRS, help="base:model pairs to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of cold starts per pair")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if the median startup time of a pair exceeds this")
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a JSON file to save the results to")
+    args = parser.parse_args()
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    results = {}
+    failures = []
+    print(f"{'pair':45s} {'median s':>9s} {'min s':>7s} {'rss MB':>7s} {'modules':>8s}  gpu stack")
+    for pair in args.pairs:
+        base, model = pair.split(":", 1)
+        runs = [measure(base, model, project_root) for _ in range(args.repeat)]
+
+        errors = [run["error"] for run in runs if "error" in run]
+        if errors:
+            print(f"{pair:45s} ERROR: {errors[0]}")
+            results[pair] = {"error": errors[0]}
+            failures.append(f"{pair}: {errors[0]}")
+            continue
+
+        seconds = [run["seconds"] for run in runs]
+        gpu_stack = sorted(set(name for run in runs for name in run["gpu_stack"]))
+        results[pair] = {
+            "median_seconds": median(seconds),
+            "min_seconds": min(seconds),
+            "max_rss_mb": max(run["max_rss_mb"] for run in runs),
+            "modules": runs[-1]["modules"],
+            "gpu_stack": gpu_stack
+        }
+        print(f"{pair:45s} {median(seconds):9.3f} {min(seconds):7.3f} {results[pair]['max_rss_mb']:7.1f} {runs[-1]['modules']:8d}  {', '.join(gpu_stack) or '-'}")
+
+        if gpu_stack and base not in LOCAL_BASES:
+            failures.append(f"{pair}: imported {', '.join(gpu_stack)}")
+        if args.max_seconds is not None and median(seconds) > args.max_seconds:
+            failures.append(f"{pair}: median startup {median(seconds):.3f}s exceeds {args.max_seconds}s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if failures:
+        print("\nStartup regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
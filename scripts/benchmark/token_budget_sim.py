@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Simulate out-of-memory handling of local-model batches on a CPU.
+
+A simulated allocator raises an out-of-memory error whenever a batch needs more than
+--capacity tokens (batch size x (longest prompt + max tokens)). The same length-bucketed
+plan is then run twice:
+1. The previous behavior: retry the failed batch --retries times, then split it in half,
+   forgetting the limit for the next batch
+2. TokenBudgetPlanner: lower the token ceiling on the first error, replan the batch under
+   it and plan every later batch under it as well
+
+The script reports the number of out-of-memory errors and generate calls of each.
+
+Usage:
+    python scripts/benchmark/token_budget_sim.py
+    python scripts/benchmark/token_budget_sim.py --questions 500 --batch-size 32 --max-tokens 8000 --capacity 150000
+"""
+
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.models.token_budget import TokenBudgetPlanner
+
+class SimulatedOutOfMemoryError(RuntimeError):
+    """Raised by the simulated allocator."""
+
+class SimulatedAllocator:
+    """Counts generate calls and fails the ones that need more tokens than the capacity."""
+
+    def __init__(self, capacity, max_tokens):
+        self.capacity = capacity
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.ooms = 0
+
+    def generate(self, lengths):
+        self.calls += 1
+        if len(lengths) * (max(lengths) + self.max_tokens) > self.capacity:
+            self.ooms += 1
+            raise SimulatedOutOfMemoryError(f"{len(lengths)} x ({max(lengths)} + {self.max_tokens}) tokens")
+
+def run_halving(batch, lengths, allocator, retries):
+    """The previous fallback: retry the same batch, then split it in half."""
+    for _ in range(retries + 1):
+        try:
+            allocator.generate([lengths[i] for i in batch])
+            return
+        except SimulatedOutOfMemoryError:
+            pass
+    if len(batch) > 1:
+        mid = len(batch) // 2
+        run_halving(batch[:mid], lengths, allocator, retries)
+        run_halving(batch[mid:], lengths, allocator, retries)
+
+def run_planner(batch, lengths, allocator, planner):
+    """The planner's fallback: split batches above the ceiling, lower the ceiling on errors."""
+    batch_lengths = [lengths[i] for i in batch]
+    sub_batches = planner.plan(batch_lengths)
+    if len(sub_batches) > 1:
+        for sub_batch in sub_batches:
+            run_planner([batch[i] for i in sub_batch], lengths, allocator, planner)
+        return
+    try:
+        allocator.generate(batch_lengths)
+        planner.record_success(batch_lengths)
+    except SimulatedOutOfMemoryError:
+        planner.record_oom(batch_lengths)
+        if len(batch) > 1:
+            run_planner(batch, lengths, allocator, planner)
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate out-of-memory handling of local-model batches")
+    parser.add_argument("--questions", type=int, default=400, help="Number of questions")
+    parser.add_argument("--batch-size", type=int, default=16, help="Maximum batch size (--parallel)")
+    parser.add_argument("--max-tokens", type=int, default=4000, help="Maximum number of generated tokens")
+    parser.add_argument("--capacity", type=int, default=40000, help="Tokens the simulated GPU can hold")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of the previous behavior before it splits a batch")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the prompt lengths")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    lengths = [int(random.lognormvariate(6, 0.8)) + 50 for _ in range(args.questions)]
+
+    # The same longest-first length-bucketed plan for both runs
+    plan = TokenBudgetPlanner(args.batch_size, args.max_tokens).plan(lengths, sorted(range(len(lengths)), key=lambda i: lengths[i]))
+    plan.reverse()
+
+    halving = SimulatedAllocator(args.capacity, args.max_tokens)
+    for batch in plan:
+        run_halving(batch, lengths, halving, args.retries)
+
+    planner = TokenBudgetPlanner(args.batch_size, args.max_tokens)
+    planned = SimulatedAllocator(args.capacity, args.max_tokens)
+    for batch in plan:
+        run_planner(batch, lengths, planned, planner)
+
+    print(f"{args.questions} questions, prompt lengths {min(lengths)}-{max(lengths)}, {len(plan)} planned batches, capacity {args.capacity} tokens")
+    print(f"{'strategy':28s} {'OOM errors':>10s} {'generate calls':>15s}")
+    print(f"{'retry, then halve':28s} {halving.ooms:10d} {halving.calls:15d}")
+    print(f"{'learned token ceiling':28s} {planned.ooms:10d} {planned.calls:15d}")
+    print(f"Final token ceiling: {planner.ceiling} (largest successful batch: {planner.largest_success})")
+
+if __name__ == "__main__":
+    main()
@@ -9,16 +9,13 @@ This script:
 """
 
 import os
+import sys
 import json
 from pathlib import Path
 
-def load_jsonl(file_path):
-    """Load a JSONL file into a list of dictionaries."""
-    data = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            data.append(json.loads(line.strip()))
-    return data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset import Dataset
 
 def save_json(data, file_path):
     """Save a dictionary to a JSON file."""
@@ -33,10 +30,9 @@ def create_question_type_mapping():
     # Process OEQ data
     oeq_file = Path("data/jsonl/oeq.jsonl")
     if oeq_file.exists():
-        oeq_data = load_jsonl(oeq_file)
-        for item in oeq_data:
-            question_id = item.get("id")
-            question_type = item.get("type")
+        oeq_data = Dataset.from_jsonl(oeq_file)
+        for question_id in oeq_data.ids():
+            question_type = oeq_data.question_type(question_id)
             if question_id and question_type:
                 question_type_mapping[question_id] = question_type
         print(f"Processed {len(oeq_data)} OEQ questions")
@@ -50,10 +46,9 @@ def create_question_type_mapping():
     
     for mcq_file in mcq_files:
         if mcq_file.exists():
-            mcq_data = load_jsonl(mcq_file)
-            for item in mcq_data:
-                question_id = item.get("id")
-                question_type = item.get("type")
+            mcq_data = Dataset.from_jsonl(mcq_file)
+            for question_id in mcq_data.ids():
+                question_type = mcq_data.question_type(question_id)
                 if question_id and question_type:
                     question_type_mapping[question_id] = question_type
             print(f"Processed {len(mcq_data)} MCQ questions from {mcq_file.name}")
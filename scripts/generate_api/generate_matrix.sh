@@ -0,0 +1,11 @@
+PROJECT_ROOT=$(dirname "$(dirname "$(dirname "$0")")")
+cd "$PROJECT_ROOT"
+
+TOKEN=8000
+
+# All models x datasets in one process; requests to each provider share its limits
+python3 -m src.generate.generate_matrix \
+    --models openai:gpt4o together:llama deepseek:v3 \
+    --datasets OEQ/oeq MCQ/extra_1-10 MCQ/main_1-10 \
+    --provider-limits openai:concurrency=16 together:concurrency=8 deepseek:concurrency=8 \
+    --max-tokens $TOKEN --retries 1 --parallel 16 --backend asyncio
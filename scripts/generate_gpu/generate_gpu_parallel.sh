@@ -7,9 +7,11 @@
 #
 # EXECUTION STRATEGY:
 #   - GPUs are divided into GPU_PARALLEL groups
-#   - Each GPU group processes its assigned datasets SEQUENTIALLY
+#   - Each GPU group runs one worker that loads the model ONCE
 #   - Different GPU groups run in PARALLEL
-#   - Datasets are distributed to balance workload across GPU groups
+#   - The unanswered questions of all datasets are split into chunks on one shared
+#     queue; whichever GPU group is free takes the next chunk, so no group sits idle
+#     while another still has a long dataset to finish
 #
 # PARAMETERS:
 #   MODEL         - The Hugging Face model to use (default: Qwen2.5-72B-GeoGPT)
@@ -13,17 +13,14 @@ This script:
 """
 
 import os
+import sys
 import json
 from pathlib import Path
 from collections import defaultdict
 
-def load_jsonl(file_path):
-    """Load a JSONL file into a list of dictionaries."""
-    data = []
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            data.append(json.loads(line.strip()))
-    return data
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.dataset import read_jsonl
 
 def save_json(data, file_path):
     """Save a dictionary to a JSON file."""
@@ -174,7 +171,7 @@ def process_dataset(dataset_path, dataset_name):
                 continue
 
             # Load evaluations
-            evaluations = load_jsonl(eval_file)
+            evaluations = read_jsonl(eval_file, "evaluations")
             print(f"  Loaded {len(evaluations)} evaluations")
 
             # Analyze evaluations
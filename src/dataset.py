@@ -0,0 +1,179 @@
+"""
+Shared access to the JSONL datasets and output files.
+
+read_jsonl reads a JSONL file into a list of dictionaries. Dataset keeps the items of a
+dataset in file order and indexes them by problem id once, so looking up the expected
+answer of a response is a dictionary lookup instead of a scan of the whole dataset.
+
+Problem ids follow the convention of generation: the item's ``id`` field, or
+``problem_{idx}`` for an item without one, where idx is its position in the file.
+"""
+
+import json
+import logging
+
+# Create module logger
+logger = logging.getLogger(__name__)
+
+def read_jsonl(file_path, description="items"):
+    """
+    Read data from a JSONL file, skipping blank lines.
+
+    Args:
+        file_path (str): Path to the JSONL file
+        description (str): What the lines are, for the log message (e.g. "problems")
+
+    Returns:
+        list: One dictionary per line
+    """
+    data = []
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    data.append(json.loads(line))
+        logger.info(f"Successfully loaded {len(data)} {description} from {file_path}")
+        return data
+    except Exception as e:
+        logger.error(f"Error loading data from {file_path}: {e}")
+        raise
+
+def get_problem_id(item, idx):
+    """
+    Get the problem id of a dataset item.
+
+    Args:
+        item (dict): Dataset item
+        idx (int): Position of the item in the dataset
+
+    Returns:
+        str: The item's id, or problem_{idx} if it has none
+    """
+    return item.get('id', f"problem_{idx}")
+
+class Dataset:
+    """
+    Items of a dataset in file order, indexed by problem id.
+    """
+
+    def __init__(self, items, path=None):
+        """
+        Index the items of a dataset.
+
+        If several items share an id, lookups return the first of them.
+
+        Args:
+            items (list): Dataset items
+            path (str, optional): File the items were read from, for log messages
+        """
+        self.items = list(items)
+        self.path = path
+        self.index = {}
+
+        duplicates = 0
+        for idx, item in enumerate(self.items):
+            problem_id = get_problem_id(item, idx)
+            if problem_id in self.index:
+                duplicates += 1
+                continue
+            self.index[problem_id] = item
+
+        if duplicates:
+            logger.warning(f"{duplicates} items of {path or 'the dataset'} repeat an earlier id; lookups return the first item with each id")
+
+    @classmethod
+    def from_jsonl(cls, file_path, description="items"):
+        """
+        Read and index a JSONL dataset.
+
+        Args:
+            file_path (str): Path to the JSONL file
+            description (str): What the lines are, for the log message (e.g. "problems")
+
+        Returns:
+            Dataset: The indexed dataset
+        """
+        return cls(read_jsonl(file_path, description), path=file_path)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, problem_id):
+        return problem_id in self.index
+
+    def ids(self):
+        """
+        Get the problem ids of the dataset in file order, one per item.
+
+        Returns:
+            list: Problem ids
+        """
+        return [get_problem_id(item, idx) for idx, item in enumerate(self.items)]
+
+    def get(self, problem_id, default=None):
+        """
+        Get the item of a problem.
+
+        Args:
+            problem_id (str): Problem id
+            default: Value returned if the dataset has no such problem
+
+        Returns:
+            dict: The dataset item, or default
+        """
+        return self.index.get(problem_id, default)
+
+    def answer(self, problem_id):
+        """
+        Get the reference answer of a problem.
+
+        Args:
+            problem_id (str): Problem id
+
+        Returns:
+            str: The answer text, or None if the problem or its answer is missing
+        """
+        item = self.index.get(problem_id)
+        return item.get('answer') if item else None
+
+    def options(self, problem_id):
+        """
+        Get the answer options of an MCQ problem.
+
+        Args:
+            problem_id (str): Problem id
+
+        Returns:
+            list: The option texts in order, or an empty list if the problem has none
+        """
+        item = self.index.get(problem_id)
+        return list(item.get('options') or []) if item else []
+
+    def correct_option(self, problem_id):
+        """
+        Get the letter of the correct option of an MCQ problem.
+
+        Args:
+            problem_id (str): Problem id
+
+        Returns:
+            str: The option letter (e.g. "B"), or None if the problem or its correct option is missing
+        """
+        item = self.index.get(problem_id)
+        return item.get('correct_option') if item else None
+
+    def question_type(self, problem_id):
+        """
+        Get the subject type of a problem (e.g. "Atmospheric Dynamics").
+
+        Args:
+            problem_id (str): Problem id
+
+        Returns:
+            str: The type, or None if the problem or its type is missing
+        """
+        item = self.index.get(problem_id)
+        return item.get('type') if item else None
@@ -5,10 +5,15 @@ import argparse
 import json
 import logging
 import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import ray
 
 # Import evaluators
-from src.evaluate.evaluators import QuantityEvaluator, ExpressionEvaluator, LLMEvaluator, MCQEvaluator
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluators import EvaluatorPool
+from src.evaluate.evaluators.expression_evaluator import DEFAULT_SIMPLIFY_TIMEOUT, COMPARISON_MODES
+from src.evaluate.evaluators.memo import memo_stats_delta, add_memo_stats
 from src.evaluate.utils import (
     extract_subquestions,
     extract_boxed_answers,
@@ -30,19 +35,6 @@ logger = logging.getLogger(__name__)
 
 # File handler will be added in the main function after the output directory is created
 
-def read_jsonl(file_path):
-    """Read data from a JSONL file."""
-    data = []
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                data.append(json.loads(line))
-        logger.info(f"Successfully loaded {len(data)} items from {file_path}")
-        return data
-    except Exception as e:
-        logger.error(f"Error loading data from {file_path}: {e}")
-        raise
-
 def write_jsonl(data, file_path, mode='w'):
     """Write data to a JSONL file."""
     try:
@@ -76,8 +68,52 @@ def update_metadata(metadata, metadata_path):
     except Exception as e:
         logger.error(f"Error updating metadata: {e}")
 
+def add_comparison_stats(stats, problem_id, subq_id, comparison, is_correct):
+    """
+    Add the details of one ExpressionEvaluator comparison to the run's comparison statistics.
+
+    The strategy, time and timeouts of a comparison depend on the machine load, so they are
+    aggregated here for the metadata instead of being written to evaluation.jsonl.
+
+    Args:
+        stats (dict): Running statistics; updated in place
+        problem_id (str): Problem id
+        subq_id (str): Subquestion id
+        comparison (dict or None): The 'comparison' details of the ExpressionEvaluator result
+        is_correct (bool or None): Verdict of the ExpressionEvaluator
+    """
+    if not comparison:
+        return
+    stats['comparisons'] = stats.get('comparisons', 0) + 1
+    stats['seconds'] = round(stats.get('seconds', 0.0) + comparison.get('seconds', 0.0), 4)
+    strategies = stats.setdefault('strategies', {})
+    strategies[comparison['strategy']] = strategies.get(comparison['strategy'], 0) + 1
+    if comparison.get('timeouts'):
+        # The verdict of these subquestions may differ on a less loaded machine
+        stats['timeouts'] = stats.get('timeouts', 0) + comparison['timeouts']
+        stats.setdefault('deadline_fired', []).append({'id': problem_id, 'subquestion': subq_id, 'is_correct': is_correct})
+
+def merge_comparison_stats(total, stats):
+    """
+    Merge the comparison statistics of a worker into the run's statistics.
+
+    Args:
+        total (dict): Running statistics; updated in place
+        stats (dict): Statistics to add, as built by add_comparison_stats
+    """
+    for key in ('comparisons', 'timeouts'):
+        if key in stats:
+            total[key] = total.get(key, 0) + stats[key]
+    if 'seconds' in stats:
+        total['seconds'] = round(total.get('seconds', 0.0) + stats['seconds'], 4)
+    for strategy, count in stats.get('strategies', {}).items():
+        strategies = total.setdefault('strategies', {})
+        strategies[strategy] = strategies.get(strategy, 0) + count
+    if stats.get('deadline_fired'):
+        total.setdefault('deadline_fired', []).extend(stats['deadline_fired'])
+
 def evaluate_response(expected_answers, actual_response, question_type="OEQ", tolerance=0.05,
-                     disable_quantity=False, disable_expression=False, enable_llm=False, llm_batch=False):
+                     disable_quantity=False, disable_expression=False, enable_llm=False, llm_batch=False, pool=None):
     """
     Evaluate a single response using available evaluators.
 
@@ -90,33 +126,23 @@ def evaluate_response(expected_answers, actual_response, question_type="OEQ", to
         disable_expression (bool): Whether to disable the ExpressionEvaluator
         enable_llm (bool): Whether to enable the LLM-as-Judge Evaluator
         llm_batch (bool): Whether to skip LLM evaluation for batch processing later
+        pool (EvaluatorPool, optional): Evaluators of the run, configured with the same tolerance and
+            disabled evaluators. If None, a pool is built for this response only.
 
     Returns:
         dict: Evaluation results
     """
-    # Initialize evaluators based on which ones are enabled and the question type
-    evaluators = []
+    if pool is None:
+        pool = EvaluatorPool(tolerance=tolerance, disable_quantity=disable_quantity, disable_expression=disable_expression)
 
-    if question_type == "MCQ":
-        # For MCQ questions, use the MCQEvaluator
-        evaluators.append(MCQEvaluator(tolerance=tolerance))
-    else:
-        # For OEQ questions, use the standard evaluators
-        if not disable_quantity:
-            evaluators.append(QuantityEvaluator(tolerance=tolerance))
-
-        if not disable_expression:
-            evaluators.append(ExpressionEvaluator(tolerance=tolerance))
-
-        # Only add LLM evaluator if enable_llm is True and llm_batch is False
-        if enable_llm and not llm_batch:
-            evaluators.append(LLMEvaluator(tolerance=tolerance))
+    # Get the evaluators that are enabled for the question type
+    # Only add the LLM evaluator if enable_llm is True and llm_batch is False
+    evaluators = pool.get_evaluators(question_type, use_llm=enable_llm and not llm_batch)
 
     # Extract answers from the response based on question type
     if question_type == "MCQ":
         # For MCQ questions, extract the answer using the MCQEvaluator
-        mcq_evaluator = MCQEvaluator(tolerance=tolerance)
-        extracted_answer = mcq_evaluator.extract_mcq_answer(actual_response)
+        extracted_answer = pool.mcq.extract_mcq_answer(actual_response)
         extracted_answers = {'a': extracted_answer} if extracted_answer else {'a': None}
     else:
         # For OEQ questions, extract boxed answers
@@ -231,7 +257,8 @@ def evaluate_with_llm(expected, actual, model_name="gpt-4o-mini", tolerance=0.05
     Returns:
         dict: Evaluation result
     """
-    llm_evaluator = LLMEvaluator(model_name=model_name, tolerance=tolerance)
+    # Each Ray worker process keeps one LLM evaluator (and OpenAI client) per model
+    llm_evaluator = EvaluatorPool.for_process(tolerance=tolerance, llm_model=model_name).llm
     try:
         return llm_evaluator.evaluate(expected, actual)
     except Exception as e:
@@ -248,298 +275,482 @@ def evaluate_with_llm(expected, actual, model_name="gpt-4o-mini", tolerance=0.05
             }
         }
 
-def evaluate_responses(responses, expected_answers, question_type="OEQ", evaluation_path=None, results_path=None,
-                      tolerance=0.05, disable_quantity=False, disable_expression=False, enable_llm=False, llm_parallelism=8):
+def evaluate_problem(response, expected_answer_dict, question_type="OEQ", tolerance=0.05,
+                     disable_quantity=False, disable_expression=False, enable_llm=False, pool=None, comparison_stats=None):
     """
-    Evaluate all model responses against expected answers.
-
-    Simplified implementation with no recovery logic:
-    1. First pass: Evaluate all problems with quantity and expression evaluators
-    2. Second pass: Batch evaluate remaining problems with LLM evaluator in parallel
-    3. Third pass: Collect statistics
+    Evaluate one response with the rule-based evaluators (the first pass of evaluate_responses).
 
     Args:
-        responses (list): List of response dictionaries
-        expected_answers (list): List of expected answer dictionaries
+        response (dict): Response dictionary with id, question and response
+        expected_answer_dict (dict): Dataset item of the problem, or None if the dataset has none
         question_type (str): Type of question (OEQ or MCQ)
-        evaluation_path (str, optional): Path to save evaluation results
-        results_path (str, optional): Path to save summary results
         tolerance (float): Tolerance for numerical comparisons
         disable_quantity (bool): Whether to disable the QuantityEvaluator
         disable_expression (bool): Whether to disable the ExpressionEvaluator
         enable_llm (bool): Whether to enable the LLM-as-Judge Evaluator
-        llm_parallelism (int): Number of parallel LLM evaluations to run
+        pool (EvaluatorPool, optional): Evaluators to use. If None, one is built for this call.
+        comparison_stats (dict, optional): Filled with the strategies, time and deadline timeouts of the
+            ExpressionEvaluator comparisons (see add_comparison_stats)
 
     Returns:
-        tuple: (results, accuracy)
+        tuple: (result, llm_tasks), where result is None if the problem has no usable
+               expected answer and llm_tasks lists the subquestions left for the LLM pass
     """
-    logger.info(f"Starting evaluation of {len(responses)} responses")
+    if pool is None:
+        pool = EvaluatorPool(tolerance=tolerance, disable_quantity=disable_quantity, disable_expression=disable_expression)
 
-    # Initialize results list and statistics
-    results = []
-    llm_evaluation_tasks = []
+    llm_tasks = []
 
-    # FIRST PASS: Evaluate all problems with quantity and expression evaluators
-    logger.info("Starting first pass: Evaluating with quantity and expression evaluators")
+    problem_id = response.get('id')
+    question_data = response.get('question')
+    model_response = response.get('response', '')
 
-    for response in responses:
-        problem_id = response.get('id')
-        question_data = response.get('question')
-        model_response = response.get('response', '')
+    logger.info(f"Processing problem {problem_id}")
 
-        logger.info(f"Processing problem {problem_id}")
+    # Handle nested question structure
+    if isinstance(question_data, dict):
+        question = question_data.get('problem', '')
+    else:
+        question = question_data
 
-        # Handle nested question structure
-        if isinstance(question_data, dict):
-            question = question_data.get('problem', '')
-        else:
-            question = question_data
-
-        # Find the expected answer dictionary
-        expected_answer_dict = next((item for item in expected_answers if item.get('id') == problem_id), None)
-
-        if not expected_answer_dict:
-            logger.warning(f"No expected answer found for problem {problem_id}")
-
-            # Create a placeholder result for problems without expected answers
-            result = {
-                'id': problem_id,
-                'question': question_data,
-                'response': model_response,
-                'expected_answers': {},
-                'extracted_answers': {},
-                'evaluation': [],
-                'score': 0,
-                'correct_count': 0,
-                'total_count': 0,
-                'error': "No expected answer found in dataset"
-            }
+    if not expected_answer_dict:
+        logger.warning(f"No expected answer found for problem {problem_id}")
 
-            results.append(result)
-            continue
+        # Create a placeholder result for problems without expected answers
+        result = {
+            'id': problem_id,
+            'question': question_data,
+            'response': model_response,
+            'expected_answers': {},
+            'extracted_answers': {},
+            'evaluation': [],
+            'score': 0,
+            'correct_count': 0,
+            'total_count': 0,
+            'error': "No expected answer found in dataset"
+        }
 
-        # For MCQ questions, handle nested question structure in the expected answers
-        if question_type == "MCQ" and isinstance(expected_answer_dict.get('question'), dict):
-            nested_question = expected_answer_dict.get('question')
+        return result, []
 
-            # Extract the correct_option field if available
-            if 'correct_option' in nested_question:
-                expected_answer_dict['correct_option'] = nested_question['correct_option']
+    # For MCQ questions, handle nested question structure in the expected answers
+    if question_type == "MCQ" and isinstance(expected_answer_dict.get('question'), dict):
+        nested_question = expected_answer_dict.get('question')
 
-            # Extract the answer field if available
-            if 'answer' in nested_question and 'answer' not in expected_answer_dict:
-                expected_answer_dict['answer'] = nested_question['answer']
+        # Extract the correct_option field if available
+        if 'correct_option' in nested_question:
+            expected_answer_dict['correct_option'] = nested_question['correct_option']
 
-        # Extract subquestions from the problem text
-        subquestions = extract_subquestions(question)
+        # Extract the answer field if available
+        if 'answer' in nested_question and 'answer' not in expected_answer_dict:
+            expected_answer_dict['answer'] = nested_question['answer']
 
-        # Extract expected answers for each subquestion
-        expected_subquestion_answers = {}
+    # Extract subquestions from the problem text
+    subquestions = extract_subquestions(question)
 
-        if question_type == "MCQ":
-            # For MCQ questions, use the correct_option field if available
-            if 'correct_option' in expected_answer_dict:
-                expected_subquestion_answers['a'] = expected_answer_dict['correct_option']
-            else:
-                # If there's no correct_option field, try to use the answer field
-                if 'answer' in expected_answer_dict:
-                    answer_text = expected_answer_dict['answer']
-                    # Try to extract the option letter from the answer
-                    mcq_evaluator = MCQEvaluator()
-                    extracted_option = mcq_evaluator.extract_mcq_answer(answer_text)
-                    if extracted_option:
-                        expected_subquestion_answers['a'] = extracted_option
-                    else:
-                        # If we can't extract an option, just use the answer as is
-                        expected_subquestion_answers['a'] = answer_text
-                else:
-                    logger.warning(f"No correct_option or answer field found for MCQ problem {problem_id}")
-                    continue
+    # Extract expected answers for each subquestion
+    expected_subquestion_answers = {}
+
+    if question_type == "MCQ":
+        # For MCQ questions, use the correct_option field if available
+        if 'correct_option' in expected_answer_dict:
+            expected_subquestion_answers['a'] = expected_answer_dict['correct_option']
         else:
-            # For OEQ questions, use the standard approach
+            # If there's no correct_option field, try to use the answer field
             if 'answer' in expected_answer_dict:
-                # If there's a single answer field, extract subquestion answers from it
                 answer_text = expected_answer_dict['answer']
-                expected_subquestion_answers = extract_expected_answers(answer_text)
-            elif 'answers' in expected_answer_dict:
-                # If there's an answers dictionary, use it directly
-                expected_subquestion_answers = expected_answer_dict['answers']
+                # Try to extract the option letter from the answer
+                extracted_option = pool.mcq.extract_mcq_answer(answer_text)
+                if extracted_option:
+                    expected_subquestion_answers['a'] = extracted_option
+                else:
+                    # If we can't extract an option, just use the answer as is
+                    expected_subquestion_answers['a'] = answer_text
             else:
-                logger.warning(f"No answer field found for problem {problem_id}")
-                continue
-
-        # If no subquestion answers were found, use the subquestions from the problem text
-        if not expected_subquestion_answers or (len(expected_subquestion_answers) == 1 and 'main' in expected_subquestion_answers):
-            if 'answer' in expected_answer_dict:
-                # Assign the same answer to all subquestions
-                for subq in subquestions:
-                    expected_subquestion_answers[subq] = expected_answer_dict['answer']
-
-        # Deduplicate expected answers to avoid redundancy
-        expected_subquestion_answers = deduplicate_expected_answers(expected_subquestion_answers)
-
-        # For OEQ questions with LLM evaluation, use a two-pass approach
-        if question_type == "OEQ" and enable_llm:
-            # First pass: Evaluate with quantity and expression evaluators only
-            evaluation = evaluate_response(
-                expected_subquestion_answers,
-                model_response,
-                question_type=question_type,
-                tolerance=tolerance,
-                disable_quantity=disable_quantity,
-                disable_expression=disable_expression,
-                enable_llm=False,  # Skip LLM evaluation in first pass
-                llm_batch=True     # Mark for batch LLM evaluation
-            )
-
-            # Store problem info for LLM evaluation in second pass
-            # For OEQ, if a subquestion is not correct, add it to LLM evaluation tasks
-            for subq_id, subq_result in evaluation['subquestion_results'].items():
-                if not subq_result['is_correct']:
-                    # This subquestion needs LLM evaluation
-                    llm_evaluation_tasks.append({
-                        'problem_id': problem_id,
-                        'subq_id': subq_id,
-                        'expected': subq_result['expected_answer'],
-                        'actual': subq_result['extracted_answer']
-                    })
+                logger.warning(f"No correct_option or answer field found for MCQ problem {problem_id}")
+                return None, []
+    else:
+        # For OEQ questions, use the standard approach
+        if 'answer' in expected_answer_dict:
+            # If there's a single answer field, extract subquestion answers from it
+            answer_text = expected_answer_dict['answer']
+            expected_subquestion_answers = extract_expected_answers(answer_text)
+        elif 'answers' in expected_answer_dict:
+            # If there's an answers dictionary, use it directly
+            expected_subquestion_answers = expected_answer_dict['answers']
         else:
-            # For MCQ questions or OEQ without LLM, evaluate normally
-            evaluation = evaluate_response(
-                expected_subquestion_answers,
-                model_response,
-                question_type=question_type,
-                tolerance=tolerance,
-                disable_quantity=disable_quantity,
-                disable_expression=disable_expression,
-                enable_llm=enable_llm
-            )
-
-        # Extract all answers for easier access
+            logger.warning(f"No answer field found for problem {problem_id}")
+            return None, []
+
+    # If no subquestion answers were found, use the subquestions from the problem text
+    if not expected_subquestion_answers or (len(expected_subquestion_answers) == 1 and 'main' in expected_subquestion_answers):
+        if 'answer' in expected_answer_dict:
+            # Assign the same answer to all subquestions
+            for subq in subquestions:
+                expected_subquestion_answers[subq] = expected_answer_dict['answer']
+
+    # Deduplicate expected answers to avoid redundancy
+    expected_subquestion_answers = deduplicate_expected_answers(expected_subquestion_answers)
+
+    # For OEQ questions with LLM evaluation, use a two-pass approach
+    if question_type == "OEQ" and enable_llm:
+        # First pass: Evaluate with quantity and expression evaluators only
+        evaluation = evaluate_response(
+            expected_subquestion_answers,
+            model_response,
+            question_type=question_type,
+            tolerance=tolerance,
+            disable_quantity=disable_quantity,
+            disable_expression=disable_expression,
+            enable_llm=False,  # Skip LLM evaluation in first pass
+            llm_batch=True,    # Mark for batch LLM evaluation
+            pool=pool
+        )
+
+        # Store problem info for LLM evaluation in second pass
+        # For OEQ, if a subquestion is not correct, add it to LLM evaluation tasks
+        for subq_id, subq_result in evaluation['subquestion_results'].items():
+            if not subq_result['is_correct']:
+                # This subquestion needs LLM evaluation
+                llm_tasks.append({
+                    'problem_id': problem_id,
+                    'subq_id': subq_id,
+                    'expected': subq_result['expected_answer'],
+                    'actual': subq_result['extracted_answer']
+                })
+    else:
+        # For MCQ questions or OEQ without LLM, evaluate normally
+        evaluation = evaluate_response(
+            expected_subquestion_answers,
+            model_response,
+            question_type=question_type,
+            tolerance=tolerance,
+            disable_quantity=disable_quantity,
+            disable_expression=disable_expression,
+            enable_llm=enable_llm,
+            pool=pool
+        )
+
+    # Extract all answers for easier access
+    if question_type == "MCQ":
+        # For MCQ questions, extract the answer using the MCQEvaluator
+        extracted_answer = pool.mcq.extract_mcq_answer(model_response)
+        extracted_answers = {'a': extracted_answer} if extracted_answer else {'a': None}
+    else:
+        # For OEQ questions, extract boxed answers
+        extracted_answers = extract_boxed_answers(model_response)
+
+    # Create a clean, organized result structure
+    subquestions = []
+
+    # Process each subquestion
+    for subq_id, subq_result in evaluation['subquestion_results'].items():
+        # Get evaluator results based on question type
         if question_type == "MCQ":
-            # For MCQ questions, extract the answer using the MCQEvaluator
-            mcq_evaluator = MCQEvaluator(tolerance=tolerance)
-            extracted_answer = mcq_evaluator.extract_mcq_answer(model_response)
-            extracted_answers = {'a': extracted_answer} if extracted_answer else {'a': None}
-        else:
-            # For OEQ questions, extract boxed answers
-            extracted_answers = extract_boxed_answers(model_response)
+            mcq_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'MCQEvaluator'), None)
+
+            # Create a clean subquestion result
+            subq_data = {
+                'id': subq_id,
+                'is_correct': subq_result['is_correct'],
+                'expected_answer': subq_result['expected_answer'],
+                'extracted_answer': subq_result['extracted_answer'],
+                'evaluations': {}
+            }
 
-        # Create a clean, organized result structure
-        subquestions = []
+            # Include MCQ evaluator results
+            if mcq_result:
+                subq_data['evaluations']['mcq'] = {
+                    'is_correct': mcq_result['is_correct'],
+                    'expected': mcq_result['details']['expected'],
+                    'extracted': mcq_result['details']['actual'],
+                    'error': mcq_result['details']['error'] if 'error' in mcq_result['details'] else None
+                }
+        else:
+            # For OEQ questions, get the standard evaluator results
+            quantity_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'QuantityEvaluator'), None)
+            expression_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'ExpressionEvaluator'), None)
+            llm_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'LLMEvaluator'), None)
+
+            # Create a clean subquestion result
+            # For OEQ with LLM enabled, don't set is_correct to true until after LLM evaluation
+            is_correct = subq_result['is_correct']
+            if question_type == "OEQ" and enable_llm and not is_correct:
+                # If we need LLM evaluation, set is_correct to null for now
+                is_correct = None
+
+            subq_data = {
+                'id': subq_id,
+                'is_correct': is_correct,
+                'expected_answer': subq_result['expected_answer'],
+                'extracted_answer': subq_result['extracted_answer'],
+                'evaluations': {}
+            }
 
-        # Process each subquestion
-        for subq_id, subq_result in evaluation['subquestion_results'].items():
-            # Get evaluator results based on question type
-            if question_type == "MCQ":
-                mcq_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'MCQEvaluator'), None)
-
-                # Create a clean subquestion result
-                subq_data = {
-                    'id': subq_id,
-                    'is_correct': subq_result['is_correct'],
-                    'expected_answer': subq_result['expected_answer'],
-                    'extracted_answer': subq_result['extracted_answer'],
-                    'evaluations': {}
+            # Only include enabled evaluators in the results
+            if quantity_result and not disable_quantity:
+                subq_data['evaluations']['quantity'] = {
+                    'is_correct': quantity_result['is_correct'],
+                    'error': quantity_result['details']['error'] if 'error' in quantity_result['details'] else None
                 }
 
-                # Include MCQ evaluator results
-                if mcq_result:
-                    subq_data['evaluations']['mcq'] = {
-                        'is_correct': mcq_result['is_correct'],
-                        'expected': mcq_result['details']['expected'],
-                        'extracted': mcq_result['details']['actual'],
-                        'error': mcq_result['details']['error'] if 'error' in mcq_result['details'] else None
-                    }
-            else:
-                # For OEQ questions, get the standard evaluator results
-                quantity_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'QuantityEvaluator'), None)
-                expression_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'ExpressionEvaluator'), None)
-                llm_result = next((r for r in subq_result['evaluator_results'] if r['details']['evaluator'] == 'LLMEvaluator'), None)
-
-                # Create a clean subquestion result
-                # For OEQ with LLM enabled, don't set is_correct to true until after LLM evaluation
-                is_correct = subq_result['is_correct']
-                if question_type == "OEQ" and enable_llm and not is_correct:
-                    # If we need LLM evaluation, set is_correct to null for now
-                    is_correct = None
-
-                subq_data = {
-                    'id': subq_id,
-                    'is_correct': is_correct,
-                    'expected_answer': subq_result['expected_answer'],
-                    'extracted_answer': subq_result['extracted_answer'],
-                    'evaluations': {}
+            if expression_result and not disable_expression:
+                subq_data['evaluations']['expression'] = {
+                    'is_correct': expression_result['is_correct'],
+                    'error': expression_result['details']['error'] if 'error' in expression_result['details'] else None
+                }
+                # Timing details depend on the machine load; they go to the metadata, not the record
+                if comparison_stats is not None:
+                    add_comparison_stats(comparison_stats, problem_id, subq_id, expression_result['details'].get('comparison'), expression_result['is_correct'])
+
+            if llm_result and enable_llm:
+                subq_data['evaluations']['llm'] = {
+                    'is_correct': llm_result['is_correct'],
+                    'explanation': llm_result['details']['explanation'] if 'explanation' in llm_result['details'] else None,
+                    'error': llm_result['details']['error'] if 'error' in llm_result['details'] else None
                 }
 
-                # Only include enabled evaluators in the results
-                if quantity_result and not disable_quantity:
-                    subq_data['evaluations']['quantity'] = {
-                        'is_correct': quantity_result['is_correct'],
-                        'error': quantity_result['details']['error'] if 'error' in quantity_result['details'] else None
-                    }
+        subquestions.append(subq_data)
 
-                if expression_result and not disable_expression:
-                    subq_data['evaluations']['expression'] = {
-                        'is_correct': expression_result['is_correct'],
-                        'error': expression_result['details']['error'] if 'error' in expression_result['details'] else None
-                    }
+    # For OEQ with LLM enabled, recalculate score based on non-null is_correct values
+    correct_count = evaluation['correct_count']
+    total_count = evaluation['total_count']
+    score = evaluation['score']
 
-                if llm_result and enable_llm:
-                    subq_data['evaluations']['llm'] = {
-                        'is_correct': llm_result['is_correct'],
-                        'explanation': llm_result['details']['explanation'] if 'explanation' in llm_result['details'] else None,
-                        'error': llm_result['details']['error'] if 'error' in llm_result['details'] else None
-                    }
+    if question_type == "OEQ" and enable_llm:
+        # Only count subquestions with non-null is_correct values
+        valid_subqs = [sq for sq in subquestions if sq['is_correct'] is not None]
+        correct_subqs = [sq for sq in valid_subqs if sq['is_correct']]
 
-            subquestions.append(subq_data)
+        if valid_subqs:
+            correct_count = len(correct_subqs)
+            total_count = len(valid_subqs)
+            score = correct_count / total_count if total_count > 0 else 0
+        else:
+            # If all subquestions need LLM evaluation, set score to null
+            correct_count = 0
+            total_count = 0
+            score = None
+
+    # Add to results with the new order
+    result = {
+        # First: id, question, and response
+        'id': problem_id,
+        'question': question,
+        'response': model_response,
+
+        # Second: expected_answers and extracted_answers
+        'expected_answers': expected_subquestion_answers,
+        'extracted_answers': extracted_answers,
+
+        # Third: evaluation (renamed from subquestions)
+        'evaluation': subquestions,
+
+        # Last: score and counts
+        'score': score,
+        'correct_count': correct_count,
+        'total_count': total_count
+    }
 
-        # For OEQ with LLM enabled, recalculate score based on non-null is_correct values
-        correct_count = evaluation['correct_count']
-        total_count = evaluation['total_count']
-        score = evaluation['score']
+    return result, llm_tasks
 
-        if question_type == "OEQ" and enable_llm:
-            # Only count subquestions with non-null is_correct values
-            valid_subqs = [sq for sq in subquestions if sq['is_correct'] is not None]
-            correct_subqs = [sq for sq in valid_subqs if sq['is_correct']]
+# Evaluators of an evaluation worker process, built once by init_evaluation_worker
+_worker_pool = None
 
-            if valid_subqs:
-                correct_count = len(correct_subqs)
-                total_count = len(valid_subqs)
-                score = correct_count / total_count if total_count > 0 else 0
-            else:
-                # If all subquestions need LLM evaluation, set score to null
-                correct_count = 0
-                total_count = 0
-                score = None
+# Memo counters of the worker's evaluators when it last returned a problem
+_worker_memo_stats = {}
 
-        # Add to results with the new order
-        result = {
-            # First: id, question, and response
-            'id': problem_id,
-            'question': question,
-            'response': model_response,
+def init_evaluation_worker(tolerance, disable_quantity, disable_expression, simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT, expression_mode="symbolic"):
+    """
+    Build the evaluators of an evaluation worker process once, before it takes any problems.
 
-            # Second: expected_answers and extracted_answers
-            'expected_answers': expected_subquestion_answers,
-            'extracted_answers': extracted_answers,
+    Args:
+        tolerance (float): Tolerance for numerical comparisons
+        disable_quantity (bool): Whether to disable the QuantityEvaluator
+        disable_expression (bool): Whether to disable the ExpressionEvaluator
+        simplify_timeout (float): Deadline in seconds of each sympy.simplify call
+        expression_mode (str): Comparison mode of the ExpressionEvaluator ("symbolic" or "numeric")
+    """
+    global _worker_pool, _worker_memo_stats
+    _worker_pool = EvaluatorPool.for_process(tolerance=tolerance, disable_quantity=disable_quantity, disable_expression=disable_expression,
+                                             simplify_timeout=simplify_timeout, expression_mode=expression_mode)
+    _worker_memo_stats = _worker_pool.memo_stats()
 
-            # Third: evaluation (renamed from subquestions)
-            'evaluation': subquestions,
+def evaluate_problem_in_worker(task):
+    """
+    Evaluate one (response, expected answer dict, settings...) task with the worker's evaluators.
 
-            # Last: score and counts
-            'score': score,
-            'correct_count': correct_count,
-            'total_count': total_count
-        }
+    Returns the (result, llm_tasks) of evaluate_problem, and the memo hits and misses and
+    the comparison statistics of this task, which the parent adds up across workers.
+    """
+    global _worker_memo_stats
+    response, expected_answer_dict, question_type, tolerance, disable_quantity, disable_expression, enable_llm = task
+    comparison_stats = {}
+    result, llm_tasks = evaluate_problem(response, expected_answer_dict, question_type, tolerance, disable_quantity, disable_expression, enable_llm,
+                                         _worker_pool, comparison_stats)
+    memo_stats = _worker_pool.memo_stats()
+    delta = memo_stats_delta(_worker_memo_stats, memo_stats)
+    _worker_memo_stats = memo_stats
+    return result, llm_tasks, delta, comparison_stats
+
+def evaluate_problems_parallel(problems, workers, question_type="OEQ", tolerance=0.05,
+                               disable_quantity=False, disable_expression=False, enable_llm=False, simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT,
+                               expression_mode="symbolic", memo_stats=None, comparison_stats=None):
+    """
+    Run evaluate_problem for many responses on a pool of worker processes.
+
+    Each worker builds its evaluators once (init_evaluation_worker) and evaluates chunks of
+    problems. Results are returned in the order of problems, so the output is the same as
+    a serial run. Workers are forked where possible, so they inherit the loaded modules and
+    the hash seed of this process.
+
+    Args:
+        problems (list): (response, expected answer dict) tuples
+        workers (int): Number of worker processes
+        question_type (str): Type of question (OEQ or MCQ)
+        tolerance (float): Tolerance for numerical comparisons
+        disable_quantity (bool): Whether to disable the QuantityEvaluator
+        disable_expression (bool): Whether to disable the ExpressionEvaluator
+        enable_llm (bool): Whether to enable the LLM-as-Judge Evaluator
+        simplify_timeout (float): Deadline in seconds of each sympy.simplify call
+        expression_mode (str): Comparison mode of the ExpressionEvaluator ("symbolic" or "numeric")
+        memo_stats (dict, optional): Filled with the LaTeX memo hits and misses of all workers
+        comparison_stats (dict, optional): Filled with the ExpressionEvaluator comparison statistics of all workers
 
+    Returns:
+        list: (result, llm_tasks) tuples of evaluate_problem, in the order of problems
+    """
+    # A process with a live Ray driver (gRPC and core worker threads) must not be forked,
+    # so workers start from a clean server process in that case
+    if ray.is_initialized():
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        logger.info(f"Ray is initialized in this process; starting evaluation workers with {start_method}")
+        context = multiprocessing.get_context(start_method)
+    elif "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    tasks = [
+        (response, expected_answer_dict, question_type, tolerance, disable_quantity, disable_expression, enable_llm)
+        for response, expected_answer_dict in problems
+    ]
+
+    # Several chunks per worker keep the workers busy when some problems take much longer than others
+    chunksize = max(1, len(tasks) // (workers * 8))
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_evaluation_worker,
+                             initargs=(tolerance, disable_quantity, disable_expression, simplify_timeout, expression_mode)) as executor:
+        first_pass = []
+        for result, llm_tasks, delta, task_comparison_stats in executor.map(evaluate_problem_in_worker, tasks, chunksize=chunksize):
+            first_pass.append((result, llm_tasks))
+            if memo_stats is not None:
+                add_memo_stats(memo_stats, delta)
+            if comparison_stats is not None:
+                merge_comparison_stats(comparison_stats, task_comparison_stats)
+        return first_pass
+
+def evaluate_responses(responses, expected_answers, question_type="OEQ", evaluation_path=None, results_path=None,
+                      tolerance=0.05, disable_quantity=False, disable_expression=False, enable_llm=False, llm_parallelism=8, pool=None, workers=1,
+                      simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT, expression_mode="symbolic", memo_stats=None, comparison_stats=None):
+    """
+    Evaluate all model responses against expected answers.
+
+    Simplified implementation with no recovery logic:
+    1. First pass: Evaluate all problems with quantity and expression evaluators
+    2. Second pass: Batch evaluate remaining problems with LLM evaluator in parallel
+    3. Third pass: Collect statistics
+
+    Args:
+        responses (list): List of response dictionaries
+        expected_answers (Dataset or list): Dataset with the expected answers, or a list of its items
+        question_type (str): Type of question (OEQ or MCQ)
+        evaluation_path (str, optional): Path to save evaluation results
+        results_path (str, optional): Path to save summary results
+        tolerance (float): Tolerance for numerical comparisons
+        disable_quantity (bool): Whether to disable the QuantityEvaluator
+        disable_expression (bool): Whether to disable the ExpressionEvaluator
+        enable_llm (bool): Whether to enable the LLM-as-Judge Evaluator
+        llm_parallelism (int): Number of parallel LLM evaluations to run
+        pool (EvaluatorPool, optional): Evaluators shared by all responses. If None, one is built for this run.
+        workers (int): Number of processes for the first pass. With more than one, each worker builds its own evaluators.
+        simplify_timeout (float): Deadline in seconds of each sympy.simplify call of the ExpressionEvaluator
+        expression_mode (str): Comparison mode of the ExpressionEvaluator ("symbolic" or "numeric")
+        memo_stats (dict, optional): Filled with the hits and misses of the LaTeX memos during the first pass,
+                                     by memo name (e.g. "QuantityEvaluator.clean_latex")
+        comparison_stats (dict, optional): Filled with the strategies, time and deadline timeouts of the
+                                           ExpressionEvaluator comparisons of the first pass
+
+    Returns:
+        tuple: (results, accuracy)
+    """
+    logger.info(f"Starting evaluation of {len(responses)} responses")
+
+    # Index the expected answers by problem id once for all responses
+    dataset = expected_answers if isinstance(expected_answers, Dataset) else Dataset(expected_answers)
+
+    # Build the evaluators once for all responses
+    if pool is None:
+        pool = EvaluatorPool(tolerance=tolerance, disable_quantity=disable_quantity, disable_expression=disable_expression,
+                             simplify_timeout=simplify_timeout, expression_mode=expression_mode)
+
+    # Initialize results list and statistics
+    results = []
+    llm_evaluation_tasks = []
+
+    # FIRST PASS: Evaluate all problems with quantity and expression evaluators
+    logger.info("Starting first pass: Evaluating with quantity and expression evaluators")
+
+    # Look up the expected answers here, so workers only receive their own problems
+    problems = [(response, dataset.get(response.get('id'))) for response in responses]
+
+    first_pass_memo_stats = {}
+    first_pass_comparison_stats = {}
+    if workers > 1 and len(problems) > 1:
+        logger.info(f"Evaluating {len(problems)} responses with {workers} worker processes")
+        first_pass = evaluate_problems_parallel(problems, workers, question_type, tolerance, disable_quantity, disable_expression, enable_llm,
+                                                simplify_timeout, expression_mode, first_pass_memo_stats, first_pass_comparison_stats)
+    else:
+        # The pool may have been used before, so count only this run's hits and misses
+        memo_stats_before = pool.memo_stats()
+        first_pass = [
+            evaluate_problem(response, expected_answer_dict, question_type, tolerance, disable_quantity, disable_expression, enable_llm, pool,
+                             first_pass_comparison_stats)
+            for response, expected_answer_dict in problems
+        ]
+        first_pass_memo_stats = memo_stats_delta(memo_stats_before, pool.memo_stats())
+
+    # Collect the results in response order
+    for result, llm_tasks in first_pass:
+        if result is None:
+            continue
         results.append(result)
+        llm_evaluation_tasks.extend(llm_tasks)
+
+    # Log the LaTeX memo hit rates of the first pass
+    for name, counts in first_pass_memo_stats.items():
+        calls = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / calls, 4) if calls else 0.0
+        logger.info(f"Memo {name}: {counts['hits']} hits, {counts['misses']} misses ({counts['hit_rate']:.1%} hit rate)")
+    if memo_stats is not None:
+        memo_stats.update(first_pass_memo_stats)
+
+    # Log the expression comparisons whose verdict a simplification deadline may have changed
+    fired = first_pass_comparison_stats.get('deadline_fired', [])
+    if fired:
+        undecided = sum(1 for entry in fired if entry['is_correct'] is None)
+        logger.warning(f"The simplification deadline fired in {len(fired)} expression comparisons; {undecided} of them are undecided (see metadata.json)")
+    if comparison_stats is not None:
+        comparison_stats.update(first_pass_comparison_stats)
 
     # SECOND PASS: Batch evaluate with LLM in parallel (only for OEQ with LLM enabled)
     if question_type == "OEQ" and enable_llm and llm_evaluation_tasks:
         logger.info(f"Starting second pass: Batch LLM evaluation for {len(llm_evaluation_tasks)} subquestions")
 
+        # Ray is only started now, after the first pass has forked and joined its workers
+        if not ray.is_initialized():
+            logger.info(f"Initializing Ray for parallel LLM evaluation with {llm_parallelism} workers")
+            ray.init(ignore_reinit_error=True, num_cpus=llm_parallelism)
+
         # Remove duplicate tasks (same problem_id and subq_id)
         unique_tasks = {}
         for task in llm_evaluation_tasks:
@@ -717,6 +928,9 @@ def main():
     parser.add_argument("--disable-expression", action="store_true", help="Disable the ExpressionEvaluator")
     parser.add_argument("--enable-llm", action="store_true", help="Enable the LLM-as-Judge Evaluator")
     parser.add_argument("--llm-parallelism", type=int, default=16, help="Number of parallel LLM evaluations to run")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes for the rule-based first pass (default: 1, serial)")
+    parser.add_argument("--simplify-timeout", type=float, default=DEFAULT_SIMPLIFY_TIMEOUT, help=f"Deadline in CPU seconds of each sympy simplification; cheaper strategies are used past it (default: {DEFAULT_SIMPLIFY_TIMEOUT}, 0 for none)")
+    parser.add_argument("--expression-mode", type=str, default="symbolic", choices=COMPARISON_MODES, help="How the ExpressionEvaluator compares expressions: symbolic (sympy.simplify) or numeric (random-point sampling, simplify only when inconclusive)")
 
     # Logging settings
     parser.add_argument("--log-level", type=str, default="INFO",
@@ -767,24 +981,24 @@ def main():
     logger.info(f"Log level set to: {args.log_level}")
 
     # Log startup information
-    logger.info(f"Starting evaluation for base: {args.base}, model: {args.model}, data: {args.data}, type: {args.type}, max_tokens: {args.max_tokens}")
+    logger.info(f"Starting evaluation for base: {args.base}, model: {args.model}, data: {args.data}, type: {args.type}, max_tokens: {args.max_tokens}, workers: {args.workers}")
     logger.info(f"Logs will be saved to: {log_path}")
     logger.info(f"All logs for this model can be found in: {logs_dir}")
 
-    # Initialize Ray for parallel processing if LLM evaluation is enabled
-    if args.enable_llm:
-        logger.info(f"Initializing Ray for parallel LLM evaluation with {args.llm_parallelism} workers")
-        ray.init(ignore_reinit_error=True, num_cpus=args.llm_parallelism)
+    # Ray for the LLM evaluation is initialized by evaluate_responses after the rule-based
+    # first pass, so that its worker processes are not forked from a live Ray driver
 
     # Read dataset and responses
     try:
-        expected_answers = read_jsonl(data_path)
-        responses = read_jsonl(response_path)
+        expected_answers = Dataset.from_jsonl(data_path)
+        responses = read_jsonl(response_path, "responses")
     except Exception as e:
         logger.error(f"Error reading input files: {e}")
         sys.exit(1)
 
     # Evaluate responses
+    memo_stats = {}
+    comparison_stats = {}
     try:
         results, accuracy = evaluate_responses(
             responses,
@@ -796,7 +1010,12 @@ def main():
             disable_quantity=args.disable_quantity,
             disable_expression=args.disable_expression,
             enable_llm=args.enable_llm,
-            llm_parallelism=args.llm_parallelism
+            llm_parallelism=args.llm_parallelism,
+            workers=args.workers,
+            simplify_timeout=args.simplify_timeout,
+            expression_mode=args.expression_mode,
+            memo_stats=memo_stats,
+            comparison_stats=comparison_stats
         )
     except Exception as e:
         logger.error(f"Error during evaluation: {e}")
@@ -829,12 +1048,28 @@ def main():
             'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'accuracy': accuracy,
             'tolerance': args.tolerance,
+            # Both can change ExpressionEvaluator verdicts
+            'simplify_timeout': args.simplify_timeout,
+            'expression_mode': args.expression_mode,
             'evaluators': enabled_evaluators,
             'disabled_evaluators': {
                 'quantity': args.type == "MCQ" or args.disable_quantity,
                 'expression': args.type == "MCQ" or args.disable_expression,
                 'llm': args.type == "MCQ" or not args.enable_llm,
                 'mcq': args.type != "MCQ"
+            },
+            # Hits and misses of the LaTeX cleaning and parsing memos of the rule-based evaluators
+            'memo_stats': memo_stats,
+            # Strategies, time and timeouts of the ExpressionEvaluator comparisons. Subquestions in
+            # deadline_fired were compared under a simplification deadline that fired; a negative
+            # verdict of theirs is recorded as undecided (is_correct None) in evaluation.jsonl
+            'comparisons': {
+                'comparisons': comparison_stats.get('comparisons', 0),
+                'seconds': comparison_stats.get('seconds', 0.0),
+                'strategies': comparison_stats.get('strategies', {}),
+                'timeouts': comparison_stats.get('timeouts', 0),
+                'deadline_enforced': bool(args.simplify_timeout),
+                'deadline_fired': comparison_stats.get('deadline_fired', [])
             }
         }
 
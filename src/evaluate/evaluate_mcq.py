@@ -7,7 +7,8 @@ import logging
 import datetime
 
 # Import evaluators - only MCQEvaluator for MCQ and CODE
-from src.evaluate.evaluators import MCQEvaluator
+from src.dataset import Dataset, read_jsonl
+from src.evaluate.evaluators import EvaluatorPool
 from src.evaluate.utils import (
     extract_subquestions,
     extract_expected_answers,
@@ -28,19 +29,6 @@ logger = logging.getLogger(__name__)
 
 # File handler will be added in the main function after the output directory is created
 
-def read_jsonl(file_path):
-    """Read data from a JSONL file."""
-    data = []
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                data.append(json.loads(line))
-        logger.info(f"Successfully loaded {len(data)} items from {file_path}")
-        return data
-    except Exception as e:
-        logger.error(f"Error loading data from {file_path}: {e}")
-        raise
-
 def write_jsonl(data, file_path, mode='w'):
     """
     Write data to a JSONL file.
@@ -109,7 +97,7 @@ def get_latest_log(logs_dir):
         logger.error(f"Error getting latest log file: {e}")
         return None
 
-def evaluate_response(expected_answers, actual_response, question_type="MCQ", tolerance=0.05):
+def evaluate_response(expected_answers, actual_response, question_type="MCQ", tolerance=0.05, pool=None):
     """
     Evaluate a single response using MCQEvaluator.
 
@@ -118,12 +106,15 @@ def evaluate_response(expected_answers, actual_response, question_type="MCQ", to
         actual_response (str): The model's response
         question_type (str): Type of question (MCQ or CODE)
         tolerance (float): Tolerance for numerical comparisons
+        pool (EvaluatorPool, optional): Evaluators of the run. If None, a pool is built for this response only.
 
     Returns:
         dict: Evaluation results
     """
-    # Initialize MCQ evaluator
-    mcq_evaluator = MCQEvaluator(tolerance=tolerance)
+    # Get the MCQ evaluator of the run
+    if pool is None:
+        pool = EvaluatorPool(tolerance=tolerance, disable_quantity=True, disable_expression=True)
+    mcq_evaluator = pool.mcq
 
     # Extract the answer using the MCQEvaluator
     extracted_answer = mcq_evaluator.extract_mcq_answer(actual_response)
@@ -236,22 +227,30 @@ def evaluate_response(expected_answers, actual_response, question_type="MCQ", to
         'answer_mapping': answer_mapping
     }
 
-def evaluate_responses(responses, expected_answers, question_type="MCQ", evaluation_path=None, results_path=None, tolerance=0.05, remove_duplicate=False):
+def evaluate_responses(responses, expected_answers, question_type="MCQ", evaluation_path=None, results_path=None, tolerance=0.05, remove_duplicate=False, pool=None):
     """
     Evaluate all model responses against expected answers.
 
     Args:
         responses (list): List of response dictionaries
-        expected_answers (list): List of expected answer dictionaries
+        expected_answers (Dataset or list): Dataset with the expected answers, or a list of its items
         question_type (str): Type of question (MCQ or CODE)
         evaluation_path (str, optional): Path to save evaluation results
         results_path (str, optional): Path to save summary results
         tolerance (float): Tolerance for numerical comparisons
         remove_duplicate (bool): Whether to remove duplicate questions from evaluation.jsonl
+        pool (EvaluatorPool, optional): Evaluators shared by all responses. If None, one is built for this run.
 
     Returns:
         tuple: (results, accuracy)
     """
+    # Index the expected answers by problem id once for all responses
+    dataset = expected_answers if isinstance(expected_answers, Dataset) else Dataset(expected_answers)
+
+    # Build the evaluators once for all responses
+    if pool is None:
+        pool = EvaluatorPool(tolerance=tolerance, disable_quantity=True, disable_expression=True)
+
     results = []
     total_score = 0
     total_problems = 0
@@ -294,7 +293,7 @@ def evaluate_responses(responses, expected_answers, question_type="MCQ", evaluat
             question = question_data
 
         # Find the expected answer dictionary
-        expected_answer_dict = next((item for item in expected_answers if item.get('id') == problem_id), None)
+        expected_answer_dict = dataset.get(problem_id)
 
         if not expected_answer_dict:
             logger.warning(f"No expected answer found for problem {problem_id}")
@@ -349,8 +348,7 @@ def evaluate_responses(responses, expected_answers, question_type="MCQ", evaluat
             if 'answer' in expected_answer_dict:
                 answer_text = expected_answer_dict['answer']
                 # Try to extract the option letter from the answer
-                mcq_evaluator = MCQEvaluator()
-                extracted_option = mcq_evaluator.extract_mcq_answer(answer_text)
+                extracted_option = pool.mcq.extract_mcq_answer(answer_text)
                 if extracted_option:
                     expected_subquestion_answers['a'] = extracted_option
                 else:
@@ -369,12 +367,12 @@ def evaluate_responses(responses, expected_answers, question_type="MCQ", evaluat
             expected_subquestion_answers,
             model_response,
             question_type=question_type,
-            tolerance=tolerance
+            tolerance=tolerance,
+            pool=pool
         )
 
         # Extract the answer using the MCQEvaluator
-        mcq_evaluator = MCQEvaluator(tolerance=tolerance)
-        extracted_answer = mcq_evaluator.extract_mcq_answer(model_response)
+        extracted_answer = pool.mcq.extract_mcq_answer(model_response)
         extracted_answers = {'a': extracted_answer} if extracted_answer else {'a': None}
 
         # Create a clean, organized result structure
@@ -558,8 +556,8 @@ def main():
 
     # Read dataset and responses
     try:
-        expected_answers = read_jsonl(data_path)
-        responses = read_jsonl(response_path)
+        expected_answers = Dataset.from_jsonl(data_path)
+        responses = read_jsonl(response_path, "responses")
     except Exception as e:
         logger.error(f"Error reading input files: {e}")
         sys.exit(1)
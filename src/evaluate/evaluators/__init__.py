@@ -7,6 +7,7 @@ from .quantity_evaluator import QuantityEvaluator
 from .expression_evaluator import ExpressionEvaluator
 from .llm_evaluator import LLMEvaluator
 from .mcq_evaluator import MCQEvaluator
+from .pool import EvaluatorPool
 
 __all__ = [
     'BaseEvaluator',
@@ -14,4 +15,5 @@ __all__ = [
     'ExpressionEvaluator',
     'LLMEvaluator',
     'MCQEvaluator',
+    'EvaluatorPool',
 ]
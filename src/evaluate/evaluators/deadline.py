@@ -0,0 +1,66 @@
+"""
+Deadlines for CPU-bound steps of the evaluators, such as sympy simplification.
+
+time_limit interrupts the code inside it once the deadline has passed, using a SIGVTALRM
+interval timer. The timer counts the CPU time of the process rather than wall-clock time,
+so evaluation workers competing for the same cores do not push each other past their
+deadlines and the verdicts do not depend on the number of workers. The timer can only be
+armed on POSIX in the main thread of a process, which is where evaluation runs: the
+evaluate scripts and their worker processes. Elsewhere the block runs without a deadline.
+"""
+
+import signal
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+class DeadlineExceeded(BaseException):
+    """
+    Raised inside a time_limit block once its deadline has passed.
+
+    Derives from BaseException, like KeyboardInterrupt, so that ``except Exception``
+    blocks inside sympy do not swallow it and carry on past the deadline.
+    """
+
+def deadline_supported():
+    """
+    Check whether time_limit can interrupt code in the current thread.
+
+    Returns:
+        bool: True on POSIX in the main thread
+    """
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Interrupt the block with DeadlineExceeded if it uses more than seconds of CPU time.
+
+    The previous SIGVTALRM handler is restored when the block exits. If seconds is None or
+    0, or deadlines are not supported in this thread, the block runs without a deadline.
+
+    Args:
+        seconds (float): Deadline in seconds of CPU time
+
+    Yields:
+        bool: Whether the deadline is enforced
+    """
+    if not seconds or not deadline_supported():
+        yield False
+        return
+
+    def on_deadline(signum, frame):
+        raise DeadlineExceeded(f"Deadline of {seconds} CPU seconds exceeded")
+
+    previous_handler = signal.signal(signal.SIGVTALRM, on_deadline)
+    signal.setitimer(signal.ITIMER_VIRTUAL, seconds)
+    try:
+        yield True
+    finally:
+        # Restore the handler even if the timer fires while it is being disarmed
+        try:
+            signal.setitimer(signal.ITIMER_VIRTUAL, 0)
+        finally:
+            signal.signal(signal.SIGVTALRM, previous_handler)
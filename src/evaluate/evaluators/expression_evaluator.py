@@ -3,27 +3,76 @@ Expression evaluator for comparing mathematical expressions.
 """
 
 import re
+import time
 import logging
+import numpy as np
 import sympy
 from sympy.parsing.latex import parse_latex
 from .base_evaluator import BaseEvaluator
+from .deadline import DeadlineExceeded, time_limit
+from .memo import LRUMemo, DEFAULT_MEMO_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Default deadlines in seconds of sympy.simplify and of the expand fallback
+DEFAULT_SIMPLIFY_TIMEOUT = 5.0
+DEFAULT_FALLBACK_TIMEOUT = 1.0
+
+# Comparison modes: prove equivalence symbolically, or sample both expressions numerically first
+COMPARISON_MODES = ['symbolic', 'numeric']
+
+# Default number of random points of the numeric mode
+DEFAULT_SAMPLE_POINTS = 32
+
+# Comparison strategies in the order they are tried; the details record the last one reached
+COMPARISON_STRATEGIES = ['numeric', 'simplify', 'expand', 'none']
+
 class ExpressionEvaluator(BaseEvaluator):
     """
     Evaluator for comparing mathematical expressions.
     Uses sympy to parse and compare expressions.
     """
 
-    def __init__(self, tolerance=0.05):
+    def __init__(self, tolerance=0.05, simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT, fallback_timeout=DEFAULT_FALLBACK_TIMEOUT,
+                 comparison_mode="symbolic", sample_points=DEFAULT_SAMPLE_POINTS, seed=0, memo_size=DEFAULT_MEMO_SIZE):
         """
         Initialize the expression evaluator.
 
         Args:
             tolerance (float): Tolerance for numerical comparisons
+            simplify_timeout (float): Deadline in seconds of each sympy.simplify call (None or 0 for no deadline)
+            fallback_timeout (float): Deadline in seconds of the sympy.expand fallback after a timeout
+            comparison_mode (str): "symbolic" to compare with sympy.simplify, or "numeric" to compare
+                                   sampled values first and simplify only when sampling is inconclusive
+            sample_points (int): Number of random points of the numeric mode
+            seed (int): Seed of the random points, so verdicts do not depend on evaluation order
+            memo_size (int): Number of strings whose cleaned LaTeX and parsed expression are
+                             memoized (None or 0 to disable the memos)
         """
         super().__init__(tolerance=tolerance)
+        if comparison_mode not in COMPARISON_MODES:
+            raise ValueError(f"Unknown comparison mode {comparison_mode}; expected one of {COMPARISON_MODES}")
+        self.simplify_timeout = simplify_timeout
+        self.fallback_timeout = fallback_timeout
+        self.comparison_mode = comparison_mode
+        self.sample_points = sample_points
+        self.seed = seed
+
+        # Memoize the pure parsing steps per instance; sympy expressions are immutable,
+        # so cached ones are shared between comparisons
+        self.memos = {}
+        if memo_size:
+            self.memos['clean_latex'] = self.clean_latex = LRUMemo(self.clean_latex, memo_size)
+            self.memos['parse_expression'] = self.parse_expression = LRUMemo(self.parse_expression, memo_size)
+
+    def memo_stats(self):
+        """
+        Get the counters of the LaTeX memos.
+
+        Returns:
+            dict: Memo name to its hits, misses, size and maximum size
+        """
+        return {f"ExpressionEvaluator.{name}": memo.stats() for name, memo in self.memos.items()}
 
     def evaluate(self, expected, actual):
         """
@@ -451,14 +500,26 @@ class ExpressionEvaluator(BaseEvaluator):
 
         # Try standard symbolic comparison
         try:
-            result = self.compare_latex_expressions(expected, actual)
+            comparison = {}
+            result = self.compare_latex_expressions(expected, actual, comparison)
+
+            # A deadline that fired leaves the expressions less simplified than usual, so a
+            # negative verdict is undecided rather than incorrect
+            error = None
+            if not result and comparison.get('timeouts'):
+                logger.warning(f"Equivalence of {expected} and {actual} is undecided: the simplification deadline fired {comparison['timeouts']} times")
+                result = None
+                error = "Simplification deadline exceeded; equivalence undecided"
+
             return {
                 'is_correct': result,
                 'details': {
                     'evaluator': str(self),
                     'expected': expected,
                     'actual': actual,
-                    'error': None
+                    'error': error,
+                    # Simplification strategy and time, or None if no simplification was needed
+                    'comparison': comparison or None
                 }
             }
         except Exception as e:
@@ -631,13 +692,112 @@ class ExpressionEvaluator(BaseEvaluator):
         cleaned = self.clean_latex(latex_expr)
         return parse_latex(cleaned)
 
-    def compare_latex_expressions(self, latex1, latex2):
+    def simplify(self, expr, comparison=None):
+        """
+        Simplify a sympy expression under the simplify deadline.
+
+        If sympy.simplify runs past its deadline, it is cancelled and the expression is
+        expanded instead, under the shorter fallback deadline. If that times out too, the
+        expression is returned as parsed.
+
+        Args:
+            expr (sympy.Expr): Expression to simplify
+            comparison (dict, optional): Updated with the least thorough strategy used so far
+                ('strategy'), the total simplification time ('seconds'), the number of
+                timeouts ('timeouts') and whether the deadline was enforced ('deadline')
+
+        Returns:
+            sympy.Expr: The simplified expression
+        """
+        start_time = time.time()
+        timeouts = 0
+        try:
+            with time_limit(self.simplify_timeout) as enforced:
+                result = sympy.simplify(expr)
+            strategy = 'simplify'
+        except DeadlineExceeded:
+            timeouts += 1
+            logger.warning(f"sympy.simplify exceeded its {self.simplify_timeout} second deadline on {str(expr)[:200]}; expanding instead")
+            try:
+                with time_limit(self.fallback_timeout):
+                    result = sympy.expand(expr)
+                strategy = 'expand'
+            except DeadlineExceeded:
+                timeouts += 1
+                logger.warning(f"sympy.expand exceeded its {self.fallback_timeout} second deadline; comparing the unsimplified expression")
+                result = expr
+                strategy = 'none'
+
+        if comparison is not None:
+            previous = comparison.get('strategy', COMPARISON_STRATEGIES[0])
+            comparison['strategy'] = max(previous, strategy, key=COMPARISON_STRATEGIES.index)
+            comparison['seconds'] = round(comparison.get('seconds', 0.0) + (time.time() - start_time), 4)
+            comparison['timeouts'] = comparison.get('timeouts', 0) + timeouts
+            comparison['deadline'] = self.simplify_timeout if enforced else None
+        return result
+
+    def numeric_equal(self, expr1, expr2, comparison=None):
+        """
+        Compare two sympy expressions by evaluating them on random points.
+
+        Both expressions are lambdified to NumPy over their free symbols and evaluated on
+        the same batch of points. Each symbol is drawn log-uniformly from [0.1, 10], as most
+        quantities in the answers are positive. Points where either value is not finite are
+        dropped. The expressions are equal if they agree within the relative tolerance at
+        every remaining point.
+
+        Args:
+            expr1 (sympy.Expr): First expression
+            expr2 (sympy.Expr): Second expression
+            comparison (dict, optional): Updated with the strategy ('numeric'), the time spent
+                                         ('seconds') and the number of usable points ('points')
+
+        Returns:
+            bool: Whether the expressions are equal, or None if sampling is inconclusive
+                  (they cannot be lambdified or too few points give finite values)
+        """
+        start_time = time.time()
+        symbols = sorted(expr1.free_symbols | expr2.free_symbols, key=lambda symbol: symbol.name)
+
+        # Same points for every comparison of this evaluator
+        rng = np.random.default_rng(self.seed)
+        points = 10.0 ** rng.uniform(-1.0, 1.0, size=(len(symbols), self.sample_points))
+
+        try:
+            # doit() evaluates what parse_latex leaves unevaluated, e.g. log(x, E), which NumPy would misread
+            function1 = sympy.lambdify(symbols, expr1.doit(), modules="numpy")
+            function2 = sympy.lambdify(symbols, expr2.doit(), modules="numpy")
+            with np.errstate(all='ignore'):
+                values1 = np.broadcast_to(np.asarray(function1(*points), dtype=complex), (self.sample_points,))
+                values2 = np.broadcast_to(np.asarray(function2(*points), dtype=complex), (self.sample_points,))
+        except Exception as e:
+            logger.debug(f"Numeric comparison not possible for {expr1} and {expr2}: {e}")
+            return None
+
+        finite = np.isfinite(values1) & np.isfinite(values2)
+        usable = int(finite.sum())
+        if usable < max(4, self.sample_points // 4):
+            return None
+
+        values1, values2 = values1[finite], values2[finite]
+        scale = np.maximum(np.abs(values1), np.abs(values2))
+        verdict = bool(np.all(np.abs(values1 - values2) <= self.tolerance * scale + 1e-12))
+
+        if comparison is not None:
+            previous = comparison.get('strategy', COMPARISON_STRATEGIES[0])
+            comparison['strategy'] = max(previous, 'numeric', key=COMPARISON_STRATEGIES.index)
+            comparison['seconds'] = round(comparison.get('seconds', 0.0) + (time.time() - start_time), 4)
+            comparison['points'] = min(comparison.get('points', usable), usable)
+        return verdict
+
+    def compare_latex_expressions(self, latex1, latex2, comparison=None):
         """
         Compare two LaTeX expressions for mathematical equivalence.
 
         Args:
             latex1 (str): First LaTeX expression
             latex2 (str): Second LaTeX expression
+            comparison (dict, optional): Filled with the simplification strategy and time (see simplify)
 
         Returns:
             bool: True if expressions are equivalent
@@ -674,9 +834,15 @@ class ExpressionEvaluator(BaseEvaluator):
                 left2_expr = self.parse_expression(left2)
                 right2_expr = self.parse_expression(right2)
 
+                # In the numeric mode, sample the differences between sides first
+                if self.comparison_mode == "numeric":
+                    verdict = self.numeric_equal(left1_expr - right1_expr, left2_expr - right2_expr, comparison)
+                    if verdict is not None:
+                        return verdict
+
                 # Check if the differences between sides are equivalent
-                diff1 = sympy.simplify(left1_expr - right1_expr)
-                diff2 = sympy.simplify(left2_expr - right2_expr)
+                diff1 = self.simplify(left1_expr - right1_expr, comparison)
+                diff2 = self.simplify(left2_expr - right2_expr, comparison)
 
                 # If both differences simplify to zero, the equations are equivalent
                 return diff1 == diff2
@@ -691,15 +857,27 @@ class ExpressionEvaluator(BaseEvaluator):
 
             # Handle equality expressions
             if isinstance(expr1, sympy.Equality) and isinstance(expr2, sympy.Equality):
+                # In the numeric mode, sample both sides first
+                if self.comparison_mode == "numeric":
+                    verdicts = [self.numeric_equal(expr1.lhs, expr2.lhs, comparison), self.numeric_equal(expr1.rhs, expr2.rhs, comparison)]
+                    if None not in verdicts:
+                        return all(verdicts)
+
                 # Compare left sides and right sides separately
-                left_diff = sympy.simplify(expr1.lhs - expr2.lhs)
-                right_diff = sympy.simplify(expr1.rhs - expr2.rhs)
+                left_diff = self.simplify(expr1.lhs - expr2.lhs, comparison)
+                right_diff = self.simplify(expr1.rhs - expr2.rhs, comparison)
 
                 # If both sides are equivalent, the equations are equivalent
                 return left_diff == 0 and right_diff == 0
 
+            # In the numeric mode, sample both expressions first; simplification only breaks ties
+            if self.comparison_mode == "numeric":
+                verdict = self.numeric_equal(expr1, expr2, comparison)
+                if verdict is not None:
+                    return verdict
+
             # Check if the difference simplifies to zero
-            diff = sympy.simplify(expr1 - expr2)
+            diff = self.simplify(expr1 - expr2, comparison)
 
             # If the difference is a number, check if it's close to zero
             if diff.is_number:
@@ -6,10 +6,16 @@ import os
 import logging
 import json
 from openai import OpenAI
+from pydantic import BaseModel
 from .base_evaluator import BaseEvaluator
 
 logger = logging.getLogger(__name__)
 
+class AnswerResponse(BaseModel):
+    """Structured output of the judge model."""
+    is_correct: bool
+    explanation: str
+
 class LLMEvaluator(BaseEvaluator):
     """
     Evaluator that uses an LLM to judge if answers are equivalent.
@@ -101,11 +107,6 @@ class LLMEvaluator(BaseEvaluator):
 #   "explanation": "Your detailed explanation here"
 # }}
 # """
-        from pydantic import BaseModel
-
-        class AnswerResponse(BaseModel):
-            is_correct: bool
-            explanation: str
 
 #         system_prompt = f"""
 # You are an expert physics teacher evaluating student answers.
@@ -5,6 +5,7 @@ MCQ evaluator for evaluating multiple-choice question responses.
 import re
 import logging
 from .base_evaluator import BaseEvaluator
+from src.type.MCQ import ANSWER_PATTERNS
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +15,9 @@ class MCQEvaluator(BaseEvaluator):
     Extracts answers from model responses and compares them to expected answers.
     """
 
+    # Answer patterns shared with the MCQ question type, compiled once
+    COMPILED_PATTERNS = [re.compile(pattern) for pattern in ANSWER_PATTERNS]
+
     def __init__(self, tolerance=0.05):
         """
         Initialize the MCQ evaluator.
@@ -49,20 +53,12 @@ class MCQEvaluator(BaseEvaluator):
                 logger.error(f"Failed to convert response to string: {e}")
                 return None
 
-        # Regex patterns to extract MCQ answers
-        patterns = [
-            r"[A,a][N,n][S,s][W,w][E,e][R,r]:?\s*[\*\[\{]*:?\s*([A-Da-d])[\*\[\}]*",  # Matches 'Answer: A', 'Answer: *A*'
-            r"\\boxed\{([A-Da-d])\}",  # Matches '\boxed{C}'
-            r"\\boxed\{\{([A-Da-d])\}\}",# \\boxed{{A}}
-            r"(\\)?boxed\{\{?\s*([A-Da-d])\s*\}?\}",
-            r"[O,o][P,p][T,t][I,i][O,o][N,n][S,s]?:?\s*[\*\[\{]*:?\s*([A-Da-d])[\*\[\}]*",  # Matches 'Option: B'
-            r"\*\*[F,f]inal\s*[A,a]nswer\*\*:?\s*\\\[\s*\\boxed\{([A-Da-d])\}\s*\\\]",  # Matches '**Final Answer**: \[ \boxed{A} \]'
-            r"\*\*Final Answer\*\*:\s*\[\s*(?:\\?boxed\{)?\s*([A-Da-d])\s*\}?\s*\]"
-        ]
+        # Regex patterns to extract MCQ answers (shared with the MCQ question type)
+        patterns = self.COMPILED_PATTERNS
 
         for i, pattern in enumerate(patterns):
             try:
-                matches = list(re.finditer(pattern, response))
+                matches = list(pattern.finditer(response))
                 if matches:
                     last_match = matches[-1]
                     answer = last_match.group(1).strip()
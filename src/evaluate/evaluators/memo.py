@@ -0,0 +1,110 @@
+"""
+Bounded LRU memos for the pure LaTeX cleaning and parsing steps of the evaluators.
+
+The same strings are cleaned and parsed over and over during an evaluation run: the
+expected answer of a question once per response to it, and identical boxed answers of
+different responses. The evaluators wrap these steps in an LRUMemo per instance, so each
+distinct string is processed once while it stays in the cache.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+
+# Default number of entries of each memo
+DEFAULT_MEMO_SIZE = 4096
+
+class LRUMemo:
+    """
+    Least-recently-used memo of a pure function of one hashable argument.
+
+    Exceptions are cached like results, since parsing the same string fails the same way
+    every time. Results that can be modified in place (e.g. pint quantities) are copied on
+    every call when copy_result is set, so callers never share a cached object.
+    """
+
+    def __init__(self, function, maxsize=DEFAULT_MEMO_SIZE, copy_result=False):
+        """
+        Initialize the memo.
+
+        Args:
+            function (callable): Pure function of one argument to memoize
+            maxsize (int): Maximum number of cached arguments
+            copy_result (bool): Whether to return a copy of the cached result
+        """
+        self.function = function
+        self.maxsize = maxsize
+        self.copy_result = copy_result
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, argument):
+        try:
+            hash(argument)
+        except TypeError:
+            # Unhashable arguments are not cached
+            return self.function(argument)
+
+        with self._lock:
+            entry = self.entries.get(argument)
+            if entry is not None:
+                self.entries.move_to_end(argument)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            try:
+                entry = (False, self.function(argument))
+            except Exception as e:
+                entry = (True, e)
+            with self._lock:
+                self.entries[argument] = entry
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+        failed, value = entry
+        if failed:
+            raise value.with_traceback(None)
+        return copy.copy(value) if self.copy_result else value
+
+    def stats(self):
+        """
+        Get the counters of the memo.
+
+        Returns:
+            dict: Hits, misses, current size and maximum size
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+def memo_stats_delta(before, after):
+    """
+    Get the hits and misses of memos between two snapshots of their stats.
+
+    Args:
+        before (dict): Memo name to stats, as returned by EvaluatorPool.memo_stats
+        after (dict): Later snapshot of the same memos
+
+    Returns:
+        dict: Memo name to {'hits', 'misses'} counted between the snapshots
+    """
+    empty = {'hits': 0, 'misses': 0}
+    return {
+        name: {key: stats[key] - before.get(name, empty)[key] for key in ('hits', 'misses')}
+        for name, stats in after.items()
+    }
+
+def add_memo_stats(total, stats):
+    """
+    Add hit and miss counts of memos into a running total.
+
+    Args:
+        total (dict): Memo name to {'hits', 'misses'}; updated in place
+        stats (dict): Memo name to counts to add
+    """
+    for name, counts in stats.items():
+        entry = total.setdefault(name, {'hits': 0, 'misses': 0})
+        entry['hits'] += counts['hits']
+        entry['misses'] += counts['misses']
@@ -0,0 +1,110 @@
+"""
+Pool of configured evaluators shared by all responses of an evaluation run.
+"""
+
+import logging
+from .quantity_evaluator import QuantityEvaluator
+from .expression_evaluator import ExpressionEvaluator, DEFAULT_SIMPLIFY_TIMEOUT
+from .llm_evaluator import LLMEvaluator
+from .mcq_evaluator import MCQEvaluator
+
+logger = logging.getLogger(__name__)
+
+class EvaluatorPool:
+    """
+    Evaluators built once per run and reused for every response.
+
+    The rule-based evaluators are created up front. The LLM evaluator, which holds an
+    OpenAI client, is only created the first time it is needed, so runs without
+    --enable-llm never build a client.
+    """
+
+    # Pools of this process, keyed by configuration (see for_process)
+    _process_pools = {}
+
+    def __init__(self, tolerance=0.05, disable_quantity=False, disable_expression=False, llm_model="gpt-4o-mini", simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT,
+                 expression_mode="symbolic"):
+        """
+        Initialize the pool.
+
+        Args:
+            tolerance (float): Tolerance for numerical comparisons
+            disable_quantity (bool): Whether to leave out the QuantityEvaluator
+            disable_expression (bool): Whether to leave out the ExpressionEvaluator
+            llm_model (str): Model of the LLM-as-Judge evaluator
+            simplify_timeout (float): Deadline in seconds of each sympy.simplify call of the ExpressionEvaluator
+            expression_mode (str): Comparison mode of the ExpressionEvaluator ("symbolic" or "numeric")
+        """
+        self.tolerance = tolerance
+        self.llm_model = llm_model
+
+        self.quantity = None if disable_quantity else QuantityEvaluator(tolerance=tolerance)
+        self.expression = None if disable_expression else ExpressionEvaluator(tolerance=tolerance, simplify_timeout=simplify_timeout,
+                                                                                 comparison_mode=expression_mode)
+        self.mcq = MCQEvaluator(tolerance=tolerance)
+        self._llm = None
+
+    @classmethod
+    def for_process(cls, tolerance=0.05, disable_quantity=False, disable_expression=False, llm_model="gpt-4o-mini", simplify_timeout=DEFAULT_SIMPLIFY_TIMEOUT,
+                    expression_mode="symbolic"):
+        """
+        Get the pool of this process for a configuration, creating it on first use.
+
+        Used where a pool cannot be passed in, e.g. inside Ray tasks, so that each worker
+        process builds its evaluators and client once instead of once per task.
+
+        Args:
+            tolerance (float): Tolerance for numerical comparisons
+            disable_quantity (bool): Whether to leave out the QuantityEvaluator
+            disable_expression (bool): Whether to leave out the ExpressionEvaluator
+            llm_model (str): Model of the LLM-as-Judge evaluator
+            simplify_timeout (float): Deadline in seconds of each sympy.simplify call of the ExpressionEvaluator
+            expression_mode (str): Comparison mode of the ExpressionEvaluator ("symbolic" or "numeric")
+
+        Returns:
+            EvaluatorPool: The shared pool
+        """
+        key = (tolerance, disable_quantity, disable_expression, llm_model, simplify_timeout, expression_mode)
+        if key not in cls._process_pools:
+            cls._process_pools[key] = cls(tolerance, disable_quantity, disable_expression, llm_model, simplify_timeout, expression_mode)
+        return cls._process_pools[key]
+
+    @property
+    def llm(self):
+        """The LLM-as-Judge evaluator, created with its OpenAI client on first use."""
+        if self._llm is None:
+            self._llm = LLMEvaluator(model_name=self.llm_model, tolerance=self.tolerance)
+            logger.info(f"Created LLM evaluator with model {self.llm_model}")
+        return self._llm
+
+    def memo_stats(self):
+        """
+        Get the counters of the LaTeX memos of the rule-based evaluators.
+
+        Returns:
+            dict: Memo name (e.g. "QuantityEvaluator.clean_latex") to its hits, misses, size and maximum size
+        """
+        stats = {}
+        for evaluator in (self.quantity, self.expression):
+            if evaluator is not None:
+                stats.update(evaluator.memo_stats())
+        return stats
+
+    def get_evaluators(self, question_type="OEQ", use_llm=False):
+        """
+        Get the evaluators to try, in order, for a question type.
+
+        Args:
+            question_type (str): Type of question (OEQ or MCQ)
+            use_llm (bool): Whether to add the LLM-as-Judge evaluator (OEQ only)
+
+        Returns:
+            list: Evaluator instances
+        """
+        if question_type == "MCQ":
+            return [self.mcq]
+
+        evaluators = [evaluator for evaluator in (self.quantity, self.expression) if evaluator is not None]
+        if use_llm:
+            evaluators.append(self.llm)
+        return evaluators
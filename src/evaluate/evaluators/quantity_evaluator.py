@@ -6,6 +6,7 @@ import re
 import logging
 from pint import UnitRegistry
 from .base_evaluator import BaseEvaluator
+from .memo import LRUMemo, DEFAULT_MEMO_SIZE
 
 logger = logging.getLogger(__name__)
 # Enable autoconvert_offset_to_baseunit to handle temperature units properly
@@ -45,15 +46,33 @@ class QuantityEvaluator(BaseEvaluator):
     - Handles LaTeX spacing commands (e.g., 495.75\\\\ \\text{g}, 10\\,\\text{m})
     """
 
-    def __init__(self, tolerance=0.05):
+    def __init__(self, tolerance=0.05, memo_size=DEFAULT_MEMO_SIZE):
         """
         Initialize the quantity evaluator.
 
         Args:
             tolerance (float): Relative tolerance for numerical comparisons
+            memo_size (int): Number of strings whose cleaned LaTeX and parsed quantity are
+                             memoized (None or 0 to disable the memos)
         """
         super().__init__(tolerance=tolerance)
 
+        # Memoize the pure parsing steps per instance; quantities are copied on return
+        # because pint quantities can be converted in place
+        self.memos = {}
+        if memo_size:
+            self.memos['clean_latex'] = self.clean_latex = LRUMemo(self.clean_latex, memo_size)
+            self.memos['latex_to_quantity'] = self.latex_to_quantity = LRUMemo(self.latex_to_quantity, memo_size, copy_result=True)
+
+    def memo_stats(self):
+        """
+        Get the counters of the LaTeX memos.
+
+        Returns:
+            dict: Memo name to its hits, misses, size and maximum size
+        """
+        return {f"QuantityEvaluator.{name}": memo.stats() for name, memo in self.memos.items()}
+
     def clean_latex(self, latex_expr):
         """
         Clean LaTeX expression by removing invalid patterns.
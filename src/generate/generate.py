@@ -9,7 +9,11 @@ import time
 from statistics import mean, median
 
 # Import the model registry
-from src.models import get_model
+from src.dataset import read_jsonl
+from src.models import get_model, APIBaseModel
+from src.models.response_cache import ResponseCache
+from src.models.rate_limiter import configure_rate_limits
+from src.generate.journal import ResponseJournal, serialize_response
 
 # Configure root logger to capture logs from all modules
 logging.basicConfig(
@@ -25,55 +29,36 @@ logger = logging.getLogger(__name__)
 
 # File handler will be added in the main function after the output directory is created
 
-def read_jsonl(file_path):
-    """Read data from a JSONL file."""
-    data = []
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                data.append(json.loads(line))
-        logger.info(f"Successfully loaded {len(data)} problems from {file_path}")
-        return data
-    except Exception as e:
-        logger.error(f"Error loading data from {file_path}: {e}")
-        raise
-
 def write_jsonl(data, file_path):
     """Write data to a JSONL file."""
     try:
-        # Custom JSON encoder to handle non-serializable objects
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                # Convert non-serializable objects to their string representation
-                try:
-                    return super().default(obj)
-                except TypeError:
-                    return str(obj)
-
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
         with open(file_path, 'w', encoding='utf-8') as f:
             for item in data:
-                try:
-                    # Try to serialize with the custom encoder
-                    f.write(json.dumps(item, cls=CustomJSONEncoder) + '\n')
-                except Exception as e:
-                    # If serialization still fails, log the error and create a simplified version
-                    logger.error(f"Error serializing item: {e}")
-                    # Create a simplified version with just the essential fields
-                    simplified_item = {
-                        'id': item.get('id', 'unknown'),
-                        'question': item.get('question', ''),
-                        'error': f"Serialization error: {str(e)}",
-                        'model': item.get('model', ''),
-                        'base': item.get('base', '')
-                    }
-                    f.write(json.dumps(simplified_item) + '\n')
+                # Non-serializable objects are converted to strings (or simplified on failure)
+                f.write(serialize_response(item))
 
         logger.info(f"Successfully wrote {len(data)} items to {file_path}")
     except Exception as e:
         logger.error(f"Error writing data to {file_path}: {e}")
         raise
 
+def format_duration(seconds):
+    """
+    Format a duration in seconds for logging.
+
+    Args:
+        seconds (float): Duration in seconds
+
+    Returns:
+        str: The duration in seconds, minutes, or hours
+    """
+    if seconds > 3600:
+        return f"{seconds/3600:.2f} hours"
+    if seconds > 60:
+        return f"{seconds/60:.2f} minutes"
+    return f"{seconds:.2f} seconds"
+
 def get_latest_log(logs_dir):
     """
     Get the path to the latest log file in the logs directory.
@@ -117,11 +102,60 @@ def update_metadata(metadata, metadata_path):
         logger.error(f"Error updating metadata: {e}")
         # Don't raise the exception to avoid interrupting the main process
 
-def process_problems(problems, model_name, output_path, base_name, question_type="OEQ", dataset_name="PAC", retries=0, parallel_size=4, max_tokens=2000, no_fallback=False, metadata_path=None, logs_dir=None, worker_logging=True, gpu=None):
+def build_response_record(problem_id, question, result, model_name, base_name):
+    """
+    Build the response record that is saved for a single problem.
+
+    Args:
+        problem_id (str): ID of the problem
+        question (str or dict): The question that was sent to the model
+        result (dict): The result returned by the model
+        model_name (str): Name of the model
+        base_name (str): Name of the base model
+
+    Returns:
+        dict: The response record (contains an 'error' field if the model returned an error)
+    """
+    # Check if there's an error in the result
+    if 'error' in result:
+        # Create response with error information
+        record = {
+            'id': problem_id,
+            'question': question,
+            'error': result['error'],
+            'model': model_name,
+            'base': base_name,
+            'usage': result.get('usage', {})
+        }
+        # Add response content if available
+        if 'content' in result:
+            record['response'] = result['content']
+    else:
+        # Create response dictionary without full_response
+        record = {
+            'id': problem_id,
+            'question': question,
+            'response': result.get('content', "Error: No content returned"),
+            'usage': result.get('usage', {}),
+            'model': model_name,
+            'base': base_name
+        }
+
+    # Add reasoning_content if it exists
+    if 'reasoning_content' in result:
+        record['reasoning_content'] = result['reasoning_content']
+
+    return record
+
+def process_problems(problems, model_name, output_path, base_name, question_type="OEQ", dataset_name="PAC", retries=0, parallel_size=4, max_tokens=2000, no_fallback=False, metadata_path=None, logs_dir=None, worker_logging=True, gpu=None, backend="ray", task_timeout=None, cache_dir=None, cache_mode="off", cache_max_size_mb=None, response_cache=None, rpm=None, tpm=None, max_concurrency=None, latency_factor=None, length_bucketing=True, local_engine="static", prompt_store_dir=None, token_budget=None, token_budget_state=None, early_stop=False, prefix_reuse=True, model=None, progress_callback=None):
     """
     Process all problems and save the responses to a JSONL file.
     Always resumes from previous run by default.
 
+    Finished responses are appended to an append-only journal next to output_path and
+    the canonical response file is compacted from it at the end of the run (or when the
+    run is terminated early).
+
     Args:
         problems (list): List of problem dictionaries
         model_name (str): Name of the model to use
@@ -137,9 +171,34 @@ def process_problems(problems, model_name, output_path, base_name, question_type
         logs_dir (str, optional): Directory to save log files. If provided, logs will be saved to this directory.
         worker_logging (bool): Whether to enable logging for the worker processes
         gpu (str, optional): GPU device IDs to use (e.g., "0" or "0,1,2,3"). If None, use all available GPUs.
+        backend (str): Execution backend for API models ("ray" or "asyncio")
+        task_timeout (float, optional): Per-question deadline in seconds for API models. None means no deadline.
+        cache_dir (str, optional): Directory of the shared API response cache. None disables the cache.
+        cache_mode (str): "readwrite", "readonly" or "off"
+        cache_max_size_mb (float, optional): Size limit of the response cache; least recently used entries are evicted
+        response_cache (ResponseCache, optional): An already opened response cache, shared with other runs in the same
+            process so that they coalesce identical in-flight prompts and respect one size limit. Overrides cache_dir,
+            cache_mode and cache_max_size_mb.
+        rpm (float, optional): Requests-per-minute budget shared by all API models of this base
+        tpm (float, optional): Tokens-per-minute budget shared by all API models of this base
+        max_concurrency (int, optional): Upper bound of concurrent requests to this base, shared with other runs
+            in the same process. Defaults to parallel_size.
+        latency_factor (float, optional): Also lower the concurrency when the latency per generated token rises above
+            this multiple of its baseline. None backs off on rate limits only.
+        length_bucketing (bool): Let local models batch questions of similar prompt length together
+        local_engine (str): Generation engine of local models: "static" batches or "continuous" batching
+        prompt_store_dir (str, optional): Root directory of the local models' pre-tokenized prompt stores. None tokenizes prompts on the fly.
+        token_budget (int, optional): Initial token ceiling of local-model batches (batch size x (longest prompt + max_tokens))
+        token_budget_state (str, optional): JSON file the local model's learned token ceiling is loaded from and saved to
+        early_stop (bool): Let local models stop a sequence once it has emitted a completed final answer (MCQ)
+        prefix_reuse (bool): Let local models prefill the prompt prefix shared by all questions once and reuse its KV cache
+        model (BaseModel, optional): Already initialized model to generate with instead of creating one, so that a
+            persistent worker can serve several datasets with the same loaded weights
+        progress_callback (callable, optional): Called with the current statistics after every batch or window
 
     Returns:
-        tuple: (all_responses, metadata_dict) where metadata_dict contains statistics about the processing
+        tuple: (all_responses, metadata_dict) where all_responses contains the responses generated in this run
+            and metadata_dict contains statistics about the processing
     """
     # Get the model implementation
     ModelClass = get_model(model_name, base_name)
@@ -155,587 +214,1030 @@ def process_problems(problems, model_name, output_path, base_name, question_type
         model_params["gpu"] = gpu
         logger.info(f"Using GPU(s): {gpu}")
 
-    # Initialize the model with the parameters
-    model = ModelClass(**model_params)
+    # Select the execution backend for API models before the model is created
+    if issubclass(ModelClass, APIBaseModel):
+        APIBaseModel.set_backend(backend)
+
+    # Select the generation engine for local models before the model is created
+    if base_name == "huggingface":
+        from src.models.huggingface_base import HuggingFaceBaseModel
+        HuggingFaceBaseModel.set_engine(local_engine)
+
+    # Initialize the model with the parameters, unless the caller keeps one loaded across datasets
+    if model is None:
+        model = ModelClass(**model_params)
+    elif hasattr(model, 'reset_run_stats'):
+        model.reset_run_stats()
+
+    # Budgets of the provider's shared rate limiter; concurrency adapts below parallel_size on 429s
+    if isinstance(model, APIBaseModel):
+        configure_rate_limits(model.rate_limit_provider, rpm=rpm, tpm=tpm, max_concurrency=max_concurrency or parallel_size, latency_factor=latency_factor)
+
+    # Answer repeated prompts from the shared response cache (API models only). A cache passed
+    # in by the caller is used as is; otherwise one is opened for this run.
+    shared_cache = response_cache is not None
+    if not isinstance(model, APIBaseModel):
+        response_cache = None
+    elif response_cache is None and cache_dir and cache_mode != "off":
+        response_cache = ResponseCache(cache_dir, max_size_mb=cache_max_size_mb, read_only=(cache_mode == "readonly"))
+    if response_cache is not None:
+        model.set_response_cache(response_cache, base_name)
 
     logger.info(f"Using model: {model_name} with base: {base_name}, parallel size: {parallel_size}, max_tokens: {max_tokens}")
     logger.info(f"Retries: {retries}, Worker logging: {worker_logging}")
 
-    # Always check for existing responses to resume from
-    existing_responses = {}
-
-    if os.path.exists(output_path):
-        logger.info(f"Checking for existing responses in {output_path}")
-        try:
-            existing_data = read_jsonl(output_path)
-            successful_count = 0
-            error_count = 0
-
-            for item in existing_data:
-                if 'id' in item:
-                    if 'error' in item:
-                        # Skip items with errors so they can be reprocessed
-                        error_count += 1
-                        logger.info(f"Found error in item {item['id']}, will reprocess")
-                        continue
-                    elif 'response' in item:
-                        # Only store successful responses
-                        existing_responses[item['id']] = item
-                        successful_count += 1
-
-            logger.info(f"Loaded {successful_count} successful responses, found {error_count} errors that will be reprocessed")
-        except Exception as e:
-            logger.error(f"Error loading existing responses: {e}")
-            logger.info("Will start from scratch")
-            existing_responses = {}
-
-    # Prepare questions and problem IDs
-    questions_data = []
-    problem_ids = []
-    original_indices = []
-
-    print("existing_responses", existing_responses.keys())
-    for idx, problem in enumerate(problems):
-        problem_id = problem.get('id', f"problem_{idx}")
-        # print("problem_id", problem_id)
-        # print("problem_id in existing_responses", problem_id in existing_responses)
-        # Skip problems that have already been processed successfully
-        if problem_id in existing_responses:
-            logger.info(f"Skipping problem {problem_id} as it was already processed successfully")
-            continue
-
-        # For MCQ questions, pass the full problem object to include options and knowledge
-        if question_type == "MCQ":
-            questions_data.append(problem)
-        else:
-            # For other question types, just extract the question text
-            question = problem.get('question', problem.get('problem', ''))
-            questions_data.append(question)
-
-        problem_ids.append(problem_id)
-        original_indices.append(idx)
-
-    if len(questions_data) == 0:
-        logger.info("All problems have already been processed. Nothing to do.")
-        return list(existing_responses.values())
-
-    logger.info(f"Processing {len(questions_data)} problems in batches of {parallel_size}")
-
-    # Initialize responses list with existing responses
-    all_responses = list(existing_responses.values())
-
-    # Define total_questions for statistics
-    total_questions = len(problems)
-
-    # Function to calculate statistics
-    def calculate_statistics():
-        successful_count = sum(1 for resp in all_responses if 'id' in resp and 'response' in resp and 'error' not in resp)
-        error_count = sum(1 for resp in all_responses if 'id' in resp and 'error' in resp)
-        missing_count = total_questions - len(all_responses)
-        completion_percentage = round((successful_count / total_questions) * 100, 2) if total_questions > 0 else 0
-
-        return {
-            'total_questions': total_questions,
-            'successful_responses': successful_count,
-            'error_responses': error_count,
-            'missing_questions': missing_count,
-            'completion_percentage': completion_percentage,
-            'processed_questions': len(questions_data),
-            'remaining_questions': len(questions_data) - (len(all_responses) - len(existing_responses.values()))
-        }
-
-    # Get model details
-    model_details = {
-        'max_tokens': max_tokens
-    }
-
-    # Add GPU configuration to model details if applicable
-    if base_name == "huggingface" and gpu is not None:
-        model_details['gpu'] = gpu
+    # The response file is written in dataset order, whatever order the responses finish in
+    dataset_order = [problem.get('id', f"problem_{idx}") for idx, problem in enumerate(problems)]
 
-    # Add model name if available
-    if hasattr(model, 'model_name'):
-        model_details['model_name'] = model.model_name
+    # Always check for existing responses to resume from.
+    # Only the journal's small id index is read here; the responses themselves stay on disk.
+    journal = ResponseJournal(output_path)
+    try:
+        existing_ids = journal.successful_ids()
+        successful_count, error_count = journal.count()
+        logger.info(f"Loaded {successful_count} successful responses, found {error_count} errors that will be reprocessed")
+
+        # Prepare questions and problem IDs
+        questions_data = []
+        problem_ids = []
+        original_indices = []
+
+        logger.debug(f"Existing response ids: {list(existing_ids)}")
+        for idx, problem in enumerate(problems):
+            problem_id = problem.get('id', f"problem_{idx}")
+            # Skip problems that have already been processed successfully
+            if problem_id in existing_ids:
+                logger.info(f"Skipping problem {problem_id} as it was already processed successfully")
+                continue
+
+            # For MCQ questions, pass the full problem object to include options and knowledge
+            if question_type == "MCQ":
+                questions_data.append(problem)
+            else:
+                # For other question types, just extract the question text
+                question = problem.get('question', problem.get('problem', ''))
+                questions_data.append(question)
+
+            problem_ids.append(problem_id)
+            original_indices.append(idx)
+
+        if len(questions_data) == 0:
+            logger.info("All problems have already been processed. Nothing to do.")
+            return [], None
+
+        logger.info(f"Processing {len(questions_data)} problems with parallel size {parallel_size}")
+
+        # Responses generated in this run (earlier responses are kept in the journal)
+        all_responses = []
+
+        # Define total_questions for statistics
+        total_questions = len(problems)
+
+        # Function to calculate statistics
+        def calculate_statistics():
+            successful_count, error_count = journal.count()
+            missing_count = total_questions - successful_count - error_count
+            completion_percentage = round((successful_count / total_questions) * 100, 2) if total_questions > 0 else 0
+
+            return {
+                'total_questions': total_questions,
+                'successful_responses': successful_count,
+                'error_responses': error_count,
+                'missing_questions': missing_count,
+                'completion_percentage': completion_percentage,
+                'processed_questions': len(questions_data),
+                'remaining_questions': len(questions_data) - len(all_responses)
+            }
+
+        # Get model details
+        model_details = {
+            'max_tokens': max_tokens
+        }
 
-    # Get log directory information
-    logs_dir = os.path.join(os.path.dirname(output_path), "logs")
-    os.makedirs(logs_dir, exist_ok=True)
+        # Add GPU configuration to model details if applicable
+        if base_name == "huggingface" and gpu is not None:
+            model_details['gpu'] = gpu
+
+        # Add model name if available
+        if hasattr(model, 'model_name'):
+            model_details['model_name'] = model.model_name
+
+        # Get log directory information
+        logs_dir = os.path.join(os.path.dirname(output_path), "logs")
+        os.makedirs(logs_dir, exist_ok=True)
+
+        # Get current log file
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        current_log_file = os.path.join(logs_dir, f"generation_{timestamp}.log")
+
+        # Create initial metadata dictionary
+        metadata = {
+            'model': {
+                'name': model_name,
+                'base': base_name,
+                'details': model_details
+            },
+            'dataset': {
+                'name': dataset_name,
+                'type': question_type,
+                'total_questions': total_questions
+            },
+            'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'statistics': calculate_statistics(),
+            'parameters': {
+                'retries': retries,
+                'parallel_size': parallel_size,
+                'max_tokens': max_tokens,
+                'no_fallback': no_fallback,
+                'worker_logging': worker_logging,
+                'async_engine': getattr(model, 'use_async', False),
+                'task_timeout': task_timeout,
+                'max_concurrency': max_concurrency or parallel_size,
+                'local_engine': local_engine if base_name == "huggingface" else None
+            },
+            'logs': {
+                'directory': logs_dir,
+                'current_log': current_log_file
+            }
+        }
 
-    # Get current log file
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    current_log_file = os.path.join(logs_dir, f"generation_{timestamp}.log")
+        # Write initial metadata if path is provided
+        if metadata_path:
+            update_metadata(metadata, metadata_path)
+            logger.info(f"Initial metadata written to {metadata_path}")
+
+        # Calculate batch size and number of batches (the batch plan of local models may differ)
+        batch_size = parallel_size
+        num_batches = (len(questions_data) + batch_size - 1) // batch_size
+
+        # Counter for consecutive failed batches
+        consecutive_failed_batches = 0
+        max_consecutive_failures = 4  # Terminate after 4 consecutive batch failures
+
+        # Track batch processing times for estimating remaining time
+        batch_times = []
+
+        # Local models stop MCQ sequences right after their final answer instead of running to max_tokens
+        if hasattr(model, 'early_stop'):
+            model.early_stop = early_stop
+            metadata['parameters']['early_stop'] = early_stop
+
+        # Local models prefill the system message shared by all prompts once and reuse its KV cache,
+        # unless the model has already failed to use a prefix cache in an earlier job
+        if hasattr(model, 'prefix_reuse'):
+            model.prefix_reuse = prefix_reuse and getattr(model, 'prefix_reuse_supported', True)
+            metadata['parameters']['prefix_reuse'] = model.prefix_reuse
+
+        # Local models pack batches against a token ceiling learned from earlier out-of-memory errors
+        if hasattr(model, 'configure_token_budget'):
+            model.configure_token_budget(token_budget, token_budget_state)
+
+        # Local models tokenize each prompt once per tokenizer, question type and dataset, and read it back afterwards
+        if prompt_store_dir and hasattr(model, 'attach_prompt_store'):
+            try:
+                model.attach_prompt_store(prompt_store_dir, question_type, dataset_name)
+                metadata['prompt_store'] = model.prepare_prompts(questions_data, question_type)
+            except Exception as e:
+                logger.warning(f"Could not use the prompt store, tokenizing prompts on the fly: {e}")
+                model.prompt_store = None
+
+        # API models and the continuous local engine stream results in completion order; static local batches do not
+        use_sliding_window = hasattr(model, 'generate_responses_stream') and getattr(model, 'streams_responses', True)
+        metadata['parameters']['sliding_window'] = use_sliding_window
+
+        if use_sliding_window:
+            # Keep up to parallel_size questions in flight: a new question is started as soon as any
+            # request finishes, and every result is committed to the journal as it arrives.
+            # Each group of parallel_size completions is treated as one "batch" for the failure
+            # counter, metadata updates, and timing statistics.
+            logger.info(f"Processing {len(questions_data)} problems with a sliding window of {parallel_size} in-flight requests")
+
+            completed_count = 0
+            window_idx = 0
+            window_responses = []
+            window_start_time = time.time()
+
+            # Indices of the questions whose result came out of the stream, and the error that ended it early
+            answered = set()
+            stream_error = None
+
+            stream = model.generate_responses_stream(questions_data, question_type, retries, worker_logging, task_timeout=task_timeout)
+            try:
+                while True:
+                    try:
+                        idx, result = next(stream)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        # Keep the results already committed and deal with the remaining questions below
+                        stream_error = e
+                        break
 
-    # Create initial metadata dictionary
-    metadata = {
-        'model': {
-            'name': model_name,
-            'base': base_name,
-            'details': model_details
-        },
-        'dataset': {
-            'name': dataset_name,
-            'type': question_type,
-            'total_questions': total_questions
-        },
-        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'statistics': calculate_statistics(),
-        'parameters': {
-            'retries': retries,
-            'parallel_size': parallel_size,
-            'max_tokens': max_tokens,
-            'no_fallback': no_fallback,
-            'worker_logging': worker_logging
-        },
-        'logs': {
-            'directory': logs_dir,
-            'current_log': current_log_file
-        }
-    }
+                    answered.add(idx)
+                    problem_id = problem_ids[idx]
+                    question = questions_data[idx]
+                    completed_count += 1
 
-    # Write initial metadata if path is provided
-    if metadata_path:
-        update_metadata(metadata, metadata_path)
-        logger.info(f"Initial metadata written to {metadata_path}")
-
-    # Calculate batch size and number of batches
-    batch_size = parallel_size
-    num_batches = (len(questions_data) + batch_size - 1) // batch_size
-
-    # Counter for consecutive failed batches
-    consecutive_failed_batches = 0
-    max_consecutive_failures = 4  # Terminate after 4 consecutive batch failures
-
-    # Track batch processing times for estimating remaining time
-    batch_times = []
-
-    # Process questions in batches
-    for batch_idx in range(num_batches):
-        start_idx = batch_idx * batch_size
-        end_idx = min(start_idx + batch_size, len(questions_data))
-
-        batch_questions = questions_data[start_idx:end_idx]
-        batch_problem_ids = problem_ids[start_idx:end_idx]
-
-        logger.info(f"Processing batch {batch_idx + 1}/{num_batches} with {len(batch_questions)} questions")
-
-        # Start timing the batch
-        batch_start_time = time.time()
-
-        try:
-            # Process this batch
-            batch_results = model.generate_responses_batch(batch_questions, question_type, retries, worker_logging)
-
-            # Calculate batch processing time
-            batch_end_time = time.time()
-            batch_duration = batch_end_time - batch_start_time
-            batch_times.append(batch_duration)
-
-            # Calculate average batch time and estimate remaining time
-            avg_batch_time = mean(batch_times) if batch_times else 0
-            remaining_batches = num_batches - (batch_idx + 1)
-            estimated_remaining_time = avg_batch_time * remaining_batches
-
-            # Format times for logging
-            batch_duration_str = f"{batch_duration:.2f} seconds"
-            if batch_duration > 60:
-                batch_duration_str = f"{batch_duration/60:.2f} minutes"
-
-            remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
-            if estimated_remaining_time > 60:
-                remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
-                if estimated_remaining_time > 3600:
-                    remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
-
-            logger.info(f"Batch {batch_idx + 1} completed in {batch_duration_str}, got {len(batch_results)} results")
-            if remaining_batches > 0:
-                logger.info(f"Estimated time for remaining {remaining_batches} batches: {remaining_time_str}")
-
-            # Check if the number of results matches the number of questions in this batch
-            if len(batch_results) != len(batch_questions):
-                logger.warning(f"Number of results ({len(batch_results)}) doesn't match number of questions in batch ({len(batch_questions)})")
-                # Pad the results list if it's shorter than the questions list
-                if len(batch_results) < len(batch_questions):
-                    logger.warning(f"Padding results list with {len(batch_questions) - len(batch_results)} error placeholders")
-                    for _ in range(len(batch_questions) - len(batch_results)):
-                        batch_results.append({
-                            'content': "Error: No result returned",
-                            'usage': {},
-                            'error': "No result returned"  # Add explicit error field
-                        })
-                # Truncate the results list if it's longer than the questions list
-                elif len(batch_results) > len(batch_questions):
-                    logger.warning(f"Truncating results list from {len(batch_results)} to {len(batch_questions)}")
-                    batch_results = batch_results[:len(batch_questions)]
-
-            # Process the results for this batch
-            batch_responses = []
-            for idx, (problem_id, question, result) in enumerate(zip(batch_problem_ids, batch_questions, batch_results)):
-                try:
-                    # Check if there's an error in the result
-                    if 'error' in result:
-                        # Create response with error information
-                        error_response = {
+                    try:
+                        response = build_response_record(problem_id, question, result, model_name, base_name)
+                        if 'error' in response:
+                            logger.info(f"Processed error result for problem {problem_id} ({completed_count}/{len(questions_data)})")
+                        else:
+                            logger.info(f"Generated response for problem {problem_id} ({completed_count}/{len(questions_data)})")
+                    except Exception as e:
+                        logger.error(f"Error processing result for problem {problem_id}: {e}")
+                        response = {
                             'id': problem_id,
                             'question': question,
-                            'error': result['error'],
+                            'error': str(e),
                             'model': model_name,
                             'base': base_name,
-                            'usage': result.get('usage', {})
+                            'usage': {}
                         }
-                        # Add response content if available
-                        if 'content' in result:
-                            error_response['response'] = result['content']
 
-                        # Add reasoning_content if it exists
-                        if 'reasoning_content' in result:
-                            error_response['reasoning_content'] = result['reasoning_content']
+                    # Commit the finished response right away
+                    journal.append(response)
+                    all_responses.append(response)
+                    window_responses.append(response)
 
-                        batch_responses.append(error_response)
-                        logger.info(f"Processed error result for problem {problem_id} ({start_idx + idx + 1}/{len(questions_data)})")
-                    else:
-                        # Extract components for successful result
-                        content = result.get('content', "Error: No content returned")
-                        usage = result.get('usage', {})
+                    # Wait until a full window of results (or the last result) has been committed
+                    if len(window_responses) < batch_size and completed_count < len(questions_data):
+                        continue
 
-                        # Create response dictionary without full_response
-                        response = {
-                            'id': problem_id,
-                            'question': question,
-                            'response': content,
-                            'usage': usage,
-                            'model': model_name,
-                            'base': base_name
-                        }
+                    # Calculate window processing time
+                    window_duration = time.time() - window_start_time
+                    batch_times.append(window_duration)
 
-                        # Add reasoning_content if it exists
-                        if 'reasoning_content' in result:
-                            response['reasoning_content'] = result['reasoning_content']
+                    # Estimate remaining time from the average window time
+                    avg_batch_time = mean(batch_times)
+                    remaining_batches = num_batches - (window_idx + 1)
+                    estimated_remaining_time = avg_batch_time * remaining_batches
 
-                        batch_responses.append(response)
-                        logger.info(f"Generated response for problem {problem_id} ({start_idx + idx + 1}/{len(questions_data)})")
+                    logger.info(f"Window {window_idx + 1}/{num_batches} completed in {format_duration(window_duration)}, got {len(window_responses)} results")
+                    if remaining_batches > 0:
+                        logger.info(f"Estimated time for remaining {len(questions_data) - completed_count} problems: {format_duration(estimated_remaining_time)}")
 
-                except Exception as e:
-                    logger.error(f"Error processing result for problem {problem_id}: {e}")
-
-                    # Save error information
-                    error_response = {
-                        'id': problem_id,
-                        'question': question,
-                        'error': str(e),
-                        'model': model_name,
-                        'base': base_name,
-                        'usage': {}
-                    }
-
-                    batch_responses.append(error_response)
-
-            # Add batch responses to all responses
-            all_responses.extend(batch_responses)
-
-            # Check if all items in the batch had errors
-            all_errors = all('error' in resp for resp in batch_responses)
-            if all_errors:
-                consecutive_failed_batches += 1
-                logger.warning(f"Batch {batch_idx + 1} had errors for all items. Consecutive failed batches: {consecutive_failed_batches}")
-
-                # Check if we've reached the maximum number of consecutive failures
-                if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
-                    error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
-                    logger.error(error_msg)
-
-                    # Update metadata with termination reason
-                    metadata['termination_reason'] = error_msg
-                    if metadata_path:
-                        update_metadata(metadata, metadata_path)
+                    # Check if all items in the window had errors
+                    if all('error' in resp for resp in window_responses):
+                        consecutive_failed_batches += 1
+                        logger.warning(f"Window {window_idx + 1} had errors for all items. Consecutive failed batches: {consecutive_failed_batches}")
 
-                    # Write the current responses to the output file
-                    write_jsonl(all_responses, output_path)
+                        # Check if we've reached the maximum number of consecutive failures
+                        if consecutive_failed_batches >= max_consecutive_failures and window_idx < max_consecutive_failures:
+                            error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
+                            logger.error(error_msg)
 
-                    # Raise an exception to terminate processing
-                    raise RuntimeError(error_msg)
-            else:
-                # Reset the counter if a batch succeeds
-                consecutive_failed_batches = 0
-                logger.info(f"Batch {batch_idx + 1} had at least one successful response. Resetting consecutive failure counter.")
+                            # Update metadata with termination reason
+                            metadata['termination_reason'] = error_msg
+                            if metadata_path:
+                                update_metadata(metadata, metadata_path)
 
-            # Save the current progress to the output file
-            write_jsonl(all_responses, output_path)
-            logger.info(f"Saved {len(all_responses)} responses to {output_path} after batch {batch_idx + 1}")
+                            # Cancel the requests still in flight; the current responses are written on the way out
+                            stream.close()
 
-            # Update metadata if path is provided
-            if metadata_path:
-                metadata['statistics'] = calculate_statistics()
-                update_metadata(metadata, metadata_path)
+                            # Raise an exception to terminate processing
+                            raise RuntimeError(error_msg)
+                    else:
+                        # Reset the counter if a window succeeds
+                        consecutive_failed_batches = 0
 
-        except Exception as e:
-            logger.error(f"Error processing batch {batch_idx + 1}: {e}")
-
-            if no_fallback:
-                logger.warning(f"Skipping batch {batch_idx + 1} due to error (fallback disabled)")
-
-                # Add error responses for all questions in this batch
-                for i, (problem_id, question) in enumerate(zip(batch_problem_ids, batch_questions)):
-                    error_response = {
-                        'id': problem_id,
-                        'question': question,
-                        'error': f"Batch processing failed: {str(e)}",
-                        'model': model_name,
-                        'base': base_name,
-                        'usage': {}
-                    }
-                    all_responses.append(error_response)
-
-                # Increment consecutive failed batches counter
-                consecutive_failed_batches += 1
-                logger.warning(f"Batch {batch_idx + 1} failed entirely. Consecutive failed batches: {consecutive_failed_batches}")
-
-                # Check if we've reached the maximum number of consecutive failures
-                if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
-                    error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
-                    logger.error(error_msg)
-
-                    # Update metadata with termination reason
-                    metadata['termination_reason'] = error_msg
+                    # Update metadata if path is provided
                     if metadata_path:
+                        metadata['statistics'] = calculate_statistics()
                         update_metadata(metadata, metadata_path)
 
-                    # Write the current responses to the output file
-                    write_jsonl(all_responses, output_path)
+                    # Report progress to the caller
+                    if progress_callback:
+                        progress_callback(calculate_statistics())
+
+                    window_idx += 1
+                    window_responses = []
+                    window_start_time = time.time()
+            finally:
+                stream.close()
+
+            if stream_error is not None:
+                remaining_indices = [idx for idx in range(len(questions_data)) if idx not in answered]
+                logger.error(f"Error in the response stream after {completed_count}/{len(questions_data)} results: {stream_error}")
+
+                if no_fallback:
+                    logger.warning(f"Skipping {len(remaining_indices)} unanswered problems due to error (fallback disabled)")
+
+                    # Add error responses for all questions without a result
+                    for idx in remaining_indices:
+                        error_response = {
+                            'id': problem_ids[idx],
+                            'question': questions_data[idx],
+                            'error': f"Stream processing failed: {str(stream_error)}",
+                            'model': model_name,
+                            'base': base_name,
+                            'usage': {}
+                        }
+                        journal.append(error_response)
+                        all_responses.append(error_response)
+
+                    logger.info(f"Journaled {len(remaining_indices)} error responses to {journal.journal_path} after the stream failed")
+                else:
+                    # Fall back to individual processing for the questions without a result
+                    logger.info(f"Falling back to individual processing for {len(remaining_indices)} unanswered problems")
+                    fallback_start_time = time.time()
+
+                    for position, idx in enumerate(remaining_indices):
+                        problem_id = problem_ids[idx]
+                        question = questions_data[idx]
+                        logger.info(f"Processing problem {problem_id} ({completed_count + position + 1}/{len(questions_data)})")
+
+                        try:
+                            result = model.generate_response(question, question_type, retries, worker_logging)
+                            response = build_response_record(problem_id, question, result, model_name, base_name)
+                            if 'error' in response:
+                                logger.info(f"Processed error result for problem {problem_id}")
+                            else:
+                                logger.info(f"Generated response for problem {problem_id}")
+                        except Exception as e:
+                            logger.error(f"Error processing problem {problem_id}: {e}")
+                            response = {
+                                'id': problem_id,
+                                'question': question,
+                                'error': str(e),
+                                'model': model_name,
+                                'base': base_name,
+                                'usage': {}
+                            }
 
-                    # Raise an exception to terminate processing
-                    raise RuntimeError(error_msg)
+                        journal.append(response)
+                        all_responses.append(response)
 
-                # Save progress after the batch
-                write_jsonl(all_responses, output_path)
-                logger.info(f"Saved {len(all_responses)} responses to {output_path} after batch {batch_idx + 1}")
+                    fallback_duration = time.time() - fallback_start_time
+                    batch_times.append(fallback_duration)
+                    logger.info(f"Fallback processing of {len(remaining_indices)} problems completed in {format_duration(fallback_duration)}")
 
                 # Update metadata if path is provided
                 if metadata_path:
                     metadata['statistics'] = calculate_statistics()
                     update_metadata(metadata, metadata_path)
-            else:
-                # Fall back to individual processing for this batch
-                logger.info(f"Falling back to individual processing for batch {batch_idx + 1}")
 
-                # Start timing the fallback batch
-                fallback_start_time = time.time()
-                individual_times = []
+                # Report progress to the caller
+                if progress_callback:
+                    progress_callback(calculate_statistics())
+        else:
+            # Local models group questions of similar prompt length into the same batch to reduce padding;
+            # otherwise batches follow dataset order. Responses are written back in dataset order either way.
+            batch_plan = None
+            if length_bucketing and hasattr(model, 'plan_length_buckets'):
+                try:
+                    batch_plan, plan_stats = model.plan_length_buckets(questions_data, question_type)
+                    metadata['length_buckets'] = plan_stats
+                except Exception as e:
+                    logger.warning(f"Could not plan length-bucketed batches, using dataset order: {e}")
+            if batch_plan is None:
+                batch_plan = [list(range(start, min(start + batch_size, len(questions_data)))) for start in range(0, len(questions_data), batch_size)]
+            metadata['parameters']['length_bucketing'] = 'length_buckets' in metadata
+            num_batches = len(batch_plan)
 
-                for i, (problem_id, question) in enumerate(zip(batch_problem_ids, batch_questions)):
-                    # Start timing individual problem
-                    problem_start_time = time.time()
+            # Number of questions scheduled before each batch, for progress logging
+            batch_starts = [0]
+            for batch_indices in batch_plan[:-1]:
+                batch_starts.append(batch_starts[-1] + len(batch_indices))
 
-                    logger.info(f"Processing problem {problem_id} ({start_idx + i + 1}/{len(questions_data)})")
+            # Process questions in batches
+            for batch_idx, batch_indices in enumerate(batch_plan):
+                start_idx = batch_starts[batch_idx]
 
-                    try:
-                        # Get model's answer (returns content, usage, and full response)
-                        result = model.generate_response(question, question_type, retries, worker_logging)
+                batch_questions = [questions_data[i] for i in batch_indices]
+                batch_problem_ids = [problem_ids[i] for i in batch_indices]
 
-                        # Check if there's an error in the result
-                        if 'error' in result:
-                            # Create response with error information
-                            error_response = {
+                logger.info(f"Processing batch {batch_idx + 1}/{num_batches} with {len(batch_questions)} questions")
+
+                # Start timing the batch
+                batch_start_time = time.time()
+
+                try:
+                    # Process this batch
+                    batch_results = model.generate_responses_batch(batch_questions, question_type, retries, worker_logging)
+
+                    # Calculate batch processing time
+                    batch_end_time = time.time()
+                    batch_duration = batch_end_time - batch_start_time
+                    batch_times.append(batch_duration)
+
+                    # Calculate average batch time and estimate remaining time
+                    avg_batch_time = mean(batch_times) if batch_times else 0
+                    remaining_batches = num_batches - (batch_idx + 1)
+                    estimated_remaining_time = avg_batch_time * remaining_batches
+
+                    # Format times for logging
+                    batch_duration_str = f"{batch_duration:.2f} seconds"
+                    if batch_duration > 60:
+                        batch_duration_str = f"{batch_duration/60:.2f} minutes"
+
+                    remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
+                    if estimated_remaining_time > 60:
+                        remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
+                        if estimated_remaining_time > 3600:
+                            remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
+
+                    logger.info(f"Batch {batch_idx + 1} completed in {batch_duration_str}, got {len(batch_results)} results")
+                    if remaining_batches > 0:
+                        logger.info(f"Estimated time for remaining {remaining_batches} batches: {remaining_time_str}")
+
+                    # Check if the number of results matches the number of questions in this batch
+                    if len(batch_results) != len(batch_questions):
+                        logger.warning(f"Number of results ({len(batch_results)}) doesn't match number of questions in batch ({len(batch_questions)})")
+                        # Pad the results list if it's shorter than the questions list
+                        if len(batch_results) < len(batch_questions):
+                            logger.warning(f"Padding results list with {len(batch_questions) - len(batch_results)} error placeholders")
+                            for _ in range(len(batch_questions) - len(batch_results)):
+                                batch_results.append({
+                                    'content': "Error: No result returned",
+                                    'usage': {},
+                                    'error': "No result returned"  # Add explicit error field
+                                })
+                        # Truncate the results list if it's longer than the questions list
+                        elif len(batch_results) > len(batch_questions):
+                            logger.warning(f"Truncating results list from {len(batch_results)} to {len(batch_questions)}")
+                            batch_results = batch_results[:len(batch_questions)]
+
+                    # Process the results for this batch
+                    batch_responses = []
+                    for idx, (problem_id, question, result) in enumerate(zip(batch_problem_ids, batch_questions, batch_results)):
+                        try:
+                            response = build_response_record(problem_id, question, result, model_name, base_name)
+                            if 'error' in response:
+                                logger.info(f"Processed error result for problem {problem_id} ({start_idx + idx + 1}/{len(questions_data)})")
+                            else:
+                                logger.info(f"Generated response for problem {problem_id} ({start_idx + idx + 1}/{len(questions_data)})")
+
+                        except Exception as e:
+                            logger.error(f"Error processing result for problem {problem_id}: {e}")
+
+                            # Save error information
+                            response = {
                                 'id': problem_id,
                                 'question': question,
-                                'error': result['error'],
+                                'error': str(e),
                                 'model': model_name,
                                 'base': base_name,
-                                'usage': result.get('usage', {})
+                                'usage': {}
                             }
-                            # Add response content if available
-                            if 'content' in result:
-                                error_response['response'] = result['content']
 
-                            # Add reasoning_content if it exists
-                            if 'reasoning_content' in result:
-                                error_response['reasoning_content'] = result['reasoning_content']
+                        # Append the finished response to the journal right away
+                        journal.append(response)
+                        batch_responses.append(response)
 
-                            all_responses.append(error_response)
-                            logger.info(f"Processed error result for problem {problem_id}")
-                        else:
-                            # Extract components for successful result
-                            content = result.get('content', "Error: No content returned")
-                            usage = result.get('usage', {})
+                    # Add batch responses to all responses
+                    all_responses.extend(batch_responses)
 
-                            # Create response dictionary without full_response
-                            response = {
+                    # Check if all items in the batch had errors
+                    all_errors = all('error' in resp for resp in batch_responses)
+                    if all_errors:
+                        consecutive_failed_batches += 1
+                        logger.warning(f"Batch {batch_idx + 1} had errors for all items. Consecutive failed batches: {consecutive_failed_batches}")
+
+                        # Check if we've reached the maximum number of consecutive failures
+                        if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
+                            error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
+                            logger.error(error_msg)
+
+                            # Update metadata with termination reason
+                            metadata['termination_reason'] = error_msg
+                            if metadata_path:
+                                update_metadata(metadata, metadata_path)
+
+                            # Raise an exception to terminate processing
+                            raise RuntimeError(error_msg)
+                    else:
+                        # Reset the counter if a batch succeeds
+                        consecutive_failed_batches = 0
+                        logger.info(f"Batch {batch_idx + 1} had at least one successful response. Resetting consecutive failure counter.")
+
+                    logger.info(f"Journaled {len(batch_responses)} responses to {journal.journal_path} after batch {batch_idx + 1}")
+
+                    # Update metadata if path is provided
+                    if metadata_path:
+                        metadata['statistics'] = calculate_statistics()
+                        update_metadata(metadata, metadata_path)
+
+                    # Report progress to the caller
+                    if progress_callback:
+                        progress_callback(calculate_statistics())
+
+                except Exception as e:
+                    logger.error(f"Error processing batch {batch_idx + 1}: {e}")
+
+                    if no_fallback:
+                        logger.warning(f"Skipping batch {batch_idx + 1} due to error (fallback disabled)")
+
+                        # Add error responses for all questions in this batch
+                        for i, (problem_id, question) in enumerate(zip(batch_problem_ids, batch_questions)):
+                            error_response = {
                                 'id': problem_id,
                                 'question': question,
-                                'response': content,
-                                'usage': usage,
+                                'error': f"Batch processing failed: {str(e)}",
                                 'model': model_name,
-                                'base': base_name
+                                'base': base_name,
+                                'usage': {}
                             }
+                            journal.append(error_response)
+                            all_responses.append(error_response)
 
-                            # Add reasoning_content if it exists
-                            if 'reasoning_content' in result:
-                                response['reasoning_content'] = result['reasoning_content']
+                        # Increment consecutive failed batches counter
+                        consecutive_failed_batches += 1
+                        logger.warning(f"Batch {batch_idx + 1} failed entirely. Consecutive failed batches: {consecutive_failed_batches}")
 
-                            all_responses.append(response)
+                        # Check if we've reached the maximum number of consecutive failures
+                        if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
+                            error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
+                            logger.error(error_msg)
 
-                            # Calculate and log individual problem time
-                            problem_end_time = time.time()
-                            problem_duration = problem_end_time - problem_start_time
-                            individual_times.append(problem_duration)
+                            # Update metadata with termination reason
+                            metadata['termination_reason'] = error_msg
+                            if metadata_path:
+                                update_metadata(metadata, metadata_path)
 
-                            # Calculate average time and estimate remaining time
-                            avg_problem_time = mean(individual_times) if individual_times else 0
-                            remaining_problems = len(batch_questions) - (i + 1)
-                            estimated_remaining_time = avg_problem_time * remaining_problems
+                            # Raise an exception to terminate processing
+                            raise RuntimeError(error_msg)
 
-                            # Format times for logging
-                            problem_duration_str = f"{problem_duration:.2f} seconds"
-                            if problem_duration > 60:
-                                problem_duration_str = f"{problem_duration/60:.2f} minutes"
+                        logger.info(f"Journaled {len(batch_problem_ids)} error responses to {journal.journal_path} after batch {batch_idx + 1}")
 
-                            remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
-                            if estimated_remaining_time > 60:
-                                remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
-                                if estimated_remaining_time > 3600:
-                                    remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
+                        # Update metadata if path is provided
+                        if metadata_path:
+                            metadata['statistics'] = calculate_statistics()
+                            update_metadata(metadata, metadata_path)
 
-                            logger.info(f"Generated response for problem {problem_id} in {problem_duration_str}")
-                            if remaining_problems > 0:
-                                logger.info(f"Estimated time for remaining {remaining_problems} problems in this batch: {remaining_time_str}")
+                        # Report progress to the caller
+                        if progress_callback:
+                            progress_callback(calculate_statistics())
+                    else:
+                        # Fall back to individual processing for this batch
+                        logger.info(f"Falling back to individual processing for batch {batch_idx + 1}")
+
+                        # Start timing the fallback batch
+                        fallback_start_time = time.time()
+                        individual_times = []
+
+                        for i, (problem_id, question) in enumerate(zip(batch_problem_ids, batch_questions)):
+                            # Start timing individual problem
+                            problem_start_time = time.time()
+
+                            logger.info(f"Processing problem {problem_id} ({start_idx + i + 1}/{len(questions_data)})")
+
+                            try:
+                                # Get model's answer (returns content, usage, and full response)
+                                result = model.generate_response(question, question_type, retries, worker_logging)
+
+                                response = build_response_record(problem_id, question, result, model_name, base_name)
+                                journal.append(response)
+                                all_responses.append(response)
+
+                                if 'error' in response:
+                                    logger.info(f"Processed error result for problem {problem_id}")
+                                else:
+                                    # Calculate and log individual problem time
+                                    problem_end_time = time.time()
+                                    problem_duration = problem_end_time - problem_start_time
+                                    individual_times.append(problem_duration)
+
+                                    # Calculate average time and estimate remaining time
+                                    avg_problem_time = mean(individual_times) if individual_times else 0
+                                    remaining_problems = len(batch_questions) - (i + 1)
+                                    estimated_remaining_time = avg_problem_time * remaining_problems
+
+                                    # Format times for logging
+                                    problem_duration_str = f"{problem_duration:.2f} seconds"
+                                    if problem_duration > 60:
+                                        problem_duration_str = f"{problem_duration/60:.2f} minutes"
+
+                                    remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
+                                    if estimated_remaining_time > 60:
+                                        remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
+                                        if estimated_remaining_time > 3600:
+                                            remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
+
+                                    logger.info(f"Generated response for problem {problem_id} in {problem_duration_str}")
+                                    if remaining_problems > 0:
+                                        logger.info(f"Estimated time for remaining {remaining_problems} problems in this batch: {remaining_time_str}")
+
+                            except Exception as e:
+                                logger.error(f"Error processing problem {problem_id}: {e}")
+
+                                # Still track time even for errors
+                                problem_end_time = time.time()
+                                problem_duration = problem_end_time - problem_start_time
+                                individual_times.append(problem_duration)
+                                logger.info(f"Problem {problem_id} failed after {problem_duration:.2f} seconds")
+
+                                # Save error information
+                                error_response = {
+                                    'id': problem_id,
+                                    'question': question,
+                                    'error': str(e),
+                                    'model': model_name,
+                                    'base': base_name,
+                                    'usage': {}
+                                }
+
+                                journal.append(error_response)
+                                all_responses.append(error_response)
+
+                        # Check if all individual items in the batch had errors
+                        batch_start_idx = len(all_responses) - len(batch_problem_ids)
+                        batch_end_idx = len(all_responses)
+                        batch_responses = all_responses[batch_start_idx:batch_end_idx]
+
+                        all_errors = all('error' in resp for resp in batch_responses)
+                        if all_errors:
+                            consecutive_failed_batches += 1
+                            logger.warning(f"Individual processing of batch {batch_idx + 1} had errors for all items. Consecutive failed batches: {consecutive_failed_batches}")
+
+                            # Check if we've reached the maximum number of consecutive failures
+                            if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
+                                error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
+                                logger.error(error_msg)
+
+                                # Update metadata with termination reason
+                                metadata['termination_reason'] = error_msg
+                                if metadata_path:
+                                    update_metadata(metadata, metadata_path)
+
+                                # Raise an exception to terminate processing
+                                raise RuntimeError(error_msg)
+                        else:
+                            # Reset the counter if a batch succeeds
+                            consecutive_failed_batches = 0
+                            logger.info(f"Individual processing of batch {batch_idx + 1} had at least one successful response. Resetting consecutive failure counter.")
+
+                        # Calculate total time for fallback batch
+                        fallback_end_time = time.time()
+                        fallback_duration = fallback_end_time - fallback_start_time
+                        batch_times.append(fallback_duration)  # Add to batch times for overall estimation
+
+                        # Format time for logging
+                        fallback_duration_str = f"{fallback_duration:.2f} seconds"
+                        if fallback_duration > 60:
+                            fallback_duration_str = f"{fallback_duration/60:.2f} minutes"
+                            if fallback_duration > 3600:
+                                fallback_duration_str = f"{fallback_duration/3600:.2f} hours"
+
+                        # Calculate average batch time and estimate remaining time
+                        avg_batch_time = mean(batch_times) if batch_times else 0
+                        remaining_batches = num_batches - (batch_idx + 1)
+                        estimated_remaining_time = avg_batch_time * remaining_batches
+
+                        # Format remaining time for logging
+                        remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
+                        if estimated_remaining_time > 60:
+                            remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
+                            if estimated_remaining_time > 3600:
+                                remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
+
+                        logger.info(f"Fallback processing of batch {batch_idx + 1} completed in {fallback_duration_str}")
+                        logger.info(f"Journaled {len(batch_problem_ids)} responses to {journal.journal_path} after individual processing of batch {batch_idx + 1}")
+
+                        if remaining_batches > 0:
+                            logger.info(f"Estimated time for remaining {remaining_batches} batches: {remaining_time_str}")
+
+                        # Update metadata if path is provided
+                        if metadata_path:
+                            metadata['statistics'] = calculate_statistics()
+                            update_metadata(metadata, metadata_path)
 
-                    except Exception as e:
-                        logger.error(f"Error processing problem {problem_id}: {e}")
+                        # Report progress to the caller
+                        if progress_callback:
+                            progress_callback(calculate_statistics())
+
+        # Update final statistics
+        processed_questions = len(questions_data)
+
+        # Calculate final statistics
+        final_stats = calculate_statistics()
+        successful_responses = final_stats['successful_responses']
+        error_responses = final_stats['error_responses']
+        missing_questions = final_stats['missing_questions']
+
+        # Add timing information to metadata
+        if batch_times:
+            timing_stats = {
+                'total_batches': len(batch_times),
+                'average_batch_time': mean(batch_times),
+                'total_processing_time': sum(batch_times),
+                'min_batch_time': min(batch_times),
+                'max_batch_time': max(batch_times),
+                'median_batch_time': median(batch_times) if len(batch_times) > 1 else batch_times[0]
+            }
+            metadata['timing'] = timing_stats
+
+            # Log timing summary
+            total_time = sum(batch_times)
+            total_time_str = f"{total_time:.2f} seconds"
+            if total_time > 60:
+                total_time_str = f"{total_time/60:.2f} minutes"
+                if total_time > 3600:
+                    total_time_str = f"{total_time/3600:.2f} hours"
+
+            avg_time = mean(batch_times)
+            avg_time_str = f"{avg_time:.2f} seconds"
+            if avg_time > 60:
+                avg_time_str = f"{avg_time/60:.2f} minutes"
+
+            logger.info(f"Total processing time: {total_time_str}")
+            logger.info(f"Average batch time: {avg_time_str}")
+
+        # Update timestamp and statistics in metadata
+        metadata['timestamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        metadata['statistics'] = final_stats
+
+        # Record how the provider's rate limiter behaved
+        if isinstance(model, APIBaseModel):
+            try:
+                metadata['rate_limiter'] = model.get_rate_limiter_stats()
+                logger.info(f"Rate limiter statistics: {metadata['rate_limiter']}")
+            except Exception as e:
+                logger.warning(f"Could not read rate limiter statistics: {e}")
+
+        # Record how many requests the response cache saved
+        if response_cache is not None:
+            metadata['cache'] = response_cache.get_stats()
+            # The counters of a cache shared with other runs cover all of them
+            metadata['cache']['shared'] = shared_cache
+            logger.info(f"Response cache statistics: {metadata['cache']}")
+
+        # Record how many local sequences were stopped after their final answer
+        if hasattr(model, 'get_early_stop_stats'):
+            metadata['early_stopping'] = model.get_early_stop_stats()
+            logger.info(f"Early stopping: {metadata['early_stopping']}")
+
+        # Record how many prefill tokens the shared prompt prefix saved
+        if hasattr(model, 'get_prefix_stats'):
+            metadata['prefix_cache'] = model.get_prefix_stats()
+            logger.info(f"Prefix cache: {metadata['prefix_cache']}")
+
+        # Record the token ceiling local batches ended up with
+        if hasattr(model, 'token_planner'):
+            metadata['token_budget'] = model.token_planner.get_stats()
+            logger.info(f"Token budget: {metadata['token_budget']}")
+
+        # Record how the prompt store was used over the whole run
+        if getattr(model, 'prompt_store', None) is not None:
+            metadata['prompt_store'].update(model.prompt_store.get_stats())
+
+        # Record how much of the local models' prefill went to padding
+        if hasattr(model, 'get_padding_stats'):
+            metadata['padding'] = model.get_padding_stats()
+            logger.info(f"Padding statistics: {metadata['padding']}")
+
+        # Record how full the continuous-batching engine kept its batch
+        if hasattr(model, 'get_engine_stats') and model.get_engine_stats() is not None:
+            metadata['engine'] = model.get_engine_stats()
+            logger.info(f"Engine statistics: {metadata['engine']}")
+
+        # Write final metadata if path is provided
+        if metadata_path:
+            update_metadata(metadata, metadata_path)
+            logger.info(f"Final metadata updated at {metadata_path}")
+
+        logger.info(f"Processed all {processed_questions} problems. Total responses: {successful_responses + error_responses}")
+        logger.info(f"Statistics: {successful_responses} successful, {error_responses} errors, {missing_questions} missing")
+
+        return all_responses, metadata
+    finally:
+        # Produce the canonical response file from the journal on every exit, including errors and interrupts
+        journal.compact(order=dataset_order)
+        journal.close()
+
+def process_problems_batch(problems, model_name, output_path, base_name, question_type="OEQ", dataset_name="PAC", max_tokens=2000, metadata_path=None, poll_interval=60, completion_window="24h", no_wait=False, cache_dir=None, cache_mode="off", cache_max_size_mb=None):
+    """
+    Process all problems as one offline job on the provider's batch API and ingest the
+    results into the same response and metadata files as process_problems.
 
-                        # Still track time even for errors
-                        problem_end_time = time.time()
-                        problem_duration = problem_end_time - problem_start_time
-                        individual_times.append(problem_duration)
-                        logger.info(f"Problem {problem_id} failed after {problem_duration:.2f} seconds")
+    The job is recorded in batch_state.json next to output_path as soon as it is submitted,
+    so an interrupted run resumes polling the same job instead of submitting it again.
+    Problems that already have a successful response are not submitted, and failed
+    requests are recorded as errors that the next run resubmits.
 
-                        # Save error information
-                        error_response = {
-                            'id': problem_id,
-                            'question': question,
-                            'error': str(e),
-                            'model': model_name,
-                            'base': base_name,
-                            'usage': {}
-                        }
+    Args:
+        problems (list): List of problem dictionaries
+        model_name (str): Name of the model to use
+        output_path (str): Path to save the responses
+        base_name (str): Name of the base model
+        question_type (str): Type of question (OEQ or MCQ)
+        dataset_name (str): Name of the dataset
+        max_tokens (int): Maximum number of tokens in the response
+        metadata_path (str, optional): Path to save the metadata file
+        poll_interval (float): Seconds between two status checks of the batch job
+        completion_window (str): Time frame within which the provider must process the job
+        no_wait (bool): Submit (or check) the job and return without waiting for it to finish
+        cache_dir (str, optional): Directory of the shared API response cache. None disables the cache.
+        cache_mode (str): "readwrite", "readonly" or "off"
+        cache_max_size_mb (float, optional): Size limit of the response cache
 
-                        all_responses.append(error_response)
+    Returns:
+        tuple: (all_responses, metadata_dict) where all_responses contains the responses ingested in this run
+            and metadata_dict contains statistics about the processing
+    """
+    from src.models.batch_api import (
+        TERMINAL_BATCH_STATUSES,
+        BatchCheckpoint,
+        write_batch_input,
+        submit_batch,
+        retrieve_batch,
+        read_batch_file,
+        parse_batch_line
+    )
+
+    # Get the model implementation; the batch API replaces parallel calls, so no workers are started
+    ModelClass = get_model(model_name, base_name)
+    if not issubclass(ModelClass, APIBaseModel):
+        raise ValueError(f"Batch mode is only available for API models, not base {base_name}")
+    model = ModelClass(parallel_size=1, max_tokens=max_tokens)
+    if not model.supports_batch_api():
+        raise ValueError(f"{ModelClass.__name__} has no batch API implementation")
 
-                # Check if all individual items in the batch had errors
-                batch_start_idx = len(all_responses) - len(batch_problem_ids)
-                batch_end_idx = len(all_responses)
-                batch_responses = all_responses[batch_start_idx:batch_end_idx]
+    response_cache = None
+    if cache_dir and cache_mode != "off":
+        response_cache = ResponseCache(cache_dir, max_size_mb=cache_max_size_mb, read_only=(cache_mode == "readonly"))
+        model.set_response_cache(response_cache, base_name)
 
-                all_errors = all('error' in resp for resp in batch_responses)
-                if all_errors:
-                    consecutive_failed_batches += 1
-                    logger.warning(f"Individual processing of batch {batch_idx + 1} had errors for all items. Consecutive failed batches: {consecutive_failed_batches}")
+    logger.info(f"Using model: {model_name} with base: {base_name} in batch mode, max_tokens: {max_tokens}")
 
-                    # Check if we've reached the maximum number of consecutive failures
-                    if consecutive_failed_batches >= max_consecutive_failures and batch_idx < max_consecutive_failures:
-                        error_msg = f"Terminating after {consecutive_failed_batches} consecutive batch failures. The model appears to be consistently failing."
-                        logger.error(error_msg)
+    output_dir = os.path.dirname(output_path)
+    checkpoint = BatchCheckpoint(os.path.join(output_dir, "batch_state.json"))
 
-                        # Update metadata with termination reason
-                        metadata['termination_reason'] = error_msg
-                        if metadata_path:
-                            update_metadata(metadata, metadata_path)
+    # Map the batch custom_id of every problem back to the problem and the question that is recorded
+    problems_by_custom_id = {}
+    for idx, problem in enumerate(problems):
+        problem_id = problem.get('id', f"problem_{idx}")
+        question = problem if question_type == "MCQ" else problem.get('question', problem.get('problem', ''))
+        problems_by_custom_id[str(problem_id)] = (problem_id, question)
+    dataset_order = [problem_id for problem_id, _ in problems_by_custom_id.values()]
 
-                        # Write the current responses to the output file
-                        write_jsonl(all_responses, output_path)
+    journal = ResponseJournal(output_path)
+    try:
+        existing_ids = journal.successful_ids()
+        successful_count, error_count = journal.count()
+        logger.info(f"Loaded {successful_count} successful responses, found {error_count} errors that will be reprocessed")
+
+        total_questions = len(problems)
+        all_responses = []
+
+        def calculate_statistics():
+            successful_count, error_count = journal.count()
+            missing_count = total_questions - successful_count - error_count
+            completion_percentage = round((successful_count / total_questions) * 100, 2) if total_questions > 0 else 0
+
+            return {
+                'total_questions': total_questions,
+                'successful_responses': successful_count,
+                'error_responses': error_count,
+                'missing_questions': missing_count,
+                'completion_percentage': completion_percentage
+            }
+
+        def record_result(custom_id, result):
+            problem_id, question = problems_by_custom_id[custom_id]
+            response = build_response_record(problem_id, question, result, model_name, base_name)
+            journal.append(response)
+            all_responses.append(response)
+
+        model_details = {'max_tokens': max_tokens}
+        if hasattr(model, 'model_name'):
+            model_details['model_name'] = model.model_name
+
+        metadata = {
+            'model': {
+                'name': model_name,
+                'base': base_name,
+                'details': model_details
+            },
+            'dataset': {
+                'name': dataset_name,
+                'type': question_type,
+                'total_questions': total_questions
+            },
+            'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'statistics': calculate_statistics(),
+            'parameters': {
+                'batch_mode': True,
+                'max_tokens': max_tokens,
+                'completion_window': completion_window,
+                'poll_interval': poll_interval
+            },
+            'logs': {
+                'directory': os.path.join(output_dir, "logs")
+            }
+        }
 
-                        # Raise an exception to terminate processing
-                        raise RuntimeError(error_msg)
-                else:
-                    # Reset the counter if a batch succeeds
-                    consecutive_failed_batches = 0
-                    logger.info(f"Individual processing of batch {batch_idx + 1} had at least one successful response. Resetting consecutive failure counter.")
-
-                # Calculate total time for fallback batch
-                fallback_end_time = time.time()
-                fallback_duration = fallback_end_time - fallback_start_time
-                batch_times.append(fallback_duration)  # Add to batch times for overall estimation
-
-                # Format time for logging
-                fallback_duration_str = f"{fallback_duration:.2f} seconds"
-                if fallback_duration > 60:
-                    fallback_duration_str = f"{fallback_duration/60:.2f} minutes"
-                    if fallback_duration > 3600:
-                        fallback_duration_str = f"{fallback_duration/3600:.2f} hours"
-
-                # Calculate average batch time and estimate remaining time
-                avg_batch_time = mean(batch_times) if batch_times else 0
-                remaining_batches = num_batches - (batch_idx + 1)
-                estimated_remaining_time = avg_batch_time * remaining_batches
-
-                # Format remaining time for logging
-                remaining_time_str = f"{estimated_remaining_time:.2f} seconds"
-                if estimated_remaining_time > 60:
-                    remaining_time_str = f"{estimated_remaining_time/60:.2f} minutes"
-                    if estimated_remaining_time > 3600:
-                        remaining_time_str = f"{estimated_remaining_time/3600:.2f} hours"
-
-                # Save progress after processing all individual problems in the batch
-                write_jsonl(all_responses, output_path)
-                logger.info(f"Fallback processing of batch {batch_idx + 1} completed in {fallback_duration_str}")
-                logger.info(f"Saved {len(all_responses)} responses to {output_path} after individual processing of batch {batch_idx + 1}")
-
-                if remaining_batches > 0:
-                    logger.info(f"Estimated time for remaining {remaining_batches} batches: {remaining_time_str}")
+        start_time = time.time()
 
-                # Update metadata if path is provided
-                if metadata_path:
-                    metadata['statistics'] = calculate_statistics()
-                    update_metadata(metadata, metadata_path)
+        if checkpoint.active is None:
+            # Collect the problems that still need a response, answering repeated prompts from the cache
+            questions_data = []
+            custom_ids = []
+            for custom_id, (problem_id, question) in problems_by_custom_id.items():
+                if problem_id in existing_ids:
+                    continue
 
-    # Update final statistics
-    processed_questions = len(questions_data)
-
-    # Calculate final statistics
-    final_stats = calculate_statistics()
-    successful_responses = final_stats['successful_responses']
-    error_responses = final_stats['error_responses']
-    missing_questions = final_stats['missing_questions']
-
-    # Add timing information to metadata
-    if batch_times:
-        timing_stats = {
-            'total_batches': len(batch_times),
-            'average_batch_time': mean(batch_times),
-            'total_processing_time': sum(batch_times),
-            'min_batch_time': min(batch_times),
-            'max_batch_time': max(batch_times),
-            'median_batch_time': median(batch_times) if len(batch_times) > 1 else batch_times[0]
-        }
-        metadata['timing'] = timing_stats
+                if response_cache is not None:
+                    cached = response_cache.get(model._response_cache_key(question, question_type), max_tokens)
+                    if cached is not None:
+                        record_result(custom_id, cached)
+                        continue
 
-        # Log timing summary
-        total_time = sum(batch_times)
-        total_time_str = f"{total_time:.2f} seconds"
-        if total_time > 60:
-            total_time_str = f"{total_time/60:.2f} minutes"
-            if total_time > 3600:
-                total_time_str = f"{total_time/3600:.2f} hours"
+                questions_data.append(question)
+                custom_ids.append(custom_id)
 
-        avg_time = mean(batch_times)
-        avg_time_str = f"{avg_time:.2f} seconds"
-        if avg_time > 60:
-            avg_time_str = f"{avg_time/60:.2f} minutes"
+            if all_responses:
+                logger.info(f"Served {len(all_responses)} problems from the response cache")
 
-        logger.info(f"Total processing time: {total_time_str}")
-        logger.info(f"Average batch time: {avg_time_str}")
+            if len(questions_data) == 0:
+                logger.info("All problems have already been processed. Nothing to submit.")
+                metadata['statistics'] = calculate_statistics()
+                if response_cache is not None:
+                    metadata['cache'] = response_cache.get_stats()
+                if metadata_path:
+                    update_metadata(metadata, metadata_path)
+                return all_responses, metadata
+
+            # Build and submit the batch; the checkpoint is written before anything else can fail
+            input_path = os.path.join(output_dir, "batch_input.jsonl")
+            write_batch_input(model, questions_data, custom_ids, question_type, input_path)
+            batch = submit_batch(model, input_path, completion_window, description=f"{base_name}-{model_name} {question_type}/{dataset_name}")
+            checkpoint.start(batch, custom_ids, input_path)
+            logger.info(f"Submitted batch {batch['id']} with {len(custom_ids)} requests")
+        else:
+            logger.info(f"Resuming batch {checkpoint.active['batch_id']} with {len(checkpoint.active['custom_ids'])} requests")
 
-    # Update timestamp and statistics in metadata
-    metadata['timestamp'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    metadata['statistics'] = final_stats
+        batch_id = checkpoint.active['batch_id']
 
-    # Write final metadata if path is provided
-    if metadata_path:
-        update_metadata(metadata, metadata_path)
-        logger.info(f"Final metadata updated at {metadata_path}")
+        # Poll the job until it reaches a terminal status
+        while True:
+            batch = retrieve_batch(model, batch_id)
+            checkpoint.update(batch)
 
-    logger.info(f"Processed all {processed_questions} problems. Total responses: {len(all_responses)}")
-    logger.info(f"Statistics: {successful_responses} successful, {error_responses} errors, {missing_questions} missing")
+            request_counts = batch.get('request_counts') or {}
+            logger.info(f"Batch {batch_id} status: {batch.get('status')}, completed: {request_counts.get('completed', 0)}, failed: {request_counts.get('failed', 0)}, total: {request_counts.get('total', 0)}")
+
+            metadata['batch'] = dict(checkpoint.active)
+            metadata['batch'].pop('custom_ids', None)
+            if metadata_path:
+                update_metadata(metadata, metadata_path)
 
-    return all_responses, metadata
+            if batch.get('status') in TERMINAL_BATCH_STATUSES:
+                break
+
+            if no_wait:
+                logger.info(f"Batch {batch_id} is still {batch.get('status')}; run again to ingest its results")
+                return all_responses, metadata
+
+            time.sleep(poll_interval)
+
+        if batch.get('status') != "completed":
+            logger.warning(f"Batch {batch_id} ended with status {batch.get('status')}: {batch.get('errors')}")
+
+        # Ingest the output and error files; requests that appear in neither stay missing and are resubmitted next run
+        pending_ids = set(checkpoint.active['custom_ids'])
+        ingested = 0
+        for file_id in (batch.get('output_file_id'), batch.get('error_file_id')):
+            if not file_id:
+                continue
+            for line in read_batch_file(model, file_id):
+                custom_id, result = parse_batch_line(model, line)
+                if custom_id not in pending_ids:
+                    logger.warning(f"Ignoring batch output line with unknown custom_id {custom_id}")
+                    continue
+                pending_ids.discard(custom_id)
+                record_result(custom_id, result)
+                ingested += 1
+
+                if response_cache is not None and 'error' not in result:
+                    _, question = problems_by_custom_id[custom_id]
+                    response_cache.put(model._response_cache_key(question, question_type), result, max_tokens)
+
+        if pending_ids:
+            logger.warning(f"{len(pending_ids)} requests of batch {batch_id} have no result and will be resubmitted on the next run")
+
+        logger.info(f"Ingested {ingested} results from batch {batch_id}")
+        checkpoint.finish(ingested)
+
+        final_stats = calculate_statistics()
+        metadata['statistics'] = final_stats
+        metadata['batch'] = checkpoint.state['history'][-1]
+        metadata['timing'] = {'total_processing_time': time.time() - start_time}
+        if response_cache is not None:
+            metadata['cache'] = response_cache.get_stats()
+            logger.info(f"Response cache statistics: {metadata['cache']}")
+
+        if metadata_path:
+            update_metadata(metadata, metadata_path)
+            logger.info(f"Final metadata updated at {metadata_path}")
+
+        logger.info(f"Statistics: {final_stats['successful_responses']} successful, {final_stats['error_responses']} errors, {final_stats['missing_questions']} missing")
+
+        return all_responses, metadata
+    finally:
+        # Produce the canonical response file from the journal on every exit, including errors and interrupts
+        journal.compact(order=dataset_order)
+        journal.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Generate responses for physics problems using LLMs")
@@ -745,6 +1247,32 @@ def main():
     parser.add_argument("--type", type=str, default="OEQ", choices=["OEQ", "MCQ", "CODE"], help="Question type (OEQ or MCQ)")
     parser.add_argument("--retries", type=int, default=0, help="Number of retries if the first attempt fails (0 means try once, 1 means try once and retry once if it fails)")
     parser.add_argument("--parallel", type=int, default=4, help="Number of parallel processes to use")
+    parser.add_argument("--backend", type=str, default="ray", choices=["ray", "asyncio"],
+                        help="Execution backend for API models: one Ray task per question, or native async clients on a single event loop (--parallel is then the number of concurrent requests)")
+    parser.add_argument("--task-timeout", type=float, default=None, help="Per-question deadline in seconds for API models; questions that miss it are recorded as errors and retried on the next run")
+    parser.add_argument("--rpm", type=float, default=None, help="Requests-per-minute budget for the API provider (default: unlimited)")
+    parser.add_argument("--tpm", type=float, default=None, help="Tokens-per-minute budget for the API provider, counting prompt plus max tokens (default: unlimited)")
+    parser.add_argument("--latency-factor", type=float, default=None,
+                        help="Also lower the API concurrency when the latency per generated token rises above this multiple of its recent average (default: back off on 429s only)")
+    parser.add_argument("--cache-mode", type=str, default="off", choices=["readwrite", "readonly", "off"],
+                        help="Shared API response cache: reuse and store responses, only reuse them, or disable the cache (default: off)")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Response cache directory (default: <project root>/cache/responses)")
+    parser.add_argument("--cache-max-size-mb", type=float, default=2048, help="Response cache size limit in MB; least recently used entries are evicted")
+    parser.add_argument("--batch-mode", action="store_true",
+                        help="Submit all questions as one offline job on the provider's batch API (OpenAI and TogetherAI) instead of synchronous calls")
+    parser.add_argument("--batch-poll-interval", type=float, default=60, help="Seconds between status checks of the batch job")
+    parser.add_argument("--batch-completion-window", type=str, default="24h", help="Time frame within which the provider must process the batch job")
+    parser.add_argument("--batch-no-wait", action="store_true", help="Submit (or check) the batch job and exit; run again later to ingest its results")
+    parser.add_argument("--local-engine", type=str, default="static", choices=["static", "continuous"],
+                        help="Generation engine for huggingface models: model.generate on static batches, or continuous batching where finished sequences are replaced at every decode step")
+    parser.add_argument("--prompt-store-dir", type=str, default=None, help="Directory of the pre-tokenized prompt stores of huggingface models (default: <project root>/cache/prompts)")
+    parser.add_argument("--no-prompt-store", action="store_true", help="Tokenize huggingface prompts on every run instead of reading them from the prompt store")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Initial token ceiling of huggingface batches, as batch size x (longest prompt + max tokens). The ceiling is lowered on out-of-memory errors "
+                             "and remembered in cache/token_budget for 7 days after the last one; a given value replaces the remembered one (default: no ceiling until the first out-of-memory error)")
+    parser.add_argument("--early-stop", action="store_true", help="Stop MCQ responses of huggingface models right after their **Final Answer** line instead of generating until EOS or max tokens")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Prefill the system message of every huggingface prompt instead of reusing the KV cache of the prefix shared by all prompts")
+    parser.add_argument("--no-length-bucketing", action="store_true", help="Batch local-model questions in dataset order instead of grouping them by prompt length")
     parser.add_argument("--worker-logging", action="store_true", help="Enable logging for worker processes")
     parser.add_argument("--max-tokens", type=int, default=2000, help="Maximum number of tokens in the response")
     parser.add_argument("--no-fallback", action="store_true", help="Disable fallback to individual processing when batch processing fails")
@@ -768,6 +1296,16 @@ def main():
 
     output_path = os.path.join(output_dir, "response.jsonl")
 
+    # The response cache is shared by every run, dataset and max_tokens setting
+    cache_dir = args.cache_dir or os.path.join(project_root, "cache", "responses")
+
+    # The token ceiling learned by a local model is kept per model and GPU set
+    gpu_name = (args.gpu or "all").replace(",", "_")
+    token_budget_state = os.path.join(project_root, "cache", "token_budget", f"{args.model}-gpu{gpu_name}.json")
+
+    # Pre-tokenized prompts of local models are kept per tokenizer, question type and dataset
+    prompt_store_dir = None if args.no_prompt_store else (args.prompt_store_dir or os.path.join(project_root, "cache", "prompts"))
+
     # Create logs directory inside the output directory
     logs_dir = os.path.join(output_dir, "logs")
     os.makedirs(logs_dir, exist_ok=True)
@@ -796,35 +1334,68 @@ def main():
 
     # Log startup information
     gpu_info = f", gpu: {args.gpu}" if args.gpu is not None and args.base == "huggingface" else ""
-    logger.info(f"Starting generation with base: {args.base}, model: {args.model}, data: {data_path}, output: {output_path}, type: {args.type}, retries: {args.retries}, parallel: {args.parallel}, max_tokens: {args.max_tokens}, worker_logging: {args.worker_logging}{gpu_info}")
+    logger.info(f"Starting generation with base: {args.base}, model: {args.model}, data: {data_path}, output: {output_path}, type: {args.type}, retries: {args.retries}, parallel: {args.parallel}, backend: {args.backend}, local_engine: {args.local_engine}, task_timeout: {args.task_timeout}, cache: {args.cache_mode}, rpm: {args.rpm}, tpm: {args.tpm}, max_tokens: {args.max_tokens}, batch_mode: {args.batch_mode}, worker_logging: {args.worker_logging}{gpu_info}")
 
     logger.info(f"Logs will be saved to: {log_path}")
     logger.info(f"All logs for this model can be found in: {logs_dir}")
 
     # Read dataset
-    problems = read_jsonl(data_path)
+    problems = read_jsonl(data_path, "problems")
 
     # Define metadata path
     metadata_path = os.path.join(output_dir, "metadata.json")
 
     # Process problems
     try:
-        _ = process_problems(
-            problems,
-            args.model,
-            output_path,
-            args.base,
-            args.type,
-            args.data,
-            args.retries,
-            args.parallel,
-            args.max_tokens,
-            args.no_fallback,
-            metadata_path,
-            logs_dir,
-            args.worker_logging,
-            args.gpu
-        )
+        if args.batch_mode:
+            _ = process_problems_batch(
+                problems,
+                args.model,
+                output_path,
+                args.base,
+                question_type=args.type,
+                dataset_name=args.data,
+                max_tokens=args.max_tokens,
+                metadata_path=metadata_path,
+                poll_interval=args.batch_poll_interval,
+                completion_window=args.batch_completion_window,
+                no_wait=args.batch_no_wait,
+                cache_dir=cache_dir,
+                cache_mode=args.cache_mode,
+                cache_max_size_mb=args.cache_max_size_mb
+            )
+        else:
+            _ = process_problems(
+                problems,
+                args.model,
+                output_path,
+                args.base,
+                question_type=args.type,
+                dataset_name=args.data,
+                retries=args.retries,
+                parallel_size=args.parallel,
+                max_tokens=args.max_tokens,
+                no_fallback=args.no_fallback,
+                metadata_path=metadata_path,
+                logs_dir=logs_dir,
+                worker_logging=args.worker_logging,
+                gpu=args.gpu,
+                backend=args.backend,
+                task_timeout=args.task_timeout,
+                cache_dir=cache_dir,
+                cache_mode=args.cache_mode,
+                cache_max_size_mb=args.cache_max_size_mb,
+                rpm=args.rpm,
+                tpm=args.tpm,
+                latency_factor=args.latency_factor,
+                length_bucketing=not args.no_length_bucketing,
+                local_engine=args.local_engine,
+                prompt_store_dir=prompt_store_dir,
+                token_budget=args.token_budget,
+                token_budget_state=token_budget_state,
+                early_stop=args.early_stop,
+                prefix_reuse=not args.no_prefix_cache
+            )
 
         # Generation completed successfully
         logger.info(f"Metadata available at {metadata_path}")
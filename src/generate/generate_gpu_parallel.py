@@ -2,34 +2,43 @@
 import os
 import sys
 import argparse
-import subprocess
 import logging
 import time
 import signal
 import atexit
-from concurrent.futures import ProcessPoolExecutor
-
-# Global list to track all running processes
+import json
+import glob
+import queue
+import shutil
+import datetime
+import multiprocessing
+
+from src.dataset import Dataset
+from src.type import get_type_module
+from src.generate.gpu_worker import run_worker, get_output_dir
+from src.generate.journal import ResponseJournal, merge_shards
+
+# Global list to track all running worker processes
 all_processes = []
 
 # Function to terminate all running processes
 def terminate_all_processes():
-    """Terminate all running processes when the script exits."""
+    """Terminate all running worker processes when the script exits."""
     if all_processes:
         logger.info(f"Terminating {len(all_processes)} running processes...")
-        for process, dataset in all_processes:
-            if process.poll() is None:  # Check if process is still running
+        for process, gpu_group in all_processes:
+            if process.is_alive():
                 try:
-                    logger.info(f"Terminating process for dataset: {dataset}")
+                    logger.info(f"Terminating worker for GPU group: {gpu_group}")
                     process.terminate()
                     # Give it a moment to terminate gracefully
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # If it doesn't terminate gracefully, kill it
-                    logger.warning(f"Process for {dataset} did not terminate gracefully, killing it")
-                    process.kill()
+                    process.join(timeout=5)
+                    if process.is_alive():
+                        # If it doesn't terminate gracefully, kill it
+                        logger.warning(f"Worker for GPU group {gpu_group} did not terminate gracefully, killing it")
+                        process.kill()
                 except Exception as e:
-                    logger.error(f"Error terminating process for {dataset}: {e}")
+                    logger.error(f"Error terminating worker for GPU group {gpu_group}: {e}")
 
 # Signal handler for graceful termination
 def signal_handler(sig, frame):
@@ -107,14 +116,25 @@ def get_dataset_path(dataset, project_root):
     question_type, dataset_name = dataset.split('/')
     return os.path.join(project_root, "data", "processed", question_type, dataset_name, "dataset.jsonl")
 
-def count_questions(dataset_path):
-    """Count the actual number of questions in a dataset."""
-    try:
-        with open(dataset_path, 'r', encoding='utf-8') as f:
-            return sum(1 for _ in f)
-    except Exception as e:
-        logger.error(f"Error counting questions in {dataset_path}: {e}")
-        return 0
+def prompt_length(problem, question_type):
+    """
+    Get the length of a problem's prompt in characters.
+
+    All prompts of a question type share the same template, so the character count orders
+    problems like their token count would, without loading a tokenizer in the parent.
+
+    Args:
+        problem (dict): The problem
+        question_type (str): Type of question (OEQ or MCQ)
+
+    Returns:
+        int: Number of characters of the rendered prompt
+    """
+    type_module = get_type_module(question_type)
+    question_text = problem.get('question', problem.get('problem', ''))
+    if question_type == "MCQ":
+        return len(type_module.get_prompt(question_text, problem.get('options', None), problem.get('knowledge', None)))
+    return len(type_module.get_prompt(question_text))
 
 def split_gpus(gpu_str, num_groups):
     """Split GPU IDs into groups."""
@@ -151,110 +171,348 @@ def split_gpus(gpu_str, num_groups):
 
     return gpu_groups
 
-def split_datasets(datasets, num_groups, project_root):
-    """Split datasets into groups based on question counts."""
-    # Get actual question counts
-    dataset_counts = {}
-    for dataset in datasets:
-        dataset_path = get_dataset_path(dataset, project_root)
-        count = count_questions(dataset_path)
-        if count == 0:
-            # Fall back to predefined counts if file can't be read
-            count = DATASET_INFO.get(dataset, 0)
-            logger.warning(f"Using predefined count for {dataset}: {count}")
-        dataset_counts[dataset] = count
-
-    # Sort datasets by count (descending)
-    sorted_datasets = sorted(dataset_counts.items(), key=lambda x: x[1], reverse=True)
-
-    # Initialize groups
-    groups = [[] for _ in range(num_groups)]
-    group_counts = [0] * num_groups
+def merge_dataset_shards(output_dir, problem_ids):
+    """
+    Merge the worker shards of a dataset into its response.jsonl and delete them.
 
-    # Distribute datasets using a greedy approach
-    for dataset, count in sorted_datasets:
-        # Find the group with the smallest total count
-        min_idx = group_counts.index(min(group_counts))
-        groups[min_idx].append(dataset)
-        group_counts[min_idx] += count
+    Args:
+        output_dir (str): Output directory of the dataset
+        problem_ids (list): Problem ids of the dataset, in dataset order
 
-    # Log the distribution
-    for i, (group, count) in enumerate(zip(groups, group_counts)):
-        logger.info(f"Group {i+1}: {count} questions - {group}")
+    Returns:
+        int: Number of shard records merged
+    """
+    shard_paths = sorted(glob.glob(os.path.join(output_dir, "shards", "*", "response.jsonl")))
+    if not shard_paths:
+        return 0
+    merged = merge_shards(os.path.join(output_dir, "response.jsonl"), shard_paths, order=problem_ids)
+    shutil.rmtree(os.path.join(output_dir, "shards"))
+    return merged
 
-    return groups
+def plan_work_items(datasets, project_root, config, chunk_size):
+    """
+    Split the unanswered questions of all datasets into work items for the shared queue.
 
-def run_generate_script(args):
-    """Run the generate.py script with the given arguments."""
-    # Unpack arguments (log_dir is only used for the main script, not passed to child processes)
-    gpu_group, datasets, base, model, max_tokens, retries, parallel, log_level, worker_logging, no_fallback, _ = args
+    Shards left behind by an interrupted run are merged first, so that their responses
+    count as done. The pending questions of each dataset are sorted by prompt length,
+    longest first, before they are chunked: each work item then holds questions of similar
+    length, so its batches are not padded to one long outlier, and the longest items are
+    taken first instead of being left for the end of the run.
 
-    logger.info(f"Processing {len(datasets)} datasets sequentially on GPU group: {gpu_group}")
+    Args:
+        datasets (list): Datasets as ``TYPE/name``
+        project_root (str): Project root directory
+        config (dict): Generation settings shared by all workers
+        chunk_size (int): Number of questions per work item
 
-    # Process each dataset sequentially within this GPU group
+    Returns:
+        tuple: (items, dataset_state) where items are dictionaries with the dataset, item
+            index and problem ids, and dataset_state maps each dataset to its output
+            directory, problem ids and progress counters
+    """
+    items = []
+    dataset_state = {}
     for dataset in datasets:
-        question_type, dataset_name = dataset.split('/')
+        dataset_path = get_dataset_path(dataset, project_root)
+        try:
+            problems = Dataset.from_jsonl(dataset_path, "problems")
+        except Exception as e:
+            logger.error(f"Error reading {dataset_path}, skipping {dataset}: {e}")
+            continue
+        problem_ids = problems.ids()
+
+        output_dir = get_output_dir(project_root, dataset, config)
+        merged = merge_dataset_shards(output_dir, problem_ids)
+        if merged:
+            logger.info(f"Merged {merged} responses of an interrupted run into {dataset}")
+
+        journal = ResponseJournal(os.path.join(output_dir, "response.jsonl"))
+        done_ids = journal.successful_ids()
+        journal.close()
+
+        # Longest prompts first, so that chunks hold questions of similar length
+        question_type = dataset.split('/')[0]
+        pending = [problem_id for problem_id in problem_ids if problem_id not in done_ids]
+        pending.sort(key=lambda problem_id: prompt_length(problems.get(problem_id), question_type), reverse=True)
+
+        dataset_state[dataset] = {
+            'output_dir': output_dir,
+            'problem_ids': problem_ids,
+            'items': 0,
+            'finished_items': 0,
+            'finished_questions': 0,
+            'pending_questions': len(pending),
+            'questions_by_gpu': {},
+            'item_metadata': []
+        }
+        for start in range(0, len(pending), chunk_size):
+            items.append({'dataset': dataset, 'item': dataset_state[dataset]['items'], 'ids': pending[start:start + chunk_size]})
+            dataset_state[dataset]['items'] += 1
+        logger.info(f"{dataset}: {len(problem_ids)} questions, {len(pending)} to generate in {dataset_state[dataset]['items']} work items")
+
+    return items, dataset_state
+
+def start_workers(gpu_groups, items, config):
+    """
+    Start one persistent worker process per GPU group, all pulling from one shared work queue.
 
-        cmd = [
-            "python3", "-m", "src.generate.generate",
-            "--base", base,
-            "--model", model,
-            "--data", dataset_name,
-            "--type", question_type,
-            "--max-tokens", str(max_tokens),
-            "--retries", str(retries),
-            "--parallel", str(parallel),
-            "--log-level", log_level,
-            "--gpu", gpu_group
-        ]
+    Workers are started with the spawn method, so that no CUDA state of this process is
+    inherited and each worker only sees its own GPU group.
 
-        # We don't pass the log directory to child processes
-        # They will use their default log paths
+    Args:
+        gpu_groups (list): GPU device IDs of each group (e.g. ["0,1", "2,3"])
+        items (list): Work items, as returned by plan_work_items
+        config (dict): Generation settings shared by all workers
 
-        if worker_logging:
-            cmd.append("--worker-logging")
+    Returns:
+        tuple: (workers, work_queue, event_queue) where workers maps worker index -> dict
+            with the process, GPU group and the work item in progress
+    """
+    context = multiprocessing.get_context("spawn")
+    event_queue = context.Queue()
+
+    # Whichever worker is free takes the next item; one None per worker ends the run
+    work_queue = context.Queue()
+    for item in items:
+        work_queue.put(item)
+    for _ in gpu_groups:
+        work_queue.put(None)
+
+    workers = {}
+    for worker_id, gpu_group in enumerate(gpu_groups):
+        process = context.Process(target=run_worker, args=(worker_id, gpu_group, config, work_queue, event_queue), name=f"gpu-worker-{worker_id}")
+        process.start()
+        all_processes.append((process, gpu_group))
+        logger.info(f"Started worker {worker_id} (pid {process.pid}) on GPU group {gpu_group}")
+
+        workers[worker_id] = {
+            'process': process,
+            'gpu': gpu_group,
+            'current': None,
+            'items': 0,
+            'exited': False
+        }
+    return workers, work_queue, event_queue
+
+def handle_event(event, workers, dataset_state, total_items):
+    """
+    Log an event reported by a worker and update the progress counters.
 
-        if no_fallback:
-            cmd.append("--no-fallback")
+    Args:
+        event (dict): Event dictionary (see src/generate/gpu_worker.py)
+        workers (dict): Worker state, as returned by start_workers
+        dataset_state (dict): Dataset state, as returned by plan_work_items
+        total_items (int): Number of work items of the run
+    """
+    worker = workers[event['worker']]
+    name = f"GPU group {event['gpu']}"
+    kind = event['event']
+
+    if kind == 'ready':
+        logger.info(f"{name}: model loaded in {event['load_seconds']:.1f} seconds (worker log: {event['log_path']})")
+    elif kind == 'load_failed':
+        logger.error(f"{name}: could not load the model, the other GPU groups take over its share: {event['error']}")
+    elif kind == 'started':
+        worker['current'] = (event['dataset'], event['item'])
+        logger.debug(f"{name}: took work item {event['item']} of {event['dataset']} ({event['questions']} questions)")
+    elif kind in ('completed', 'failed'):
+        worker['current'] = None
+        worker['items'] += 1
+        state = dataset_state[event['dataset']]
+        state['finished_items'] += 1
+        state['finished_questions'] += event['questions']
+        state['questions_by_gpu'][event['gpu']] = state['questions_by_gpu'].get(event['gpu'], 0) + event['questions']
+        finished_items = sum(s['finished_items'] for s in dataset_state.values())
+
+        if kind == 'completed':
+            state['item_metadata'].append((event['gpu'], event.get('metadata', {})))
+            logger.info(f"{name}: {event['dataset']} item {event['item']} done in {event['elapsed_seconds']:.1f} seconds "
+                        f"({event['successful']} successful, {event['errors']} errors); {event['dataset']} "
+                        f"{state['finished_questions']}/{state['pending_questions']} questions, all datasets {finished_items}/{total_items} items")
+        else:
+            logger.error(f"{name}: {event['dataset']} item {event['item']} failed after {event['elapsed_seconds']:.1f} seconds: {event.get('error')}")
+    elif kind == 'exit':
+        worker['exited'] = True
+        logger.info(f"{name}: worker finished after {worker['items']} work items")
+
+def monitor_workers(workers, event_queue, dataset_state, total_items, poll_interval=5):
+    """
+    Stream worker events until every worker has exited.
 
-        logger.info(f"Starting dataset {dataset} on GPU group {gpu_group}")
-        logger.info(f"Running command: {' '.join(cmd)}")
+    The work item of a worker that dies without reporting its exit (e.g. killed by the
+    OOM killer) is logged as lost; its unanswered questions are generated by the next run.
 
+    Args:
+        workers (dict): Worker state, as returned by start_workers
+        event_queue (multiprocessing.Queue): Queue the workers report their events to
+        dataset_state (dict): Dataset state, as returned by plan_work_items
+        total_items (int): Number of work items of the run
+        poll_interval (float): Seconds between liveness checks while no events arrive
+    """
+    while not all(worker['exited'] for worker in workers.values()):
         try:
-            # Start the process
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-
-            # Add to global list for cleanup
-            all_processes.append((process, dataset))
-
-            # Wait for this process to complete before starting the next one
-            logger.info(f"Waiting for dataset {dataset} to complete on GPU group {gpu_group}...")
-            stdout, stderr = process.communicate()
-
-            # Log the output to our log file
-            if stdout:
-                logger.debug(f"STDOUT for {dataset} on GPU group {gpu_group}:\n{stdout}")
-
-            if process.returncode != 0:
-                logger.error(f"Process for {dataset} failed with code {process.returncode}")
-                logger.error(f"STDERR for {dataset} on GPU group {gpu_group}:\n{stderr}")
+            handle_event(event_queue.get(timeout=poll_interval), workers, dataset_state, total_items)
+            continue
+        except queue.Empty:
+            pass
+
+        for worker_id, worker in workers.items():
+            if worker['exited'] or worker['process'].is_alive():
+                continue
+            # Events the worker sent just before exiting may still be in the queue
+            try:
+                while True:
+                    handle_event(event_queue.get(timeout=1), workers, dataset_state, total_items)
+            except queue.Empty:
+                pass
+            if worker['exited']:
+                continue
+            logger.error(f"Worker {worker_id} on GPU group {worker['gpu']} exited unexpectedly with code {worker['process'].exitcode}")
+            if worker['current'] is not None:
+                dataset, item = worker['current']
+                logger.error(f"Work item {item} of {dataset} was lost with it; its questions will be generated by the next run")
+            worker['exited'] = True
+
+    for worker in workers.values():
+        worker['process'].join()
+        if (worker['process'], worker['gpu']) in all_processes:
+            all_processes.remove((worker['process'], worker['gpu']))
+
+# Fields of the per-item metadata that hold a setting or the latest state rather than a count;
+# merging keeps their last value instead of adding them up
+LAST_VALUE_FIELDS = {'ceiling', 'largest_success', 'max_batch_size', 'max_new_tokens', 'token_ceiling', 'prefix_tokens', 'path', 'prompts', 'size_mb'}
+
+def add_counters(total, stats):
+    """
+    Add the counters of one metadata section to a running total, recursing into nested sections.
+
+    Args:
+        total (dict): Running total, updated in place
+        stats (dict): The section of one work item
+    """
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            add_counters(total.setdefault(key, {}), value)
+        elif key == 'min_prompt_tokens':
+            total[key] = min(total.get(key, value), value)
+        elif key == 'max_prompt_tokens':
+            total[key] = max(total.get(key, value), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in LAST_VALUE_FIELDS:
+            total[key] = total.get(key, 0) + value
+        else:
+            total[key] = value
+
+def merge_item_metadata(item_metadata):
+    """
+    Merge the process_problems metadata of a dataset's work items into the sections of one metadata.json.
+
+    Counters are added up and the ratios derived from them are recomputed. The token budget
+    is kept per GPU group, since each group learns its own ceiling, and the parameters are
+    taken from the last item.
+
+    Args:
+        item_metadata (list): (GPU group, metadata sections) of each completed work item,
+            with the sections listed in gpu_worker.ITEM_METADATA_SECTIONS
+
+    Returns:
+        dict: Section name -> merged section
+    """
+    merged = {}
+    for gpu_group, sections in item_metadata:
+        for section, stats in sections.items():
+            if section == 'parameters':
+                merged.setdefault('parameters', {}).update(stats)
+            elif section == 'token_budget':
+                add_counters(merged.setdefault('token_budget', {}).setdefault(gpu_group, {}), stats)
+            elif section == 'engine':
+                # The engine reports a mean batch size; weight it by the item's decode steps
+                add_counters(merged.setdefault('engine', {}), {**stats, 'batch_size_sum': stats.get('mean_batch_size', 0) * stats.get('steps', 0)})
             else:
-                logger.info(f"Process for {dataset} completed successfully on GPU group {gpu_group}")
-                if stderr:
-                    logger.debug(f"STDERR for {dataset} on GPU group {gpu_group} (non-error):\n{stderr}")
+                add_counters(merged.setdefault(section, {}), stats)
+
+    # Recompute the ratios, which were added up with the counters
+    for section in ('padding', 'length_buckets'):
+        if section in merged:
+            padded = merged[section].get('padded_prompt_tokens', 0)
+            merged[section]['padding_efficiency'] = round(merged[section].get('prompt_tokens', 0) / padded, 4) if padded else 1.0
+    if 'length_buckets' in merged:
+        padded = merged['length_buckets'].get('dataset_order_padded_prompt_tokens', 0)
+        merged['length_buckets']['dataset_order_padding_efficiency'] = round(merged['length_buckets'].get('prompt_tokens', 0) / padded, 4) if padded else 1.0
+    if 'early_stopping' in merged:
+        sequences = merged['early_stopping'].get('sequences', 0)
+        merged['early_stopping']['stopped_share'] = round(merged['early_stopping'].get('stopped', 0) / sequences, 4) if sequences else 0.0
+    if 'engine' in merged:
+        steps = merged['engine'].get('steps', 0)
+        merged['engine']['mean_batch_size'] = round(merged['engine'].pop('batch_size_sum', 0) / steps, 2) if steps else 0
+    return merged
+
+def write_dataset_metadata(dataset, state, config, chunk_size):
+    """
+    Merge a dataset's shards and write its metadata.json from the merged responses.
 
-            # Remove from global list since it's completed
-            all_processes.remove((process, dataset))
+    The statistics are counted from the merged response file; the padding, early stopping,
+    prefix cache, token budget, prompt store and engine sections are merged from the
+    metadata of the work items completed in this run (see merge_item_metadata).
 
-        except Exception as e:
-            logger.error(f"Error processing dataset {dataset} on GPU group {gpu_group}: {e}")
+    Args:
+        dataset (str): Dataset as ``TYPE/name``
+        state (dict): The dataset's entry in the dataset state
+        config (dict): Generation settings shared by all workers
+        chunk_size (int): Number of questions per work item
 
-    return True
+    Returns:
+        dict: The dataset's statistics
+    """
+    output_dir = state['output_dir']
+    merge_dataset_shards(output_dir, state['problem_ids'])
+
+    journal = ResponseJournal(os.path.join(output_dir, "response.jsonl"))
+    successful_count, error_count = journal.count()
+    journal.close()
+    total_questions = len(state['problem_ids'])
+
+    question_type, dataset_name = dataset.split('/')
+    item_sections = merge_item_metadata(state['item_metadata'])
+    statistics = {
+        'total_questions': total_questions,
+        'successful_responses': successful_count,
+        'error_responses': error_count,
+        'missing_questions': total_questions - successful_count - error_count,
+        'completion_percentage': round((successful_count / total_questions) * 100, 2) if total_questions > 0 else 0
+    }
+    metadata = {
+        'model': {
+            'name': config['model'],
+            'base': config['base'],
+            'details': {'max_tokens': config['max_tokens']}
+        },
+        'dataset': {
+            'name': dataset_name,
+            'type': question_type,
+            'total_questions': total_questions
+        },
+        'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'statistics': statistics,
+        'parameters': {
+            **item_sections.pop('parameters', {}),
+            'retries': config['retries'],
+            'parallel_size': config['parallel'],
+            'max_tokens': config['max_tokens'],
+            'no_fallback': config['no_fallback'],
+            'worker_logging': config['worker_logging'],
+            'local_engine': config['local_engine'],
+            'token_budget': config['token_budget'],
+            'chunk_size': chunk_size
+        },
+        **item_sections,
+        'work_stealing': {
+            'work_items': state['items'],
+            'questions_by_gpu_group': state['questions_by_gpu']
+        }
+    }
+    with open(os.path.join(output_dir, "metadata.json"), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    return statistics
 
 def main():
     # Register signal handlers for graceful termination
@@ -264,9 +522,9 @@ def main():
     # Register cleanup function to run at exit
     atexit.register(terminate_all_processes)
 
-    logger.info("Process termination handlers registered. All subprocesses will be terminated if the script exits.")
+    logger.info("Process termination handlers registered. All worker processes will be terminated if the script exits.")
 
-    parser = argparse.ArgumentParser(description="Run generate.py in parallel with multiple GPU groups for local models. Each GPU group processes its datasets sequentially.")
+    parser = argparse.ArgumentParser(description="Generate with local models on multiple GPU groups in parallel. Each GPU group runs one worker that loads the model once and takes chunks of questions from a queue shared by all groups.")
     parser.add_argument("--base", type=str, default="huggingface", help="Base model type (must be huggingface)")
     parser.add_argument("--model", type=str, required=True, help="Model to use (e.g., Qwen2.5-72B-GeoGPT)")
     parser.add_argument("--datasets", type=str, nargs='+', help="List of datasets to process (e.g., OEQ/PAC MCQ/main_1-10)")
@@ -278,6 +536,15 @@ def main():
     parser.add_argument("--log-level", type=str, default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], help="Set the logging level")
     parser.add_argument("--worker-logging", action="store_true", help="Enable logging for worker processes")
     parser.add_argument("--no-fallback", action="store_true", help="Disable fallback to individual processing when batch processing fails")
+    parser.add_argument("--local-engine", type=str, default="static", choices=["static", "continuous"],
+                        help="Generation engine of the workers: model.generate on static batches, or continuous batching where finished sequences are replaced at every decode step")
+    parser.add_argument("--token-budget", type=int, default=None,
+                        help="Initial token ceiling of each GPU group's batches, as batch size x (longest prompt + max tokens). The ceiling is lowered on out-of-memory errors "
+                             "and remembered per GPU group in cache/token_budget for 7 days after the last one; a given value replaces the remembered one (default: no ceiling until the first out-of-memory error)")
+    parser.add_argument("--early-stop", action="store_true", help="Stop MCQ responses right after their **Final Answer** line instead of generating until EOS or max tokens")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="Prefill the system message of every prompt instead of reusing the KV cache of the prefix shared by all prompts")
+    parser.add_argument("--no-length-bucketing", action="store_true", help="Batch the questions of a work item in their planned order instead of grouping them by prompt length")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Number of questions per work item taken by a GPU group (default: 4 x --parallel)")
     parser.add_argument("--log-dir", type=str, default="parallel_log", help="Directory to store logs for this script only (default: parallel_log)")
 
     args = parser.parse_args()
@@ -320,38 +587,50 @@ def main():
 
     logger.info(f"Created {len(gpu_groups)} GPU groups: {gpu_groups}")
 
-    # Split datasets into groups
-    dataset_groups = split_datasets(args.datasets, len(gpu_groups), project_root)
-
-    # Prepare arguments for each GPU group
-    process_args = []
-    for gpu_group, dataset_group in zip(gpu_groups, dataset_groups):
-        process_args.append((
-            gpu_group,
-            dataset_group,
-            args.base,
-            args.model,
-            args.max_tokens,
-            args.retries,
-            args.parallel,
-            args.log_level,
-            args.worker_logging,
-            args.no_fallback,
-            args.log_dir
-        ))
-
-    # Run generate.py in parallel for each GPU group
-    # Each GPU group will process its datasets sequentially
+    # Generation settings shared by all workers
+    config = {
+        'base': args.base,
+        'model': args.model,
+        'max_tokens': args.max_tokens,
+        'retries': args.retries,
+        'parallel': args.parallel,
+        'log_level': args.log_level,
+        'worker_logging': args.worker_logging,
+        'no_fallback': args.no_fallback,
+        'local_engine': args.local_engine,
+        'token_budget': args.token_budget,
+        'early_stop': args.early_stop,
+        'prefix_reuse': not args.no_prefix_cache,
+        'length_bucketing': not args.no_length_bucketing,
+        'log_dir': log_dir
+    }
+
+    # Split the unanswered questions of all datasets into work items
+    chunk_size = args.chunk_size or 4 * args.parallel
+    items, dataset_state = plan_work_items(args.datasets, project_root, config, chunk_size)
+    if not items:
+        logger.info("All questions have already been answered. Nothing to do.")
+
+    # Start one persistent worker per GPU group
+    # Each worker loads the model once and then takes work items from the shared queue whenever it is free
     start_time = time.time()
-    logger.info(f"Starting parallel execution with {len(gpu_groups)} GPU groups")
-    logger.info(f"Each GPU group will process its datasets SEQUENTIALLY")
-
-    with ProcessPoolExecutor(max_workers=len(gpu_groups)) as executor:
-        list(executor.map(run_generate_script, process_args))
+    if items:
+        logger.info(f"Starting {len(gpu_groups)} GPU workers on {len(items)} work items of up to {chunk_size} questions")
+        # work_queue stays referenced until the workers are done; they unpickle it after start
+        workers, work_queue, event_queue = start_workers(gpu_groups, items, config)
+        monitor_workers(workers, event_queue, dataset_state, len(items))
 
     end_time = time.time()
     total_time = end_time - start_time
 
+    # Merge the shards of every dataset generated in this run into its response.jsonl and summarize it
+    for dataset, state in dataset_state.items():
+        if not state['items']:
+            continue
+        statistics = write_dataset_metadata(dataset, state, config, chunk_size)
+        logger.info(f"{dataset}: {statistics['successful_responses']}/{statistics['total_questions']} successful, "
+                    f"{statistics['error_responses']} errors, {statistics['missing_questions']} missing "
+                    f"(questions by GPU group: {state['questions_by_gpu'] or 'none'})")
     logger.info(f"All processes completed in {total_time:.2f} seconds")
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+Run a matrix of API models and datasets in a single process.
+
+Every (model, dataset) pair becomes a job that runs process_problems on its own thread,
+with the same output layout as separate generate.py runs. All jobs share the process-wide
+scheduling state of the API models: one Ray runtime (or asyncio engine), one response
+cache (when enabled with --cache-mode) and one rate limiter per provider. Requests of jobs on the same provider
+are interleaved under that provider's concurrency, rpm and tpm limits, and jobs on
+different providers overlap instead of running back to back.
+
+Example:
+    python -m src.generate.generate_matrix \
+        --models openai:gpt4o together:llama deepseek:v3 \
+        --datasets MCQ/main_1-10 MCQ/extra_1-10 OEQ/oeq \
+        --provider-limits openai:concurrency=32,rpm=500 together:concurrency=16 \
+        --backend asyncio --max-tokens 8000
+"""
+import os
+import sys
+import json
+import argparse
+import logging
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.dataset import read_jsonl
+from src.generate.generate import process_problems, format_duration
+from src.models import get_model, APIBaseModel
+from src.models.rate_limiter import configure_rate_limits
+from src.models.response_cache import ResponseCache
+
+# Initialize logger (handlers are configured in main)
+logger = logging.getLogger(__name__)
+
+def parse_provider_limits(specs):
+    """
+    Parse per-provider limits of the form ``provider:concurrency=32,rpm=500,tpm=200000,latency=2``.
+
+    Args:
+        specs (list): Limit specifications, one per provider
+
+    Returns:
+        dict: Provider name -> {'concurrency': int, 'rpm': float, 'tpm': float, 'latency': float} (missing keys are None)
+    """
+    limits = {}
+    for spec in specs or []:
+        provider, _, settings = spec.partition(":")
+        provider_limits = {'concurrency': None, 'rpm': None, 'tpm': None, 'latency': None}
+        for setting in filter(None, settings.split(",")):
+            key, _, value = setting.partition("=")
+            key = key.strip()
+            if key not in provider_limits or not value:
+                raise ValueError(f"Invalid provider limit '{setting}' in '{spec}'. Expected concurrency=N, rpm=N, tpm=N or latency=F")
+            provider_limits[key] = int(value) if key == 'concurrency' else float(value)
+        limits[provider] = provider_limits
+    return limits
+
+def build_jobs(models, datasets):
+    """
+    Build the job list for every (model, dataset) pair, interleaved across providers so
+    that the first jobs to start cover as many providers as possible.
+
+    Args:
+        models (list): Models as ``base:model``
+        datasets (list): Datasets as ``TYPE/name`` (e.g. MCQ/main_1-10)
+
+    Returns:
+        list: Job dictionaries with base, model, provider, question_type and dataset
+
+    Raises:
+        ValueError: If a model is not an API model or a dataset is malformed
+    """
+    jobs_by_provider = {}
+    for model_spec in models:
+        base_name, _, model_name = model_spec.partition(":")
+        ModelClass = get_model(model_name, base_name)
+        if not issubclass(ModelClass, APIBaseModel):
+            raise ValueError(f"{model_spec} is not an API model; use generate_gpu_parallel for local models")
+        provider = ModelClass.PROVIDER or base_name
+
+        for dataset in datasets:
+            question_type, _, dataset_name = dataset.partition("/")
+            if not dataset_name:
+                raise ValueError(f"Invalid dataset '{dataset}'. Expected TYPE/name, e.g. MCQ/main_1-10")
+            jobs_by_provider.setdefault(provider, []).append({
+                'base': base_name,
+                'model': model_name,
+                'provider': provider,
+                'question_type': question_type,
+                'dataset': dataset_name,
+                'name': f"{base_name}-{model_name}/{question_type}/{dataset_name}"
+            })
+
+    # Round-robin over providers
+    jobs = []
+    queues = list(jobs_by_provider.values())
+    while any(queues):
+        for queue in queues:
+            if queue:
+                jobs.append(queue.pop(0))
+    return jobs
+
+def run_job(job, args, project_root, response_cache, provider_limits):
+    """
+    Run one (model, dataset) job with process_problems.
+
+    Args:
+        job (dict): The job, as built by build_jobs
+        args (argparse.Namespace): Parsed command-line arguments
+        project_root (str): Project root directory
+        response_cache (ResponseCache): Response cache shared by all jobs, or None if disabled
+        provider_limits (dict): Parsed per-provider limits
+
+    Returns:
+        dict: Job summary with status, statistics and elapsed time
+    """
+    # Name the thread after the job so interleaved log lines can be told apart
+    threading.current_thread().name = job['name']
+
+    data_path = os.path.join(project_root, "data", "processed", job['question_type'], job['dataset'], "dataset.jsonl")
+    output_dir = os.path.join(project_root, "output", job['question_type'], job['dataset'], f"{job['base']}-{job['model']}-{args.max_tokens}")
+    output_path = os.path.join(output_dir, "response.jsonl")
+    metadata_path = os.path.join(output_dir, "metadata.json")
+    logs_dir = os.path.join(output_dir, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+
+    limits = provider_limits.get(job['provider'], {})
+    summary = dict(job)
+    summary['output_dir'] = output_dir
+
+    start_time = time.time()
+    logger.info(f"Starting job {job['name']} with provider limits: {limits or 'default'}")
+    try:
+        problems = read_jsonl(data_path, "problems")
+        _, metadata = process_problems(
+            problems,
+            job['model'],
+            output_path,
+            job['base'],
+            question_type=job['question_type'],
+            dataset_name=job['dataset'],
+            retries=args.retries,
+            parallel_size=args.parallel,
+            max_tokens=args.max_tokens,
+            no_fallback=args.no_fallback,
+            metadata_path=metadata_path,
+            logs_dir=logs_dir,
+            worker_logging=args.worker_logging,
+            backend=args.backend,
+            task_timeout=args.task_timeout,
+            response_cache=response_cache,
+            rpm=limits.get('rpm'),
+            tpm=limits.get('tpm'),
+            max_concurrency=limits.get('concurrency'),
+            latency_factor=limits.get('latency')
+        )
+        summary['status'] = 'completed'
+        if metadata is not None:
+            summary['statistics'] = metadata.get('statistics')
+    except Exception as e:
+        logger.error(f"Job {job['name']} failed: {e}")
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+
+    summary['elapsed_seconds'] = time.time() - start_time
+    logger.info(f"Finished job {job['name']} ({summary['status']}) in {format_duration(summary['elapsed_seconds'])}")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a matrix of API models and datasets in one process with shared per-provider scheduling")
+    parser.add_argument("--models", nargs="+", required=True, help="Models as base:model (e.g. openai:gpt4o together:llama)")
+    parser.add_argument("--datasets", nargs="+", required=True, help="Datasets as TYPE/name (e.g. MCQ/main_1-10 OEQ/oeq)")
+    parser.add_argument("--provider-limits", nargs="*", default=[],
+                        help="Per-provider limits as provider:concurrency=N,rpm=N,tpm=N,latency=F (e.g. openai:concurrency=32,rpm=500). "
+                             "Concurrency is shared by all jobs on the provider and defaults to --parallel. "
+                             "latency=F also backs off when the latency per generated token exceeds F times its recent average (default: 429s only).")
+    parser.add_argument("--max-concurrent-jobs", type=int, default=None, help="Maximum number of jobs running at the same time (default: all)")
+    parser.add_argument("--parallel", type=int, default=16, help="Number of requests each job keeps in flight")
+    parser.add_argument("--backend", type=str, default="asyncio", choices=["ray", "asyncio"], help="Execution backend for API models")
+    parser.add_argument("--retries", type=int, default=1, help="Number of retries if the first attempt fails")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="Maximum number of tokens in the response")
+    parser.add_argument("--task-timeout", type=float, default=None, help="Per-question deadline in seconds")
+    parser.add_argument("--no-fallback", action="store_true", help="Disable fallback to individual processing when batch processing fails")
+    parser.add_argument("--worker-logging", action="store_true", help="Enable logging for worker processes")
+    parser.add_argument("--cache-mode", type=str, default="off", choices=["readwrite", "readonly", "off"], help="Shared API response cache mode (default: off)")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Response cache directory (default: <project root>/cache/responses)")
+    parser.add_argument("--cache-max-size-mb", type=float, default=2048, help="Response cache size limit in MB")
+    parser.add_argument("--log-level", type=str, default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+                        help="Set the logging level (default: INFO)")
+    args = parser.parse_args()
+
+    # Get the project root directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(script_dir))
+
+    # One log file for the whole matrix; the thread name identifies the job of each line
+    logs_dir = os.path.join(project_root, "output", "matrix_logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_path = os.path.join(logs_dir, f"matrix_{timestamp}.log")
+
+    log_level = getattr(logging, args.log_level)
+    formatter = logging.Formatter('%(asctime)s - %(threadName)s - %(name)s - %(levelname)s - %(message)s')
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    for handler in root_logger.handlers:
+        handler.setFormatter(formatter)
+    file_handler = logging.FileHandler(log_path)
+    file_handler.setLevel(log_level)
+    file_handler.setFormatter(formatter)
+    root_logger.addHandler(file_handler)
+
+    provider_limits = parse_provider_limits(args.provider_limits)
+    jobs = build_jobs(args.models, args.datasets)
+    max_workers = args.max_concurrent_jobs or len(jobs)
+
+    # The backend is process-wide; set it once before any model is created
+    APIBaseModel.set_backend(args.backend)
+
+    # Configure each provider's shared limiter once, before any job starts. The jobs pass the
+    # same limits to process_problems, which leaves an unchanged limiter alone, so a job starting
+    # later neither refills the buckets nor resets the concurrency learned from 429s.
+    for provider in sorted({job['provider'] for job in jobs}):
+        limits = provider_limits.get(provider, {})
+        configure_rate_limits(provider, rpm=limits.get('rpm'), tpm=limits.get('tpm'), max_concurrency=limits.get('concurrency') or args.parallel, latency_factor=limits.get('latency'))
+
+    # Open the response cache once, so all jobs coalesce identical in-flight prompts and share
+    # one size limit instead of each scanning the cache directory and evicting on its own
+    response_cache = None
+    if args.cache_mode != "off":
+        cache_dir = args.cache_dir or os.path.join(project_root, "cache", "responses")
+        response_cache = ResponseCache(cache_dir, max_size_mb=args.cache_max_size_mb, read_only=(args.cache_mode == "readonly"))
+
+    logger.info(f"Running {len(jobs)} jobs ({len(args.models)} models x {len(args.datasets)} datasets), up to {max_workers} at a time, backend: {args.backend}")
+    logger.info(f"Provider limits: {provider_limits or 'default'}")
+    logger.info(f"Logs will be saved to: {log_path}")
+
+    start_time = time.time()
+    summaries = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="matrix") as executor:
+        futures = [executor.submit(run_job, job, args, project_root, response_cache, provider_limits) for job in jobs]
+        for future in as_completed(futures):
+            summaries.append(future.result())
+            logger.info(f"{len(summaries)}/{len(jobs)} jobs finished")
+
+    total_time = time.time() - start_time
+    summaries.sort(key=lambda summary: summary['name'])
+
+    # Write a summary of the whole matrix next to the log file
+    summary_path = os.path.join(logs_dir, f"matrix_{timestamp}.json")
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'total_time_seconds': total_time, 'provider_limits': provider_limits,
+                   'cache': response_cache.get_stats() if response_cache is not None else None, 'jobs': summaries}, f, indent=2)
+
+    logger.info(f"Matrix finished in {format_duration(total_time)}")
+    for summary in summaries:
+        stats = summary.get('statistics') or {}
+        logger.info(f"  {summary['name']}: {summary['status']}, {stats.get('successful_responses', 0)} successful, "
+                    f"{stats.get('error_responses', 0)} errors, {format_duration(summary['elapsed_seconds'])}")
+    logger.info(f"Summary saved to {summary_path}")
+
+    if any(summary['status'] != 'completed' for summary in summaries):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Persistent generation worker for one GPU group.
+
+generate_gpu_parallel starts one worker process per GPU group. The worker loads the local
+model once and then pulls work items from a queue shared by all workers until it receives
+None. A work item is a chunk of questions of one dataset; the worker runs process_problems
+on it with the already loaded model and writes the responses to its own shard of the
+dataset (see get_shard_path). The parent merges the shards into the dataset's normal
+response.jsonl once all workers are done.
+
+Progress is reported to the parent as events on a shared event queue, one dictionary per
+event, instead of as captured process output:
+    {'event': 'ready', 'worker': 0, 'gpu': '0,1', 'load_seconds': 312.5}
+    {'event': 'started', 'worker': 0, 'gpu': '0,1', 'dataset': 'MCQ/main_1-10', 'item': 3, 'questions': 16}
+    {'event': 'completed' | 'failed', 'worker': 0, 'gpu': '0,1', 'dataset': 'MCQ/main_1-10', 'item': 3, ...}
+    {'event': 'exit', 'worker': 0, 'gpu': '0,1'}
+
+A completed event carries the sections of the item's process_problems metadata listed in
+ITEM_METADATA_SECTIONS, which the parent merges into the dataset's metadata.json.
+"""
+import os
+import time
+import logging
+import traceback
+
+# Initialize logger (handlers are configured in run_worker)
+logger = logging.getLogger(__name__)
+
+# Sections of the process_problems metadata that describe how a work item was generated
+ITEM_METADATA_SECTIONS = ['parameters', 'length_buckets', 'padding', 'early_stopping', 'prefix_cache', 'token_budget', 'prompt_store', 'engine']
+
+def setup_worker_logging(log_dir, worker_id, gpu_group, log_level):
+    """
+    Send the worker's logs to a file of its own instead of the parent's console.
+
+    Args:
+        log_dir (str): Directory of the parent's logs
+        worker_id (int): Index of the worker
+        gpu_group (str): GPU device IDs of the worker
+        log_level (str): Logging level name (e.g. "INFO")
+
+    Returns:
+        str: Path to the worker's log file
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    log_path = os.path.join(log_dir, f"gpu_worker_{worker_id}_gpu{gpu_group.replace(',', '_')}_{timestamp}.log")
+
+    handler = logging.FileHandler(log_path)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    # Drop console handlers (e.g. the one src.generate.generate configures) so worker logs do not interleave on the console
+    root_logger = logging.getLogger()
+    for existing in list(root_logger.handlers):
+        root_logger.removeHandler(existing)
+    root_logger.addHandler(handler)
+    root_logger.setLevel(getattr(logging, log_level))
+    return log_path
+
+def get_output_dir(project_root, dataset, config):
+    """
+    Get the output directory of a dataset, the same one a generate.py run uses.
+
+    Args:
+        project_root (str): Project root directory
+        dataset (str): Dataset as ``TYPE/name`` (e.g. MCQ/main_1-10)
+        config (dict): Generation settings shared by all workers (see generate_gpu_parallel.main)
+
+    Returns:
+        str: Path to the output directory
+    """
+    question_type, dataset_name = dataset.split('/')
+    return os.path.join(project_root, "output", question_type, dataset_name, f"{config['base']}-{config['model']}-{config['max_tokens']}")
+
+def get_shard_path(output_dir, worker_id):
+    """
+    Get the response file a worker writes its part of a dataset to.
+
+    Args:
+        output_dir (str): Output directory of the dataset
+        worker_id (int): Index of the worker
+
+    Returns:
+        str: Path to the shard's response file
+    """
+    return os.path.join(output_dir, "shards", f"worker{worker_id}", "response.jsonl")
+
+def run_work_item(model, item, problems, config, worker_id, gpu_group, project_root, emit):
+    """
+    Generate the responses to one chunk of questions with the loaded model.
+
+    Args:
+        model (HuggingFaceBaseModel): The worker's loaded model
+        item (dict): Work item with the dataset (``TYPE/name``), its index and the problem ids to generate
+        problems (Dataset): All problems of the dataset, indexed by id
+        config (dict): Generation settings shared by all workers (see generate_gpu_parallel.main)
+        worker_id (int): Index of the worker
+        gpu_group (str): GPU device IDs of the worker
+        project_root (str): Project root directory
+        emit (callable): Sends an event dictionary to the parent
+
+    Returns:
+        dict: Item summary with status, counts and elapsed time
+    """
+    from src.generate.generate import process_problems
+
+    dataset = item['dataset']
+    question_type, dataset_name = dataset.split('/')
+    output_dir = get_output_dir(project_root, dataset, config)
+    logs_dir = os.path.join(output_dir, "logs")
+
+    # Same shared caches as a generate.py run on this GPU set
+    token_budget_state = os.path.join(project_root, "cache", "token_budget", f"{config['model']}-gpu{gpu_group.replace(',', '_')}.json")
+    prompt_store_dir = os.path.join(project_root, "cache", "prompts")
+
+    # Look the chunk's problems up in the dataset index, in the planned order. process_problems
+    # names a problem without an id after its position, which in a chunk is not its position
+    # in the dataset, so the dataset id is set explicitly
+    chunk = []
+    for problem_id in item['ids']:
+        problem = problems.get(problem_id)
+        if problem is None:
+            logger.warning(f"Problem {problem_id} of work item {item['item']} is not in {dataset}; skipping it")
+            continue
+        chunk.append(problem if 'id' in problem else {**problem, 'id': problem_id})
+
+    summary = {'dataset': dataset, 'item': item['item'], 'questions': len(chunk)}
+    start_time = time.time()
+    emit({'event': 'started', 'dataset': dataset, 'item': item['item'], 'questions': len(chunk)})
+    try:
+        responses, metadata = process_problems(
+            chunk,
+            config['model'],
+            get_shard_path(output_dir, worker_id),
+            config['base'],
+            question_type=question_type,
+            dataset_name=dataset_name,
+            retries=config['retries'],
+            parallel_size=config['parallel'],
+            max_tokens=config['max_tokens'],
+            no_fallback=config['no_fallback'],
+            logs_dir=logs_dir,
+            worker_logging=config['worker_logging'],
+            gpu=gpu_group,
+            length_bucketing=config['length_bucketing'],
+            local_engine=config['local_engine'],
+            prompt_store_dir=prompt_store_dir,
+            token_budget=config['token_budget'],
+            token_budget_state=token_budget_state,
+            early_stop=config['early_stop'],
+            prefix_reuse=config['prefix_reuse'],
+            model=model
+        )
+        summary['status'] = 'completed'
+        summary['successful'] = sum(1 for response in responses if 'error' not in response)
+        summary['errors'] = len(responses) - summary['successful']
+        summary['metadata'] = {section: metadata[section] for section in ITEM_METADATA_SECTIONS if metadata and metadata.get(section) is not None}
+    except Exception as e:
+        logger.error(f"Work item {item['item']} of {dataset} failed: {e}\n{traceback.format_exc()}")
+        summary['status'] = 'failed'
+        summary['error'] = str(e)
+
+    summary['elapsed_seconds'] = time.time() - start_time
+    emit({'event': summary['status'], **summary})
+    return summary
+
+def run_worker(worker_id, gpu_group, config, work_queue, event_queue):
+    """
+    Load the model on a GPU group and run work items from the shared work queue until it yields None.
+
+    This is the target of the worker process. CUDA_VISIBLE_DEVICES is set before torch is
+    imported, so the process only ever sees its own GPU group.
+
+    Args:
+        worker_id (int): Index of the worker
+        gpu_group (str): GPU device IDs of the worker (e.g. "0,1")
+        config (dict): Generation settings shared by all workers (see generate_gpu_parallel.main)
+        work_queue (multiprocessing.Queue): Work items shared by all workers, followed by one None per worker
+        event_queue (multiprocessing.Queue): Queue the worker reports its events to
+    """
+    os.environ["CUDA_VISIBLE_DEVICES"] = gpu_group
+
+    def emit(event):
+        event_queue.put({'worker': worker_id, 'gpu': gpu_group, **event})
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(script_dir))
+
+    try:
+        from src.models import get_model
+        from src.models.huggingface_base import HuggingFaceBaseModel
+
+        log_path = setup_worker_logging(config['log_dir'], worker_id, gpu_group, config['log_level'])
+        logger.info(f"Worker {worker_id} starting on GPU group {gpu_group}, logging to {log_path}")
+
+        # Load the weights once; every work item of this worker reuses them
+        start_time = time.time()
+        HuggingFaceBaseModel.set_engine(config['local_engine'])
+        ModelClass = get_model(config['model'], config['base'])
+        model = ModelClass(parallel_size=config['parallel'], max_tokens=config['max_tokens'], gpu=gpu_group)
+        load_seconds = time.time() - start_time
+        logger.info(f"Loaded {config['model']} in {load_seconds:.1f} seconds")
+        emit({'event': 'ready', 'load_seconds': load_seconds, 'log_path': log_path})
+    except Exception as e:
+        logger.error(f"Worker {worker_id} could not load the model: {e}\n{traceback.format_exc()}")
+        emit({'event': 'load_failed', 'error': str(e)})
+        emit({'event': 'exit'})
+        return
+
+    # Problems of the datasets this worker has seen, read and indexed once per dataset
+    problems_by_dataset = {}
+
+    while True:
+        item = work_queue.get()
+        if item is None:
+            break
+        dataset = item['dataset']
+        logger.info(f"Worker {worker_id} took work item {item['item']} of {dataset} ({len(item['ids'])} questions)")
+        if dataset not in problems_by_dataset:
+            from src.dataset import Dataset
+            question_type, dataset_name = dataset.split('/')
+            problems_by_dataset[dataset] = Dataset.from_jsonl(os.path.join(project_root, "data", "processed", question_type, dataset_name, "dataset.jsonl"), "problems")
+        run_work_item(model, item, problems_by_dataset[dataset], config, worker_id, gpu_group, project_root, emit)
+
+    logger.info(f"Worker {worker_id} found the work queue empty; exiting")
+    emit({'event': 'exit'})
@@ -0,0 +1,370 @@
+"""
+Append-only response journal used by the generation loop.
+
+Every finished response is appended to ``response.journal.jsonl`` exactly once and
+fsynced, and a one-line entry (id, status, byte offset, length) is appended to the
+sidecar ``response.index.jsonl``. Resuming a run only needs the small index, and the
+canonical ``response.jsonl`` is produced by a single compaction pass at the end of a run.
+"""
+
+import os
+import json
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class _ResponseJSONEncoder(json.JSONEncoder):
+    """JSON encoder that converts non-serializable objects to their string representation."""
+
+    def default(self, obj):
+        try:
+            return super().default(obj)
+        except TypeError:
+            return str(obj)
+
+def serialize_response(item):
+    """
+    Serialize a response dictionary to a single JSONL line.
+
+    Args:
+        item (dict): The response dictionary
+
+    Returns:
+        str: The JSON line, including the trailing newline
+    """
+    try:
+        return json.dumps(item, cls=_ResponseJSONEncoder) + '\n'
+    except Exception as e:
+        # If serialization still fails, log the error and keep just the essential fields
+        logger.error(f"Error serializing item: {e}")
+        simplified_item = {
+            'id': item.get('id', 'unknown'),
+            'question': item.get('question', ''),
+            'error': f"Serialization error: {str(e)}",
+            'model': item.get('model', ''),
+            'base': item.get('base', '')
+        }
+        return json.dumps(simplified_item) + '\n'
+
+def get_journal_paths(output_path):
+    """
+    Get the journal and index paths that belong to a response file.
+
+    Args:
+        output_path (str): Path to the canonical response file (e.g. .../response.jsonl)
+
+    Returns:
+        tuple: (journal_path, index_path)
+    """
+    root, _ = os.path.splitext(output_path)
+    return f"{root}.journal.jsonl", f"{root}.index.jsonl"
+
+class ResponseJournal:
+    """
+    Append-only journal of generated responses with a sidecar id index.
+
+    The index keeps, for every problem id, the status and location of the latest record
+    written for it. A later record for the same id (e.g. a successful retry of an error)
+    supersedes the earlier one during compaction.
+    """
+
+    def __init__(self, output_path):
+        """
+        Open (or create) the journal for the given response file.
+
+        If no journal exists yet but ``output_path`` does (a run produced before the
+        journal was introduced), the existing responses are imported once so they can
+        be resumed from.
+
+        Args:
+            output_path (str): Path to the canonical response file
+        """
+        self.output_path = output_path
+        self.journal_path, self.index_path = get_journal_paths(output_path)
+
+        # Latest index entry for each problem id, in the order they were last written
+        self.entries = {}
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+        if not os.path.exists(self.journal_path) and os.path.exists(output_path):
+            self._import_response_file()
+        else:
+            self._load_index()
+
+        self._journal_file = open(self.journal_path, 'ab')
+        self._index_file = open(self.index_path, 'a', encoding='utf-8')
+
+    def _load_index(self):
+        """
+        Load the sidecar index and recover any journal records it is missing.
+
+        The index can lag behind the journal (a crash between the two appends) or be lost
+        altogether. Records past the last indexed byte are then re-indexed by scanning the
+        journal line by line; only a trailing partial line that does not parse is truncated.
+        """
+        indexed_end = 0
+        journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted run; the journal scan below recovers its record
+                        logger.warning(f"Ignoring malformed index line in {self.index_path}")
+                        continue
+                    if entry['offset'] + entry['length'] > journal_size:
+                        logger.warning(f"Ignoring index entry for {entry['id']} past the end of {self.journal_path}")
+                        continue
+                    self.entries.pop(entry['id'], None)
+                    self.entries[entry['id']] = entry
+                    indexed_end = max(indexed_end, entry['offset'] + entry['length'])
+
+            # Start recovered entries on a line of their own after a torn final line
+            with open(self.index_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        with open(self.index_path, 'a', encoding='utf-8') as index:
+                            index.write('\n')
+
+        if journal_size > indexed_end:
+            self._recover_unindexed(indexed_end, journal_size)
+
+        logger.info(f"Loaded journal index with {len(self.entries)} problem ids from {self.index_path}")
+
+    def _recover_unindexed(self, indexed_end, journal_size):
+        """
+        Index the journal records that start at or after indexed_end.
+
+        Args:
+            indexed_end (int): Byte offset just past the last indexed record
+            journal_size (int): Current size of the journal in bytes
+        """
+        logger.warning(f"Journal {self.journal_path} has {journal_size - indexed_end} unindexed bytes, rebuilding their index entries")
+
+        recovered = []
+        truncate_at = None
+        restore_newline = False
+        with open(self.journal_path, 'rb') as journal:
+            journal.seek(indexed_end)
+            offset = indexed_end
+            for raw_line in journal:
+                try:
+                    item = json.loads(raw_line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    item = None
+
+                if not raw_line.endswith(b'\n'):
+                    if item is None:
+                        # A record whose write was cut short; it will be regenerated
+                        truncate_at = offset
+                        break
+                    # A complete record that only lost its newline; restore it below
+                    raw_line += b'\n'
+                    restore_newline = True
+
+                if isinstance(item, dict) and 'id' in item:
+                    recovered.append({
+                        'id': item['id'],
+                        'ok': 'error' not in item and 'response' in item,
+                        'offset': offset,
+                        'length': len(raw_line)
+                    })
+                else:
+                    logger.warning(f"Skipping malformed journal line at byte {offset} of {self.journal_path}")
+                offset += len(raw_line)
+
+        if truncate_at is not None:
+            logger.warning(f"Truncating {journal_size - truncate_at} bytes of a partial record from {self.journal_path}")
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(truncate_at)
+        elif restore_newline:
+            with open(self.journal_path, 'ab') as f:
+                f.write(b'\n')
+
+        with open(self.index_path, 'a', encoding='utf-8') as index:
+            for entry in recovered:
+                index.write(json.dumps(entry) + '\n')
+                self.entries.pop(entry['id'], None)
+                self.entries[entry['id']] = entry
+            index.flush()
+            os.fsync(index.fileno())
+
+        logger.info(f"Recovered {len(recovered)} index entries from {self.journal_path}")
+
+    def _import_response_file(self):
+        """Seed the journal and index from an existing response file."""
+        logger.info(f"No journal found, importing existing responses from {self.output_path}")
+
+        offset = 0
+        with open(self.output_path, 'rb') as src, \
+                open(self.journal_path, 'wb') as journal, \
+                open(self.index_path, 'w', encoding='utf-8') as index:
+            for raw_line in src:
+                try:
+                    item = json.loads(raw_line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping malformed line in {self.output_path}")
+                    continue
+                if 'id' not in item:
+                    continue
+                if not raw_line.endswith(b'\n'):
+                    raw_line += b'\n'
+
+                entry = {
+                    'id': item['id'],
+                    'ok': 'error' not in item and 'response' in item,
+                    'offset': offset,
+                    'length': len(raw_line)
+                }
+                journal.write(raw_line)
+                index.write(json.dumps(entry) + '\n')
+                offset += len(raw_line)
+
+                self.entries.pop(entry['id'], None)
+                self.entries[entry['id']] = entry
+
+            journal.flush()
+            os.fsync(journal.fileno())
+            index.flush()
+            os.fsync(index.fileno())
+
+        logger.info(f"Imported {len(self.entries)} responses into {self.journal_path}")
+
+    def append(self, response):
+        """
+        Append a finished response to the journal and record it in the index.
+
+        Args:
+            response (dict): The response dictionary (must contain an 'id')
+        """
+        data = serialize_response(response).encode('utf-8')
+        offset = self._journal_file.tell()
+
+        self._journal_file.write(data)
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+
+        entry = {
+            'id': response.get('id'),
+            'ok': 'error' not in response and 'response' in response,
+            'offset': offset,
+            'length': len(data)
+        }
+        self._index_file.write(json.dumps(entry) + '\n')
+        self._index_file.flush()
+        os.fsync(self._index_file.fileno())
+
+        self.entries.pop(entry['id'], None)
+        self.entries[entry['id']] = entry
+
+    def successful_ids(self):
+        """Return the set of problem ids whose latest record is a successful response."""
+        return {problem_id for problem_id, entry in self.entries.items() if entry['ok']}
+
+    def count(self):
+        """
+        Count the problem ids in the journal by status.
+
+        Returns:
+            tuple: (successful_count, error_count)
+        """
+        successful = sum(1 for entry in self.entries.values() if entry['ok'])
+        return successful, len(self.entries) - successful
+
+    def compact(self, output_path=None, order=None):
+        """
+        Write the canonical response file from the journal.
+
+        The latest record for each id is copied byte-for-byte, ordered by when it was
+        written (or by ``order``), and the file is replaced atomically.
+
+        Args:
+            output_path (str, optional): Destination file. Defaults to the journal's response file.
+            order (list, optional): Problem ids in the order the responses should be written
+                (e.g. dataset order). Ids missing from it follow in the order they were written.
+
+        Returns:
+            int: Number of responses written
+        """
+        output_path = output_path or self.output_path
+        tmp_path = f"{output_path}.tmp"
+
+        self._journal_file.flush()
+        entries = sorted(self.entries.values(), key=lambda entry: entry['offset'])
+        if order is not None:
+            position = {problem_id: i for i, problem_id in enumerate(order)}
+            entries.sort(key=lambda entry: position.get(entry['id'], len(position)))
+
+        with open(self.journal_path, 'rb') as journal, open(tmp_path, 'wb') as out:
+            for entry in entries:
+                journal.seek(entry['offset'])
+                out.write(journal.read(entry['length']))
+            out.flush()
+            os.fsync(out.fileno())
+
+        os.replace(tmp_path, output_path)
+        logger.info(f"Compacted {len(entries)} responses from {self.journal_path} into {output_path}")
+        return len(entries)
+
+    def records(self):
+        """
+        Read the latest record of every problem id, in the order they were written.
+
+        Yields:
+            tuple: (entry, record) where entry is the index entry and record the response dictionary
+        """
+        self._journal_file.flush()
+        with open(self.journal_path, 'rb') as journal:
+            for entry in sorted(self.entries.values(), key=lambda entry: entry['offset']):
+                journal.seek(entry['offset'])
+                yield entry, json.loads(journal.read(entry['length']))
+
+    def close(self):
+        """Close the underlying journal and index files."""
+        self._journal_file.close()
+        self._index_file.close()
+
+def merge_shards(output_path, shard_paths, order=None):
+    """
+    Merge the journals of shard response files into the journal of a response file.
+
+    Workers that share a dataset each write to a shard of their own; merging appends the
+    shard records to the dataset's journal and compacts it into the canonical response
+    file, so the result resumes and evaluates like a single run. A shard record replaces
+    the dataset's record for the same id unless that one is successful and the shard
+    record is an error.
+
+    Args:
+        output_path (str): Path to the canonical response file
+        shard_paths (list): Paths to the shard response files (only their journals are read)
+        order (list, optional): Problem ids in the order the responses should be written
+
+    Returns:
+        int: Number of shard records merged
+    """
+    journal = ResponseJournal(output_path)
+    merged = 0
+    try:
+        for shard_path in shard_paths:
+            shard = ResponseJournal(shard_path)
+            try:
+                for entry, record in shard.records():
+                    current = journal.entries.get(entry['id'])
+                    if current is not None and current['ok'] and not entry['ok']:
+                        continue
+                    journal.append(record)
+                    merged += 1
+            finally:
+                shard.close()
+        journal.compact(order=order)
+    finally:
+        journal.close()
+
+    logger.info(f"Merged {merged} responses from {len(shard_paths)} shards into {output_path}")
+    return merged
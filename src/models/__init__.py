@@ -2,130 +2,120 @@
 Models module for generating responses to physics problems.
 
 This module contains implementations for different LLM models.
+
+Model classes are registered by import path and only imported when they are requested,
+so an API-only run never loads torch, transformers or accelerate (pulled in by the
+local model bases), nor the client libraries of the other providers.
 """
 
-# Import base models
-from .api_base import APIBaseModel
-from .local_base import LocalBaseModel
-
-# Import API-based models
-from .openai_base import (
-    OpenAIBaseModel,
-    GPT4oModel,
-    GPT4oMiniModel,
-    GPT35TurboModel,
-    O3MiniModel,
-    O1Model
-)
-from .together_base import (
-    TogetherBaseModel,
-    LlamaModel,
-    MistralModel,
-    ClaudeModel,
-    DeepSeekR1DistillLlama70BModel,
-    QwQ32BPreviewModel,
-    Qwen2572BInstructTurboModel,
-    Llama31405BInstructTurboModel,
-    Qwen3235BA22BFp8TputModel,
-    Llama3370BInstructModel_Togehter,
-    Qwen257BInstructModel_Togehter
-)
-from .deepseek_base import (
-    DeepSeekBaseModel,
-    DeepSeekR1Model,
-    DeepSeekV3Model
-)
-from .google_base import (
-    GoogleBaseModel,
-    GeminiModel,
-    GeminiFlashExpModel
-)
-
-# Import local models
-from .huggingface_base import (
-    HuggingFaceBaseModel,
-    LlamaLocalModel,
-    MistralLocalModel,
-    PhiLocalModel,
-    QwenMathModel,
-    DeepSeekMathModel,
-    DeepSeekMathRLModel,
-    ClimateGPT70BModel,
-    ClimateGPT7BModel,
-    Qwen2532BInstructModel,
-    Qwen253BInstructModel,
-    Qwen257BInstructModel,
-    Qwen25Coder32BInstructModel,
-    Qwen25Math15BInstructModel,
-    Qwen25Math72BInstructModel,
-    Qwen25Math7BInstructModel,
-    Gemma227BITModel,
-    Gemma29BITModel,
-    Llama3370BInstructModel,
-    Qwen2572BGeoGPTModel,
-)
-
-
-
-# Dictionary mapping base names to their model registries
+import importlib
+
+# Dictionary mapping base names to their model registries.
+# Each model maps to "<module>.<class>" inside this package and is imported by get_model.
 BASE_REGISTRY = {
     # API-based models
     "openai": {
-        "gpt4o": GPT4oModel,
-        "gpt4o-mini": GPT4oMiniModel,
-        "gpt35-turbo": GPT35TurboModel,
-        "o3-mini": O3MiniModel,
-        "o1": O1Model,
-        "gpto1": O1Model,  # Alias for o1
+        "gpt4o": "openai_base.GPT4oModel",
+        "gpt4o-mini": "openai_base.GPT4oMiniModel",
+        "gpt35-turbo": "openai_base.GPT35TurboModel",
+        "o3-mini": "openai_base.O3MiniModel",
+        "o1": "openai_base.O1Model",
+        "gpto1": "openai_base.O1Model",  # Alias for o1
     },
     "together": {
-        "llama": LlamaModel,
-        "mistral": MistralModel,
-        "claude": ClaudeModel,
-        "DeepSeek-R1-Distill-Llama-70B": DeepSeekR1DistillLlama70BModel,
-        "QwQ-32B-Preview": QwQ32BPreviewModel,
-        "Qwen2.5-72B-Instruct-Turbo": Qwen2572BInstructTurboModel,
-        "Llama-3.1-405B-Instruct-Turbo": Llama31405BInstructTurboModel,
-        "Qwen3-235B-A22B-fp8-tput": Qwen3235BA22BFp8TputModel,
-        "Llama-3.3-70B-Instruct": Llama3370BInstructModel_Togehter,
-        "Qwen2.5-7B-Instruct-Turbo": Qwen257BInstructModel_Togehter
+        "llama": "together_base.LlamaModel",
+        "mistral": "together_base.MistralModel",
+        "claude": "together_base.ClaudeModel",
+        "DeepSeek-R1-Distill-Llama-70B": "together_base.DeepSeekR1DistillLlama70BModel",
+        "QwQ-32B-Preview": "together_base.QwQ32BPreviewModel",
+        "Qwen2.5-72B-Instruct-Turbo": "together_base.Qwen2572BInstructTurboModel",
+        "Llama-3.1-405B-Instruct-Turbo": "together_base.Llama31405BInstructTurboModel",
+        "Qwen3-235B-A22B-fp8-tput": "together_base.Qwen3235BA22BFp8TputModel",
+        "Llama-3.3-70B-Instruct": "together_base.Llama3370BInstructModel_Togehter",
+        "Qwen2.5-7B-Instruct-Turbo": "together_base.Qwen257BInstructModel_Togehter"
     },
     "deepseek": {
-        "r1": DeepSeekR1Model,
-        "v3": DeepSeekV3Model,
+        "r1": "deepseek_base.DeepSeekR1Model",
+        "v3": "deepseek_base.DeepSeekV3Model",
     },
     "google": {
-        "gemini-2.0-flash-thinking-exp-01-21": GeminiModel,
-        "gemini-2.0-flash-exp": GeminiFlashExpModel,
+        "gemini-2.0-flash-thinking-exp-01-21": "google_base.GeminiModel",
+        "gemini-2.0-flash-exp": "google_base.GeminiFlashExpModel",
     },
     # Local models
     "huggingface": {
-        "llama": LlamaLocalModel,
-        "mistral": MistralLocalModel,
-        "phi": PhiLocalModel,
-        "qwen-math": QwenMathModel,
-        "deepseek-math-7b-instruct": DeepSeekMathModel,
-        "deepseek-math-7b-rl": DeepSeekMathRLModel,
-        "climategpt-70b": ClimateGPT70BModel,
-        "climategpt-7b": ClimateGPT7BModel,
-        "Qwen2.5-32B-Instruct": Qwen2532BInstructModel,
-        "Qwen2.5-3B-Instruct": Qwen253BInstructModel,
-        "Qwen2.5-7B-Instruct": Qwen257BInstructModel,
-        "Qwen2.5-Coder-32B-Instruct": Qwen25Coder32BInstructModel,
-        "Qwen2.5-Math-1.5B-Instruct": Qwen25Math15BInstructModel,
-        "Qwen2.5-Math-72B-Instruct": Qwen25Math72BInstructModel,
-        "Qwen2.5-Math-7B-Instruct": Qwen25Math7BInstructModel,
-        "gemma-2-27b-it": Gemma227BITModel,
-        "gemma-2-9b-it": Gemma29BITModel,
-        "Llama-3.3-70B-Instruct": Llama3370BInstructModel,
-        "Qwen2.5-72B-GeoGPT": Qwen2572BGeoGPTModel,
+        "llama": "huggingface_base.LlamaLocalModel",
+        "mistral": "huggingface_base.MistralLocalModel",
+        "phi": "huggingface_base.PhiLocalModel",
+        "qwen-math": "huggingface_base.QwenMathModel",
+        "deepseek-math-7b-instruct": "huggingface_base.DeepSeekMathModel",
+        "deepseek-math-7b-rl": "huggingface_base.DeepSeekMathRLModel",
+        "climategpt-70b": "huggingface_base.ClimateGPT70BModel",
+        "climategpt-7b": "huggingface_base.ClimateGPT7BModel",
+        "Qwen2.5-32B-Instruct": "huggingface_base.Qwen2532BInstructModel",
+        "Qwen2.5-3B-Instruct": "huggingface_base.Qwen253BInstructModel",
+        "Qwen2.5-7B-Instruct": "huggingface_base.Qwen257BInstructModel",
+        "Qwen2.5-Coder-32B-Instruct": "huggingface_base.Qwen25Coder32BInstructModel",
+        "Qwen2.5-Math-1.5B-Instruct": "huggingface_base.Qwen25Math15BInstructModel",
+        "Qwen2.5-Math-72B-Instruct": "huggingface_base.Qwen25Math72BInstructModel",
+        "Qwen2.5-Math-7B-Instruct": "huggingface_base.Qwen25Math7BInstructModel",
+        "gemma-2-27b-it": "huggingface_base.Gemma227BITModel",
+        "gemma-2-9b-it": "huggingface_base.Gemma29BITModel",
+        "Llama-3.3-70B-Instruct": "huggingface_base.Llama3370BInstructModel",
+        "Qwen2.5-72B-GeoGPT": "huggingface_base.Qwen2572BGeoGPTModel",
     },
 
 }
 
+# Base classes that are not in the registry but can still be imported from this package
+_BASE_CLASSES = {
+    "BaseModel": "base",
+    "APIBaseModel": "api_base",
+    "LocalBaseModel": "local_base",
+    "OpenAIBaseModel": "openai_base",
+    "TogetherBaseModel": "together_base",
+    "DeepSeekBaseModel": "deepseek_base",
+    "GoogleBaseModel": "google_base",
+    "HuggingFaceBaseModel": "huggingface_base",
+}
+
+def _resolve(import_path):
+    """
+    Import a model class from its "<module>.<class>" path inside this package.
+
+    Args:
+        import_path (str): The registered import path
+
+    Returns:
+        Model class: The model implementation
+    """
+    module_name, class_name = import_path.rsplit(".", 1)
+    module = importlib.import_module(f"{__name__}.{module_name}")
+    return getattr(module, class_name)
+
+def _lazy_attributes():
+    """Map every importable class name to its module."""
+    attributes = dict(_BASE_CLASSES)
+    for base_models in BASE_REGISTRY.values():
+        for import_path in base_models.values():
+            module_name, class_name = import_path.rsplit(".", 1)
+            attributes[class_name] = module_name
+    return attributes
+
+def __getattr__(name):
+    """Import model classes on first access, e.g. ``from src.models import GPT4oModel``."""
+    module_name = _lazy_attributes().get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return _resolve(f"{module_name}.{name}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes()))
+
 def get_model(model_name, base_name):
     """
     Get the model implementation for the given model name and base.
+    Only the module of the requested model is imported.
 
     Args:
         model_name (str): Name of the model
@@ -144,4 +134,4 @@ def get_model(model_name, base_name):
     if model_name not in base_models:
         raise ValueError(f"Model {model_name} is not supported for base {base_name}. Supported models: {list(base_models.keys())}")
 
-    return base_models[model_name]
+    return _resolve(base_models[model_name])
@@ -3,9 +3,19 @@ Base class for API-based models that use Ray for parallel processing.
 """
 
 import abc
+import asyncio
 import logging
+import threading
 import time
 from .base import BaseModel
+from .rate_limiter import (
+    RateLimitedError,
+    RemoteRateLimiter,
+    get_rate_limiter,
+    get_remote_rate_limiter,
+    get_rate_limit_info,
+    get_result_rate_limit_info
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -62,17 +72,228 @@ def format_api_response(content, usage, full_response, error=None):
 
     return response
 
+def _call_model_with_retry(model_instance, model_class_name, model_args, question_data, question_type, retries=0, worker_logging=True, limiter=None):
+    """
+    Call a model's _make_api_call with retry logic inside a Ray worker.
+
+    Args:
+        model_instance (APIBaseModel): The worker's long-lived model instance
+        model_class_name (str): Fully qualified class name of the model (for logging)
+        model_args (dict): Arguments the model instance was created with (for logging)
+        question_data (str or dict): The question to answer
+        question_type (str): Type of question (OEQ or MCQ)
+        retries (int): Number of retries if the first attempt fails
+        worker_logging (bool): Whether to enable logging for the worker process
+        limiter (RemoteRateLimiter, optional): The provider's shared rate limiter
+
+    Returns:
+        dict: The model's response, or an error result after the final failed attempt
+    """
+    # Configure logging for this Ray worker
+    worker_logger = logging.getLogger("src.models.api_base.worker")
+
+    # Set up worker logging based on the worker_logging parameter
+    if worker_logging:
+        worker_logger.setLevel(logging.INFO)
+
+        # Create console handler if not already present
+        if not worker_logger.handlers:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(logging.INFO)
+            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+            console_handler.setFormatter(formatter)
+            worker_logger.addHandler(console_handler)
+    else:
+        # Disable logging for this worker
+        worker_logger.setLevel(logging.ERROR)  # Only log errors
+
+        # Remove any existing handlers
+        for handler in worker_logger.handlers[:]:
+            worker_logger.removeHandler(handler)
+
+    # Get a short version of the question for logging
+    if isinstance(question_data, dict):
+        question_text = question_data.get('question', question_data.get('problem', ''))
+    else:
+        question_text = str(question_data)
+
+    short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+    short_question = short_question.replace("\n", " ")
+
+    # Calculate max attempts (retries + 1 for the initial attempt)
+    max_attempts = retries + 1
+
+    worker_logger.info(f"API call starting for question: {short_question}")
+    worker_logger.info(f"Model class: {model_class_name}")
+    worker_logger.info(f"Model args: {model_args}")
+
+    # Log specific model arguments for debugging
+    if 'parallel_size' in model_args:
+        worker_logger.info(f"Parallel size: {model_args['parallel_size']}")
+    if 'max_tokens' in model_args:
+        worker_logger.info(f"Max tokens: {model_args['max_tokens']}")
+
+    worker_logger.info(f"Question type: {question_type}")
+    worker_logger.info(f"Retries: {retries} (will try up to {max_attempts} times)")
+
+    estimated_tokens = model_instance._estimate_tokens(question_data, question_type)
+
+    # Call the model's _make_api_call method
+    for attempt in range(max_attempts):
+        # Wait until the provider's shared rate limiter admits the request
+        ticket = limiter.acquire(estimated_tokens) if limiter is not None else None
+        started = time.time()
+        released = False
+        try:
+            worker_logger.info(f"Attempt {attempt+1}/{max_attempts} for question: {short_question}")
+
+            # Call the model's _make_api_call method
+            result = model_instance._make_api_call(question_data, question_type)
+
+            # Check if result is None
+            if result is None:
+                worker_logger.error(f"_make_api_call returned None for question: {short_question}")
+                # Create a proper error result
+                result = {
+                    'content': "Error: API call returned None",
+                    'usage': {},
+                    'full_response': {'error': "API call returned None"},
+                    'error': "API call returned None",
+                    'logs': [f"API call returned None on attempt {attempt+1}"]
+                }
+                # Raise an exception to trigger retry or error handling
+                raise ValueError("_make_api_call returned None")
+
+            # Provider wrappers return rate limits as error results; retry them like exceptions
+            rate_limited, retry_after = get_result_rate_limit_info(result)
+            if rate_limited:
+                raise RateLimitedError(result.get('error', "Rate limited"), retry_after)
+
+            if limiter is not None:
+                usage = (result.get('usage') if isinstance(result, dict) else None) or {}
+                limiter.release(ticket, tokens_used=usage.get('total_tokens'), latency=time.time() - started, output_tokens=usage.get('completion_tokens'))
+                released = True
+
+            worker_logger.info(f"API call succeeded for question: {short_question}")
+            worker_logger.info(f"Result type: {type(result)}")
+
+            # Log some information about the result
+            if isinstance(result, dict):
+                if 'content' in result:
+                    content_length = len(result['content']) if result['content'] else 0
+                    worker_logger.info(f"Content length: {content_length} characters")
+
+                if 'error' in result:
+                    worker_logger.warning(f"Result contains error: {result['error']}")
+
+                # Add a log entry to the result so the main process can see it
+                if 'logs' not in result:
+                    result['logs'] = []
+                result['logs'].append(f"API call succeeded after {attempt+1} attempts")
+            else:
+                # If result is not a dict (but not None), convert it to a proper dict
+                worker_logger.warning(f"API call returned non-dict result: {type(result)} for question: {short_question}")
+                worker_logger.warning(f"Result value: {str(result)[:100]}...")
+                original_result = result
+                result = {
+                    'content': str(original_result),
+                    'usage': {},
+                    'full_response': {'original_result': str(original_result)},
+                    'logs': [f"API call returned non-dict result: {type(original_result)}"]
+                }
+
+            # Log success and return the result
+            worker_logger.info(f"Successfully completed API call for question: {short_question}")
+            return result
+        except Exception as e:
+            error_msg = str(e)
+            error_type = type(e).__name__
+            worker_logger.error(f"Attempt {attempt+1}/{max_attempts} failed for question: {short_question}")
+            worker_logger.error(f"Error type: {error_type}")
+            worker_logger.error(f"Error details: {error_msg}")
+
+            # Add traceback information
+            import traceback
+            worker_logger.error(f"Traceback: {traceback.format_exc()}")
+
+            # Report the outcome so the limiter can back off on 429s
+            if isinstance(e, RateLimitedError):
+                rate_limited, retry_after = True, e.retry_after
+            else:
+                rate_limited, retry_after = get_rate_limit_info(e)
+            if limiter is not None and not released:
+                limiter.release(ticket, latency=time.time() - started, rate_limited=rate_limited, retry_after=retry_after)
+
+            if attempt < max_attempts - 1:
+                # Honor Retry-After, otherwise back off exponentially with jitter
+                sleep_time = limiter.retry_delay(attempt, retry_after) if limiter is not None else 2 ** attempt
+                worker_logger.info(f"Retrying in {sleep_time:.1f} seconds...")
+                time.sleep(sleep_time)
+            else:
+                worker_logger.error(f"Failed to get response after {max_attempts} attempts for question: {short_question}")
+                worker_logger.error(f"Final error: {error_msg}")
+
+                # Create an error result with detailed information
+                error_result = {
+                    'content': f"Error: {error_msg}",
+                    'usage': {},
+                    'full_response': {
+                        'error': error_msg,
+                        'error_type': error_type,
+                        'question': short_question
+                    },
+                    'error': error_msg,
+                    'logs': [
+                        f"API call failed after {max_attempts} attempts",
+                        f"Error type: {error_type}",
+                        f"Error message: {error_msg}"
+                    ]
+                }
+
+                # Return the error result instead of raising an exception
+                worker_logger.info(f"Returning error result for question: {short_question}")
+                return error_result
+
 class APIBaseModel(BaseModel):
     """
     Base class for all API-based model implementations.
     Uses Ray for parallel processing of API calls.
     Falls back to sequential processing if Ray is not available.
+
+    Models that implement _make_api_call_async can instead run on the "asyncio" backend,
+    where every request is a coroutine on a single event loop owned by this process and
+    parallel_size bounds the number of requests in flight.
     """
 
     # Class variable to track if Ray has been initialized
     _ray_initialized = False
     _ray_module = None
-    _call_api_with_retry = None
+    _api_worker_class = None
+    _ray_init_lock = threading.Lock()
+
+    # Provider name used to share one rate limiter between all models of a base
+    PROVIDER = None
+
+    # Execution backend used by new model instances: "ray" or "asyncio"
+    _backend = "ray"
+    SUPPORTED_BACKENDS = ("ray", "asyncio")
+
+    @classmethod
+    def set_backend(cls, backend):
+        """
+        Select the execution backend for API models created after this call.
+
+        Args:
+            backend (str): "ray" to run one Ray task per question, or "asyncio" to run
+                all requests as coroutines on one event loop in this process
+
+        Raises:
+            ValueError: If the backend is not supported
+        """
+        if backend not in APIBaseModel.SUPPORTED_BACKENDS:
+            raise ValueError(f"Backend {backend} is not supported. Supported backends: {list(APIBaseModel.SUPPORTED_BACKENDS)}")
+        APIBaseModel._backend = backend
+        logger.info(f"API model backend set to: {backend}")
 
     @classmethod
     def init_ray(cls):
@@ -80,6 +301,15 @@ class APIBaseModel(BaseModel):
         if cls._ray_initialized:
             return True
 
+        # Several runs may create models at the same time in one process (see generate_matrix)
+        with APIBaseModel._ray_init_lock:
+            if cls._ray_initialized:
+                return True
+            return cls._init_ray_locked()
+
+    @classmethod
+    def _init_ray_locked(cls):
+        """Initialize Ray and define the worker actor class. Called with _ray_init_lock held."""
         try:
             # Only import Ray when needed
             import ray
@@ -146,161 +376,31 @@ class APIBaseModel(BaseModel):
             ray_initialized = init_ray_with_fallbacks()
 
             if ray_initialized:
-                # Define the remote function
-                @ray.remote
-                def _call_api_with_retry(model_class_name, model_args, question_data, question_type, retries=0, worker_logging=True):
-                    # This is the same function body as _call_api_with_retry_func
-                    # Configure logging for this Ray worker
-                    import logging
-                    worker_logger = logging.getLogger("src.models.api_base.worker")
-
-                    # Set up worker logging based on the worker_logging parameter
-                    if worker_logging:
-                        worker_logger.setLevel(logging.INFO)
-
-                        # Create console handler if not already present
-                        if not worker_logger.handlers:
-                            console_handler = logging.StreamHandler()
-                            console_handler.setLevel(logging.INFO)
-                            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-                            console_handler.setFormatter(formatter)
-                            worker_logger.addHandler(console_handler)
-                    else:
-                        # Disable logging for this worker
-                        worker_logger.setLevel(logging.ERROR)  # Only log errors
-
-                        # Remove any existing handlers
-                        for handler in worker_logger.handlers[:]:
-                            worker_logger.removeHandler(handler)
-
-                    # Dynamically import and instantiate the model class
-                    import importlib
-                    module_name, class_name = model_class_name.rsplit('.', 1)
-                    module = importlib.import_module(module_name)
-                    model_class = getattr(module, class_name)
-                    model_instance = model_class(**model_args)
-
-                    # Get a short version of the question for logging
-                    if isinstance(question_data, dict):
-                        question_text = question_data.get('question', question_data.get('problem', ''))
-                    else:
-                        question_text = str(question_data)
-
-                    short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
-                    short_question = short_question.replace("\n", " ")
-
-                    # Calculate max attempts (retries + 1 for the initial attempt)
-                    max_attempts = retries + 1
-
-                    worker_logger.info(f"API call starting for question: {short_question}")
-                    worker_logger.info(f"Model class: {model_class_name}")
-                    worker_logger.info(f"Model args: {model_args}")
-
-                    # Log specific model arguments for debugging
-                    if 'parallel_size' in model_args:
-                        worker_logger.info(f"Parallel size: {model_args['parallel_size']}")
-                    if 'max_tokens' in model_args:
-                        worker_logger.info(f"Max tokens: {model_args['max_tokens']}")
-
-                    worker_logger.info(f"Question type: {question_type}")
-                    worker_logger.info(f"Retries: {retries} (will try up to {max_attempts} times)")
-
-                    # Call the model's _make_api_call method
-                    for attempt in range(max_attempts):
-                        try:
-                            worker_logger.info(f"Attempt {attempt+1}/{max_attempts} for question: {short_question}")
-
-                            # Call the model's _make_api_call method
-                            result = model_instance._make_api_call(question_data, question_type)
-
-                            # Check if result is None
-                            if result is None:
-                                worker_logger.error(f"_make_api_call returned None for question: {short_question}")
-                                # Create a proper error result
-                                result = {
-                                    'content': "Error: API call returned None",
-                                    'usage': {},
-                                    'full_response': {'error': "API call returned None"},
-                                    'error': "API call returned None",
-                                    'logs': [f"API call returned None on attempt {attempt+1}"]
-                                }
-                                # Raise an exception to trigger retry or error handling
-                                raise ValueError("_make_api_call returned None")
-
-                            worker_logger.info(f"API call succeeded for question: {short_question}")
-                            worker_logger.info(f"Result type: {type(result)}")
-
-                            # Log some information about the result
-                            if isinstance(result, dict):
-                                if 'content' in result:
-                                    content_length = len(result['content']) if result['content'] else 0
-                                    worker_logger.info(f"Content length: {content_length} characters")
-
-                                if 'error' in result:
-                                    worker_logger.warning(f"Result contains error: {result['error']}")
-
-                                # Add a log entry to the result so the main process can see it
-                                if 'logs' not in result:
-                                    result['logs'] = []
-                                result['logs'].append(f"API call succeeded after {attempt+1} attempts")
-                            else:
-                                # If result is not a dict (but not None), convert it to a proper dict
-                                worker_logger.warning(f"API call returned non-dict result: {type(result)} for question: {short_question}")
-                                worker_logger.warning(f"Result value: {str(result)[:100]}...")
-                                original_result = result
-                                result = {
-                                    'content': str(original_result),
-                                    'usage': {},
-                                    'full_response': {'original_result': str(original_result)},
-                                    'logs': [f"API call returned non-dict result: {type(original_result)}"]
-                                }
-
-                            # Log success and return the result
-                            worker_logger.info(f"Successfully completed API call for question: {short_question}")
-                            return result
-                        except Exception as e:
-                            error_msg = str(e)
-                            error_type = type(e).__name__
-                            worker_logger.error(f"Attempt {attempt+1}/{max_attempts} failed for question: {short_question}")
-                            worker_logger.error(f"Error type: {error_type}")
-                            worker_logger.error(f"Error details: {error_msg}")
-
-                            # Add traceback information
-                            import traceback
-                            worker_logger.error(f"Traceback: {traceback.format_exc()}")
-
-                            if attempt < max_attempts - 1:
-                                # Exponential backoff
-                                sleep_time = 2 ** attempt
-                                worker_logger.info(f"Retrying in {sleep_time} seconds...")
-                                time.sleep(sleep_time)
-                            else:
-                                worker_logger.error(f"Failed to get response after {max_attempts} attempts for question: {short_question}")
-                                worker_logger.error(f"Final error: {error_msg}")
-
-                                # Create an error result with detailed information
-                                error_result = {
-                                    'content': f"Error: {error_msg}",
-                                    'usage': {},
-                                    'full_response': {
-                                        'error': error_msg,
-                                        'error_type': error_type,
-                                        'question': short_question
-                                    },
-                                    'error': error_msg,
-                                    'logs': [
-                                        f"API call failed after {max_attempts} attempts",
-                                        f"Error type: {error_type}",
-                                        f"Error message: {error_msg}"
-                                    ]
-                                }
-
-                                # Return the error result instead of raising an exception
-                                worker_logger.info(f"Returning error result for question: {short_question}")
-                                return error_result
-
-                # Store the remote function
-                cls._call_api_with_retry = _call_api_with_retry
+                # Define the worker actor. Each actor creates its model (and therefore its API
+                # client and connection pool) once and reuses it for every question it serves.
+                # API calls are I/O-bound, so actors reserve no CPU and a pool larger than the
+                # number of cores can still be scheduled.
+                @ray.remote(num_cpus=0)
+                class _APIWorker:
+                    def __init__(self, model_class_name, model_args, limiter_actor=None):
+                        # Dynamically import and instantiate the model class
+                        import importlib
+                        module_name, class_name = model_class_name.rsplit('.', 1)
+                        module = importlib.import_module(module_name)
+                        model_class = getattr(module, class_name)
+                        self.model_class_name = model_class_name
+                        self.model_args = model_args
+                        self.model_instance = model_class(**model_args)
+                        self.limiter = RemoteRateLimiter(limiter_actor) if limiter_actor is not None else None
+
+                    def call(self, question_data, question_type, retries=0, worker_logging=True):
+                        return _call_model_with_retry(
+                            self.model_instance, self.model_class_name, self.model_args,
+                            question_data, question_type, retries, worker_logging, self.limiter
+                        )
+
+                # Store the actor class
+                cls._api_worker_class = _APIWorker
                 cls._ray_initialized = True
                 return True
             else:
@@ -324,6 +424,38 @@ class APIBaseModel(BaseModel):
         super().__init__(parallel_size=parallel_size)
         self.max_tokens = max_tokens
 
+        # State of the asyncio engine; the event loop thread and client are created on first use
+        self._loop = None
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._semaphore = None
+        self._async_client = None
+
+        # Optional content-addressed response cache, see set_response_cache
+        self._response_cache = None
+        self._cache_base_name = None
+
+        # Pool of long-lived Ray worker actors, created on first use
+        self._actor_pool = None
+        self._actor_load = []
+        self._task_actors = {}
+        # Timed out tasks whose actor is still busy with them; see _abandon_ray_task
+        self._abandoned_tasks = set()
+        self._actor_pool_lock = threading.Lock()
+
+        self.use_async = False
+        if APIBaseModel._backend == "asyncio":
+            if self.supports_async():
+                self.use_async = True
+            else:
+                logger.warning(f"{self.__class__.__name__} has no async client implementation, falling back to the Ray backend")
+
+        if self.use_async:
+            # The asyncio engine replaces Ray, so Ray is never imported or started
+            self.use_ray = False
+            logger.info(f"Initialized API base model with asyncio engine, max concurrent requests: {max(1, parallel_size)}, max_tokens: {max_tokens}")
+            return
+
         # Try to initialize Ray if not already initialized
         self.use_ray = self.__class__.init_ray() if parallel_size > 1 else False
 
@@ -345,9 +477,476 @@ class APIBaseModel(BaseModel):
         """
         raise NotImplementedError("Subclasses must implement _make_api_call")
 
+    async def _make_api_call_async(self, question_data, question_type):
+        """
+        Make the actual API call with an async client. Implemented by subclasses that
+        support the asyncio backend.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The model's response
+        """
+        raise NotImplementedError("Subclasses must implement _make_api_call_async to use the asyncio backend")
+
+    def supports_async(self):
+        """Return True if this model implements _make_api_call_async."""
+        return type(self)._make_api_call_async is not APIBaseModel._make_api_call_async
+
+    def _async_client_config(self):
+        """
+        Keyword arguments for the AsyncOpenAI client used by the asyncio backend.
+        Subclasses using an OpenAI-compatible endpoint override this (api_key, base_url).
+
+        Returns:
+            dict: Client keyword arguments
+        """
+        return {}
+
+    def _get_async_client(self):
+        """
+        Get the AsyncOpenAI client for this model, creating it on first use.
+
+        The connection pool is sized to the number of concurrent requests so that
+        parallel_size requests can really be in flight at the same time.
+
+        Returns:
+            AsyncOpenAI: The async client
+        """
+        if self._async_client is None:
+            from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+            import httpx
+
+            concurrency = max(1, self.parallel_size)
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+            )
+            self._async_client = AsyncOpenAI(http_client=http_client, **self._async_client_config())
+            logger.info(f"Created async client for {self.__class__.__name__} with {concurrency} connections")
+        return self._async_client
+
+    def _build_batch_body(self, question_data, question_type):
+        """
+        Build the chat completion request body of a question for a batch job.
+        Implemented by subclasses whose provider has an OpenAI-compatible batch API.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The request body
+        """
+        raise NotImplementedError("Subclasses must implement _build_batch_body to use batch mode")
+
+    def _parse_batch_body(self, body, short_question):
+        """
+        Convert the chat completion body of a batch output line into the standardized response format.
+
+        Args:
+            body (dict): The chat completion as returned in the batch output file
+            short_question (str): Label of the request for logging
+
+        Returns:
+            dict: The model's response
+        """
+        raise NotImplementedError("Subclasses must implement _parse_batch_body to use batch mode")
+
+    def supports_batch_api(self):
+        """Return True if this model implements _build_batch_body."""
+        return type(self)._build_batch_body is not APIBaseModel._build_batch_body
+
+    def _get_batch_client(self):
+        """
+        Get the synchronous OpenAI client used for batch jobs, creating it on first use.
+        It talks to the same endpoint as the asyncio backend (see _async_client_config).
+
+        Returns:
+            OpenAI: The client
+        """
+        if getattr(self, '_batch_client', None) is None:
+            from openai import OpenAI
+
+            self._batch_client = OpenAI(**self._async_client_config())
+        return self._batch_client
+
+    def _get_event_loop(self):
+        """
+        Get the event loop of the asyncio engine, starting its background thread on first use.
+
+        Returns:
+            asyncio.AbstractEventLoop: The running event loop
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run_loop():
+                    asyncio.set_event_loop(loop)
+                    # The semaphore bounds how many requests are in flight at once
+                    self._semaphore = asyncio.Semaphore(max(1, self.parallel_size))
+                    ready.set()
+                    loop.run_forever()
+
+                self._loop_thread = threading.Thread(target=run_loop, name=f"{self.__class__.__name__}-asyncio", daemon=True)
+                self._loop_thread.start()
+                ready.wait()
+                self._loop = loop
+                logger.info(f"Started asyncio engine event loop for {self.__class__.__name__}")
+        return self._loop
+
+    def _submit_async(self, question_data, question_type, retries=0):
+        """
+        Schedule an API call on the asyncio engine.
+
+        Args:
+            question_data (str or dict): The question to answer
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+
+        Returns:
+            concurrent.futures.Future: Future resolving to the response dictionary
+        """
+        loop = self._get_event_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._async_api_call_with_retry(question_data, question_type, retries), loop
+        )
+
+    async def _async_api_call_with_retry(self, question_data, question_type, retries=0):
+        """
+        Make an async API call with retry logic on the asyncio engine.
+        Mirrors _direct_api_call_with_retry; the concurrency slot is released while backing off.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+
+        Returns:
+            dict: The model's response
+        """
+        # Get a short version of the question for logging
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+        else:
+            question_text = str(question_data)
+
+        short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+        short_question = short_question.replace("\n", " ")
+
+        # Calculate max attempts (retries + 1 for the initial attempt)
+        max_attempts = retries + 1
+
+        limiter = get_rate_limiter(self.rate_limit_provider)
+        estimated_tokens = self._estimate_tokens(question_data, question_type)
+
+        for attempt in range(max_attempts):
+            ticket = None
+            started = None
+            try:
+                async with self._semaphore:
+                    # Wait until the provider's shared rate limiter admits the request
+                    ticket = await limiter.acquire_async(estimated_tokens)
+                    started = time.time()
+                    logger.debug(f"Async API call attempt {attempt+1}/{max_attempts} for question: {short_question}")
+                    result = await self._make_api_call_async(question_data, question_type)
+
+                # Check if result is None
+                if result is None:
+                    logger.error(f"_make_api_call_async returned None")
+                    raise ValueError("_make_api_call_async returned None")
+
+                # Provider wrappers return rate limits as error results; retry them like exceptions
+                rate_limited, retry_after = get_result_rate_limit_info(result)
+                if rate_limited:
+                    raise RateLimitedError(result.get('error', "Rate limited"), retry_after)
+
+                usage = result.get('usage') or {}
+                limiter.release(ticket, tokens_used=usage.get('total_tokens'), latency=time.time() - started, output_tokens=usage.get('completion_tokens'))
+                ticket = None
+                return result
+
+            except Exception as e:
+                error_msg = str(e)
+                logger.error(f"Async API call attempt {attempt+1}/{max_attempts} failed for question: {short_question}: {error_msg}")
+
+                # Report the outcome so the limiter can back off on 429s
+                if isinstance(e, RateLimitedError):
+                    rate_limited, retry_after = True, e.retry_after
+                else:
+                    rate_limited, retry_after = get_rate_limit_info(e)
+                if ticket is not None:
+                    limiter.release(ticket, latency=time.time() - started, rate_limited=rate_limited, retry_after=retry_after)
+
+                if attempt < max_attempts - 1:
+                    # Honor Retry-After, otherwise back off exponentially with jitter
+                    sleep_time = limiter.retry_delay(attempt, retry_after)
+                    logger.info(f"Retrying async API call in {sleep_time:.1f} seconds...")
+                    await asyncio.sleep(sleep_time)
+                else:
+                    logger.error(f"Failed to get response after {max_attempts} async API call attempts")
+
+                    # Create an error result
+                    return {
+                        'content': f"Error: {error_msg}",
+                        'usage': {},
+                        'full_response': {'error': error_msg, 'error_type': type(e).__name__},
+                        'error': error_msg
+                    }
+
+    def _get_actor_pool(self):
+        """
+        Get the pool of Ray worker actors for this model, creating it on first use.
+
+        The pool has parallel_size actors. Each actor builds its model instance, API client
+        and connection pool once and keeps them for the lifetime of the run.
+
+        Returns:
+            list: The actor handles
+        """
+        with self._actor_pool_lock:
+            if self._actor_pool is None:
+                # Get the fully qualified class name for serialization
+                model_class_name = f"{self.__class__.__module__}.{self.__class__.__name__}"
+
+                # Each actor serves one question at a time, so its own model instance runs sequentially
+                model_args = {'parallel_size': 1, 'max_tokens': self.max_tokens}
+
+                # All workers for a provider share one rate limiter actor
+                limiter_actor = get_remote_rate_limiter(self.rate_limit_provider)
+
+                pool_size = max(1, self.parallel_size)
+                self._actor_pool = [
+                    self.__class__._api_worker_class.remote(model_class_name, model_args, limiter_actor)
+                    for _ in range(pool_size)
+                ]
+                self._actor_load = [0] * pool_size
+                logger.info(f"Started Ray worker pool with {pool_size} actors for {model_class_name}")
+        return self._actor_pool
+
+    def _submit_ray_task(self, question_data, question_type, retries=0, worker_logging=True):
+        """
+        Submit a question to the least busy actor in the worker pool.
+
+        Args:
+            question_data (str or dict): The question to answer
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+            worker_logging (bool): Whether to enable logging for the worker process
+
+        Returns:
+            ray.ObjectRef: Reference to the result; pass it to _get_ray_result to collect it
+        """
+        pool = self._get_actor_pool()
+        with self._actor_pool_lock:
+            actor_idx = min(range(len(pool)), key=lambda i: self._actor_load[i])
+            self._actor_load[actor_idx] += 1
+            task = pool[actor_idx].call.remote(question_data, question_type, retries, worker_logging)
+            self._task_actors[task] = actor_idx
+        return task
+
+    def _release_ray_task(self, task):
+        """Mark a task's actor as free again once its result has been collected."""
+        with self._actor_pool_lock:
+            actor_idx = self._task_actors.pop(task, None)
+            if actor_idx is not None:
+                self._actor_load[actor_idx] -= 1
+
+    def _abandon_ray_task(self, task):
+        """
+        Give up on a task whose result is no longer wanted (timed out, or the caller stopped).
+
+        A running call on a synchronous actor cannot be interrupted, so the actor stays busy
+        until the call returns. The task keeps its actor's load charged until its reference
+        resolves (see _reap_abandoned_tasks); otherwise new questions would be routed to the
+        busy actor and queue behind it.
+
+        Args:
+            task (ray.ObjectRef): The task reference
+        """
+        try:
+            # Only takes effect while the task is still queued on the actor
+            self.__class__._ray_module.cancel(task)
+        except Exception as e:
+            logger.warning(f"Could not cancel abandoned Ray task: {e}")
+        with self._actor_pool_lock:
+            self._abandoned_tasks.add(task)
+
+    def _reap_abandoned_tasks(self):
+        """Free the actors of abandoned tasks that have finished since they were abandoned."""
+        with self._actor_pool_lock:
+            abandoned = list(self._abandoned_tasks)
+        if not abandoned:
+            return
+
+        done, _ = self.__class__._ray_module.wait(abandoned, num_returns=len(abandoned), timeout=0)
+        for task in done:
+            with self._actor_pool_lock:
+                self._abandoned_tasks.discard(task)
+            self._release_ray_task(task)
+        if done:
+            logger.info(f"{len(done)} abandoned Ray tasks finished; their actors are free again ({len(abandoned) - len(done)} still busy)")
+
+    def _get_ray_result(self, task):
+        """
+        Wait for a task submitted with _submit_ray_task and return its result.
+
+        Args:
+            task (ray.ObjectRef): The task reference
+
+        Returns:
+            dict: The worker's result
+        """
+        try:
+            return self.__class__._ray_module.get(task)
+        finally:
+            self._release_ray_task(task)
+
+    def set_response_cache(self, cache, base_name):
+        """
+        Serve repeated prompts from a response cache.
+
+        Args:
+            cache (ResponseCache): The cache to use, or None to disable caching
+            base_name (str): Name of the model base, part of the cache key
+        """
+        self._response_cache = cache
+        self._cache_base_name = base_name
+        if cache is not None:
+            logger.info(f"Response cache enabled for {self.__class__.__name__} at {cache.cache_dir}")
+
+    def _render_prompt(self, question_data, question_type):
+        """
+        Render the system message and user prompt for a question.
+
+        Args:
+            question_data (str or dict): The question to answer
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            tuple: (system_message, prompt)
+        """
+        from src.type import get_type_module
+
+        # Get the appropriate question type module
+        type_module = get_type_module(question_type)
+
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+            if question_type == "MCQ":
+                prompt = type_module.get_prompt(question_text, question_data.get('options', None), question_data.get('knowledge', None))
+            else:
+                prompt = type_module.get_prompt(question_text)
+        else:
+            prompt = type_module.get_prompt(str(question_data))
+
+        return type_module.SYSTEM_MESSAGE, prompt
+
+    @property
+    def rate_limit_provider(self):
+        """Name of the provider whose shared rate limiter this model uses."""
+        return self.PROVIDER or self.__class__.__name__
+
+    def _estimate_tokens(self, question_data, question_type):
+        """
+        Estimate the tokens a request counts against a tokens-per-minute budget: the prompt
+        (about four characters per token) plus the full completion budget, which is what
+        providers reserve when a request is admitted.
+
+        Args:
+            question_data (str or dict): The question to answer
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            int: Estimated tokens
+        """
+        try:
+            system_message, prompt = self._render_prompt(question_data, question_type)
+            prompt_tokens = (len(system_message) + len(prompt)) // 4
+        except Exception:
+            prompt_tokens = 0
+        return prompt_tokens + (self.max_tokens or 0)
+
+    def get_rate_limiter_stats(self):
+        """
+        Get the counters of the provider's shared rate limiter used by this model.
+
+        Returns:
+            dict: Limiter statistics (requests, 429s, waiting time, current concurrency limit)
+        """
+        if self.use_ray and self._actor_pool is not None:
+            limiter_actor = get_remote_rate_limiter(self.rate_limit_provider)
+            return self.__class__._ray_module.get(limiter_actor.get_stats.remote())
+        return get_rate_limiter(self.rate_limit_provider).get_stats()
+
+    def _cache_params(self):
+        """
+        Decoding parameters that affect the response, other than max_tokens.
+        Subclasses that set sampling parameters override this so they become part of the cache key.
+
+        Returns:
+            dict: The decoding parameters
+        """
+        return {}
+
+    def _response_cache_key(self, question_data, question_type):
+        """Compute the response cache key for a question."""
+        from .response_cache import ResponseCache
+
+        system_message, prompt = self._render_prompt(question_data, question_type)
+        model_name = getattr(self, 'model_name', self.__class__.__name__)
+        return ResponseCache.make_key(self._cache_base_name, model_name, system_message, prompt, self._cache_params())
+
     def generate_response(self, question_data, question_type="OEQ", retries=0, worker_logging=True):
         """
         Generate a response for the given question using the API.
+
+        If a response cache is set, a cached response is returned when available, and a
+        request for a prompt that is already in flight waits for that request instead of
+        being sent again.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails (0 means try once, 1 means try once and retry once if it fails)
+            worker_logging (bool): Whether to enable logging for the worker process
+
+        Returns:
+            dict: A dictionary containing:
+                - 'content': The model's response text
+                - 'usage': Information about token usage
+                - 'full_response': The full response object
+        """
+        cache = self._response_cache
+        if cache is None:
+            return self._generate_response_uncached(question_data, question_type, retries, worker_logging)
+
+        key = self._response_cache_key(question_data, question_type)
+        cached = cache.get(key, self.max_tokens)
+        if cached is not None:
+            logger.info(f"Response cache hit for key {key[:12]}")
+            return cached
+
+        future, is_leader = cache.claim(key)
+        if not is_leader:
+            logger.info(f"Waiting for identical in-flight request with key {key[:12]}")
+            return dict(future.result())
+
+        result = None
+        try:
+            result = self._generate_response_uncached(question_data, question_type, retries, worker_logging)
+            return result
+        finally:
+            if result is None:
+                result = self._task_error_result("Request was abandoned", "RuntimeError", "Request was abandoned")
+            cache.release(key, result, self.max_tokens)
+
+    def _generate_response_uncached(self, question_data, question_type="OEQ", retries=0, worker_logging=True):
+        """
+        Generate a response for the given question using the API.
         Uses Ray for parallel processing if available, otherwise falls back to direct API calls.
 
         Args:
@@ -362,18 +961,16 @@ class APIBaseModel(BaseModel):
                 - 'usage': Information about token usage
                 - 'full_response': The full response object
         """
+        # Run on the asyncio engine if selected
+        if self.use_async:
+            return self._submit_async(question_data, question_type, retries).result()
+
         # If Ray is not available, fall back to direct API call
         if not self.use_ray:
             return self._direct_api_call_with_retry(question_data, question_type, retries)
 
         # Ray is available, use parallel processing
         try:
-            # Get the fully qualified class name for serialization
-            model_class_name = f"{self.__class__.__module__}.{self.__class__.__name__}"
-
-            # Create a dictionary of model arguments
-            model_args = {'parallel_size': self.parallel_size, 'max_tokens': self.max_tokens}
-
             # Get a short version of the question for logging
             if isinstance(question_data, dict):
                 question_text = question_data.get('question', question_data.get('problem', ''))
@@ -383,17 +980,15 @@ class APIBaseModel(BaseModel):
             short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
             short_question = short_question.replace("\n", " ")
 
-            logger.info(f"Submitting Ray task for question: {short_question}")
+            logger.info(f"Submitting question to Ray worker pool: {short_question}")
             logger.info(f"Retries: {retries}, Worker logging: {worker_logging}")
 
             # Submit the task using the class variable
-            task = self.__class__._call_api_with_retry.remote(
-                model_class_name, model_args, question_data, question_type, retries, worker_logging
-            )
+            task = self._submit_ray_task(question_data, question_type, retries, worker_logging)
 
             # Get the result without a timeout
             logger.info(f"Waiting for Ray task to complete")
-            result = self.__class__._ray_module.get(task)
+            result = self._get_ray_result(task)
 
             # Check if result is None
             if result is None:
@@ -466,8 +1061,14 @@ class APIBaseModel(BaseModel):
         # Calculate max attempts (retries + 1 for the initial attempt)
         max_attempts = retries + 1
 
+        limiter = get_rate_limiter(self.rate_limit_provider)
+        estimated_tokens = self._estimate_tokens(question_data, question_type)
+
         # Call the model's _make_api_call method with retry logic
         for attempt in range(max_attempts):
+            # Wait until the provider's shared rate limiter admits the request
+            ticket = limiter.acquire(estimated_tokens)
+            started = time.time()
             try:
                 logger.info(f"Direct API call attempt {attempt+1}/{max_attempts}")
 
@@ -479,6 +1080,15 @@ class APIBaseModel(BaseModel):
                     logger.error(f"_make_api_call returned None")
                     raise ValueError("_make_api_call returned None")
 
+                # Provider wrappers return rate limits as error results; retry them like exceptions
+                rate_limited, retry_after = get_result_rate_limit_info(result)
+                if rate_limited:
+                    raise RateLimitedError(result.get('error', "Rate limited"), retry_after)
+
+                usage = result.get('usage') or {}
+                limiter.release(ticket, tokens_used=usage.get('total_tokens'), latency=time.time() - started, output_tokens=usage.get('completion_tokens'))
+                ticket = None
+
                 logger.info(f"Successfully completed direct API call")
                 return result
 
@@ -486,10 +1096,18 @@ class APIBaseModel(BaseModel):
                 error_msg = str(e)
                 logger.error(f"Direct API call attempt {attempt+1}/{max_attempts} failed: {error_msg}")
 
+                # Report the outcome so the limiter can back off on 429s
+                if isinstance(e, RateLimitedError):
+                    rate_limited, retry_after = True, e.retry_after
+                else:
+                    rate_limited, retry_after = get_rate_limit_info(e)
+                if ticket is not None:
+                    limiter.release(ticket, latency=time.time() - started, rate_limited=rate_limited, retry_after=retry_after)
+
                 if attempt < max_attempts - 1:
-                    # Exponential backoff
-                    sleep_time = 2 ** attempt
-                    logger.info(f"Retrying direct API call in {sleep_time} seconds...")
+                    # Honor Retry-After, otherwise back off exponentially with jitter
+                    sleep_time = limiter.retry_delay(attempt, retry_after)
+                    logger.info(f"Retrying direct API call in {sleep_time:.1f} seconds...")
                     time.sleep(sleep_time)
                 else:
                     logger.error(f"Failed to get response after {max_attempts} direct API call attempts")
@@ -502,213 +1120,364 @@ class APIBaseModel(BaseModel):
                         'error': error_msg
                     }
 
-    def generate_responses_batch(self, questions_data, question_type="OEQ", retries=0, worker_logging=True):
+    def _task_error_result(self, error_msg, error_type, log_message):
         """
-        Generate responses for multiple questions in parallel.
-        Uses Ray for parallel processing if available, otherwise falls back to sequential processing.
+        Build the error result for a question whose task failed or timed out.
 
         Args:
-            questions_data (list): List of questions to answer. Each item can be a string or a dictionary containing the question and additional data
-            question_type (str): Type of question (OEQ or MCQ)
-            retries (int): Number of retries if the first attempt fails (0 means try once, 1 means try once and retry once if it fails)
-            worker_logging (bool): Whether to enable logging for the worker process
+            error_msg (str): The error message
+            error_type (str): The error type name
+            log_message (str): Log entry attached to the result
 
         Returns:
-            list: List of responses
+            dict: The error result
         """
-        # If Ray is not available, fall back to sequential processing
-        if not self.use_ray:
-            return self._generate_responses_sequential(questions_data, question_type, retries)
-
-        # Ray is available, use parallel processing
-        # Calculate number of batches
-        total_questions = len(questions_data)
-        num_batches = (total_questions + self.parallel_size - 1) // self.parallel_size
-
-        logger.info(f"Processing {total_questions} questions in {num_batches} batches of up to {self.parallel_size}")
-        logger.info(f"Retries: {retries}, Worker logging: {worker_logging}")
+        return {
+            'content': f"Error: {error_msg}",
+            'usage': {},
+            'full_response': {'error': error_msg, 'error_type': error_type},
+            'error': error_msg,  # Add explicit error field
+            'logs': [log_message]
+        }
+
+    def _iter_ray_results(self, questions_data, question_type="OEQ", retries=0, worker_logging=True, task_timeout=None):
+        """
+        Run questions on the Ray worker pool and yield results as they finish.
 
-        all_results = []
+        Every actor that is free gets a task. ray.wait returns whichever task completes
+        first, so a slow task never holds back results that are already done. A task that
+        runs longer than task_timeout is reported as an error and abandoned: its actor takes
+        no new questions until the call actually returns, so their deadlines are not spent
+        waiting behind it.
 
-        # Process questions in batches to control memory usage
-        for batch_idx in range(num_batches):
-            start_idx = batch_idx * self.parallel_size
-            end_idx = min(start_idx + self.parallel_size, total_questions)
-            batch_questions = questions_data[start_idx:end_idx]
+        Args:
+            questions_data (list): List of questions to answer
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+            worker_logging (bool): Whether to enable logging for the worker process
+            task_timeout (float, optional): Per-task deadline in seconds. None means no deadline.
 
-            logger.info(f"Submitting batch {batch_idx + 1}/{num_batches} with {len(batch_questions)} questions")
+        Yields:
+            tuple: (index, result) in completion order
+        """
+        ray = self.__class__._ray_module
+        total_questions = len(questions_data)
+        pool_size = len(self._get_actor_pool())
 
-            # Get the fully qualified class name for serialization
-            model_class_name = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        # Task reference -> (question index, deadline)
+        pending = {}
+        next_idx = 0
 
-            # Create a dictionary of model arguments
-            model_args = {'parallel_size': self.parallel_size, 'max_tokens': self.max_tokens}
+        try:
+            while next_idx < total_questions or pending:
+                # Actors still busy with abandoned tasks take no new questions
+                self._reap_abandoned_tasks()
+                with self._actor_pool_lock:
+                    window_size = pool_size - len(self._abandoned_tasks)
+
+                # Keep every free actor in the pool busy
+                while next_idx < total_questions and len(pending) < window_size:
+                    task = self._submit_ray_task(questions_data[next_idx], question_type, retries, worker_logging)
+                    deadline = time.time() + task_timeout if task_timeout else None
+                    pending[task] = (next_idx, deadline)
+                    next_idx += 1
+
+                if not pending:
+                    # Every actor is busy with an abandoned task; wait for one of them to return
+                    with self._actor_pool_lock:
+                        abandoned = list(self._abandoned_tasks)
+                    logger.warning(f"All {pool_size} Ray actors are busy with timed out tasks; waiting for one to become free")
+                    ray.wait(abandoned, num_returns=1, timeout=60)
+                    continue
 
-            # Submit all tasks in this batch
-            tasks = []
-            for question in batch_questions:
-                tasks.append(self.__class__._call_api_with_retry.remote(
-                    model_class_name, model_args, question, question_type, retries, worker_logging
-                ))
+                # Wait for the first finished task, but no longer than the earliest deadline
+                deadlines = [deadline for _, deadline in pending.values() if deadline is not None]
+                wait_timeout = max(0.0, min(deadlines) - time.time()) if deadlines else None
+                ready, _ = ray.wait(list(pending), num_returns=1, timeout=wait_timeout)
+                if ready and len(pending) > 1:
+                    # Collect anything else that has already finished in the same pass
+                    ready, _ = ray.wait(list(pending), num_returns=len(pending), timeout=0)
 
-            # Get all results from this batch in parallel
-            try:
-                # Try to get all results, but handle individual failures
-                batch_results = []
-                for i, task in enumerate(tasks):
+                for task in ready:
+                    idx, _ = pending.pop(task)
                     try:
-                        # Add a timeout to ray.get to prevent hanging
-                        logger.info(f"Waiting for result of question {start_idx + i + 1}/{total_questions}")
-
-                        # Get the result without a timeout
-                        logger.info(f"Waiting for Ray task to complete for question {start_idx + i + 1}")
-                        result = self.__class__._ray_module.get(task)
+                        result = self._get_ray_result(task)
 
                         # Check if result is None
                         if result is None:
-                            logger.error(f"Ray task returned None for question {start_idx + i + 1}")
+                            logger.error(f"Ray task returned None for question {idx + 1}")
                             raise ValueError("Ray task returned None")
 
                         # Check if result is a dictionary
                         if not isinstance(result, dict):
-                            logger.error(f"Ray task returned non-dict result: {type(result)} for question {start_idx + i + 1}")
+                            logger.error(f"Ray task returned non-dict result: {type(result)} for question {idx + 1}")
                             raise ValueError(f"Ray task returned non-dict result: {type(result)}")
 
                         # Log any logs from the worker process
                         if 'logs' in result:
                             for log_entry in result['logs']:
-                                logger.info(f"Worker log for question {start_idx + i + 1}: {log_entry}")
-
-                        batch_results.append(result)
-                        logger.info(f"Completed question {start_idx + i + 1}/{total_questions}")
+                                logger.info(f"Worker log for question {idx + 1}: {log_entry}")
                     except Exception as e:
                         error_msg = str(e)
-                        logger.error(f"Error processing question {start_idx + i + 1}: {error_msg}")
+                        logger.error(f"Error processing question {idx + 1}: {error_msg}")
                         logger.error(f"Error type: {type(e).__name__}")
+                        result = self._task_error_result(error_msg, type(e).__name__, f"Error in Ray task: {error_msg}")
+
+                    logger.info(f"Completed question {idx + 1}/{total_questions} ({len(pending)} still in flight)")
+                    yield idx, result
+
+                # Give up on tasks that are past their deadline
+                now = time.time()
+                for task, (idx, deadline) in list(pending.items()):
+                    if deadline is None or now < deadline:
+                        continue
+                    pending.pop(task)
+                    self._abandon_ray_task(task)
+
+                    error_msg = f"Task timed out after {task_timeout} seconds"
+                    logger.error(f"Question {idx + 1}/{total_questions}: {error_msg}")
+                    yield idx, self._task_error_result(error_msg, "TimeoutError", error_msg)
+        finally:
+            # Cancel outstanding work if the caller stops early
+            for task in pending:
+                self._abandon_ray_task(task)
+
+    def generate_responses_batch(self, questions_data, question_type="OEQ", retries=0, worker_logging=True, on_result=None, task_timeout=None):
+        """
+        Generate responses for multiple questions in parallel.
+        Uses Ray for parallel processing if available, otherwise falls back to sequential processing.
 
-                        # Add detailed error information
-                        import traceback
-                        logger.error(f"Traceback: {traceback.format_exc()}")
+        Results are collected in completion order. on_result is called for every question as
+        soon as its result is available, so callers can persist results incrementally; the
+        returned list is in the same order as questions_data.
 
-                        # Add error result with error information in both content and full_response
-                        error_result = {
-                            'content': f"Error: {error_msg}",
-                            'usage': {},
-                            'full_response': {'error': error_msg, 'error_type': type(e).__name__},
-                            'error': error_msg,  # Add explicit error field
-                            'logs': [f"Error in Ray task: {error_msg}"]
-                        }
-                        batch_results.append(error_result)
+        Args:
+            questions_data (list): List of questions to answer. Each item can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails (0 means try once, 1 means try once and retry once if it fails)
+            worker_logging (bool): Whether to enable logging for the worker process
+            on_result (callable, optional): Called as on_result(index, result) when a question finishes
+            task_timeout (float, optional): Per-question deadline in seconds (Ray and asyncio backends)
 
-                all_results.extend(batch_results)
-                logger.info(f"Completed batch {batch_idx + 1}/{num_batches} with {len(batch_results)} results")
+        Returns:
+            list: List of responses
+        """
+        # If neither Ray nor the asyncio engine is available, fall back to sequential processing
+        # (cached runs always go through the stream so hits and identical prompts are handled)
+        if not self.use_ray and not self.use_async and self._response_cache is None:
+            return self._generate_responses_sequential(questions_data, question_type, retries, on_result=on_result)
 
-                # Count successful and error results
-                success_count = sum(1 for r in batch_results if 'error' not in r)
-                error_count = sum(1 for r in batch_results if 'error' in r)
-                logger.info(f"Batch {batch_idx + 1} results: {success_count} successful, {error_count} errors")
-            except Exception as e:
-                error_msg = str(e)
-                logger.error(f"Error processing batch {batch_idx + 1}: {error_msg}")
-                logger.error(f"Error type: {type(e).__name__}")
+        total_questions = len(questions_data)
+        all_results = [None] * total_questions
 
-                # Add detailed error information
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.info(f"Processing {total_questions} questions with up to {max(1, self.parallel_size)} in flight")
+        logger.info(f"Retries: {retries}, Worker logging: {worker_logging}, Task timeout: {task_timeout}")
 
-                # Try falling back to sequential processing for this batch
-                logger.warning(f"Ray batch processing failed, trying sequential processing for batch {batch_idx + 1}")
-                try:
-                    batch_results = []
-                    for i, question in enumerate(batch_questions):
-                        logger.info(f"Sequential fallback for question {start_idx + i + 1}/{total_questions}")
-                        result = self._direct_api_call_with_retry(question, question_type, retries)
-                        batch_results.append(result)
-
-                        # Log success or failure
-                        if 'error' in result:
-                            logger.error(f"Sequential fallback failed for question {start_idx + i + 1}")
-                        else:
-                            logger.info(f"Sequential fallback succeeded for question {start_idx + i + 1}")
-
-                    all_results.extend(batch_results)
-
-                    # Count successful and error results
-                    sequential_success = sum(1 for r in batch_results if 'error' not in r)
-                    sequential_error = sum(1 for r in batch_results if 'error' in r)
-                    logger.info(f"Sequential fallback for batch {batch_idx + 1} results: {sequential_success} successful, {sequential_error} errors")
-
-                    # Skip the individual Ray processing below
-                    continue
+        try:
+            for idx, result in self.generate_responses_stream(questions_data, question_type, retries, worker_logging, task_timeout=task_timeout):
+                all_results[idx] = result
+                if on_result is not None:
+                    on_result(idx, result)
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error collecting parallel results: {error_msg}")
+            logger.error(f"Error type: {type(e).__name__}")
 
+            # Add detailed error information
+            import traceback
+            logger.error(f"Traceback: {traceback.format_exc()}")
+
+            # Fall back to sequential processing for the questions that have no result yet
+            missing = [idx for idx, result in enumerate(all_results) if result is None]
+            logger.warning(f"Parallel processing failed, trying sequential processing for {len(missing)} remaining questions")
+            for idx in missing:
+                logger.info(f"Sequential fallback for question {idx + 1}/{total_questions}")
+                try:
+                    result = self._direct_api_call_with_retry(questions_data[idx], question_type, retries)
                 except Exception as e2:
                     error_msg2 = str(e2)
-                    logger.error(f"Sequential fallback also failed for batch {batch_idx + 1}: {error_msg2}")
-                    logger.error(f"Falling back to individual Ray processing as last resort")
+                    logger.error(f"Sequential fallback failed for question {idx + 1}: {error_msg2}")
+                    result = self._task_error_result(error_msg2, type(e2).__name__, f"Error in sequential fallback: {error_msg2}")
 
-                # Process questions individually with Ray as last resort
-                for i, question in enumerate(batch_questions):
-                    try:
-                        logger.info(f"Starting individual processing for question {start_idx + i + 1}/{total_questions}")
+                all_results[idx] = result
+                if on_result is not None:
+                    on_result(idx, result)
 
-                        # Submit the task
-                        task = self.__class__._call_api_with_retry.remote(
-                            model_class_name, model_args, question, question_type, retries, worker_logging
-                        )
+        # Log final results
+        total_success = sum(1 for r in all_results if 'error' not in r)
+        total_error = sum(1 for r in all_results if 'error' in r)
+        logger.info(f"Final results: {len(all_results)} total, {total_success} successful, {total_error} errors")
 
-                        # Get the result without a timeout
-                        logger.info(f"Waiting for individual Ray task to complete for question {start_idx + i + 1}")
-                        result = self.__class__._ray_module.get(task)
+        return all_results
 
-                        # Check if result is None
-                        if result is None:
-                            logger.error(f"Individual Ray task returned None for question {start_idx + i + 1}")
-                            raise ValueError("Ray task returned None")
+    def generate_responses_stream(self, questions_data, question_type="OEQ", retries=0, worker_logging=True, task_timeout=None):
+        """
+        Generate responses with a sliding window of in-flight requests.
 
-                        # Check if result is a dictionary
-                        if not isinstance(result, dict):
-                            logger.error(f"Individual Ray task returned non-dict result: {type(result)} for question {start_idx + i + 1}")
-                            raise ValueError(f"Ray task returned non-dict result: {type(result)}")
+        If a response cache is set, cached questions are yielded first without any request,
+        and questions whose prompt is identical to one already in flight wait for that
+        request instead of being sent again. Only the remaining questions are sent.
 
-                        # Log any logs from the worker process
-                        if 'logs' in result:
-                            for log_entry in result['logs']:
-                                logger.info(f"Worker log for question {start_idx + i + 1}: {log_entry}")
+        Args:
+            questions_data (list): List of questions to answer. Each item can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+            worker_logging (bool): Whether to enable logging for the worker process
+            task_timeout (float, optional): Per-question deadline in seconds. None means no deadline.
 
-                        all_results.append(result)
-                        logger.info(f"Completed individual processing for question {start_idx + i + 1}/{total_questions}")
-                    except Exception as e:
-                        error_msg = str(e)
-                        logger.error(f"Error in individual processing for question {start_idx + i + 1}: {error_msg}")
-                        logger.error(f"Error type: {type(e).__name__}")
+        Yields:
+            tuple: (index, result) in completion order, where index is the position of the question in questions_data
+        """
+        cache = self._response_cache
+        if cache is None:
+            yield from self._stream_responses(questions_data, question_type, retries, worker_logging, task_timeout)
+            return
+
+        keys = [self._response_cache_key(question, question_type) for question in questions_data]
+
+        # Serve hits, and split the misses into requests to send and waiters on identical prompts
+        leaders = []
+        followers = []
+        claimed = []
+        hits = 0
+        for idx, key in enumerate(keys):
+            cached = cache.get(key, self.max_tokens)
+            if cached is not None:
+                hits += 1
+                yield idx, cached
+                continue
+
+            future, is_leader = cache.claim(key)
+            if is_leader:
+                leaders.append(idx)
+                claimed.append(key)
+            else:
+                followers.append((idx, future))
+
+        logger.info(f"Response cache: {hits} hits, {len(followers)} coalesced with identical prompts, {len(leaders)} requests to send")
+
+        try:
+            leader_questions = [questions_data[idx] for idx in leaders]
+            for leader_pos, result in self._stream_responses(leader_questions, question_type, retries, worker_logging, task_timeout):
+                idx = leaders[leader_pos]
+                cache.release(keys[idx], result, self.max_tokens)
+                yield idx, result
+
+                # Hand out results to questions that were waiting on a finished request
+                waiting = []
+                for follower_idx, future in followers:
+                    if future.done():
+                        yield follower_idx, dict(future.result())
+                    else:
+                        waiting.append((follower_idx, future))
+                followers = waiting
+
+            # Remaining waiters depend on requests made by other callers
+            for follower_idx, future in followers:
+                yield follower_idx, dict(future.result())
+        finally:
+            # Never leave waiters hanging on a request that was not completed
+            abandoned = self._task_error_result("Request was abandoned", "RuntimeError", "Request was abandoned")
+            for key in claimed:
+                cache.release(key, abandoned, self.max_tokens)
+
+    def _stream_responses(self, questions_data, question_type="OEQ", retries=0, worker_logging=True, task_timeout=None):
+        """
+        Generate responses with a sliding window of in-flight requests, without the response cache.
+
+        Up to parallel_size questions are in flight at any time. As soon as one finishes, its
+        result is yielded and the next question is started, so a single slow response does not
+        hold up the other slots. On the Ray backend completion is detected with ray.wait.
+
+        Args:
+            questions_data (list): List of questions to answer. Each item can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Number of retries if the first attempt fails
+            worker_logging (bool): Whether to enable logging for the worker process
+            task_timeout (float, optional): Per-question deadline in seconds. A question that
+                misses it is cancelled (best effort) and yielded as an error. None means no deadline.
+
+        Yields:
+            tuple: (index, result) in completion order, where index is the position of the question in questions_data
+        """
+        if self.use_ray:
+            yield from self._iter_ray_results(questions_data, question_type, retries, worker_logging, task_timeout)
+            return
+
+        import concurrent.futures
 
-                        # Add detailed error information
-                        import traceback
-                        logger.error(f"Traceback: {traceback.format_exc()}")
+        total_questions = len(questions_data)
+        window_size = max(1, self.parallel_size)
+
+        logger.info(f"Streaming {total_questions} questions with up to {window_size} in flight")
+
+        # On the asyncio engine requests are coroutines on the event loop; otherwise each
+        # in-flight request occupies a thread that blocks in generate_response
+        executor = None
+        if self.use_async:
+            submit = lambda question: self._submit_async(question, question_type, retries)
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=window_size)
+            submit = lambda question: executor.submit(self._generate_response_uncached, question, question_type, retries, worker_logging)
+
+        # Future -> (question index, deadline)
+        in_flight = {}
+        next_idx = 0
 
-                        # Add error result with error information in both content and full_response
-                        error_result = {
+        try:
+            while next_idx < total_questions or in_flight:
+                # Fill every free slot in the window
+                while next_idx < total_questions and len(in_flight) < window_size:
+                    future = submit(questions_data[next_idx])
+                    deadline = time.time() + task_timeout if task_timeout else None
+                    in_flight[future] = (next_idx, deadline)
+                    next_idx += 1
+
+                # Wait for the first finished request, but no longer than the earliest deadline
+                deadlines = [deadline for _, deadline in in_flight.values() if deadline is not None]
+                wait_timeout = max(0.0, min(deadlines) - time.time()) if deadlines else None
+                done, _ = concurrent.futures.wait(in_flight, timeout=wait_timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                for future in done:
+                    idx, _ = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                        if not isinstance(result, dict):
+                            raise ValueError(f"generate_response returned non-dict result: {type(result)}")
+                    except Exception as e:
+                        error_msg = str(e)
+                        logger.error(f"Error processing question {idx + 1}/{total_questions}: {error_msg}")
+                        result = {
                             'content': f"Error: {error_msg}",
                             'usage': {},
                             'full_response': {'error': error_msg, 'error_type': type(e).__name__},
-                            'error': error_msg,  # Add explicit error field
-                            'logs': [f"Error in individual processing: {error_msg}"]
+                            'error': error_msg
                         }
-                        all_results.append(error_result)
-
-                # Log individual processing results for this batch
-                individual_success = sum(1 for r in all_results[-len(batch_questions):] if 'error' not in r)
-                individual_error = sum(1 for r in all_results[-len(batch_questions):] if 'error' in r)
-                logger.info(f"Individual processing of batch {batch_idx + 1} results: {individual_success} successful, {individual_error} errors")
-
-        # Log final results
-        total_success = sum(1 for r in all_results if 'error' not in r)
-        total_error = sum(1 for r in all_results if 'error' in r)
-        logger.info(f"Final results: {len(all_results)} total, {total_success} successful, {total_error} errors")
 
-        return all_results
+                    logger.info(f"Completed question {idx + 1}/{total_questions} ({len(in_flight)} still in flight)")
+                    yield idx, result
+
+                # Give up on requests that are past their deadline. A blocking request in a
+                # worker thread cannot be interrupted, but its result is no longer waited for.
+                now = time.time()
+                for future, (idx, deadline) in list(in_flight.items()):
+                    if deadline is None or now < deadline:
+                        continue
+                    in_flight.pop(future)
+                    future.cancel()
+
+                    error_msg = f"Task timed out after {task_timeout} seconds"
+                    logger.error(f"Question {idx + 1}/{total_questions}: {error_msg}")
+                    yield idx, self._task_error_result(error_msg, "TimeoutError", error_msg)
+        finally:
+            # Drop queued work if the caller stops early (e.g. after too many consecutive failures)
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in in_flight:
+                    future.cancel()
 
-    def _generate_responses_sequential(self, questions_data, question_type="OEQ", retries=0):
+    def _generate_responses_sequential(self, questions_data, question_type="OEQ", retries=0, on_result=None):
         """
         Generate responses for multiple questions sequentially.
         This is a fallback method when Ray is not available.
@@ -717,6 +1486,7 @@ class APIBaseModel(BaseModel):
             questions_data (list): List of questions to answer. Each item can be a string or a dictionary containing the question and additional data
             question_type (str): Type of question (OEQ or MCQ)
             retries (int): Number of retries if the first attempt fails
+            on_result (callable, optional): Called as on_result(index, result) when a question finishes
 
         Returns:
             list: List of response dictionaries
@@ -731,6 +1501,8 @@ class APIBaseModel(BaseModel):
             # Use the direct API call method
             result = self._direct_api_call_with_retry(question_data, question_type, retries)
             results.append(result)
+            if on_result is not None:
+                on_result(i, result)
 
             # Log success or failure
             if 'error' in result:
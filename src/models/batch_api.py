@@ -0,0 +1,249 @@
+"""
+Offline batch jobs on OpenAI-compatible batch APIs.
+
+A batch job turns a list of questions into a JSONL file of chat completion requests
+(one line per question, keyed by ``custom_id``), uploads it through ``/v1/files``,
+creates a job through ``/v1/batches`` and later downloads the job's output and error
+files. Batch jobs are billed at a discount and are not subject to the per-minute rate
+limits of synchronous calls, at the cost of finishing within a completion window
+(typically 24 hours) instead of immediately.
+
+The state of the submitted job is kept in a small checkpoint file, so an interrupted
+run resumes polling the same job instead of submitting (and paying for) it again.
+"""
+
+import os
+import json
+import logging
+import datetime
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Endpoint every request line of a batch is sent to
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Batch statuses after which the job will not change any more
+TERMINAL_BATCH_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+def write_batch_input(model, questions_data, custom_ids, question_type, input_path):
+    """
+    Write the batch request file for a list of questions.
+
+    Args:
+        model (APIBaseModel): Model that supports the batch API
+        questions_data (list): List of questions (strings or dictionaries)
+        custom_ids (list): Identifier of each question, echoed back in the batch output
+        question_type (str): Type of question (OEQ or MCQ)
+        input_path (str): Path of the JSONL file to write
+
+    Returns:
+        int: Number of requests written
+    """
+    os.makedirs(os.path.dirname(input_path), exist_ok=True)
+    tmp_path = f"{input_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for custom_id, question_data in zip(custom_ids, questions_data):
+            request = {
+                "custom_id": str(custom_id),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": model._build_batch_body(question_data, question_type)
+            }
+            f.write(json.dumps(request, ensure_ascii=False) + '\n')
+    os.replace(tmp_path, input_path)
+
+    logger.info(f"Wrote {len(custom_ids)} batch requests to {input_path} ({os.path.getsize(input_path) / 1024:.1f} KB)")
+    return len(custom_ids)
+
+def _batch_to_dict(batch):
+    """Convert a batch object returned by the client into a plain dictionary."""
+    if hasattr(batch, 'model_dump'):
+        return batch.model_dump()
+    return dict(batch)
+
+def submit_batch(model, input_path, completion_window="24h", description=None):
+    """
+    Upload a batch request file and create the batch job.
+
+    Args:
+        model (APIBaseModel): Model that supports the batch API
+        input_path (str): Path of the JSONL request file
+        completion_window (str): Time frame within which the batch must be processed
+        description (str, optional): Free-text description stored with the job
+
+    Returns:
+        dict: The created batch
+    """
+    client = model._get_batch_client()
+
+    with open(input_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    logger.info(f"Uploaded batch input file {input_path} as {input_file.id}")
+
+    batch_params = {
+        "input_file_id": input_file.id,
+        "endpoint": BATCH_ENDPOINT,
+        "completion_window": completion_window
+    }
+    if description:
+        batch_params["metadata"] = {"description": description}
+
+    batch = client.batches.create(**batch_params)
+    logger.info(f"Created batch {batch.id} with status {batch.status}")
+    return _batch_to_dict(batch)
+
+def retrieve_batch(model, batch_id):
+    """
+    Get the current state of a batch job.
+
+    Args:
+        model (APIBaseModel): Model that supports the batch API
+        batch_id (str): ID of the batch
+
+    Returns:
+        dict: The batch
+    """
+    return _batch_to_dict(model._get_batch_client().batches.retrieve(batch_id))
+
+def read_batch_file(model, file_id):
+    """
+    Download a batch output or error file.
+
+    Args:
+        model (APIBaseModel): Model that supports the batch API
+        file_id (str): ID of the file
+
+    Returns:
+        list: The parsed JSONL lines
+    """
+    content = model._get_batch_client().files.content(file_id).text
+    lines = [json.loads(line) for line in content.splitlines() if line.strip()]
+    logger.info(f"Downloaded {len(lines)} lines from batch file {file_id}")
+    return lines
+
+def parse_batch_line(model, line):
+    """
+    Convert one line of a batch output or error file into the standardized response format.
+
+    Args:
+        model (APIBaseModel): Model that supports the batch API
+        line (dict): The parsed output line
+
+    Returns:
+        tuple: (custom_id, result)
+    """
+    from .api_base import format_api_response
+
+    custom_id = line.get('custom_id')
+    response = line.get('response') or {}
+    status_code = response.get('status_code')
+    body = response.get('body') or {}
+
+    # Request-level failures are reported either in 'error' or as a non-200 response
+    error = line.get('error')
+    if not error and status_code not in (None, 200):
+        error = body.get('error') if isinstance(body, dict) else None
+        error = error or f"HTTP {status_code}"
+    if not error and not body:
+        error = "Batch output line has no response body"
+
+    if error:
+        if isinstance(error, dict):
+            error = f"{error.get('code') or error.get('type') or 'error'}: {error.get('message', '')}"
+        logger.error(f"Batch request {custom_id} failed: {error}")
+        return custom_id, format_api_response("", {}, line, error=f"Batch request failed: {error}")
+
+    try:
+        return custom_id, model._parse_batch_body(body, f"batch request {custom_id}")
+    except Exception as e:
+        logger.error(f"Error parsing batch response for {custom_id}: {e}")
+        return custom_id, format_api_response("", {}, line, error=f"Error parsing batch response: {e}")
+
+class BatchCheckpoint:
+    """
+    Checkpoint of the batch job belonging to an output directory.
+
+    The checkpoint records the active (submitted but not yet ingested) job together with
+    the ids it covers, and a history of the jobs that were already ingested. It is rewritten
+    atomically after every state change.
+    """
+
+    def __init__(self, path):
+        """
+        Load (or create) the checkpoint.
+
+        Args:
+            path (str): Path of the checkpoint file
+        """
+        self.path = path
+        self.state = {'active': None, 'history': []}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+            active = self.state.get('active')
+            if active:
+                logger.info(f"Loaded batch checkpoint {path} with active batch {active['batch_id']} (status: {active.get('status')})")
+
+    @property
+    def active(self):
+        """The active batch job, or None."""
+        return self.state.get('active')
+
+    def save(self):
+        """Write the checkpoint atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+    def start(self, batch, custom_ids, input_path):
+        """
+        Record a newly submitted batch job.
+
+        Args:
+            batch (dict): The created batch
+            custom_ids (list): Ids of the requests in the batch
+            input_path (str): Path of the batch request file
+        """
+        self.state['active'] = {
+            'batch_id': batch['id'],
+            'input_file_id': batch.get('input_file_id'),
+            'input_path': input_path,
+            'custom_ids': [str(custom_id) for custom_id in custom_ids],
+            'status': batch.get('status'),
+            'submitted_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.save()
+
+    def update(self, batch):
+        """
+        Record the latest state of the active batch job.
+
+        Args:
+            batch (dict): The batch as returned by retrieve_batch
+        """
+        active = self.state['active']
+        active['status'] = batch.get('status')
+        active['request_counts'] = batch.get('request_counts')
+        active['output_file_id'] = batch.get('output_file_id')
+        active['error_file_id'] = batch.get('error_file_id')
+        active['errors'] = batch.get('errors')
+        self.save()
+
+    def finish(self, ingested_count):
+        """
+        Move the active batch job to the history once its results are ingested.
+
+        Args:
+            ingested_count (int): Number of responses ingested from the job
+        """
+        active = self.state['active']
+        active['ingested'] = ingested_count
+        active['finished_at'] = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # The id list is only needed while the job is active
+        active.pop('custom_ids', None)
+        self.state['history'].append(active)
+        self.state['active'] = None
+        self.save()
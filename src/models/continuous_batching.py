@@ -0,0 +1,353 @@
+"""
+Iteration-level (continuous) batching for local Hugging Face causal language models.
+
+``model.generate`` on a static batch decodes until the longest sequence of the batch is
+done, so sequences that finish early keep occupying their slot. The engine here schedules
+at every decode step instead: finished sequences leave the batch right away and waiting
+prompts are prefilled and join the running batch, so the batch stays full.
+
+The running batch is kept left-padded: every row's KV cache is aligned on the right, the
+attention mask hides the padding, and position ids count only real tokens. Joining prompts
+are prefilled as their own batch and their caches are merged into the running one by
+left-padding the shorter of the two. The engine only uses ``model(...)`` forward passes
+with a ``DynamicCache``, so it works with any causal LM loaded through ``transformers``
+(including on CPU).
+"""
+
+import time
+import logging
+from collections import deque
+
+import torch
+from transformers import DynamicCache
+from transformers import (
+    LogitsProcessorList,
+    RepetitionPenaltyLogitsProcessor,
+    TemperatureLogitsWarper,
+    TopKLogitsWarper,
+    TopPLogitsWarper
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _cache_layers(cache):
+    """Return the (keys, values) tensors of every layer of a DynamicCache."""
+    if hasattr(cache, 'layers'):
+        # transformers >= 4.56 keeps one object per layer
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+def _make_cache(layers):
+    """Build a DynamicCache from per-layer (keys, values) tensors."""
+    if hasattr(DynamicCache, 'from_legacy_cache'):
+        return DynamicCache.from_legacy_cache(tuple(layers))
+    return DynamicCache(ddp_cache_data=layers)
+
+def _left_pad(tensor, length, dim):
+    """Left-pad a tensor with zeros along dim up to the given length."""
+    missing = length - tensor.shape[dim]
+    if missing <= 0:
+        return tensor
+    shape = list(tensor.shape)
+    shape[dim] = missing
+    return torch.cat([tensor.new_zeros(shape), tensor], dim=dim)
+
+class _Sequence:
+    """A request in the engine: its prompt, generated tokens and timing."""
+
+    def __init__(self, index, prompt_ids):
+        self.index = index
+        self.prompt_ids = prompt_ids
+        self.generated_ids = []
+        self.finish_reason = None
+        self.started = None
+        # State of the final answer detector, if one is used
+        self.stop_state = None
+
+class ContinuousBatchingEngine:
+    """
+    Continuous-batching generation loop on top of a Hugging Face causal LM.
+
+    Decoding follows the model's generation config: greedy unless do_sample is set, in which
+    case temperature, top-k and top-p are applied; repetition_penalty is always honored.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size=8, max_new_tokens=2000, device=None):
+        """
+        Initialize the engine.
+
+        Args:
+            model: The causal language model (already loaded and in eval mode)
+            tokenizer: Its tokenizer; must have a pad token
+            max_batch_size (int): Maximum number of sequences decoded together
+            max_new_tokens (int): Maximum number of tokens generated per sequence
+            device (str or torch.device, optional): Device of the model inputs. Defaults to the model's device.
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_new_tokens = max_new_tokens
+        self.device = device or model.device
+
+        generation_config = model.generation_config
+        eos_token_id = generation_config.eos_token_id
+        if eos_token_id is None:
+            eos_token_id = tokenizer.eos_token_id
+        self.eos_token_ids = set(eos_token_id if isinstance(eos_token_id, (list, tuple)) else [eos_token_id])
+        self.eos_token_ids.discard(None)
+
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        self.do_sample = bool(generation_config.do_sample)
+        self.logits_processors = self._build_logits_processors(generation_config)
+        # Final answer detector of the current generate call (see generate)
+        self.stop_detector = None
+
+        self.stats = {'steps': 0, 'prefills': 0, 'prefill_tokens': 0, 'decode_tokens': 0, 'batch_size_sum': 0, 'oom_restarts': 0, 'early_stopped': 0, 'prefix_reused_tokens': 0}
+
+    def _build_logits_processors(self, generation_config):
+        """Build the logits processors that model.generate would apply for this generation config."""
+        processors = LogitsProcessorList()
+        repetition_penalty = generation_config.repetition_penalty
+        if repetition_penalty is not None and repetition_penalty != 1.0:
+            processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+        if self.do_sample:
+            if generation_config.temperature is not None and generation_config.temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(generation_config.temperature))
+            if generation_config.top_k is not None and generation_config.top_k != 0:
+                processors.append(TopKLogitsWarper(generation_config.top_k))
+            if generation_config.top_p is not None and generation_config.top_p < 1.0:
+                processors.append(TopPLogitsWarper(generation_config.top_p))
+        return processors
+
+    def _next_tokens(self, logits, sequences):
+        """
+        Pick the next token of every row from the last-position logits.
+
+        Args:
+            logits (torch.Tensor): Logits of shape (batch, vocab)
+            sequences (list): The _Sequence of every row
+
+        Returns:
+            list: The next token id of every row
+        """
+        logits = logits.float()
+        if len(self.logits_processors) > 0:
+            # Rows have different lengths, so processors that look at the tokens so far run per row
+            rows = []
+            for row, sequence in enumerate(sequences):
+                input_ids = torch.tensor([sequence.prompt_ids + sequence.generated_ids], device=logits.device)
+                rows.append(self.logits_processors(input_ids, logits[row:row + 1]))
+            logits = torch.cat(rows, dim=0)
+
+        if self.do_sample:
+            probs = torch.softmax(logits, dim=-1)
+            return torch.multinomial(probs, num_samples=1).squeeze(-1).tolist()
+        return torch.argmax(logits, dim=-1).tolist()
+
+    def _prefill(self, sequences, shared_prefix=None):
+        """
+        Run the prompts of newly admitted sequences as one left-padded batch.
+
+        If all prompts start with the shared prefix, the batch is laid out as
+        [prefix | padding | suffix] and only the suffixes are run, on top of a copy of the
+        prefix's cached keys and values.
+
+        Args:
+            sequences (list): The _Sequence objects to prefill
+            shared_prefix (SharedPrefix, optional): Prefilled prompt prefix shared by the sequences
+
+        Returns:
+            tuple: (cache, attention_mask, first_tokens)
+        """
+        prompts = [sequence.prompt_ids for sequence in sequences]
+        if shared_prefix is not None and shared_prefix.matches(prompts):
+            input_ids, attention_mask = shared_prefix.build_batch(prompts, self.pad_token_id, self.device)
+            cache = shared_prefix.cache_for_batch(len(sequences))
+            start = len(shared_prefix)
+            self.stats['prefix_reused_tokens'] += start * len(sequences)
+        else:
+            length = max(len(prompt) for prompt in prompts)
+            input_ids = torch.full((len(sequences), length), self.pad_token_id, dtype=torch.long)
+            attention_mask = torch.zeros((len(sequences), length), dtype=torch.long)
+            for row, prompt in enumerate(prompts):
+                input_ids[row, length - len(prompt):] = torch.tensor(prompt, dtype=torch.long)
+                attention_mask[row, length - len(prompt):] = 1
+            input_ids = input_ids.to(self.device)
+            attention_mask = attention_mask.to(self.device)
+            cache = DynamicCache()
+            start = 0
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+
+        outputs = self.model(
+            input_ids=input_ids[:, start:],
+            attention_mask=attention_mask,
+            position_ids=position_ids[:, start:],
+            past_key_values=cache,
+            use_cache=True
+        )
+
+        self.stats['prefills'] += 1
+        self.stats['prefill_tokens'] += int(attention_mask[:, start:].sum())
+        return outputs.past_key_values, attention_mask, self._next_tokens(outputs.logits[:, -1, :], sequences)
+
+    def _finish_reason(self, sequence, token):
+        """Return why a sequence is done after generating token, or None if it continues."""
+        if token in self.eos_token_ids:
+            return "stop"
+        if self.stop_detector is not None and self.stop_detector.check(sequence.stop_state, sequence.generated_ids[-self.stop_detector.window:]):
+            self.stats['early_stopped'] += 1
+            return "final_answer"
+        if len(sequence.generated_ids) >= self.max_new_tokens:
+            return "length"
+        return None
+
+    def generate(self, prompts, stop_detector=None, shared_prefix=None):
+        """
+        Generate completions for a list of prompts, yielding each one as soon as it is done.
+
+        Args:
+            prompts (list): Token id lists, one per prompt
+            stop_detector (FinalAnswerDetector, optional): Stops a sequence (finish reason "final_answer")
+                once it has emitted a completed final answer
+            shared_prefix (SharedPrefix, optional): Prefilled prompt prefix reused by every prefill whose prompts start with it
+
+        Yields:
+            tuple: (index, result) where result has 'token_ids' (generated tokens without the EOS token),
+                'prompt_tokens', 'completion_tokens', 'finish_reason' and 'time_taken'
+        """
+        waiting = deque(_Sequence(index, list(prompt_ids)) for index, prompt_ids in enumerate(prompts))
+        self.stop_detector = stop_detector
+        for sequence in waiting:
+            sequence.stop_state = stop_detector.new_state() if stop_detector is not None else None
+        active = []
+        cache = None
+        attention_mask = None
+        next_tokens = []
+
+        while waiting or active:
+            joining = []
+            out_of_memory = False
+            try:
+                # Admit waiting prompts into the free slots of the running batch
+                if waiting and len(active) < self.max_batch_size:
+                    joining = [waiting.popleft() for _ in range(min(self.max_batch_size - len(active), len(waiting)))]
+                    started = time.time()
+                    for sequence in joining:
+                        sequence.started = started
+
+                    with torch.inference_mode():
+                        new_cache, new_mask, first_tokens = self._prefill(joining, shared_prefix)
+
+                    if active:
+                        # Merge the caches; the shorter side is left-padded and masked
+                        length = max(attention_mask.shape[1], new_mask.shape[1])
+                        layers = [
+                            (torch.cat([_left_pad(keys, length, 2), _left_pad(new_keys, length, 2)], dim=0),
+                             torch.cat([_left_pad(values, length, 2), _left_pad(new_values, length, 2)], dim=0))
+                            for (keys, values), (new_keys, new_values) in zip(_cache_layers(cache), _cache_layers(new_cache))
+                        ]
+                        cache = _make_cache(layers)
+                        attention_mask = torch.cat([_left_pad(attention_mask, length, 1), _left_pad(new_mask, length, 1)], dim=0)
+                    else:
+                        cache, attention_mask = new_cache, new_mask
+
+                    active.extend(joining)
+                    next_tokens.extend(first_tokens)
+
+                    # The prefill already produced each joining sequence's first token
+                    for sequence, token in zip(joining, first_tokens):
+                        sequence.generated_ids.append(token)
+                        sequence.finish_reason = self._finish_reason(sequence, token)
+                else:
+                    # One decode step for the whole running batch
+                    input_ids = torch.tensor(next_tokens, dtype=torch.long, device=self.device).unsqueeze(-1)
+                    position_ids = attention_mask.sum(-1, keepdim=True)
+                    attention_mask = torch.cat([attention_mask, attention_mask.new_ones((len(active), 1))], dim=1)
+
+                    with torch.inference_mode():
+                        outputs = self.model(
+                            input_ids=input_ids,
+                            attention_mask=attention_mask,
+                            position_ids=position_ids,
+                            past_key_values=cache,
+                            use_cache=True
+                        )
+                    cache = outputs.past_key_values
+                    next_tokens = self._next_tokens(outputs.logits[:, -1, :], active)
+
+                    self.stats['steps'] += 1
+                    self.stats['decode_tokens'] += len(active)
+                    self.stats['batch_size_sum'] += len(active)
+
+                    for sequence, token in zip(active, next_tokens):
+                        sequence.generated_ids.append(token)
+                        sequence.finish_reason = self._finish_reason(sequence, token)
+            except torch.cuda.OutOfMemoryError:
+                # Sequences whose prefill failed are not part of the running batch yet
+                restarted = active + [sequence for sequence in joining if sequence not in active]
+                if len(restarted) <= 1:
+                    raise
+                # Restart outside the except block, whose traceback keeps the failed step's tensors alive
+                out_of_memory = True
+
+            if out_of_memory:
+                # Restart the running sequences with a smaller batch, once the old cache is released
+                active, cache, attention_mask, next_tokens = [], None, None, []
+                torch.cuda.empty_cache()
+                self.max_batch_size = max(1, len(restarted) // 2)
+                self.stats['oom_restarts'] += 1
+                logger.warning(f"Out of memory with {len(restarted)} running sequences, restarting them with max batch size {self.max_batch_size}")
+                for sequence in reversed(restarted):
+                    sequence.generated_ids = []
+                    sequence.finish_reason = None
+                    sequence.stop_state = stop_detector.new_state() if stop_detector is not None else None
+                    waiting.appendleft(sequence)
+                continue
+
+            # Hand out finished sequences and drop their rows from the batch
+            if any(sequence.finish_reason for sequence in active):
+                keep = []
+                for row, sequence in enumerate(active):
+                    if sequence.finish_reason is None:
+                        keep.append(row)
+                        continue
+
+                    token_ids = sequence.generated_ids
+                    if sequence.finish_reason == "stop":
+                        token_ids = token_ids[:-1]
+                    yield sequence.index, {
+                        'token_ids': token_ids,
+                        'prompt_tokens': len(sequence.prompt_ids),
+                        'completion_tokens': len(token_ids),
+                        'finish_reason': sequence.finish_reason,
+                        'time_taken': time.time() - sequence.started
+                    }
+
+                if keep:
+                    rows = torch.tensor(keep, device=attention_mask.device)
+                    attention_mask = attention_mask[rows]
+                    # Drop the leading columns that are padding for every remaining row
+                    first_column = int(attention_mask.any(dim=0).nonzero()[0])
+                    attention_mask = attention_mask[:, first_column:]
+                    cache = _make_cache([
+                        (keys[rows][:, :, first_column:], values[rows][:, :, first_column:])
+                        for keys, values in _cache_layers(cache)
+                    ])
+                    active = [active[row] for row in keep]
+                    next_tokens = [next_tokens[row] for row in keep]
+                else:
+                    active, cache, attention_mask, next_tokens = [], None, None, []
+
+    def get_stats(self):
+        """
+        Get the scheduling counters of the engine.
+
+        Returns:
+            dict: Decode steps, prefills, prefill and decode tokens, prefix tokens reused instead of
+                prefilled, OOM restarts, sequences stopped after their final answer, and the mean running batch size
+        """
+        stats = dict(self.stats)
+        stats['mean_batch_size'] = round(stats['batch_size_sum'] / stats['steps'], 2) if stats['steps'] else 0
+        del stats['batch_size_sum']
+        return stats
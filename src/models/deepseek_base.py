@@ -8,7 +8,7 @@ import json
 import requests
 from openai import OpenAI
 from dotenv import load_dotenv
-from .api_base import APIBaseModel
+from .api_base import APIBaseModel, format_api_response
 from src.type import get_type_module
 
 # Configure logging
@@ -22,6 +22,8 @@ class DeepSeekBaseModel(APIBaseModel):
     DeepSeek API model implementation for generating responses to physics problems.
     """
 
+    PROVIDER = "deepseek"
+
     def __init__(self, model_name="deepseek-chat", parallel_size=4, max_tokens=2000):
         """
         Initialize the DeepSeek model.
@@ -39,19 +41,34 @@ class DeepSeekBaseModel(APIBaseModel):
 
         self.model_name = model_name
         self.max_tokens = max_tokens
+        self._client = None
         # self.api_url = "https://api.deepseek.com/v1/chat/completions"
         logger.info(f"Initialized DeepSeek model: {model_name}, max_tokens: {max_tokens}")
 
-    def _make_api_call(self, question_data, question_type):
+    def _get_client(self):
+        """Get the OpenAI client for the DeepSeek base URL, creating it on first use so its connections are reused."""
+        if self._client is None:
+            # Initialize the OpenAI client with DeepSeek base URL
+            self._client = OpenAI(
+                api_key=os.environ.get("DeepSeek_API_KEY"),
+                base_url="https://api.deepseek.com"
+            )
+        return self._client
+
+    def _async_client_config(self):
+        """Client arguments for the asyncio backend."""
+        return {"api_key": self.api_key, "base_url": "https://api.deepseek.com"}
+
+    def _build_api_params(self, question_data, question_type):
         """
-        Make the API call to DeepSeek using the OpenAI client library.
+        Build the chat completion parameters for a question.
 
         Args:
             question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
             question_type (str): Type of question (OEQ or MCQ)
 
         Returns:
-            dict: The model's response
+            dict: Keyword arguments for chat.completions.create
         """
         # Get the appropriate question type module
         type_module = get_type_module(question_type)
@@ -77,42 +94,82 @@ class DeepSeekBaseModel(APIBaseModel):
         # Get the system message from the question type module
         system_message = type_module.SYSTEM_MESSAGE
 
-        # Initialize the OpenAI client with DeepSeek base URL
-        client = OpenAI(
-            api_key=os.environ.get("DeepSeek_API_KEY"),
-            base_url="https://api.deepseek.com"
-        )
+        return {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+            "stream": False,
+            "max_tokens": self.max_tokens,
+        }
+
+    def _parse_response(self, chat_completion):
+        """
+        Convert a chat completion into the standardized response format.
+
+        Args:
+            chat_completion: The chat completion returned by the API
+
+        Returns:
+            dict: The model's response
+        """
+        # Extract the content
+        content = chat_completion.choices[0].message.content
+
+        # Convert the response object to a dictionary for serialization
+        response_dict = chat_completion.model_dump()
+
+        # Extract usage information
+        usage = response_dict.get("usage", {})
+
+        # For DeepSeek R1 model, extract reasoning_content if it exists
+        reasoning_content = None
+        if self.model_name == "deepseek-reasoner" and hasattr(chat_completion.choices[0].message, "reasoning_content"):
+            reasoning_content = chat_completion.choices[0].message.reasoning_content
+            logger.info(f"Found reasoning_content in DeepSeek R1 response: {len(reasoning_content) if reasoning_content else 0} characters")
+
+        # Use the standardized response format function
+        return format_api_response(content, usage, response_dict)
+
+    def _make_api_call(self, question_data, question_type):
+        """
+        Make the API call to DeepSeek using the OpenAI client library.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The model's response
+        """
+        api_params = self._build_api_params(question_data, question_type)
 
         try:
             # Make the API call
-            chat_completion = client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-                stream=False,
-                max_tokens=self.max_tokens,
-            )
-
-            # Extract the content
-            content = chat_completion.choices[0].message.content
+            chat_completion = self._get_client().chat.completions.create(**api_params)
+            return self._parse_response(chat_completion)
+        except Exception as e:
+            logger.error(f"Error in DeepSeek {self.model_name} API call: {str(e)}")
+            raise
 
-            # Convert the response object to a dictionary for serialization
-            response_dict = chat_completion.model_dump()
+    async def _make_api_call_async(self, question_data, question_type):
+        """
+        Make the API call to DeepSeek with the shared async client (asyncio backend).
 
-            # Extract usage information
-            usage = response_dict.get("usage", {})
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
 
-            # For DeepSeek R1 model, extract reasoning_content if it exists
-            reasoning_content = None
-            if self.model_name == "deepseek-reasoner" and hasattr(chat_completion.choices[0].message, "reasoning_content"):
-                reasoning_content = chat_completion.choices[0].message.reasoning_content
-                logger.info(f"Found reasoning_content in DeepSeek R1 response: {len(reasoning_content) if reasoning_content else 0} characters")
+        Returns:
+            dict: The model's response
+        """
+        api_params = self._build_api_params(question_data, question_type)
 
-            # Use the standardized response format function
-            from .api_base import format_api_response
-            return format_api_response(content, usage, response_dict)
+        try:
+            # Make the API call
+            chat_completion = await self._get_async_client().chat.completions.create(**api_params)
+            return self._parse_response(chat_completion)
         except Exception as e:
             logger.error(f"Error in DeepSeek {self.model_name} API call: {str(e)}")
             raise
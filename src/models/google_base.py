@@ -7,6 +7,7 @@ import os
 import requests
 from dotenv import load_dotenv
 from .api_base import APIBaseModel, format_api_response
+from .rate_limiter import get_rate_limit_info
 from src.type import get_type_module
 
 # Configure logging
@@ -20,6 +21,8 @@ class GoogleBaseModel(APIBaseModel):
     Google API model implementation for generating responses to physics problems.
     """
 
+    PROVIDER = "google"
+
     def __init__(self, model_name="gemini-2.0-flash-thinking-exp-01-21", parallel_size=4, max_tokens=2000):
         """
         Initialize the Google model.
@@ -298,6 +301,11 @@ class GoogleBaseModel(APIBaseModel):
                 "error_type": error_type,
                 "question": short_question
             }
+
+            # Let the retry loop and rate limiter recognise 429s and Retry-After
+            rate_limited, retry_after = get_rate_limit_info(e)
+            error_response["rate_limited"] = rate_limited
+            error_response["retry_after"] = retry_after
             return format_api_response(f"Error: {error_msg}", {}, error_response, error=error_msg)
 
 # Specific model implementations
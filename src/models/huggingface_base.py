@@ -6,19 +6,60 @@ import logging
 import os
 import time
 import torch
-from transformers import AutoModel, AutoModelForCausalLM, AutoTokenizer, GenerationConfig
+from transformers import AutoModel, AutoModelForCausalLM, AutoTokenizer, BatchEncoding, GenerationConfig, StoppingCriteria, StoppingCriteriaList
 from accelerate import Accelerator
 from .local_base import LocalBaseModel
+from .token_budget import TokenBudgetPlanner
 from src.type import get_type_module
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+class _StepTimer(StoppingCriteria):
+    """
+    Stopping criterion that never stops generation and only records when each decode step finished.
+
+    model.generate calls its stopping criteria once per generated token, so step_times[k] is the
+    time at which the (k+1)-th new token of every sequence in the batch was available.
+    """
+
+    def __init__(self):
+        self.step_times = []
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.step_times.append(time.time())
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
 class HuggingFaceBaseModel(LocalBaseModel):
     """
     Hugging Face Transformers model implementation for generating responses to physics problems.
+
+    With the "continuous" engine, questions are generated by a ContinuousBatchingEngine that
+    keeps up to parallel_size sequences decoding and replaces finished ones at every step,
+    instead of model.generate on static batches.
     """
 
+    # Generation engine used by new model instances: "static" or "continuous"
+    _engine = "static"
+    SUPPORTED_ENGINES = ("static", "continuous")
+
+    @classmethod
+    def set_engine(cls, engine):
+        """
+        Select the generation engine for Hugging Face models created after this call.
+
+        Args:
+            engine (str): "static" to run model.generate on fixed batches, or "continuous"
+                to schedule sequences at every decode step
+
+        Raises:
+            ValueError: If the engine is not supported
+        """
+        if engine not in HuggingFaceBaseModel.SUPPORTED_ENGINES:
+            raise ValueError(f"Engine {engine} is not supported. Supported engines: {list(HuggingFaceBaseModel.SUPPORTED_ENGINES)}")
+        HuggingFaceBaseModel._engine = engine
+        logger.info(f"Hugging Face generation engine set to: {engine}")
+
     def __init__(self, model_name, device=None, parallel_size=1, max_tokens=2000, gpu="0", truncation=True):
         """
         Initialize the Hugging Face model.
@@ -35,6 +76,30 @@ class HuggingFaceBaseModel(LocalBaseModel):
         self.truncation = truncation
         logger.info(f"Initialized Hugging Face model: {model_name} on GPU: {gpu}")
 
+        # Prompt tokens actually generated from vs. padded batch size, see get_padding_stats
+        self.padding_stats = {'batches': 0, 'sequences': 0, 'prompt_tokens': 0, 'padded_prompt_tokens': 0}
+
+        # Continuous batching streams each response as soon as it is finished
+        self.engine = HuggingFaceBaseModel._engine
+        self.streams_responses = self.engine == "continuous"
+        self._continuous_engine = None
+
+        # Persistent store of pre-tokenized prompts, see attach_prompt_store
+        self.prompt_store = None
+
+        # Batches are packed against a token ceiling that is lowered on out-of-memory errors
+        self.token_planner = TokenBudgetPlanner(self.parallel_size, self.max_tokens)
+
+        # Stop sequences once they have emitted a completed final answer (question types with FINAL_ANSWER_PATTERNS); opt-in
+        self.early_stop = False
+        self.early_stop_stats = {'sequences': 0, 'stopped': 0}
+
+        # Prefilled KV cache of the prompt prefix shared by every question of a type, see _get_shared_prefix
+        self.prefix_reuse = True
+        self._shared_prefixes = {}
+        # Cleared once the model has failed to prefill or continue from a prefix cache; reuse then stays off
+        self.prefix_reuse_supported = True
+
         # Initialize model with accelerator
         self._init_model_with_accelerator()
 
@@ -134,6 +199,409 @@ class HuggingFaceBaseModel(LocalBaseModel):
             question_text = str(question_data)
             return type_module.get_prompt(question_text)
 
+    def _build_chat_texts(self, questions_data, question_type):
+        """
+        Build the chat-formatted model input of each question.
+
+        Args:
+            questions_data (list): List of questions (strings or dictionaries)
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            tuple: (prompts, texts) where texts have the chat template applied
+        """
+        # Get the system message from the question type module
+        system_message = get_type_module(question_type).SYSTEM_MESSAGE
+
+        # Prepare prompts for all questions
+        prompts = [self._prepare_prompt(question_data, question_type) for question_data in questions_data]
+
+        # Create messages list format with system message for each prompt
+        messages_list = [
+            [
+                # {"role": "system", "content": system_message},
+                {"role": "user", "content": system_message + prompt}
+            ] for prompt in prompts
+        ]
+
+        # Apply chat template to all messages
+        texts = [self.tokenizer.apply_chat_template(msg, tokenize=False, add_generation_prompt=True) for msg in messages_list]
+        return prompts, texts
+
+    def configure_token_budget(self, token_budget=None, state_path=None):
+        """
+        Set the token ceiling batches are packed against.
+
+        Args:
+            token_budget (int, optional): Initial ceiling in tokens (batch size x (longest prompt + max_tokens)).
+                None means no ceiling until the first out-of-memory error.
+            state_path (str, optional): JSON file the learned ceiling is loaded from and saved to
+        """
+        self.token_planner = TokenBudgetPlanner(self.parallel_size, self.max_tokens, token_budget=token_budget, state_path=state_path)
+        logger.info(f"Token ceiling for batches: {self.token_planner.ceiling if self.token_planner.ceiling is not None else 'none'}")
+
+    def attach_prompt_store(self, store_root, question_type, dataset_name):
+        """
+        Read and write prompt token ids through a persistent store.
+
+        The store lives at <store_root>/<tokenizer fingerprint>/<question_type>/<dataset_name>,
+        so a tokenizer or chat template change starts a new store instead of reusing stale ids.
+
+        Args:
+            store_root (str): Root directory of all prompt stores
+            question_type (str): Type of question (OEQ or MCQ)
+            dataset_name (str): Name of the dataset
+        """
+        from .prompt_store import PromptStore, describe_tokenizer, tokenizer_fingerprint
+
+        store_dir = os.path.join(store_root, tokenizer_fingerprint(self.tokenizer, self.truncation), question_type, dataset_name)
+        self.prompt_store = PromptStore(store_dir, describe_tokenizer(self.tokenizer, self.truncation))
+
+    def prepare_prompts(self, questions_data, question_type="OEQ"):
+        """
+        Tokenize every question that is not in the prompt store yet and add it to the store.
+
+        Args:
+            questions_data (list): List of questions (strings or dictionaries)
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: Prompt store statistics, including how many prompts were reused and tokenized
+        """
+        if self.prompt_store is None:
+            return None
+
+        start_time = time.time()
+        hits, writes = self.prompt_store.stats['hits'], self.prompt_store.stats['writes']
+        self._tokenize_prompts(questions_data, question_type)
+
+        stats = self.prompt_store.get_stats()
+        stats['reused'] = stats['hits'] - hits
+        stats['tokenized'] = stats['writes'] - writes
+        stats['prepare_seconds'] = round(time.time() - start_time, 3)
+        logger.info(f"Prepared {len(questions_data)} prompts in {stats['prepare_seconds']}s: {stats['reused']} from the prompt store, {stats['tokenized']} tokenized")
+        return stats
+
+    def _tokenize_prompts(self, questions_data, question_type):
+        """
+        Get the token ids of the chat-formatted model input of each question, without padding.
+
+        Prompts found in the prompt store are read from it; the others are rendered, tokenized
+        and added to the store.
+
+        Args:
+            questions_data (list): List of questions (strings or dictionaries)
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            tuple: (prompts, input_ids) where input_ids is a list of token id lists
+        """
+        if self.prompt_store is None:
+            prompts, texts = self._build_chat_texts(questions_data, question_type)
+            return prompts, self.tokenizer(texts, truncation=self.truncation)['input_ids']
+
+        from .prompt_store import prompt_key
+
+        system_message = get_type_module(question_type).SYSTEM_MESSAGE
+        prompts = [self._prepare_prompt(question_data, question_type) for question_data in questions_data]
+        keys = [prompt_key(system_message, prompt) for prompt in prompts]
+        input_ids = [self.prompt_store.get(key) for key in keys]
+
+        missing = [i for i, ids in enumerate(input_ids) if ids is None]
+        if missing:
+            _, texts = self._build_chat_texts([questions_data[i] for i in missing], question_type)
+            new_ids = self.tokenizer(texts, truncation=self.truncation)['input_ids']
+            for i, ids in zip(missing, new_ids):
+                input_ids[i] = ids
+            self.prompt_store.add({keys[i]: ids for i, ids in zip(missing, new_ids)})
+
+        return prompts, input_ids
+
+    def plan_length_buckets(self, questions_data, question_type="OEQ"):
+        """
+        Group questions into batches of similar prompt length.
+
+        All prompts are tokenized up front and sorted by length, then packed into batches of
+        at most parallel_size questions that fit the token ceiling, so short questions are no
+        longer padded to the length of a long problem in the same batch. Batches are returned
+        longest first, so a batch that does not fit in GPU memory shows up at the start of the run.
+
+        Args:
+            questions_data (list): List of questions (strings or dictionaries)
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            tuple: (batches, plan_stats) where batches is a list of index lists into questions_data
+                and plan_stats compares the padding of the plan with batching in dataset order
+        """
+        batch_size = max(1, self.parallel_size)
+
+        # Pre-tokenize all prompts the way generate_responses_parallel does, without padding
+        _, all_input_ids = self._tokenize_prompts(questions_data, question_type)
+        lengths = [len(input_ids) for input_ids in all_input_ids]
+
+        # Sort by length (ties keep dataset order) and pack into batches within the token ceiling, longest first
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        batches = self.token_planner.plan(lengths, order)
+        batches.reverse()
+
+        def padded_tokens(index_batches):
+            return sum(max(lengths[i] for i in batch) * len(batch) for batch in index_batches)
+
+        # Compare with the dataset-order batching used before
+        dataset_batches = [list(range(start, min(start + batch_size, len(lengths)))) for start in range(0, len(lengths), batch_size)]
+        prompt_tokens = sum(lengths)
+        bucketed_padded = padded_tokens(batches)
+        dataset_padded = padded_tokens(dataset_batches)
+
+        plan_stats = {
+            'num_batches': len(batches),
+            'token_ceiling': self.token_planner.ceiling,
+            'prompt_tokens': prompt_tokens,
+            'min_prompt_tokens': min(lengths) if lengths else 0,
+            'max_prompt_tokens': max(lengths) if lengths else 0,
+            'padded_prompt_tokens': bucketed_padded,
+            'padding_efficiency': round(prompt_tokens / bucketed_padded, 4) if bucketed_padded else 1.0,
+            'dataset_order_padded_prompt_tokens': dataset_padded,
+            'dataset_order_padding_efficiency': round(prompt_tokens / dataset_padded, 4) if dataset_padded else 1.0
+        }
+        logger.info(f"Planned {len(batches)} length-bucketed batches for {len(lengths)} prompts ({plan_stats['min_prompt_tokens']}-{plan_stats['max_prompt_tokens']} tokens), "
+                    f"padding efficiency {plan_stats['padding_efficiency']:.1%} vs. {plan_stats['dataset_order_padding_efficiency']:.1%} in dataset order")
+        return batches, plan_stats
+
+    def get_padding_stats(self):
+        """
+        Get the padding efficiency of the batches generated so far.
+
+        Returns:
+            dict: Number of batches and sequences, real and padded prompt tokens, and their ratio
+        """
+        stats = dict(self.padding_stats)
+        padded = stats['padded_prompt_tokens']
+        stats['padding_efficiency'] = round(stats['prompt_tokens'] / padded, 4) if padded else 1.0
+        return stats
+
+    def _stop_token_ids(self):
+        """
+        Get the token ids that end a generated sequence: the EOS tokens of the generation config and the pad token.
+
+        Returns:
+            list: Token ids
+        """
+        eos_token_id = self.model.generation_config.eos_token_id
+        if eos_token_id is None:
+            eos_token_id = self.tokenizer.eos_token_id
+        stop_ids = set(eos_token_id if isinstance(eos_token_id, (list, tuple)) else [eos_token_id])
+        # model.generate fills the rows that finished early with the pad token
+        stop_ids.add(self.tokenizer.pad_token_id)
+        stop_ids.discard(None)
+        return sorted(stop_ids)
+
+    def _final_answer_detector(self, question_type):
+        """
+        Get the final answer detector for a question type.
+
+        Args:
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            FinalAnswerDetector or None: None if early stopping is disabled or the question type has no final answer format
+        """
+        patterns = getattr(get_type_module(question_type), 'FINAL_ANSWER_PATTERNS', None)
+        if not self.early_stop or not patterns:
+            return None
+
+        from .stopping import FinalAnswerDetector
+        return FinalAnswerDetector(self.tokenizer, patterns)
+
+    def get_early_stop_stats(self):
+        """
+        Get how many sequences were stopped right after their final answer.
+
+        Returns:
+            dict: Number of sequences generated with a final answer detector and number of them stopped early
+        """
+        stats = dict(self.early_stop_stats)
+        stats['stopped_share'] = round(stats['stopped'] / stats['sequences'], 4) if stats['sequences'] else 0.0
+        return stats
+
+    def _get_shared_prefix(self, question_type):
+        """
+        Get the prefilled prompt prefix shared by all questions of a type, computing it on first use.
+
+        The prefix is found by rendering two probe questions and taking their common tokens,
+        minus the last one, whose tokenization may depend on the question that follows.
+
+        Args:
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            SharedPrefix or None: None if prefix reuse is disabled or the prefix is too short to be worth it
+        """
+        if not self.prefix_reuse:
+            return None
+        if question_type not in self._shared_prefixes:
+            from .prefix_cache import SharedPrefix, common_prefix_length
+
+            _, texts = self._build_chat_texts(["0", "1"], question_type)
+            probe_ids = self.tokenizer(texts, truncation=self.truncation)['input_ids']
+            prefix_length = common_prefix_length(probe_ids) - 1
+
+            shared_prefix = None
+            if prefix_length >= 8:
+                try:
+                    shared_prefix = SharedPrefix(self.model, probe_ids[0][:prefix_length], self.accelerator.device)
+                    logger.info(f"Prefilled the shared {question_type} prompt prefix of {prefix_length} tokens")
+                except Exception as e:
+                    # Some models (e.g. with sliding-window or hybrid caches) cannot prefill into a DynamicCache
+                    self._disable_prefix_reuse(f"Prefilling the shared {question_type} prompt prefix failed: {e}")
+                    return None
+            else:
+                logger.info(f"The {question_type} prompts share only {max(prefix_length, 0)} tokens; not reusing a prefix")
+            self._shared_prefixes[question_type] = shared_prefix
+        return self._shared_prefixes[question_type]
+
+    def _disable_prefix_reuse(self, reason):
+        """
+        Turn prefix reuse off for the rest of this model's lifetime.
+
+        Args:
+            reason (str): Why the prefix cache cannot be used, for the log
+        """
+        logger.warning(f"{reason}; disabling prefix reuse for this model")
+        self.prefix_reuse = False
+        self.prefix_reuse_supported = False
+        self._shared_prefixes = {}
+
+    def get_prefix_stats(self):
+        """
+        Get how often the shared prompt prefixes were reused.
+
+        Returns:
+            dict: Question type -> prefix statistics, for the question types with a shared prefix
+        """
+        return {question_type: shared_prefix.get_stats() for question_type, shared_prefix in self._shared_prefixes.items() if shared_prefix is not None}
+
+    def _get_continuous_engine(self):
+        """Get the continuous-batching engine of this model, creating it on first use."""
+        if self._continuous_engine is None:
+            from .continuous_batching import ContinuousBatchingEngine
+
+            self._continuous_engine = ContinuousBatchingEngine(
+                self.model,
+                self.tokenizer,
+                max_batch_size=self.parallel_size,
+                max_new_tokens=self.max_tokens,
+                device=self.accelerator.device
+            )
+            logger.info(f"Created continuous batching engine with max batch size {self.parallel_size}, max_new_tokens {self.max_tokens}")
+        return self._continuous_engine
+
+    def get_engine_stats(self):
+        """
+        Get the scheduling counters of the continuous-batching engine.
+
+        Returns:
+            dict or None: Engine statistics, or None if the engine was not used
+        """
+        if self._continuous_engine is None:
+            return None
+        return self._continuous_engine.get_stats()
+
+    def reset_run_stats(self):
+        """
+        Zero the padding, early stopping, prefix and engine counters.
+
+        A model that stays loaded for several datasets (see src/generate/gpu_worker.py) calls
+        this before each one, so that every dataset's metadata only counts its own run. The
+        prefilled prefixes and the engine itself are kept.
+        """
+        self.padding_stats = dict.fromkeys(self.padding_stats, 0)
+        self.early_stop_stats = dict.fromkeys(self.early_stop_stats, 0)
+        for shared_prefix in self._shared_prefixes.values():
+            if shared_prefix is not None:
+                shared_prefix.stats = dict.fromkeys(shared_prefix.stats, 0)
+        if self._continuous_engine is not None:
+            self._continuous_engine.stats = dict.fromkeys(self._continuous_engine.stats, 0)
+
+    def generate_responses_stream(self, questions_data, question_type="OEQ", retries=0, worker_logging=True, task_timeout=None):
+        """
+        Generate responses with the continuous-batching engine, yielding each one as soon as it is finished.
+
+        Up to parallel_size sequences decode together; when one finishes, the next waiting
+        question is prefilled and joins the batch at the following step.
+
+        Args:
+            questions_data (list): List of questions to answer
+            question_type (str): Type of question (OEQ or MCQ)
+            retries (int): Unused; kept for the interface shared with API models
+            worker_logging (bool): Unused; kept for the interface shared with API models
+            task_timeout (float, optional): Unused; local generation has no per-question deadline
+
+        Yields:
+            tuple: (index, result) where index is the position of the question in questions_data
+        """
+        if not questions_data:
+            return
+
+        engine = self._get_continuous_engine()
+
+        # Prepare prompts and tokenize them without padding
+        _, prompts = self._tokenize_prompts(questions_data, question_type)
+
+        logger.info(f"Generating {len(prompts)} responses with continuous batching (max batch size {engine.max_batch_size})")
+
+        stop_detector = self._final_answer_detector(question_type)
+
+        shared_prefix = self._get_shared_prefix(question_type)
+        pending = set(range(len(prompts)))
+        while pending:
+            # Positions in questions_data of the prompts given to the engine in this attempt
+            order = sorted(pending)
+            try:
+                for local_index, output in engine.generate([prompts[index] for index in order], stop_detector=stop_detector, shared_prefix=shared_prefix):
+                    index = order[local_index]
+                    pending.discard(index)
+                    if stop_detector is not None:
+                        self.early_stop_stats['sequences'] += 1
+                        self.early_stop_stats['stopped'] += output['finish_reason'] == "final_answer"
+                    response = self.tokenizer.decode(output['token_ids'], skip_special_tokens=True)
+
+                    usage = {
+                        "prompt_tokens": output['prompt_tokens'],
+                        "completion_tokens": output['completion_tokens'],
+                        "total_tokens": output['prompt_tokens'] + output['completion_tokens'],
+                        "time_taken": output['time_taken'],
+                        "decode_time": output['time_taken']
+                    }
+
+                    yield index, {
+                        "content": response,
+                        "usage": usage,
+                        "full_response": {
+                            "model": self.model_name,
+                            "choices": [{"message": {"content": response}, "finish_reason": output['finish_reason']}],
+                            "usage": usage
+                        }
+                    }
+            except Exception as e:
+                # Some models (e.g. with sliding-window or hybrid caches) cannot continue from a prefix cache
+                if shared_prefix is not None:
+                    self._disable_prefix_reuse(f"Continuous batching from the shared prefix cache failed: {e}")
+                    logger.info(f"Retrying the {len(pending)} unfinished questions without the shared prefix")
+                    shared_prefix = None
+                    continue
+
+                error = f"Error generating response: {str(e)}"
+                logger.error(f"Continuous batching failed with {len(pending)} questions unfinished: {e}")
+                for index in sorted(pending):
+                    yield index, {
+                        "content": f"Error: {str(e)}",
+                        "usage": {},
+                        "error": error
+                    }
+                return
+
     def generate_response(self, question_data, question_type="OEQ", max_retries=3, worker_logging=True):
         """
         Generate a response for the given question using the Hugging Face model with accelerator.
@@ -158,6 +626,27 @@ class HuggingFaceBaseModel(LocalBaseModel):
             "error": "Failed to generate response"
         }
 
+    def _generate_sub_batches(self, batch_questions, sub_batches, question_type, max_retries, worker_logging):
+        """
+        Generate a batch as several smaller batches and return the results in the original order.
+
+        Args:
+            batch_questions (list): List of questions
+            sub_batches (list): Batches as lists of indices into batch_questions
+            question_type (str): Type of question (OEQ or MCQ)
+            max_retries (int): Maximum number of retries if the first attempt fails
+            worker_logging (bool): Whether to enable logging for the worker process
+
+        Returns:
+            list: List of responses, one per question in batch_questions
+        """
+        results = [None] * len(batch_questions)
+        for sub_batch in sub_batches:
+            sub_results = self.generate_responses_parallel([batch_questions[i] for i in sub_batch], question_type, max_retries, worker_logging)
+            for i, result in zip(sub_batch, sub_results):
+                results[i] = result
+        return results
+
     def generate_responses_parallel(self, batch_questions, question_type="OEQ", max_retries=3, worker_logging=True):
         """
         Generate responses for multiple questions in parallel.
@@ -175,31 +664,11 @@ class HuggingFaceBaseModel(LocalBaseModel):
         if not batch_questions:
             return []
 
-        # Get the appropriate question type module
-        type_module = get_type_module(question_type)
-
-        # Get the system message from the question type module
-        system_message = type_module.SYSTEM_MESSAGE
-
-        # Prepare prompts for all questions in the batch
-        prompts = []
-        for question_data in batch_questions:
-            prompt = self._prepare_prompt(question_data, question_type)
-            prompts.append(prompt)
-
-        # Create messages list format with system message for each prompt
-        messages_list = [
-            [
-                # {"role": "system", "content": system_message},
-                {"role": "user", "content": system_message + prompt}
-            ] for prompt in prompts
-        ]
-
         # Record start time
         time_start = time.time()
 
-        # Apply chat template to all messages
-        texts = [self.tokenizer.apply_chat_template(msg, tokenize=False, add_generation_prompt=True) for msg in messages_list]
+        # Prepare prompts and get their token ids (from the prompt store if one is attached)
+        prompts, input_ids = self._tokenize_prompts(batch_questions, question_type)
 
         # Log the formatted prompts for debugging
         for i, prompt in enumerate(prompts):
@@ -207,68 +676,117 @@ class HuggingFaceBaseModel(LocalBaseModel):
             short_prompt = short_prompt.replace("\n", " ")
             logger.debug(f"Question {i+1}/{len(prompts)}: {short_prompt}")
 
+        # Split a batch that exceeds the learned token ceiling before it runs out of memory
+        lengths = [len(ids) for ids in input_ids]
+        sub_batches = self.token_planner.plan(lengths)
+        if len(sub_batches) > 1:
+            self.token_planner.stats['split_batches'] += 1
+            logger.info(f"Batch of {len(batch_questions)} questions costs {self.token_planner.batch_cost(lengths)} tokens, above the ceiling of {self.token_planner.ceiling}; "
+                        f"splitting it into {len(sub_batches)} batches")
+            return self._generate_sub_batches(batch_questions, sub_batches, question_type, max_retries, worker_logging)
+
         # Log batch size
         logger.info(f"Processing batch of {len(batch_questions)} questions in parallel")
 
-        # Tokenize inputs
-        model_inputs = self.tokenizer(texts, return_tensors="pt", padding=True, truncation=self.truncation).to(self.accelerator.device)
+        # Batch the token ids: [prefix | padding | suffix] when the shared prompt prefix is reused, left-padded otherwise
+        shared_prefix = self._get_shared_prefix(question_type)
+        if shared_prefix is not None and shared_prefix.matches(input_ids):
+            prefixed_ids, prefixed_mask = shared_prefix.build_batch(input_ids, self.tokenizer.pad_token_id, self.accelerator.device)
+            model_inputs = BatchEncoding({'input_ids': prefixed_ids, 'attention_mask': prefixed_mask})
+        else:
+            shared_prefix = None
+            model_inputs = self.tokenizer.pad({'input_ids': input_ids}, padding=True, return_tensors="pt").to(self.accelerator.device)
+
+        # Real prompt length of every row, without the left padding
+        prompt_lengths = model_inputs.attention_mask.sum(dim=1).tolist()
+        completion_lengths = [0] * len(batch_questions)
+        decode_times = [0.0] * len(batch_questions)
+
+        # Stops each sequence once it has emitted its final answer (MCQ)
+        stop_detector = self._final_answer_detector(question_type)
 
         # Generate response
         retry_count = 0
         MAX_RETRIES = max_retries
         MAX_NEW_TOKEN = self.max_tokens
         success = False
+        replan = False
         error = ""
         responses = [""] * len(batch_questions)
 
         while not success and retry_count <= MAX_RETRIES:
+            out_of_memory = False
             try:
                 # Generate outputs with the model
                 # with torch.no_grad():
+                step_timer = _StepTimer()
+                stopping_criteria = StoppingCriteriaList([step_timer])
+                final_answer_criteria = None
+                if stop_detector is not None:
+                    from .stopping import FinalAnswerStoppingCriteria
+                    final_answer_criteria = FinalAnswerStoppingCriteria(stop_detector, model_inputs.input_ids.shape[1])
+                    stopping_criteria.append(final_answer_criteria)
+
+                # Generation appends to the cache, so every attempt starts from a fresh copy of the prefix
+                generate_kwargs = {}
+                if shared_prefix is not None:
+                    generate_kwargs['past_key_values'] = shared_prefix.cache_for_batch(len(batch_questions))
+
+                generate_start = time.time()
                 with torch.inference_mode():
                     generated_ids = self.model.generate(
                         **model_inputs,
-                        max_new_tokens=MAX_NEW_TOKEN
+                        max_new_tokens=MAX_NEW_TOKEN,
+                        stopping_criteria=stopping_criteria,
+                        **generate_kwargs
                     )
+                    generate_time = time.time() - generate_start
+
+                    # Remove input tokens from output to get generated tokens only (all rows share the padded prompt length)
+                    generated_ids = generated_ids[:, model_inputs.input_ids.shape[1]:]
 
-                    # Remove input tokens from output to get generated tokens only
-                    generated_ids = [
-                        output_ids[len(input_ids):] for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)
-                    ]
+                    # A sequence ends at its first EOS or pad token; rows without one ran to the full length
+                    is_stop = torch.isin(generated_ids, torch.tensor(self._stop_token_ids(), device=generated_ids.device))
+                    generated_lengths = torch.where(is_stop.any(dim=1), is_stop.int().argmax(dim=1), generated_ids.shape[1])
+                    completion_lengths = generated_lengths.tolist()
 
                     # Decode generated tokens into human-readable text
                     responses = self.tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
 
+                # A sequence finished at the step that produced its EOS token (or its last token)
+                step_times = step_timer.step_times
+                if step_times:
+                    decode_times = [step_times[min(length, len(step_times) - 1)] - generate_start for length in completion_lengths]
+                else:
+                    decode_times = [generate_time] * len(batch_questions)
+
                 success = True
                 logger.info(f"Successfully generated {len(responses)} responses in parallel")
+                if final_answer_criteria is not None:
+                    self.early_stop_stats['sequences'] += len(batch_questions)
+                    self.early_stop_stats['stopped'] += final_answer_criteria.stopped_count
+                    logger.info(f"{final_answer_criteria.stopped_count}/{len(batch_questions)} sequences stopped after their final answer")
+                self.token_planner.record_success(lengths)
+
+                # Track how much of the prefill was spent on padding
+                self.padding_stats['batches'] += 1
+                self.padding_stats['sequences'] += len(batch_questions)
+                self.padding_stats['prompt_tokens'] += int(model_inputs.attention_mask.sum())
+                self.padding_stats['padded_prompt_tokens'] += model_inputs.input_ids.numel()
 
             except torch.cuda.OutOfMemoryError:
-                # Handle out-of-memory error
-                torch.cuda.empty_cache()  # Release GPU memory
-                retry_count += 1  # Increment retry count
-                logger.warning(f"Out of memory error (retry {retry_count}/{MAX_RETRIES})")
-
-                if retry_count > MAX_RETRIES:
-                    responses = ["Error: Out of memory"] * len(batch_questions)
-                    error = f"Out of memory error after {MAX_RETRIES} retries"
-                    logger.error(error)
-
-                    # If OOM and batch size > 1, try with smaller batch size
-                    if len(batch_questions) > 1:
-                        logger.warning("Reducing batch size and trying again with smaller batches")
-                        # Split the batch in half
-                        mid = len(batch_questions) // 2
-                        first_half = batch_questions[:mid]
-                        second_half = batch_questions[mid:]
-
-                        # Process each half separately
-                        first_results = self.generate_responses_parallel(first_half, question_type, max_retries, worker_logging)
-                        second_results = self.generate_responses_parallel(second_half, question_type, max_retries, worker_logging)
-
-                        # Combine results
-                        return first_results + second_results
+                # Only note the error here: until the except block is left, its traceback keeps the
+                # frames of the failed forward pass, and their GPU tensors, alive
+                out_of_memory = True
 
             except Exception as e:
+                # Some models (e.g. with sliding-window or hybrid caches) cannot continue from a prefix cache
+                if shared_prefix is not None:
+                    self._disable_prefix_reuse(f"Generation from the shared prefix cache failed: {e}")
+                    shared_prefix = None
+                    model_inputs = self.tokenizer.pad({'input_ids': input_ids}, padding=True, return_tensors="pt").to(self.accelerator.device)
+                    continue
+
                 retry_count += 1
                 logger.warning(f"Error during generation (retry {retry_count}/{MAX_RETRIES}): {e}")
 
@@ -277,6 +795,33 @@ class HuggingFaceBaseModel(LocalBaseModel):
                     error = f"Error generating response: {str(e)}"
                     logger.error(error)
 
+            if out_of_memory:
+                # Release the failed attempt's memory
+                generate_kwargs = None
+                torch.cuda.empty_cache()
+
+                # Lower the token ceiling; this batch and every later one are planned under it
+                self.token_planner.record_oom(lengths)
+                if len(batch_questions) > 1:
+                    replan = True
+                    break
+
+                # A single question cannot be split any further
+                retry_count += 1  # Increment retry count
+                logger.warning(f"Out of memory error on a single question (retry {retry_count}/{MAX_RETRIES})")
+
+                if retry_count > MAX_RETRIES:
+                    responses = ["Error: Out of memory"] * len(batch_questions)
+                    error = f"Out of memory error after {MAX_RETRIES} retries"
+                    logger.error(error)
+
+        if replan:
+            # Drop this attempt's inputs before the replanned batches allocate their own
+            logger.warning("Replanning the batch under the lowered token ceiling")
+            model_inputs = None
+            torch.cuda.empty_cache()
+            return self.generate_responses_parallel(batch_questions, question_type, max_retries, worker_logging)
+
         # Calculate token usage and prepare results
         time_end = time.time()
         batch_time = time_end - time_start
@@ -285,16 +830,17 @@ class HuggingFaceBaseModel(LocalBaseModel):
         logger.info(f"Batch processing completed in {batch_time:.2f} seconds")
 
         for i, response in enumerate(responses):
-            # Calculate approximate token counts
-            input_tokens = len(self.tokenizer.encode(texts[i]))
-            output_tokens = len(self.tokenizer.encode(response)) if response else 0
+            # Token counts come from the input and generated ids (padding and EOS excluded)
+            input_tokens = prompt_lengths[i]
+            output_tokens = completion_lengths[i] if success else 0
             total_tokens = input_tokens + output_tokens
 
             usage = {
                 "prompt_tokens": input_tokens,
                 "completion_tokens": output_tokens,
                 "total_tokens": total_tokens,
-                "time_taken": batch_time
+                "time_taken": batch_time,
+                "decode_time": decode_times[i] if success else 0.0
             }
 
             # Create result dictionary
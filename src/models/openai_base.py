@@ -6,7 +6,8 @@ import logging
 import os
 from openai import OpenAI
 from dotenv import load_dotenv
-from .api_base import APIBaseModel
+from .api_base import APIBaseModel, format_api_response
+from .rate_limiter import get_rate_limit_info
 from src.type import get_type_module
 
 # Configure logging
@@ -20,6 +21,8 @@ class OpenAIBaseModel(APIBaseModel):
     OpenAI API model implementation for generating responses to physics problems.
     """
 
+    PROVIDER = "openai"
+
     def __init__(self, model_name="gpt-4o", parallel_size=4, max_tokens=2000, use_max_completion_tokens=False):
         """
         Initialize the OpenAI model.
@@ -40,139 +43,239 @@ class OpenAIBaseModel(APIBaseModel):
         token_param = "max_completion_tokens" if use_max_completion_tokens else "max_tokens"
         logger.info(f"Initialized OpenAI model: {model_name}, {token_param}: {max_tokens}")
 
-    def _make_api_call(self, question_data, question_type):
+    def _async_client_config(self):
+        """Client arguments for the asyncio backend."""
+        return {"api_key": os.environ.get("OPENAI_API_KEY")}
+
+    def _build_api_params(self, question_data, question_type):
         """
-        Make the API call to OpenAI.
+        Build the chat completion parameters for a question.
 
         Args:
             question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
             question_type (str): Type of question (OEQ or MCQ)
 
         Returns:
-            dict: The model's response
+            tuple: (api_params, short_question)
         """
-        try:
-            # Get the appropriate question type module
-            type_module = get_type_module(question_type)
-
-            # Extract question text and additional data if available
-            if isinstance(question_data, dict):
-                question_text = question_data.get('question', question_data.get('problem', ''))
-
-                # For MCQ questions, extract options and knowledge if available
-                if question_type == "MCQ":
-                    options = question_data.get('options', None)
-                    knowledge = question_data.get('knowledge', None)
-                    # Get the prompt with options and knowledge
-                    prompt = type_module.get_prompt(question_text, options, knowledge)
-                else:
-                    # For other question types, just use the question text
-                    prompt = type_module.get_prompt(question_text)
+        # Get the appropriate question type module
+        type_module = get_type_module(question_type)
+
+        # Extract question text and additional data if available
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+
+            # For MCQ questions, extract options and knowledge if available
+            if question_type == "MCQ":
+                options = question_data.get('options', None)
+                knowledge = question_data.get('knowledge', None)
+                # Get the prompt with options and knowledge
+                prompt = type_module.get_prompt(question_text, options, knowledge)
             else:
-                # If question_data is a string, just use it directly
-                question_text = str(question_data)
+                # For other question types, just use the question text
                 prompt = type_module.get_prompt(question_text)
+        else:
+            # If question_data is a string, just use it directly
+            question_text = str(question_data)
+            prompt = type_module.get_prompt(question_text)
+
+        # Get a short version of the question for logging
+        short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+        short_question = short_question.replace("\n", " ")
+
+        # Get the system message from the question type module
+        system_message = type_module.SYSTEM_MESSAGE
+
+        # Determine which token parameter to use
+        token_param = "max_completion_tokens" if self.use_max_completion_tokens else "max_tokens"
+
+        logger.info(f"Sending request to OpenAI API with model: {self.model_name} for question: {short_question}")
+
+        # Log the API request details
+        logger.debug(f"System message: {system_message[:100]}...")
+        logger.debug(f"Prompt length: {len(prompt)} characters")
+        logger.debug(f"{token_param}: {self.max_tokens}")
+
+        # Create API parameters
+        api_params = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_message},
+                {"role": "user", "content": prompt}
+            ],
+        }
+
+        # Add the appropriate token parameter
+        api_params[token_param] = self.max_tokens
+
+        return api_params, short_question
+
+    def _parse_response(self, response, short_question):
+        """
+        Convert a chat completion into the standardized response format.
+
+        Args:
+            response: The chat completion returned by the API
+            short_question (str): Shortened question text for logging
+
+        Returns:
+            dict: The model's response
+        """
+        # Extract the content and usage information
+        content = response.choices[0].message.content
+
+        # Create basic usage dictionary
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+
+        # Check if completion_tokens_details exists and contains reasoning_tokens (for o3-mini model)
+        try:
+            if hasattr(response.usage, 'completion_tokens_details'):
+                completion_tokens_details = response.usage.completion_tokens_details
+                if hasattr(completion_tokens_details, 'reasoning_tokens'):
+                    reasoning_tokens = completion_tokens_details.reasoning_tokens
+                    if reasoning_tokens is not None:
+                        usage["reasoning_tokens"] = reasoning_tokens
+                        logger.info(f"Found reasoning tokens: {usage['reasoning_tokens']}")
+        except Exception as e:
+            # If anything goes wrong, just log it and continue without reasoning tokens
+            logger.warning(f"Error extracting reasoning tokens: {e}")
 
-            # Get a short version of the question for logging
-            short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
-            short_question = short_question.replace("\n", " ")
+        # Use the standardized response format function
+        result = format_api_response(content, usage, response)
 
-            # Get the system message from the question type module
-            system_message = type_module.SYSTEM_MESSAGE
+        logger.info(f"OpenAI API call successful for question: {short_question}")
 
-            # Determine which token parameter to use
-            token_param = "max_completion_tokens" if self.use_max_completion_tokens else "max_tokens"
+        # Log token usage information
+        token_info = f"Received {len(content)} characters of content, {usage['total_tokens']} total tokens"
+        if 'reasoning_tokens' in usage:
+            token_info += f", {usage['reasoning_tokens']} reasoning tokens"
+        if 'reasoning_content' in result:
+            token_info += f", reasoning_content: {len(result['reasoning_content'])} characters"
+        logger.info(token_info)
+        return result
 
-            logger.info(f"Sending request to OpenAI API with model: {self.model_name} for question: {short_question}")
+    def _format_error(self, e, question_data):
+        """
+        Log an API error and convert it into the standardized error response.
+
+        Args:
+            e (Exception): The exception raised by the API call
+            question_data (str or dict): The question that was being answered
+
+        Returns:
+            dict: The error response
+        """
+        # Get a short version of the question for logging
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+        else:
+            question_text = str(question_data)
 
-            # Log the API request details
-            logger.debug(f"System message: {system_message[:100]}...")
-            logger.debug(f"Prompt length: {len(prompt)} characters")
-            logger.debug(f"{token_param}: {self.max_tokens}")
+        short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+        short_question = short_question.replace("\n", " ")
+
+        # Log detailed error information
+        error_msg = str(e)
+        error_type = type(e).__name__
+
+        logger.error(f"Error in OpenAI API call for question: {short_question}")
+        logger.error(f"Error type: {error_type}")
+        logger.error(f"Error message: {error_msg}")
+
+        # Add traceback information
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+
+        # Use the standardized response format function with error
+        error_response = {
+            "error": error_msg,
+            "error_type": error_type,
+            "question": short_question
+        }
+
+        # Let the retry loop and rate limiter recognise 429s and Retry-After
+        rate_limited, retry_after = get_rate_limit_info(e)
+        error_response["rate_limited"] = rate_limited
+        error_response["retry_after"] = retry_after
+
+        return format_api_response(f"Error: {error_msg}", {}, error_response, error=error_msg)
+
+    def _make_api_call(self, question_data, question_type):
+        """
+        Make the API call to OpenAI.
 
-            # Create API parameters
-            api_params = {
-                "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
-            }
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
 
-            # Add the appropriate token parameter
-            api_params[token_param] = self.max_tokens
+        Returns:
+            dict: The model's response
+        """
+        try:
+            api_params, short_question = self._build_api_params(question_data, question_type)
 
             # Make the API call
             response = self.client.chat.completions.create(**api_params)
 
-            # Extract the content and usage information
-            content = response.choices[0].message.content
-
-            # Create basic usage dictionary
-            usage = {
-                "prompt_tokens": response.usage.prompt_tokens,
-                "completion_tokens": response.usage.completion_tokens,
-                "total_tokens": response.usage.total_tokens
-            }
-
-            # Check if completion_tokens_details exists and contains reasoning_tokens (for o3-mini model)
-            try:
-                if hasattr(response.usage, 'completion_tokens_details'):
-                    completion_tokens_details = response.usage.completion_tokens_details
-                    if hasattr(completion_tokens_details, 'reasoning_tokens'):
-                        reasoning_tokens = completion_tokens_details.reasoning_tokens
-                        if reasoning_tokens is not None:
-                            usage["reasoning_tokens"] = reasoning_tokens
-                            logger.info(f"Found reasoning tokens: {usage['reasoning_tokens']}")
-            except Exception as e:
-                # If anything goes wrong, just log it and continue without reasoning tokens
-                logger.warning(f"Error extracting reasoning tokens: {e}")
-
-            # Use the standardized response format function
-            from .api_base import format_api_response
-            result = format_api_response(content, usage, response)
-
-            logger.info(f"OpenAI API call successful for question: {short_question}")
-
-            # Log token usage information
-            token_info = f"Received {len(content)} characters of content, {usage['total_tokens']} total tokens"
-            if 'reasoning_tokens' in usage:
-                token_info += f", {usage['reasoning_tokens']} reasoning tokens"
-            if 'reasoning_content' in result:
-                token_info += f", reasoning_content: {len(result['reasoning_content'])} characters"
-            logger.info(token_info)
-            return result
+            return self._parse_response(response, short_question)
 
         except Exception as e:
-            # Get a short version of the question for logging
-            if isinstance(question_data, dict):
-                question_text = question_data.get('question', question_data.get('problem', ''))
-            else:
-                question_text = str(question_data)
-
-            short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
-            short_question = short_question.replace("\n", " ")
-
-            # Log detailed error information
-            error_msg = str(e)
-            error_type = type(e).__name__
-
-            logger.error(f"Error in OpenAI API call for question: {short_question}")
-            logger.error(f"Error type: {error_type}")
-            logger.error(f"Error message: {error_msg}")
-
-            # Add traceback information
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-
-            # Use the standardized response format function with error
-            from .api_base import format_api_response
-            error_response = {
-                "error": error_msg,
-                "error_type": error_type,
-                "question": short_question
-            }
-            return format_api_response(f"Error: {error_msg}", {}, error_response, error=error_msg)
+            return self._format_error(e, question_data)
+
+    async def _make_api_call_async(self, question_data, question_type):
+        """
+        Make the API call to OpenAI with the async client (asyncio backend).
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The model's response
+        """
+        try:
+            api_params, short_question = self._build_api_params(question_data, question_type)
+
+            # Make the API call
+            response = await self._get_async_client().chat.completions.create(**api_params)
+
+            return self._parse_response(response, short_question)
+
+        except Exception as e:
+            return self._format_error(e, question_data)
+
+    def _build_batch_body(self, question_data, question_type):
+        """
+        Build the chat completion request body of a question for a batch job.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The request body
+        """
+        api_params, _ = self._build_api_params(question_data, question_type)
+        return api_params
+
+    def _parse_batch_body(self, body, short_question):
+        """
+        Convert the chat completion body of a batch output line into the standardized response format.
+
+        Args:
+            body (dict): The chat completion as returned in the batch output file
+            short_question (str): Label of the request for logging
+
+        Returns:
+            dict: The model's response
+        """
+        from openai.types.chat import ChatCompletion
+
+        return self._parse_response(ChatCompletion.model_validate(body), short_question)
 
 # Specific model implementations
 class GPT4oModel(OpenAIBaseModel):
@@ -0,0 +1,134 @@
+"""
+KV cache reuse for the prompt prefix shared by all questions of a question type.
+
+Every local prompt is the chat template applied to ``SYSTEM_MESSAGE + get_prompt(...)``,
+so all prompts of a question type start with the same tokens: the template header, the
+system message and the fixed start of the question (e.g. ``Question:``). That prefix is
+prefilled once per model and question type, and its keys and values are reused by every
+batch instead of being recomputed for every sequence.
+
+Batches that reuse the prefix are laid out as ``[prefix | padding | suffix]`` instead of
+being left-padded as a whole: the prefix occupies the same positions in every row, so one
+cached copy serves the entire batch. The attention mask hides the padding in the middle,
+and position ids computed from the mask continue right after the prefix.
+"""
+
+import logging
+import torch
+from transformers import DynamicCache
+from .continuous_batching import _cache_layers, _make_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def common_prefix_length(token_lists):
+    """
+    Get the length of the longest common prefix of token id lists.
+
+    Args:
+        token_lists (list): Token id lists
+
+    Returns:
+        int: Number of leading tokens shared by all lists
+    """
+    if not token_lists:
+        return 0
+    length = min(len(tokens) for tokens in token_lists)
+    first = token_lists[0]
+    for position in range(length):
+        if any(tokens[position] != first[position] for tokens in token_lists[1:]):
+            return position
+    return length
+
+class SharedPrefix:
+    """
+    The shared prompt prefix of one question type and its prefilled KV cache.
+    """
+
+    def __init__(self, model, prefix_ids, device):
+        """
+        Prefill the prefix.
+
+        Args:
+            model: Hugging Face causal LM
+            prefix_ids (list): Token ids of the shared prefix
+            device: Device of the model inputs
+        """
+        self.prefix_ids = list(prefix_ids)
+        self.stats = {'batches': 0, 'sequences': 0, 'reused_tokens': 0}
+
+        input_ids = torch.tensor([self.prefix_ids], dtype=torch.long, device=device)
+        with torch.inference_mode():
+            outputs = model(input_ids=input_ids, past_key_values=DynamicCache(), use_cache=True)
+        # Keys and values of the prefix, with batch size 1
+        self.layers = [(keys.clone(), values.clone()) for keys, values in _cache_layers(outputs.past_key_values)]
+
+    def __len__(self):
+        return len(self.prefix_ids)
+
+    def matches(self, prompts):
+        """
+        Check whether every prompt starts with the prefix and has at least one token after it.
+
+        Args:
+            prompts (list): Token id lists
+
+        Returns:
+            bool: True if the prefix can be reused for all prompts
+        """
+        length = len(self.prefix_ids)
+        return all(len(prompt) > length and list(prompt[:length]) == self.prefix_ids for prompt in prompts)
+
+    def cache_for_batch(self, batch_size):
+        """
+        Get a fresh copy of the prefix cache for a batch; generation appends to it.
+
+        Args:
+            batch_size (int): Number of rows
+
+        Returns:
+            DynamicCache: The prefix keys and values repeated for every row
+        """
+        return _make_cache([
+            (keys.expand(batch_size, -1, -1, -1).clone(), values.expand(batch_size, -1, -1, -1).clone())
+            for keys, values in self.layers
+        ])
+
+    def build_batch(self, prompts, pad_token_id, device):
+        """
+        Lay out prompts as [prefix | padding | suffix].
+
+        Args:
+            prompts (list): Token id lists that all start with the prefix
+            pad_token_id (int): Token id used for the padding
+            device: Device of the model inputs
+
+        Returns:
+            tuple: (input_ids, attention_mask), each of shape (batch size, prefix + longest suffix)
+        """
+        prefix_length = len(self.prefix_ids)
+        suffix_length = max(len(prompt) for prompt in prompts) - prefix_length
+        length = prefix_length + suffix_length
+
+        input_ids = torch.full((len(prompts), length), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(prompts), length), dtype=torch.long)
+        input_ids[:, :prefix_length] = torch.tensor(self.prefix_ids, dtype=torch.long)
+        attention_mask[:, :prefix_length] = 1
+        for row, prompt in enumerate(prompts):
+            suffix = list(prompt[prefix_length:])
+            input_ids[row, length - len(suffix):] = torch.tensor(suffix, dtype=torch.long)
+            attention_mask[row, length - len(suffix):] = 1
+
+        self.stats['batches'] += 1
+        self.stats['sequences'] += len(prompts)
+        self.stats['reused_tokens'] += prefix_length * len(prompts)
+        return input_ids.to(device), attention_mask.to(device)
+
+    def get_stats(self):
+        """
+        Get the reuse counters of the prefix.
+
+        Returns:
+            dict: Prefix length and the number of batches, sequences and prefill tokens that reused it
+        """
+        return {'prefix_tokens': len(self.prefix_ids), **self.stats}
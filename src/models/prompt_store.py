@@ -0,0 +1,198 @@
+"""
+Persistent store of pre-tokenized prompts for local models.
+
+Rendering the chat template and tokenizing with a slow (``use_fast=False``) tokenizer is
+repeated for every question on every run and retry. The store keeps the token ids of each
+rendered ``SYSTEM_MESSAGE + get_prompt(...)`` instead, so they are computed once per
+(tokenizer, question type, dataset) and read back directly afterwards.
+
+Each store is a directory holding two files:
+- ``tokens.bin``: the token ids of all prompts, concatenated as int32 and read through a memory map
+- ``index.json``: prompt key -> [offset, length] into ``tokens.bin``, plus a description of the tokenizer
+
+Stores are append-only. The token file is written before the index, and both under an
+exclusive file lock, so concurrent runs on the same dataset never see a partial entry.
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import numpy as np
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Data type of the stored token ids
+TOKEN_DTYPE = np.int32
+
+def describe_tokenizer(tokenizer, truncation):
+    """
+    Describe everything about a tokenizer that changes the token ids of a rendered prompt.
+
+    Args:
+        tokenizer: Hugging Face tokenizer
+        truncation (bool): Whether prompts are truncated to the tokenizer's model_max_length
+
+    Returns:
+        dict: JSON-serializable tokenizer description
+    """
+    return {
+        'class': type(tokenizer).__name__,
+        'name_or_path': tokenizer.name_or_path,
+        'vocab_size': len(tokenizer),
+        'chat_template': tokenizer.chat_template,
+        'special_tokens': {name: str(value) for name, value in sorted(tokenizer.special_tokens_map.items())},
+        'model_max_length': tokenizer.model_max_length if truncation else None,
+        'truncation': bool(truncation)
+    }
+
+def tokenizer_fingerprint(tokenizer, truncation):
+    """
+    Compute a short fingerprint of a tokenizer, used as the store directory name.
+
+    Args:
+        tokenizer: Hugging Face tokenizer
+        truncation (bool): Whether prompts are truncated to the tokenizer's model_max_length
+
+    Returns:
+        str: Directory-safe fingerprint, e.g. ``Qwen2.5-7B-Instruct-1a2b3c4d5e6f7a8b``
+    """
+    description = describe_tokenizer(tokenizer, truncation)
+    digest = hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+    name = os.path.basename(str(tokenizer.name_or_path).rstrip('/')) or "tokenizer"
+    return f"{name}-{digest}"
+
+def prompt_key(system_message, prompt):
+    """
+    Compute the store key of a prompt from the text it is rendered from.
+
+    Args:
+        system_message (str): System message of the question type
+        prompt (str): Prompt built by the question type's get_prompt
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(f"{system_message}\0{prompt}".encode('utf-8')).hexdigest()
+
+class PromptStore:
+    """
+    Append-only, memory-mapped store of prompt token ids.
+    """
+
+    def __init__(self, store_dir, tokenizer_description=None):
+        """
+        Open (or create) the store.
+
+        Args:
+            store_dir (str): Directory of the store
+            tokenizer_description (dict, optional): Tokenizer description saved with the index
+        """
+        self.store_dir = store_dir
+        self.tokens_path = os.path.join(store_dir, "tokens.bin")
+        self.index_path = os.path.join(store_dir, "index.json")
+        self.lock_path = os.path.join(store_dir, ".lock")
+        self.tokenizer_description = tokenizer_description
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+        os.makedirs(store_dir, exist_ok=True)
+        self._entries = self._read_index()
+        self._tokens = None
+
+        logger.info(f"Opened prompt store at {store_dir} with {len(self._entries)} prompts")
+
+    def _read_index(self):
+        """Read the prompt index from disk."""
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('entries', {})
+
+    def _token_array(self):
+        """Get the memory map of the token file, opening it on first use."""
+        if self._tokens is None and os.path.exists(self.tokens_path) and os.path.getsize(self.tokens_path) > 0:
+            self._tokens = np.memmap(self.tokens_path, dtype=TOKEN_DTYPE, mode='r')
+        return self._tokens
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Get the token ids of a prompt.
+
+        Args:
+            key (str): Prompt key, see prompt_key
+
+        Returns:
+            list or None: Token ids, or None if the prompt is not in the store
+        """
+        entry = self._entries.get(key)
+        tokens = self._token_array() if entry is not None else None
+        if entry is None or tokens is None or entry[0] + entry[1] > len(tokens):
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        offset, length = entry
+        return tokens[offset:offset + length].tolist()
+
+    def add(self, prompts):
+        """
+        Append the token ids of new prompts to the store.
+
+        Args:
+            prompts (dict): Prompt key -> list of token ids
+        """
+        with open(self.lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another run may have added prompts since the index was read
+                self._entries = self._read_index()
+                new_prompts = {key: ids for key, ids in prompts.items() if key not in self._entries}
+                if not new_prompts:
+                    return
+
+                item_size = np.dtype(TOKEN_DTYPE).itemsize
+                with open(self.tokens_path, 'ab') as f:
+                    # Realign after a write that was interrupted mid-token
+                    position = f.tell()
+                    if position % item_size:
+                        f.write(b'\0' * (item_size - position % item_size))
+                    offset = f.tell() // item_size
+
+                    for key, ids in new_prompts.items():
+                        f.write(np.asarray(ids, dtype=TOKEN_DTYPE).tobytes())
+                        self._entries[key] = [offset, len(ids)]
+                        offset += len(ids)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Only publish the new entries once their tokens are on disk
+                tmp_path = f"{self.index_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'tokenizer': self.tokenizer_description, 'entries': self._entries}, f)
+                os.replace(tmp_path, self.index_path)
+
+                self.stats['writes'] += len(new_prompts)
+                # The memory map has to be reopened to see the appended tokens
+                self._tokens = None
+                logger.info(f"Added {len(new_prompts)} prompts to the prompt store at {self.store_dir} ({len(self._entries)} in total)")
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get_stats(self):
+        """
+        Get the store's counters.
+
+        Returns:
+            dict: Path, number of stored prompts, size of the token file and hit/miss/write counts
+        """
+        size = os.path.getsize(self.tokens_path) if os.path.exists(self.tokens_path) else 0
+        return {
+            'path': self.store_dir,
+            'prompts': len(self._entries),
+            'size_mb': round(size / 1024 / 1024, 2),
+            **self.stats
+        }
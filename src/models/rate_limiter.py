@@ -0,0 +1,515 @@
+"""
+Adaptive per-provider rate limiting for API models.
+
+Every provider base (openai, together, deepseek, google) has one shared RateLimiter that
+combines:
+- token buckets for requests-per-minute and tokens-per-minute budgets,
+- an AIMD concurrency limit: it grows by one slot per window of successful requests and is
+  halved when the provider answers 429,
+- a provider-wide cooldown taken from Retry-After headers.
+
+Latency is an optional second congestion signal (latency_factor, off by default). Since
+the latency of an LLM call grows with the length of its answer, it is compared per
+generated token, against a slowly decaying average rather than the fastest call seen, so
+that long answers alone never shrink the concurrency.
+
+In-process callers (direct calls and the asyncio engine) use the limiter directly. Ray
+workers share a single limiter actor per provider through RemoteRateLimiter.
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+import email.utils
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Limits applied to providers created after configure_rate_limits; None means unlimited
+_RATE_LIMIT_CONFIG = {}
+
+# Provider name -> RateLimiter (in this process)
+_RATE_LIMITERS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+class RateLimiter:
+    """
+    Token-bucket and AIMD concurrency limiter for one provider.
+
+    All methods are thread-safe. acquire() blocks, acquire_async() yields to the event loop,
+    and try_acquire() never waits so it can also be served from a Ray actor.
+    """
+
+    def __init__(self, name, rpm=None, tpm=None, max_concurrency=None, min_concurrency=1, latency_factor=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            name (str): Provider name, used for logging
+            rpm (float, optional): Requests-per-minute budget. None means unlimited.
+            tpm (float, optional): Tokens-per-minute budget. None means unlimited.
+            max_concurrency (int, optional): Upper bound of the adaptive concurrency limit. None means unbounded.
+            min_concurrency (int): Lower bound of the adaptive concurrency limit
+            latency_factor (float, optional): Latency per generated token above this multiple of its
+                baseline counts as congestion. None disables the latency signal.
+        """
+        self.name = name
+        self.min_concurrency = max(1, min_concurrency)
+        self.latency_factor = None
+
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self._last_decrease = 0.0
+        self._consecutive_rate_limits = 0
+
+        # Fast and slow exponentially weighted latency per generated token; the slow one is the
+        # baseline, so a lasting change of the workload becomes the new normal
+        self._latency_ewma = None
+        self._latency_baseline = None
+
+        self.stats = {'requests': 0, 'rate_limited': 0, 'decreases': 0, 'waited_seconds': 0.0}
+
+        self.rpm = None
+        self.tpm = None
+        self.max_concurrency = None
+        self.concurrency_limit = None
+        self._request_tokens = 0.0
+        self._token_tokens = 0.0
+        self._refilled_at = time.monotonic()
+        self.configure(rpm=rpm, tpm=tpm, max_concurrency=max_concurrency, latency_factor=latency_factor)
+
+    def configure(self, rpm=None, tpm=None, max_concurrency=None, latency_factor=None):
+        """
+        Set the budgets.
+
+        Calling it again with the same limits changes nothing, so every job on a provider
+        can configure the shared limiter. A changed limit never refills a bucket or resets
+        the learned concurrency: the current budget and concurrency limit are only clamped
+        to the new bounds. A bucket that was unlimited until now starts full.
+
+        Args:
+            rpm (float, optional): Requests-per-minute budget. None means unlimited.
+            tpm (float, optional): Tokens-per-minute budget. None means unlimited.
+            max_concurrency (int, optional): Upper bound of the concurrency limit. None means unbounded.
+            latency_factor (float, optional): Latency per generated token above this multiple of its
+                baseline counts as congestion. None disables the latency signal.
+        """
+        with self._lock:
+            if (rpm, tpm, max_concurrency, latency_factor) == (self.rpm, self.tpm, self.max_concurrency, self.latency_factor):
+                return
+
+            self.latency_factor = latency_factor
+
+            # Settle the budget accumulated under the old limits before changing them
+            self._refill(time.monotonic())
+
+            if not rpm:
+                self._request_tokens = 0.0
+            elif not self.rpm:
+                self._request_tokens = float(rpm)
+            else:
+                self._request_tokens = min(self._request_tokens, float(rpm))
+
+            if not tpm:
+                self._token_tokens = 0.0
+            elif not self.tpm:
+                self._token_tokens = float(tpm)
+            else:
+                self._token_tokens = min(self._token_tokens, float(tpm))
+
+            self.rpm = rpm
+            self.tpm = tpm
+
+            self.max_concurrency = max_concurrency
+            if not max_concurrency:
+                self.concurrency_limit = None
+            elif self.concurrency_limit is None:
+                self.concurrency_limit = float(max(self.min_concurrency, max_concurrency))
+            else:
+                self.concurrency_limit = min(self.concurrency_limit, float(max(self.min_concurrency, max_concurrency)))
+            self._condition.notify_all()
+
+        logger.info(f"Rate limiter for {self.name}: rpm={rpm}, tpm={tpm}, max_concurrency={max_concurrency}, latency_factor={latency_factor}")
+
+    def _refill(self, now):
+        """Add the budget accumulated since the last refill. Called with the lock held."""
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        if self.rpm:
+            self._request_tokens = min(float(self.rpm), self._request_tokens + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._token_tokens = min(float(self.tpm), self._token_tokens + elapsed * self.tpm / 60.0)
+
+    def try_acquire(self, estimated_tokens=0):
+        """
+        Take a slot and budget for one request if they are available now.
+
+        Args:
+            estimated_tokens (int): Expected prompt plus completion tokens of the request
+
+        Returns:
+            tuple: (ticket, wait_seconds). ticket is None when the caller has to wait
+                wait_seconds and try again; otherwise pass it to release().
+        """
+        with self._lock:
+            return self._try_acquire_locked(estimated_tokens)
+
+    def _try_acquire_locked(self, estimated_tokens):
+        now = time.monotonic()
+        self._refill(now)
+
+        # Provider asked us to back off (Retry-After)
+        if now < self.cooldown_until:
+            return None, self.cooldown_until - now
+
+        # Adaptive concurrency limit
+        if self.concurrency_limit is not None and self.in_flight >= int(self.concurrency_limit):
+            return None, 0.05
+
+        # Requests-per-minute bucket
+        if self.rpm and self._request_tokens < 1.0:
+            return None, (1.0 - self._request_tokens) * 60.0 / self.rpm
+
+        # Tokens-per-minute bucket; a request larger than the whole budget waits for a full bucket
+        needed_tokens = 0
+        if self.tpm:
+            needed_tokens = min(float(estimated_tokens), float(self.tpm))
+            if self._token_tokens < needed_tokens:
+                return None, (needed_tokens - self._token_tokens) * 60.0 / self.tpm
+
+        if self.rpm:
+            self._request_tokens -= 1.0
+        if self.tpm:
+            self._token_tokens -= needed_tokens
+        self.in_flight += 1
+        self.stats['requests'] += 1
+        return {'estimated_tokens': needed_tokens, 'acquired_at': now}, 0.0
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Block until a request may be sent.
+
+        Args:
+            estimated_tokens (int): Expected prompt plus completion tokens of the request
+
+        Returns:
+            dict: Ticket to pass to release()
+        """
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                ticket, wait = self._try_acquire_locked(estimated_tokens)
+                if ticket is not None:
+                    self.stats['waited_seconds'] += time.monotonic() - started
+                    return ticket
+                self._condition.wait(timeout=wait)
+
+    async def acquire_async(self, estimated_tokens=0):
+        """
+        Wait on the event loop until a request may be sent.
+
+        Args:
+            estimated_tokens (int): Expected prompt plus completion tokens of the request
+
+        Returns:
+            dict: Ticket to pass to release()
+        """
+        started = time.monotonic()
+        while True:
+            ticket, wait = self.try_acquire(estimated_tokens)
+            if ticket is not None:
+                with self._lock:
+                    self.stats['waited_seconds'] += time.monotonic() - started
+                return ticket
+            await asyncio.sleep(min(wait, 1.0))
+
+    def release(self, ticket, tokens_used=None, latency=None, rate_limited=False, retry_after=None, output_tokens=None):
+        """
+        Report the outcome of a request and free its slot.
+
+        Args:
+            ticket (dict): The ticket returned when the request was admitted
+            tokens_used (int, optional): Actual total tokens, used to correct the token estimate
+            latency (float, optional): Request latency in seconds
+            rate_limited (bool): Whether the provider rejected the request with a rate limit
+            retry_after (float, optional): Seconds the provider asked us to wait
+            output_tokens (int, optional): Generated tokens, used to normalize the latency
+        """
+        with self._condition:
+            now = time.monotonic()
+            self.in_flight = max(0, self.in_flight - 1)
+
+            # Return unused budget (or charge the overshoot) once the real usage is known
+            if self.tpm and tokens_used is not None and ticket is not None:
+                self._refill(now)
+                self._token_tokens = min(float(self.tpm), self._token_tokens + ticket['estimated_tokens'] - tokens_used)
+
+            if rate_limited:
+                self.stats['rate_limited'] += 1
+                self._consecutive_rate_limits += 1
+
+                # Without a Retry-After header, back off exponentially in the number of 429s in a row
+                if retry_after is None:
+                    retry_after = min(60.0, 2.0 ** (self._consecutive_rate_limits - 1))
+                self.cooldown_until = max(self.cooldown_until, now + retry_after)
+                self._decrease(now, 0.5, f"rate limited, cooling down for {retry_after:.1f}s")
+            else:
+                self._consecutive_rate_limits = 0
+                congested = False
+                if self.latency_factor and latency is not None and output_tokens:
+                    per_token = latency / output_tokens
+                    if self._latency_ewma is None:
+                        self._latency_ewma = self._latency_baseline = per_token
+                    else:
+                        self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * per_token
+                        self._latency_baseline = 0.98 * self._latency_baseline + 0.02 * per_token
+                    congested = self._latency_ewma > self.latency_factor * self._latency_baseline
+
+                if congested:
+                    self._decrease(now, 0.9, f"latency {1000 * self._latency_ewma:.1f} ms/token is above {self.latency_factor}x the {1000 * self._latency_baseline:.1f} ms/token baseline")
+                elif self.concurrency_limit is not None:
+                    # Additive increase: about one extra slot per window of successful requests
+                    self.concurrency_limit = min(float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit)
+
+            self._condition.notify_all()
+
+    def _decrease(self, now, factor, reason):
+        """Multiplicatively shrink the concurrency limit, at most once per second. Called with the lock held."""
+        if self.concurrency_limit is None:
+            # Start adapting from the current level of concurrency
+            self.concurrency_limit = float(max(self.min_concurrency, self.in_flight + 1))
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        old_limit = self.concurrency_limit
+        self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit * factor)
+        self.stats['decreases'] += 1
+        logger.warning(f"Rate limiter for {self.name}: {reason}; concurrency {old_limit:.1f} -> {self.concurrency_limit:.1f}")
+
+    def retry_delay(self, attempt, retry_after=None):
+        """
+        Delay before retrying a failed request.
+
+        Args:
+            attempt (int): Zero-based number of the attempt that failed
+            retry_after (float, optional): Seconds the provider asked us to wait
+
+        Returns:
+            float: Seconds to wait
+        """
+        if retry_after is not None:
+            return retry_after
+        # Exponential backoff with full jitter so retries of simultaneous failures spread out
+        return random.uniform(0.5, 1.0) * min(60.0, 2.0 ** attempt)
+
+    def get_stats(self):
+        """Return the counters together with the current limits."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['waited_seconds'] = round(stats['waited_seconds'], 2)
+            stats['concurrency_limit'] = round(self.concurrency_limit, 2) if self.concurrency_limit is not None else None
+            stats['rpm'] = self.rpm
+            stats['tpm'] = self.tpm
+            stats['latency_factor'] = self.latency_factor
+        return stats
+
+class _RateLimiterActor:
+    """Synchronous wrapper exposing the non-blocking RateLimiter methods as a Ray actor."""
+
+    def __init__(self, name, **config):
+        self.limiter = RateLimiter(name, **config)
+
+    def configure(self, rpm=None, tpm=None, max_concurrency=None, latency_factor=None):
+        self.limiter.configure(rpm=rpm, tpm=tpm, max_concurrency=max_concurrency, latency_factor=latency_factor)
+
+    def try_acquire(self, estimated_tokens=0):
+        return self.limiter.try_acquire(estimated_tokens)
+
+    def release(self, ticket, tokens_used=None, latency=None, rate_limited=False, retry_after=None, output_tokens=None):
+        self.limiter.release(ticket, tokens_used, latency, rate_limited, retry_after, output_tokens)
+
+    def get_stats(self):
+        return self.limiter.get_stats()
+
+class RemoteRateLimiter:
+    """
+    Blocking client for a RateLimiter that runs as a Ray actor, used inside Ray workers.
+    The actor only answers non-blocking calls; waiting happens in the worker.
+    """
+
+    def __init__(self, actor):
+        self.actor = actor
+
+    def acquire(self, estimated_tokens=0):
+        import ray
+
+        while True:
+            ticket, wait = ray.get(self.actor.try_acquire.remote(estimated_tokens))
+            if ticket is not None:
+                return ticket
+            time.sleep(min(wait, 1.0))
+
+    def release(self, ticket, tokens_used=None, latency=None, rate_limited=False, retry_after=None, output_tokens=None):
+        self.actor.release.remote(ticket, tokens_used, latency, rate_limited, retry_after, output_tokens)
+
+    def retry_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0.5, 1.0) * min(60.0, 2.0 ** attempt)
+
+def configure_rate_limits(provider, rpm=None, tpm=None, max_concurrency=None, latency_factor=None):
+    """
+    Set the budgets of a provider's shared limiter.
+
+    The limits are applied to the in-process limiter and, when Ray is running, to the
+    provider's limiter actor. Configuring a provider again with the same limits is a no-op
+    (see RateLimiter.configure).
+
+    Args:
+        provider (str): Provider name (e.g. openai)
+        rpm (float, optional): Requests-per-minute budget. None means unlimited.
+        tpm (float, optional): Tokens-per-minute budget. None means unlimited.
+        max_concurrency (int, optional): Upper bound of the adaptive concurrency limit
+        latency_factor (float, optional): Also back off when the latency per generated token rises
+            above this multiple of its baseline. None (default) backs off on 429s only.
+    """
+    config = {'rpm': rpm, 'tpm': tpm, 'max_concurrency': max_concurrency, 'latency_factor': latency_factor}
+    with _RATE_LIMITERS_LOCK:
+        _RATE_LIMIT_CONFIG[provider] = config
+        limiter = _RATE_LIMITERS.get(provider)
+    if limiter is not None:
+        limiter.configure(**config)
+
+    # Forward the limits to a limiter actor that Ray workers already share
+    try:
+        import ray
+    except ImportError:
+        return
+    if ray.is_initialized():
+        try:
+            actor = ray.get_actor(f"rate_limiter:{provider}")
+        except ValueError:
+            return
+        ray.get(actor.configure.remote(**config))
+
+def get_rate_limiter(provider):
+    """
+    Get the shared in-process limiter of a provider, creating it on first use.
+
+    Args:
+        provider (str): Provider name (e.g. openai)
+
+    Returns:
+        RateLimiter: The limiter
+    """
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(provider)
+        if limiter is None:
+            limiter = RateLimiter(provider, **_RATE_LIMIT_CONFIG.get(provider, {}))
+            _RATE_LIMITERS[provider] = limiter
+        return limiter
+
+def get_remote_rate_limiter(provider):
+    """
+    Get the provider's limiter actor shared by all Ray workers, creating it on first use
+    and applying the provider's current limits to it.
+
+    Args:
+        provider (str): Provider name (e.g. openai)
+
+    Returns:
+        ray.actor.ActorHandle: The limiter actor
+    """
+    import ray
+
+    actor_class = ray.remote(num_cpus=0)(_RateLimiterActor)
+    config = _RATE_LIMIT_CONFIG.get(provider, {})
+    actor = actor_class.options(name=f"rate_limiter:{provider}", get_if_exists=True).remote(provider, **config)
+    # An existing actor keeps the limits it was created with unless they are forwarded
+    if config:
+        actor.configure.remote(**config)
+    return actor
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value (seconds or an HTTP date).
+
+    Args:
+        value (str): The header value
+
+    Returns:
+        float or None: Seconds to wait
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def get_rate_limit_info(error):
+    """
+    Work out whether an exception is a provider rate limit and how long to wait.
+
+    Args:
+        error (Exception): The exception raised by the API call
+
+    Returns:
+        tuple: (rate_limited, retry_after) where retry_after is in seconds or None
+    """
+    response = getattr(error, 'response', None)
+    status_code = getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    headers = getattr(response, 'headers', None) or {}
+
+    error_text = str(error).lower()
+    rate_limited = status_code == 429 or 'rate limit' in error_text or 'resource_exhausted' in error_text or 'too many requests' in error_text
+    if not rate_limited:
+        return False, None
+
+    retry_after = None
+    try:
+        if headers.get('retry-after-ms') is not None:
+            retry_after = float(headers.get('retry-after-ms')) / 1000.0
+        else:
+            retry_after = parse_retry_after(headers.get('retry-after'))
+    except (TypeError, ValueError, AttributeError):
+        retry_after = None
+    return True, retry_after
+
+def get_result_rate_limit_info(result):
+    """
+    Work out whether an error result returned by _make_api_call is a rate limit.
+
+    Args:
+        result (dict): The result dictionary
+
+    Returns:
+        tuple: (rate_limited, retry_after)
+    """
+    if not isinstance(result, dict) or 'error' not in result:
+        return False, None
+
+    full_response = result.get('full_response')
+    if isinstance(full_response, dict) and 'rate_limited' in full_response:
+        return bool(full_response['rate_limited']), full_response.get('retry_after')
+
+    error_text = str(result['error']).lower()
+    rate_limited = '429' in error_text or 'rate limit' in error_text or 'resource_exhausted' in error_text or 'too many requests' in error_text
+    return rate_limited, None
+
+class RateLimitedError(Exception):
+    """Raised by the retry loops when a provider wrapper returned a rate-limit error result."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
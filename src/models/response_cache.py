@@ -0,0 +1,255 @@
+"""
+Content-addressed on-disk cache of API model responses.
+
+A response is stored under the SHA-256 of (base, model name, system message, rendered
+prompt, decoding parameters), so the same prompt sent by another run, output directory or
+dataset split is answered from disk instead of the paid API. Entries are one JSON file
+each, sharded by the first two hex digits of the key.
+
+max_tokens is deliberately not part of the key. An entry generated with a smaller budget
+is reused for a larger one only when it was not truncated (it used fewer completion tokens
+than its own budget), and an entry is always reused for the budget it was generated with.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+import concurrent.futures
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Content-addressed response cache with LRU size eviction and in-flight coalescing.
+
+    Recency is tracked through file modification times, which are refreshed on every hit,
+    so the least recently used entries are evicted first once the cache grows past
+    max_size_mb. In read-only mode hits are served but nothing is written, touched or evicted.
+    """
+
+    def __init__(self, cache_dir, max_size_mb=None, read_only=False):
+        """
+        Open (or create) the cache.
+
+        Args:
+            cache_dir (str): Directory holding the cache entries
+            max_size_mb (float, optional): Size limit in megabytes. None means unbounded.
+            read_only (bool): Serve hits without writing new entries
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.read_only = read_only
+
+        self._lock = threading.Lock()
+        # Keys currently being generated -> future resolving to their result
+        self._in_flight = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'writes': 0, 'evictions': 0}
+
+        # Entry path -> (mtime, size), used for LRU eviction
+        self._entries = {}
+        self._total_size = 0
+
+        if not read_only:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        if os.path.isdir(cache_dir):
+            for shard in os.listdir(cache_dir):
+                shard_dir = os.path.join(cache_dir, shard)
+                if not os.path.isdir(shard_dir):
+                    continue
+                for name in os.listdir(shard_dir):
+                    if not name.endswith('.json'):
+                        continue
+                    path = os.path.join(shard_dir, name)
+                    stat = os.stat(path)
+                    self._entries[path] = (stat.st_mtime, stat.st_size)
+                    self._total_size += stat.st_size
+
+        mode = "read-only" if read_only else "read-write"
+        logger.info(f"Opened {mode} response cache at {cache_dir} with {len(self._entries)} entries ({self._total_size / 1024 / 1024:.1f} MB)")
+
+    @staticmethod
+    def make_key(base_name, model_name, system_message, prompt, params=None):
+        """
+        Compute the cache key for a request.
+
+        Args:
+            base_name (str): Name of the model base (e.g. openai)
+            model_name (str): Provider model name
+            system_message (str): The system message
+            prompt (str): The rendered user prompt
+            params (dict, optional): Decoding parameters other than max_tokens
+
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        payload = {
+            'base': base_name,
+            'model': model_name,
+            'system_message': system_message,
+            'prompt': prompt,
+            'params': params or {}
+        }
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key, max_tokens):
+        """
+        Look up a cached response usable with the given max_tokens.
+
+        Args:
+            key (str): The cache key
+            max_tokens (int): The token budget of the current request
+
+        Returns:
+            dict or None: The cached result, or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        completion_tokens = entry.get('usage', {}).get('completion_tokens')
+        truncated = completion_tokens is None or completion_tokens >= entry['max_tokens']
+        if entry['max_tokens'] != max_tokens and (truncated or completion_tokens > max_tokens):
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+            if not self.read_only:
+                # Refresh recency for LRU eviction
+                try:
+                    os.utime(path)
+                    self._entries[path] = (os.stat(path).st_mtime, self._entries.get(path, (0, 0))[1])
+                except OSError:
+                    pass
+
+        result = {
+            'content': entry['content'],
+            'usage': entry.get('usage', {}),
+            'full_response': {'cache_key': key, 'cached_max_tokens': entry['max_tokens']},
+            'logs': ["Served from response cache"]
+        }
+        if entry.get('reasoning_content'):
+            result['reasoning_content'] = entry['reasoning_content']
+        return result
+
+    def put(self, key, result, max_tokens):
+        """
+        Store a successful result. Error results and read-only caches are skipped.
+
+        Args:
+            key (str): The cache key
+            result (dict): The model result
+            max_tokens (int): The token budget the result was generated with
+        """
+        if self.read_only or not isinstance(result, dict) or 'error' in result or not result.get('content'):
+            return
+
+        entry = {
+            'content': result['content'],
+            'usage': result.get('usage', {}),
+            'max_tokens': max_tokens
+        }
+        if result.get('reasoning_content'):
+            entry['reasoning_content'] = result['reasoning_content']
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write response cache entry {key}: {e}")
+            return
+
+        stat = os.stat(path)
+        with self._lock:
+            old_size = self._entries.get(path, (0, 0))[1]
+            self._entries[path] = (stat.st_mtime, stat.st_size)
+            self._total_size += stat.st_size - old_size
+            self.stats['writes'] += 1
+            self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits its size limit. Called with the lock held."""
+        if self.max_size_bytes is None or self._total_size <= self.max_size_bytes:
+            return
+
+        for path, (_, size) in sorted(self._entries.items(), key=lambda item: item[1][0]):
+            if self._total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not evict response cache entry {path}: {e}")
+                continue
+            del self._entries[path]
+            self._total_size -= size
+            self.stats['evictions'] += 1
+
+    def claim(self, key):
+        """
+        Register interest in generating the response for a key.
+
+        The first caller becomes the leader and must call release() when its request
+        finishes; later callers get the leader's future and wait on it instead of
+        sending the same prompt again.
+
+        Args:
+            key (str): The cache key
+
+        Returns:
+            tuple: (future, is_leader)
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future, False
+            future = concurrent.futures.Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def release(self, key, result, max_tokens):
+        """
+        Finish a claimed key: store the result and hand it to any coalesced waiters.
+        Releasing a key that is no longer in flight does nothing.
+
+        Args:
+            key (str): The cache key
+            result (dict): The result of the leader's request
+            max_tokens (int): The token budget the result was generated with
+        """
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is None:
+            return
+
+        self.put(key, result, max_tokens)
+        future.set_result(result)
+
+    def get_stats(self):
+        """Return a copy of the hit/miss/write counters together with the current size."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['size_mb'] = round(self._total_size / 1024 / 1024, 2)
+            stats['read_only'] = self.read_only
+        return stats
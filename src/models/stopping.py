@@ -0,0 +1,123 @@
+"""
+Early stopping of local generation once a final answer has been emitted.
+
+Question types whose answers follow a fixed format (MCQ: ``**Final Answer**: \\[ \\boxed{X} \\]``)
+define ``FINAL_ANSWER_PATTERNS``. Local models often keep generating after that line
+until they reach max_new_tokens; a sequence is stopped instead once one of the patterns
+has matched and the answer line is finished.
+
+FinalAnswerDetector works on token ids and is shared by the static engine (through
+FinalAnswerStoppingCriteria, a transformers stopping criterion) and the continuous
+batching engine.
+"""
+
+import re
+import logging
+import torch
+from transformers import StoppingCriteria
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class FinalAnswerDetector:
+    """
+    Detects, token by token, when a sequence has emitted a completed final answer.
+
+    Only tokens that can complete a pattern trigger a regex search, and the search only
+    covers the last `window` generated tokens, so the cost per step stays small. After a
+    match the sequence may continue for up to `grace_tokens` tokens to finish the answer
+    line (e.g. the closing ``\\]``); it is stopped at the first newline or when the grace
+    tokens are used up.
+    """
+
+    # Every final-answer pattern ends with one of these characters
+    TRIGGER_CHARACTERS = ("}", "]")
+
+    def __init__(self, tokenizer, patterns, window=48, grace_tokens=8):
+        """
+        Initialize the detector.
+
+        Args:
+            tokenizer: Tokenizer used to decode generated tokens
+            patterns (list): Regex patterns of a completed final answer
+            window (int): Number of most recent tokens searched for a pattern
+            grace_tokens (int): Tokens allowed after a match to finish the answer line
+        """
+        self.tokenizer = tokenizer
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.window = window
+        self.grace_tokens = grace_tokens
+
+    def new_state(self):
+        """Create the per-sequence state passed to check."""
+        return {'steps': 0, 'answered_at': None}
+
+    def check(self, state, recent_ids):
+        """
+        Check whether a sequence should stop after its latest token.
+
+        Must be called once for every generated token.
+
+        Args:
+            state (dict): The sequence's state, see new_state
+            recent_ids (list): The most recent generated tokens of the sequence (at least the
+                last `window` tokens, or all of them if fewer were generated)
+
+        Returns:
+            bool: True if the sequence should stop
+        """
+        state['steps'] += 1
+        if not len(recent_ids):
+            return False
+        piece = self.tokenizer.decode([int(recent_ids[-1])], skip_special_tokens=True)
+
+        # After a match, finish the answer line
+        if state['answered_at'] is not None:
+            return "\n" in piece or state['steps'] - state['answered_at'] >= self.grace_tokens
+
+        if not any(character in piece for character in self.TRIGGER_CHARACTERS):
+            return False
+
+        tail = self.tokenizer.decode([int(token) for token in recent_ids[-self.window:]], skip_special_tokens=True)
+        for pattern in self.patterns:
+            match = pattern.search(tail)
+            if match:
+                state['answered_at'] = state['steps']
+                # The token that completed the answer may already end the line
+                return "\n" in tail[match.end():]
+        return False
+
+class FinalAnswerStoppingCriteria(StoppingCriteria):
+    """
+    Stopping criterion for model.generate that stops each row of a batch once it has emitted a final answer.
+    """
+
+    def __init__(self, detector, prompt_length):
+        """
+        Initialize the criterion.
+
+        Args:
+            detector (FinalAnswerDetector): Final answer detector
+            prompt_length (int): Padded prompt length; generated tokens start after it
+        """
+        self.detector = detector
+        self.prompt_length = prompt_length
+        self.states = None
+        self.done = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.done is None:
+            self.states = [self.detector.new_state() for _ in range(input_ids.shape[0])]
+            self.done = [False] * input_ids.shape[0]
+
+        # Only the last window of generated tokens is copied to the host
+        recent = input_ids[:, max(self.prompt_length, input_ids.shape[1] - self.detector.window):].tolist()
+        for row, recent_ids in enumerate(recent):
+            if not self.done[row] and self.detector.check(self.states[row], recent_ids):
+                self.done[row] = True
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
+
+    @property
+    def stopped_count(self):
+        """Number of rows stopped by this criterion."""
+        return sum(self.done) if self.done is not None else 0
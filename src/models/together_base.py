@@ -6,8 +6,10 @@ import logging
 import os
 import re
 import time
+import asyncio
 from dotenv import load_dotenv
 from .api_base import APIBaseModel, format_api_response
+from .rate_limiter import get_rate_limit_info
 from src.type import get_type_module
 
 # Configure logging
@@ -16,11 +18,20 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# OpenAI-compatible endpoint used by the asyncio backend and batch mode
+TOGETHER_OPENAI_BASE_URL = os.environ.get("TOGETHER_BASE_URL", "https://api.together.xyz/v1")
+
 class TogetherBaseModel(APIBaseModel):
     """
     Together AI API model implementation for generating responses to physics problems.
     """
 
+    PROVIDER = "together"
+
+    # Tries per question while the API returns empty content, and the wait between them
+    EMPTY_RESPONSE_TRIES = 1  # Set to 1 for now, can be increased if needed
+    EMPTY_RESPONSE_RETRY_DELAY = 2
+
     def __init__(self, model_name="togethercomputer/llama-2-70b-chat", parallel_size=4, max_tokens=2000):
         """
         Initialize the Together AI model.
@@ -36,185 +47,329 @@ class TogetherBaseModel(APIBaseModel):
             raise ValueError("TOGETHER_API_KEY environment variable is not set")
 
         self.model_name = model_name
+        self._client = None
         logger.info(f"Initialized Together AI model: {model_name}, max_tokens: {max_tokens}")
 
-    def _make_api_call(self, question_data, question_type):
+    def _get_client(self):
+        """Get the Together client, creating it on first use so its connections are reused."""
+        if self._client is None:
+            # Import the Together client
+            try:
+                from together import Together
+            except ImportError:
+                logger.error("Together client library not installed. Please install it with 'pip install together'")
+                raise ImportError("Together client library not installed. Please install it with 'pip install together'")
+
+            # Initialize the Together client
+            self._client = Together(api_key=self.api_key)
+        return self._client
+
+    def _async_client_config(self):
+        """Client arguments for the asyncio backend (Together's OpenAI-compatible endpoint)."""
+        return {"api_key": self.api_key, "base_url": TOGETHER_OPENAI_BASE_URL}
+
+    def _build_request(self, question_data, question_type):
         """
-        Make the API call to Together AI using the client library.
+        Build the chat completion parameters for a question.
 
         Args:
             question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
             question_type (str): Type of question (OEQ or MCQ)
 
         Returns:
-            dict: The model's response
+            tuple: (request_params, short_question)
         """
-        try:
-            # Get the appropriate question type module
-            type_module = get_type_module(question_type)
-
-            # Extract question text and additional data if available
-            if isinstance(question_data, dict):
-                question_text = question_data.get('question', question_data.get('problem', ''))
-
-                # For MCQ questions, extract options and knowledge if available
-                if question_type == "MCQ":
-                    options = question_data.get('options', None)
-                    knowledge = question_data.get('knowledge', None)
-                    # Get the prompt with options and knowledge
-                    prompt = type_module.get_prompt(question_text, options, knowledge)
-                else:
-                    # For other question types, just use the question text
-                    prompt = type_module.get_prompt(question_text)
+        # Get the appropriate question type module
+        type_module = get_type_module(question_type)
+
+        # Extract question text and additional data if available
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+
+            # For MCQ questions, extract options and knowledge if available
+            if question_type == "MCQ":
+                options = question_data.get('options', None)
+                knowledge = question_data.get('knowledge', None)
+                # Get the prompt with options and knowledge
+                prompt = type_module.get_prompt(question_text, options, knowledge)
             else:
-                # If question_data is a string, just use it directly
-                question_text = str(question_data)
+                # For other question types, just use the question text
                 prompt = type_module.get_prompt(question_text)
+        else:
+            # If question_data is a string, just use it directly
+            question_text = str(question_data)
+            prompt = type_module.get_prompt(question_text)
+
+        # Get a short version of the question for logging
+        short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+        short_question = short_question.replace("\n", " ")
+
+        # Get the system message from the question type module
+        system_message = type_module.SYSTEM_MESSAGE
+
+        # Format the prompt for Together AI
+        formatted_prompt = f"{system_message}\n\n{prompt}"
+
+        # Handle different models with specific configurations
+        if "gemma" in self.model_name.lower():
+            # For Gemma models, we need to be careful about token limits
+            logger.info(f"Using Gemma-specific configuration for model: {self.model_name}")
+            max_tokens = min(6000, self.max_tokens)  # Ensure we don't exceed Gemma's limits
+        else:
+            # For all other models
+            max_tokens = self.max_tokens
+
+        request_params = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": formatted_prompt}],
+            "max_tokens": max_tokens,
+        }
+        return request_params, short_question
+
+    def _parse_response(self, response):
+        """
+        Extract content, usage and reasoning content from a chat completion.
 
-            # Get a short version of the question for logging
-            short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
-            short_question = short_question.replace("\n", " ")
+        Args:
+            response: The chat completion returned by the API
 
-            # Get the system message from the question type module
-            system_message = type_module.SYSTEM_MESSAGE
+        Returns:
+            tuple: (content, usage, reasoning_content)
+        """
+        # Extract usage information
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "total_tokens": response.usage.total_tokens
+        }
+
+        # Extract the content
+        respond = response.choices[0].message.content
+        logger.info(f"Received response with length: {len(respond)} characters")
+
+        # Extract reasoning_content if available
+        reasoning_content = None
+
+        # Check for reasoning content in the response
+        if "Qwen/Qwen3-235B-A22B-fp8-tput" in self.model_name:
+            # Try to extract reasoning content from Qwen3 model response
+            logger.info(f"Extracted reasoning content from <think> tags...")
+            try:
+                if "<think>" in respond and "</think>" in respond:
+                    # Extract content between <think> and </think> tags
+                    think_pattern = re.compile(r"<think>(.*?)</think>", re.DOTALL)
+                    matches = think_pattern.findall(respond)
 
-            # Format the prompt for Together AI
-            formatted_prompt = f"{system_message}\n\n{prompt}"
+                    if matches:
+                        # Combine all thinking sections if there are multiple
+                        reasoning_content = "\n\n".join(match.strip() for match in matches)
+                        logger.info(f"Extracted reasoning content from <think> tags: {len(reasoning_content)} characters")
 
-            # Import the Together client
-            try:
-                from together import Together
-            except ImportError:
-                logger.error("Together client library not installed. Please install it with 'pip install together'")
-                raise ImportError("Together client library not installed. Please install it with 'pip install together'")
+                        # Remove the <think> sections from the main content
+                        cleaned_content = think_pattern.sub("", respond).strip()
 
-            # Initialize the Together client
-            client = Together(api_key=self.api_key)
+                        # If there's content left after removing thinking sections, update the respond variable
+                        if cleaned_content:
+                            respond = cleaned_content
+                            logger.info(f"Updated main content after removing <think> sections: {len(respond)} characters")
+            except Exception as e:
+                logger.warning(f"Error extracting reasoning content: {e}")
+
+        return respond, usage, reasoning_content
+
+    def _format_result(self, respond, usage, response, reasoning_content, short_question):
+        """
+        Build the standardized response from the parsed completion.
+
+        Args:
+            respond (str): The response content
+            usage (dict): Token usage information
+            response: The full chat completion
+            reasoning_content (str or None): Extracted reasoning content
+            short_question (str): Shortened question text for logging
+
+        Returns:
+            dict: The model's response
+        """
+        # Create a response object with reasoning_content if available
+        response_obj = {
+            "content": respond,
+            "usage": usage,
+            "full_response": response
+        }
+
+        # Add reasoning_content if available
+        if reasoning_content:
+            response_obj["reasoning_content"] = reasoning_content
+
+        # Use the standardized response format function
+        result = format_api_response(respond, usage, response_obj)
+
+        logger.info(f"Together AI API call successful for question: {short_question}")
+        logger.info(f"Received {len(respond)} characters of content, {usage['total_tokens']} total tokens")
+
+        return result
+
+    def _format_error(self, e, question_data):
+        """
+        Log an API error and convert it into the standardized error response.
+
+        Args:
+            e (Exception): The exception raised by the API call
+            question_data (str or dict): The question that was being answered
+
+        Returns:
+            dict: The error response
+        """
+        logger.error(f"Error in Together AI API call: {str(e)}")
+
+        # Get a short version of the question for error logging
+        if isinstance(question_data, dict):
+            question_text = question_data.get('question', question_data.get('problem', ''))
+        else:
+            question_text = str(question_data)
+
+        short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
+        short_question = short_question.replace("\n", " ")
+
+        # Log detailed error information
+        error_msg = str(e)
+        error_type = type(e).__name__
+
+        logger.error(f"Error in Together AI API call for question: {short_question}")
+        logger.error(f"Error type: {error_type}")
+        logger.error(f"Error message: {error_msg}")
+
+        # Add traceback information
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+
+        # Use the standardized response format function with error
+        error_response = {
+            "error": error_msg,
+            "error_type": error_type,
+            "question": short_question
+        }
+
+        # Let the retry loop and rate limiter recognise 429s and Retry-After
+        rate_limited, retry_after = get_rate_limit_info(e)
+        error_response["rate_limited"] = rate_limited
+        error_response["retry_after"] = retry_after
+
+        return format_api_response(f"Error: {error_msg}", {}, error_response, error=error_msg)
+
+    def _make_api_call(self, question_data, question_type):
+        """
+        Make the API call to Together AI using the client library.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The model's response
+        """
+        try:
+            request_params, short_question = self._build_request(question_data, question_type)
+
+            client = self._get_client()
 
             logger.info(f"Sending request to Together AI with model: {self.model_name} for question: {short_question}")
 
             respond = ""
             try_count = 0
-            max_tries = 1  # Set to 1 for now, can be increased if needed
+            max_tries = self.EMPTY_RESPONSE_TRIES
 
             while respond == "" and try_count < max_tries:
                 try_count += 1
 
-                # Handle different models with specific configurations
-                if "gemma" in self.model_name.lower():
-                    # For Gemma models, we need to be careful about token limits
-                    logger.info(f"Using Gemma-specific configuration for model: {self.model_name}")
-                    response = client.chat.completions.create(
-                        model=self.model_name,
-                        messages=[{"role": "user", "content": formatted_prompt}],
-                        max_tokens=min(6000, self.max_tokens)  # Ensure we don't exceed Gemma's limits
-                    )
-                else:
-                    # For all other models
-                    response = client.chat.completions.create(
-                        model=self.model_name,
-                        messages=[{"role": "user", "content": formatted_prompt}],
-                        max_tokens=self.max_tokens,
-                    )
-
-                # Extract usage information
-                usage = {
-                    "prompt_tokens": response.usage.prompt_tokens,
-                    "completion_tokens": response.usage.completion_tokens,
-                    "total_tokens": response.usage.total_tokens
-                }
-
-                # Extract the content
-                respond = response.choices[0].message.content
-                logger.info(f"Received response with length: {len(respond)} characters")
-
-                # Extract reasoning_content if available
-                reasoning_content = None
-
-                # Check for reasoning content in the response
-                if "Qwen/Qwen3-235B-A22B-fp8-tput" in self.model_name:
-                    # Try to extract reasoning content from Qwen3 model response
-                    logger.info(f"Extracted reasoning content from <think> tags...")
-                    try:
-                        if "<think>" in respond and "</think>" in respond:
-                            # Extract content between <think> and </think> tags
-                            think_pattern = re.compile(r"<think>(.*?)</think>", re.DOTALL)
-                            matches = think_pattern.findall(respond)
-
-                            if matches:
-                                # Combine all thinking sections if there are multiple
-                                reasoning_content = "\n\n".join(match.strip() for match in matches)
-                                logger.info(f"Extracted reasoning content from <think> tags: {len(reasoning_content)} characters")
-
-                                # Remove the <think> sections from the main content
-                                cleaned_content = think_pattern.sub("", respond).strip()
-
-                                # If there's content left after removing thinking sections, update the respond variable
-                                if cleaned_content:
-                                    respond = cleaned_content
-                                    logger.info(f"Updated main content after removing <think> sections: {len(respond)} characters")
-                    except Exception as e:
-                        logger.warning(f"Error extracting reasoning content: {e}")
+                response = client.chat.completions.create(**request_params)
+                respond, usage, reasoning_content = self._parse_response(response)
 
                 # If we got an empty response and have more tries, wait a bit before retrying
                 if respond == "" and try_count < max_tries:
                     logger.warning(f"Received empty response, retrying ({try_count}/{max_tries})...")
-                    time.sleep(2)  # Wait 2 seconds before retrying
+                    time.sleep(self.EMPTY_RESPONSE_RETRY_DELAY)
 
             # Check if we still have an empty response after all retries
             if respond == "":
                 logger.warning(f"Still received empty response after {max_tries} tries")
 
-            # Create a response object with reasoning_content if available
-            response_obj = {
-                "content": respond,
-                "usage": usage,
-                "full_response": response
-            }
+            return self._format_result(respond, usage, response, reasoning_content, short_question)
+
+        except Exception as e:
+            return self._format_error(e, question_data)
+
+    async def _make_api_call_async(self, question_data, question_type):
+        """
+        Make the API call to Together AI through its OpenAI-compatible endpoint with the
+        shared async client (asyncio backend).
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The model's response
+        """
+        try:
+            request_params, short_question = self._build_request(question_data, question_type)
+
+            logger.info(f"Sending async request to Together AI with model: {self.model_name} for question: {short_question}")
+
+            respond = ""
+            try_count = 0
+            max_tries = self.EMPTY_RESPONSE_TRIES
+
+            # Same empty-content retries as the synchronous path, without blocking the event loop
+            while respond == "" and try_count < max_tries:
+                try_count += 1
 
-            # Add reasoning_content if available
-            if reasoning_content:
-                response_obj["reasoning_content"] = reasoning_content
+                response = await self._get_async_client().chat.completions.create(**request_params)
+                respond, usage, reasoning_content = self._parse_response(response)
 
-            # Use the standardized response format function
-            result = format_api_response(respond, usage, response_obj)
+                if respond == "" and try_count < max_tries:
+                    logger.warning(f"Received empty response, retrying ({try_count}/{max_tries})...")
+                    await asyncio.sleep(self.EMPTY_RESPONSE_RETRY_DELAY)
 
-            logger.info(f"Together AI API call successful for question: {short_question}")
-            logger.info(f"Received {len(respond)} characters of content, {usage['total_tokens']} total tokens")
+            if respond == "":
+                logger.warning(f"Still received empty response after {max_tries} tries for question: {short_question}")
 
-            return result
+            return self._format_result(respond, usage, response, reasoning_content, short_question)
 
         except Exception as e:
-            logger.error(f"Error in Together AI API call: {str(e)}")
+            return self._format_error(e, question_data)
 
-            # Get a short version of the question for error logging
-            if isinstance(question_data, dict):
-                question_text = question_data.get('question', question_data.get('problem', ''))
-            else:
-                question_text = str(question_data)
-
-            short_question = question_text[:50] + "..." if len(question_text) > 50 else question_text
-            short_question = short_question.replace("\n", " ")
-
-            # Log detailed error information
-            error_msg = str(e)
-            error_type = type(e).__name__
-
-            logger.error(f"Error in Together AI API call for question: {short_question}")
-            logger.error(f"Error type: {error_type}")
-            logger.error(f"Error message: {error_msg}")
-
-            # Add traceback information
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-
-            # Use the standardized response format function with error
-            error_response = {
-                "error": error_msg,
-                "error_type": error_type,
-                "question": short_question
-            }
-            return format_api_response(f"Error: {error_msg}", {}, error_response, error=error_msg)
+    def _build_batch_body(self, question_data, question_type):
+        """
+        Build the chat completion request body of a question for a Together batch job.
+
+        Args:
+            question_data (str or dict): The question to answer. Can be a string or a dictionary containing the question and additional data
+            question_type (str): Type of question (OEQ or MCQ)
+
+        Returns:
+            dict: The request body
+        """
+        request_params, _ = self._build_request(question_data, question_type)
+        return request_params
+
+    def _parse_batch_body(self, body, short_question):
+        """
+        Convert the chat completion body of a batch output line into the standardized response format.
+
+        Args:
+            body (dict): The chat completion as returned in the batch output file
+            short_question (str): Label of the request for logging
+
+        Returns:
+            dict: The model's response
+        """
+        from openai.types.chat import ChatCompletion
+
+        response = ChatCompletion.model_validate(body)
+        respond, usage, reasoning_content = self._parse_response(response)
+        return self._format_result(respond, usage, response, reasoning_content, short_question)
 
 # Specific model implementations
 class LlamaModel(TogetherBaseModel):
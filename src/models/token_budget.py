@@ -0,0 +1,202 @@
+"""
+Token-budget batch planning for local models.
+
+The memory a batch needs during generation grows with the padded number of tokens it
+holds in the KV cache: batch size x (longest prompt + max_new_tokens). The planner packs
+questions into batches whose estimated cost stays below a token ceiling, and lowers that
+ceiling whenever a batch runs out of memory. The learned ceiling applies to every later
+batch, and to later runs when a state file is given, so the same out-of-memory error is
+not hit again batch after batch.
+
+A learned ceiling can rise again. It expires STATE_MAX_AGE_DAYS after the last
+out-of-memory error, so an error caused by a transient condition (e.g. another process on
+the GPU) does not shrink every later run, and an explicit token_budget replaces it.
+
+The planner only does arithmetic on token counts and does not import torch, so its OOM
+handling can be exercised on a CPU with a simulated allocator (see
+scripts/benchmark/token_budget_sim.py).
+"""
+
+import os
+import json
+import logging
+import datetime
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class TokenBudgetPlanner:
+    """
+    Packs batches against a token ceiling that is learned from out-of-memory errors.
+    """
+
+    # Fraction of a failed batch's cost the ceiling drops to when no smaller batch is known to fit
+    OOM_BACKOFF = 0.5
+
+    # Days after the last out-of-memory error after which a saved ceiling is no longer loaded
+    STATE_MAX_AGE_DAYS = 7
+
+    def __init__(self, max_batch_size, max_new_tokens, token_budget=None, state_path=None):
+        """
+        Initialize the planner.
+
+        Args:
+            max_batch_size (int): Maximum number of questions per batch
+            max_new_tokens (int): Maximum number of generated tokens per question
+            token_budget (int, optional): Initial ceiling in tokens, which replaces a saved ceiling.
+                None means the saved ceiling, or no ceiling until the first OOM.
+            state_path (str, optional): JSON file the learned ceiling is loaded from and saved to
+        """
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_new_tokens = max_new_tokens
+        self.ceiling = token_budget
+        self.state_path = state_path
+
+        # Cost of the largest batch that generated without running out of memory
+        self.largest_success = 0
+        self.stats = {'oom_count': 0, 'split_batches': 0}
+        # Out-of-memory errors recorded by earlier runs in the state file, and when the last one happened
+        self._previous_oom_count = 0
+        self.last_oom_at = None
+
+        if state_path and os.path.exists(state_path):
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._previous_oom_count = state.get('oom_count', 0)
+            # State files written before last_oom_at was recorded only have updated_at
+            last_oom_at = state.get('last_oom_at') or state.get('updated_at')
+            age_days = None
+            if last_oom_at:
+                age_days = (datetime.datetime.now() - datetime.datetime.strptime(last_oom_at, '%Y-%m-%d %H:%M:%S')).total_seconds() / 86400
+
+            if age_days is not None and age_days > self.STATE_MAX_AGE_DAYS:
+                logger.info(f"Ignoring the token ceiling in {state_path}: its last out-of-memory error is {age_days:.1f} days old "
+                            f"(more than {self.STATE_MAX_AGE_DAYS})")
+            else:
+                self.largest_success = state.get('largest_success', 0)
+                self.last_oom_at = last_oom_at
+                if token_budget is not None:
+                    logger.info(f"Using the given token ceiling {token_budget} instead of the learned {state.get('ceiling')} in {state_path}")
+                else:
+                    self.ceiling = state.get('ceiling')
+                    logger.info(f"Loaded token ceiling {self.ceiling} from {state_path} (learned from {self._previous_oom_count} out-of-memory errors)")
+
+    def batch_cost(self, lengths):
+        """
+        Estimate the token cost of a batch.
+
+        Args:
+            lengths (list): Prompt lengths of the questions in the batch
+
+        Returns:
+            int: Batch size x (longest prompt + max_new_tokens)
+        """
+        if not lengths:
+            return 0
+        return len(lengths) * (max(lengths) + self.max_new_tokens)
+
+    def fits(self, lengths):
+        """Check whether a batch fits the batch size limit and the current ceiling."""
+        if len(lengths) > self.max_batch_size:
+            return False
+        return self.ceiling is None or self.batch_cost(lengths) <= self.ceiling
+
+    def plan(self, lengths, order=None):
+        """
+        Pack questions into batches that fit the ceiling, keeping the given order.
+
+        A question whose cost alone exceeds the ceiling still gets a batch of its own.
+
+        Args:
+            lengths (list): Prompt length of every question
+            order (list, optional): Order in which questions are packed (default: index order).
+                Packing questions sorted by length keeps the padding within each batch small.
+
+        Returns:
+            list: Batches as lists of indices into lengths
+        """
+        order = list(range(len(lengths))) if order is None else order
+        batches = []
+        batch = []
+        for index in order:
+            if batch and not self.fits([lengths[i] for i in batch] + [lengths[index]]):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def record_oom(self, lengths):
+        """
+        Lower the ceiling after a batch ran out of memory.
+
+        The new ceiling is the cost of the largest smaller batch that is known to fit, or
+        OOM_BACKOFF times the failed cost if that is higher. It is always below the cost of
+        the failed batch, so replanning that batch splits it.
+
+        Args:
+            lengths (list): Prompt lengths of the questions in the failed batch
+
+        Returns:
+            int: The new ceiling
+        """
+        cost = self.batch_cost(lengths)
+        known_good = self.largest_success if self.largest_success < cost else 0
+        new_ceiling = max(int(cost * self.OOM_BACKOFF), known_good, 1)
+        if self.ceiling is None or new_ceiling < self.ceiling:
+            self.ceiling = new_ceiling
+        # Costs at or above a failure can no longer be trusted to fit
+        if self.largest_success >= cost:
+            self.largest_success = 0
+
+        self.stats['oom_count'] += 1
+        self.last_oom_at = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        logger.warning(f"Out of memory on a batch of {len(lengths)} questions costing {cost} tokens; token ceiling lowered to {self.ceiling}")
+        self._save()
+        return self.ceiling
+
+    def record_success(self, lengths):
+        """
+        Remember the cost of a batch that generated without running out of memory.
+
+        Args:
+            lengths (list): Prompt lengths of the questions in the batch
+        """
+        cost = self.batch_cost(lengths)
+        if cost > self.largest_success:
+            self.largest_success = cost
+            self._save()
+
+    def _save(self):
+        """Write the learned state to the state file."""
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        state = {
+            'ceiling': self.ceiling,
+            'largest_success': self.largest_success,
+            'max_new_tokens': self.max_new_tokens,
+            'oom_count': self._previous_oom_count + self.stats['oom_count'],
+            'last_oom_at': self.last_oom_at,
+            'updated_at': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def get_stats(self):
+        """
+        Get the planner's state and counters.
+
+        Returns:
+            dict: Current ceiling, largest successful batch cost and OOM/split counts of this run
+        """
+        return {
+            'ceiling': self.ceiling,
+            'largest_success': self.largest_success,
+            'max_batch_size': self.max_batch_size,
+            'max_new_tokens': self.max_new_tokens,
+            **self.stats
+        }
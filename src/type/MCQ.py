@@ -17,6 +17,23 @@ SYSTEM_MESSAGE = """You are an Earth Science Expert answering multiple-choice qu
 
 """
 
+# Regex patterns the MCQ evaluator extracts answers with, in priority order.
+# Group 1 of each pattern is the chosen option.
+ANSWER_PATTERNS = [
+    r"[A,a][N,n][S,s][W,w][E,e][R,r]:?\s*[\*\[\{]*:?\s*([A-Da-d])[\*\[\}]*",  # Matches 'Answer: A', 'Answer: *A*'
+    r"\\boxed\{([A-Da-d])\}",  # Matches '\boxed{C}'
+    r"\\boxed\{\{([A-Da-d])\}\}",# \\boxed{{A}}
+    r"(\\)?boxed\{\{?\s*([A-Da-d])\s*\}?\}",
+    r"[O,o][P,p][T,t][I,i][O,o][N,n][S,s]?:?\s*[\*\[\{]*:?\s*([A-Da-d])[\*\[\}]*",  # Matches 'Option: B'
+    r"\*\*[F,f]inal\s*[A,a]nswer\*\*:?\s*\\\[\s*\\boxed\{([A-Da-d])\}\s*\\\]",  # Matches '**Final Answer**: \[ \boxed{A} \]'
+    r"\*\*Final Answer\*\*:\s*\[\s*(?:\\?boxed\{)?\s*([A-Da-d])\s*\}?\s*\]"
+]
+
+# The answer patterns that only match the completed **Final Answer** line the system message asks for.
+# 'Answer: A', 'Option: B' and a bare \boxed{A} also appear in the middle of the reasoning, so they are left out.
+# With early stopping enabled, local generation stops a sequence shortly after one of these has been emitted.
+FINAL_ANSWER_PATTERNS = [ANSWER_PATTERNS[i] for i in (5, 6)]
+
 def get_prompt(question, options=None, knowledge=None):
     """
     Get the formatted prompt for a multiple-choice question.